@@ -0,0 +1,19 @@
+"""Latency, throughput and memory benchmarks for the RAG chatbot system."""
+
+from .suite import (
+    BenchmarkRunner,
+    DEFAULT_WORKLOAD,
+    STAGES,
+    compare_to_baseline,
+    load_workload,
+    percentile
+)
+
+__all__ = [
+    "BenchmarkRunner",
+    "DEFAULT_WORKLOAD",
+    "STAGES",
+    "compare_to_baseline",
+    "load_workload",
+    "percentile"
+]
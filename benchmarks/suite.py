@@ -0,0 +1,580 @@
+"""Benchmark suite driving each pipeline stage with a configurable workload.
+
+Each stage is timed on its own (vector search, RAG chain, function calling,
+the full chatbot and text-to-speech) and reported as p50/p95/p99 latency,
+throughput and memory. Startup (import time, time to the first prompt and to
+the first answer) is measured in fresh interpreters. The intent router's
+accuracy is measured on the use case's held-out routing questions. Reports are plain JSON so a run can be saved as a
+baseline and later runs compared against it.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import threading
+import tracemalloc
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Callable
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+STAGES = ("vector_search", "retrieval_chain", "function_calling", "chatbot", "tts")
+
+DEFAULT_WORKLOAD: Dict[str, Any] = {
+    "use_case": "it_helpdesk",
+    # Timed iterations per stage (queries are cycled) and untimed warm-up iterations
+    "iterations": 20,
+    "warmup": 2,
+    # Concurrent callers per stage; throughput is iterations / wall time
+    "concurrency": 1,
+    # Extra iterations run under tracemalloc to measure allocations
+    "memory_iterations": 3,
+    # Clear the query-embedding cache before each search to measure cold embeddings
+    "cold_cache": False,
+    # Let repeated first-turn questions be served from the answer cache
+    # (off, so every iteration measures retrieval and generation)
+    "answer_cache": False,
+    # TTS needs network access (gTTS/edge-tts), so it is opt-in
+    "stages": ["vector_search", "retrieval_chain", "function_calling", "chatbot"],
+    # Per-stage query lists; missing stages use questions from the use case's data
+    "queries": {},
+    # Fresh interpreters started to time imports and the first prompt/answer (0 skips it)
+    "startup_runs": 3,
+    # Measure intent router accuracy on the held-out routing questions
+    "routing_eval": True
+}
+
+STARTUP_METRICS = ("import_ms", "first_prompt_ms", "first_answer_ms", "cli_help_ms")
+
+ROUTING_METRICS = ("accuracy", "misroute_rate")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Run in a fresh interpreter: time to import the chat interface, to a chatbot
+# ready for input (what the command-line REPL waits for) and to the first answer
+_STARTUP_PROBE = """
+import json, time
+start = time.perf_counter()
+from rag_system.chat_interface import RAGChatbot
+imported = time.perf_counter()
+chatbot = RAGChatbot({use_case!r})
+ready = time.perf_counter()
+chatbot.chat({question!r})
+answered = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (imported - start) * 1000,
+    "first_prompt_ms": (ready - start) * 1000,
+    "first_answer_ms": (answered - start) * 1000
+}}))
+"""
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Compute a percentile with linear interpolation.
+
+    Args:
+        values: Sample values
+        pct: Percentile between 0 and 100
+
+    Returns:
+        Percentile value (0.0 for no samples)
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def load_workload(path: Optional[str] = None, **overrides: Any) -> Dict[str, Any]:
+    """Load a workload definition, filling unspecified keys from the default.
+
+    Args:
+        path: JSON workload file (optional)
+        **overrides: Keys to override (None values are ignored)
+
+    Returns:
+        Complete workload dictionary
+    """
+    workload = json.loads(json.dumps(DEFAULT_WORKLOAD))
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            workload.update(json.load(f))
+    workload.update({key: value for key, value in overrides.items() if value is not None})
+
+    unknown = [stage for stage in workload["stages"] if stage not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown benchmark stages: {', '.join(unknown)}")
+    return workload
+
+
+def _default_queries(use_case: str) -> Dict[str, List[str]]:
+    """Questions for each stage taken from the use case's mock data."""
+    if use_case == "it_helpdesk":
+        from mock_data.it_helpdesk import ROUTING_EXAMPLES
+        knowledge = ROUTING_EXAMPLES["rag"]
+        tools = ROUTING_EXAMPLES["tools"]
+    else:
+        raise ValueError(f"Unknown use case: {use_case}")
+
+    return {
+        "vector_search": knowledge,
+        "retrieval_chain": knowledge,
+        "function_calling": tools,
+        "chatbot": [question for pair in zip(tools, knowledge) for question in pair],
+        "tts": [
+            "Your printer is online and the toner is at 75 percent.",
+            "To reset your password, visit the password portal and follow the instructions."
+        ]
+    }
+
+
+def _routing_eval_set(use_case: str) -> List[tuple]:
+    """Held-out (question, expected route) pairs of the use case."""
+    if use_case == "it_helpdesk":
+        from mock_data.it_helpdesk import ROUTING_EVAL_SET
+        return ROUTING_EVAL_SET
+    raise ValueError(f"Unknown use case: {use_case}")
+
+
+def _memory_rss_kb() -> Optional[int]:
+    """Peak resident set size of the process in KB, if available."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def measure_startup(use_case: str, question: str, runs: int = 3) -> Dict[str, Any]:
+    """Time startup in fresh interpreters.
+
+    Args:
+        use_case: Use case of the chatbot
+        question: First question asked
+        runs: Interpreters started per measurement; the median is reported
+
+    Returns:
+        Median import time, time to first prompt, time to first answer and
+        wall time of ``chatbot_main.py --help``, in milliseconds
+    """
+    samples: Dict[str, List[float]] = {metric: [] for metric in STARTUP_METRICS}
+    errors: List[str] = []
+    probe = _STARTUP_PROBE.format(use_case=use_case, question=question)
+
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", probe],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=300
+        )
+        if result.returncode != 0:
+            errors.append(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"exit {result.returncode}")
+            continue
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+        for metric, value in timings.items():
+            samples[metric].append(value)
+
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "chatbot_main.py", "--help"],
+            cwd=PROJECT_ROOT, capture_output=True, timeout=60
+        )
+        samples["cli_help_ms"].append((time.perf_counter() - start) * 1000)
+
+    report: Dict[str, Any] = {
+        "runs": runs,
+        "startup_mode": os.getenv("RAG_STARTUP_MODE", "background"),
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:3]
+    }
+    report.update({metric: percentile(values, 50) for metric, values in samples.items()})
+    return report
+
+
+def _git_commit() -> Optional[str]:
+    """Current git commit of the working tree, if any."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+class BenchmarkRunner:
+    """Runs the configured stages and produces a JSON-friendly report."""
+
+    def __init__(self, workload: Optional[Dict[str, Any]] = None):
+        """Initialize benchmark runner.
+
+        Args:
+            workload: Workload definition (see DEFAULT_WORKLOAD); defaults to DEFAULT_WORKLOAD
+        """
+        self.workload = workload or load_workload()
+        self.use_case = self.workload["use_case"]
+        self.queries = _default_queries(self.use_case)
+        self.queries.update(self.workload.get("queries") or {})
+
+        self._shared: Dict[str, Any] = {}
+        self._shared_lock = threading.Lock()
+        self._local = threading.local()
+
+    def run(self, progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """Run every configured stage.
+
+        Args:
+            progress: Optional callback receiving a status line per stage
+
+        Returns:
+            Report with run metadata and per-stage results
+        """
+        report = {
+            "meta": {
+                "timestamp": datetime.now().isoformat(),
+                "git_commit": _git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "offline": os.getenv("AZURE_OPENAI_OFFLINE", "").lower() in ("1", "true", "yes"),
+                "workload": {key: value for key, value in self.workload.items() if key != "queries"}
+            },
+            "stages": {}
+        }
+
+        for stage in self.workload["stages"]:
+            if progress:
+                progress(f"Running {stage}...")
+            result = self.run_stage(stage)
+            report["stages"][stage] = result
+            if progress:
+                progress(
+                    f"  {stage}: p50={result['p50_ms']:.1f}ms p95={result['p95_ms']:.1f}ms "
+                    f"p99={result['p99_ms']:.1f}ms {result['throughput_rps']:.2f} req/s "
+                    f"errors={result['errors']}"
+                )
+
+        runs = int(self.workload.get("startup_runs", 0))
+        if runs > 0:
+            if progress:
+                progress("Measuring startup...")
+            report["startup"] = measure_startup(self.use_case, self.queries["chatbot"][0], runs)
+            if progress:
+                startup = report["startup"]
+                progress(
+                    f"  startup: import={startup['import_ms']:.0f}ms first_prompt={startup['first_prompt_ms']:.0f}ms "
+                    f"first_answer={startup['first_answer_ms']:.0f}ms cli_help={startup['cli_help_ms']:.0f}ms "
+                    f"errors={startup['errors']}"
+                )
+
+        if self.workload.get("routing_eval"):
+            if progress:
+                progress("Evaluating intent router...")
+            report["routing"] = self.evaluate_routing()
+            if progress:
+                routing = report["routing"]
+                progress(
+                    f"  routing: accuracy={routing['accuracy']:.1%} misrouted={routing['misrouted']}/{routing['total']} "
+                    f"ambiguous={routing['ambiguous_rate']:.1%}"
+                )
+
+        report["meta"]["peak_rss_kb"] = _memory_rss_kb()
+        return report
+
+    def evaluate_routing(self) -> Dict[str, Any]:
+        """Measure intent router accuracy on the held-out routing questions.
+
+        The router embeds through the shared vector store, as in the chat engine.
+
+        Returns:
+            IntentRouter.evaluate report (accuracy, misrouting, confusion counts)
+        """
+        from rag_system.intent_router import IntentRouter
+        vector_store = self._shared_component("vector_store")
+        router = IntentRouter(self.use_case, embed_fn=vector_store.embed_query)
+        return router.evaluate(_routing_eval_set(self.use_case))
+
+    def run_stage(self, stage: str) -> Dict[str, Any]:
+        """Benchmark one stage.
+
+        Args:
+            stage: Stage name (see STAGES)
+
+        Returns:
+            Latency percentiles, throughput, error count and memory for the stage
+        """
+        operation = self._operation(stage)
+        queries = self.queries.get(stage) or []
+        if not queries:
+            raise ValueError(f"No queries configured for stage: {stage}")
+
+        iterations = int(self.workload["iterations"])
+        concurrency = max(1, int(self.workload["concurrency"]))
+
+        for i in range(int(self.workload["warmup"])):
+            self._timed(operation, queries[i % len(queries)])
+
+        latencies: List[float] = []
+        errors: List[str] = []
+        lock = threading.Lock()
+
+        def run_one(i: int) -> None:
+            elapsed_ms, error = self._timed(operation, queries[i % len(queries)])
+            with lock:
+                if error is None:
+                    latencies.append(elapsed_ms)
+                else:
+                    errors.append(error)
+
+        wall_start = time.perf_counter()
+        if concurrency == 1:
+            for i in range(iterations):
+                run_one(i)
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f"bench-{stage}") as executor:
+                list(executor.map(run_one, range(iterations)))
+        wall_s = time.perf_counter() - wall_start
+
+        result = {
+            "iterations": iterations,
+            "concurrency": concurrency,
+            "errors": len(errors),
+            "error_samples": sorted(set(errors))[:3],
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "mean_ms": sum(latencies) / len(latencies) if latencies else 0.0,
+            "min_ms": min(latencies) if latencies else 0.0,
+            "max_ms": max(latencies) if latencies else 0.0,
+            "throughput_rps": len(latencies) / wall_s if wall_s > 0 else 0.0,
+            "wall_s": wall_s
+        }
+        result.update(self._measure_memory(operation, queries))
+        return result
+
+    def _timed(self, operation: Callable[[str], Any], query: str):
+        """Run one operation, returning its latency and an error message if it failed."""
+        start = time.perf_counter()
+        try:
+            operation(query)
+            error = None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        return (time.perf_counter() - start) * 1000, error
+
+    def _measure_memory(self, operation: Callable[[str], Any], queries: List[str]) -> Dict[str, Any]:
+        """Run a few iterations under tracemalloc, separately from the timed run."""
+        iterations = int(self.workload.get("memory_iterations", 0))
+        if iterations <= 0:
+            return {"memory_peak_kb": None, "memory_retained_kb": None}
+
+        already_tracing = tracemalloc.is_tracing()
+        if not already_tracing:
+            tracemalloc.start()
+        try:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            for i in range(iterations):
+                self._timed(operation, queries[i % len(queries)])
+            after, peak = tracemalloc.get_traced_memory()
+        finally:
+            if not already_tracing:
+                tracemalloc.stop()
+
+        return {
+            "memory_peak_kb": round((peak - before) / 1024, 1),
+            "memory_retained_kb": round((after - before) / 1024, 1)
+        }
+
+    def _operation(self, stage: str) -> Callable[[str], Any]:
+        """Build the callable exercised by a stage."""
+        if stage == "vector_search":
+            vector_store = self._shared_component("vector_store")
+            cold = bool(self.workload.get("cold_cache"))
+
+            def search(query: str):
+                if cold:
+                    vector_store.clear_query_cache()
+                return vector_store.search(query)
+            return search
+
+        if stage == "retrieval_chain":
+            chain = self._shared_component("retrieval_chain")
+
+            def rag(query: str):
+                result = chain.chat(query)
+                if "error" in result:
+                    raise RuntimeError(result["error"])
+                return result
+            return rag
+
+        if stage == "function_calling":
+            function_caller = self._shared_component("function_caller")
+
+            def call_functions(query: str):
+                result = function_caller.chat_with_functions([
+                    {"role": "system", "content": "You are a helpful IT assistant."},
+                    {"role": "user", "content": query}
+                ])
+                if "error" in result:
+                    raise RuntimeError(result["error"])
+                return result
+            return call_functions
+
+        if stage == "chatbot":
+            def chat(query: str):
+                # Conversation state is per chatbot, so each worker thread gets its own
+                chatbot = self._thread_chatbot()
+                chatbot.conversation_manager.clear_history()
+                result = chatbot.chat(query)
+                if result.get("success") is False or "error" in result:
+                    raise RuntimeError(result.get("error") or result.get("answer"))
+                return result
+            return chat
+
+        if stage == "tts":
+            from rag_system.text_to_speech import synthesize_to_mp3_bytes
+
+            def speak(text: str):
+                audio = synthesize_to_mp3_bytes(text)
+                if audio is None:
+                    raise RuntimeError("Speech synthesis failed or no TTS provider available")
+                return audio
+            return speak
+
+        raise ValueError(f"Unknown benchmark stage: {stage}")
+
+    def _shared_component(self, name: str) -> Any:
+        """Create a component once and share it across worker threads."""
+        with self._shared_lock:
+            return self._create_shared(name)
+
+    def _create_shared(self, name: str) -> Any:
+        """Create a shared component if it does not exist yet (lock held)."""
+        if name not in self._shared:
+            if name == "vector_store":
+                from rag_system.vector_store import create_vector_store_for_use_case
+                self._shared[name] = create_vector_store_for_use_case(self.use_case)
+            elif name == "retrieval_chain":
+                from rag_system.retrieval_chain import RetrievalChain
+                self._shared[name] = RetrievalChain(self.use_case)
+                self._configure_answer_cache(self._shared[name])
+            elif name == "function_caller":
+                from rag_system.function_calling import FunctionCaller
+                self._shared[name] = FunctionCaller(self.use_case)
+            elif name == "chat_engine":
+                from rag_system.chat_interface import ChatEngine
+                # Warm-up would pre-embed benchmark queries behind the timed runs' back
+                self._shared[name] = ChatEngine(self.use_case, warm_queries=False)
+                self._configure_answer_cache(self._shared[name].retrieval_chain)
+        return self._shared[name]
+
+    def _configure_answer_cache(self, retrieval_chain: Any) -> None:
+        """Turn the answer cache on or off as the workload asks, whatever the environment says."""
+        from rag_system.retrieval_chain import DEFAULT_ANSWER_CACHE_SIZE
+        if not self.workload.get("answer_cache"):
+            retrieval_chain.answer_cache_size = 0
+        elif retrieval_chain.answer_cache_size <= 0:
+            retrieval_chain.answer_cache_size = DEFAULT_ANSWER_CACHE_SIZE
+
+    def _thread_chatbot(self):
+        """Get the calling thread's chatbot (its own conversation on the shared engine)."""
+        chatbot = getattr(self._local, "chatbot", None)
+        if chatbot is None:
+            from rag_system.chat_interface import RAGChatbot
+            chatbot = RAGChatbot(engine=self._shared_component("chat_engine"))
+            self._local.chatbot = chatbot
+        return chatbot
+
+
+def compare_to_baseline(
+    report: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float = 0.2,
+    metrics: tuple = ("p50_ms", "p95_ms", "p99_ms")
+) -> List[Dict[str, Any]]:
+    """Find stages that got slower (or lost throughput) and routing that got less accurate than a baseline.
+
+    Args:
+        report: Current benchmark report
+        baseline: Saved baseline report
+        tolerance: Allowed relative slowdown (0.2 = 20%)
+        metrics: Latency metrics to compare
+
+    Returns:
+        List of regressions (empty if the run is within tolerance)
+    """
+    regressions = []
+    for stage, current in report.get("stages", {}).items():
+        previous = baseline.get("stages", {}).get(stage)
+        if not previous:
+            continue
+
+        for metric in metrics:
+            old, new = previous.get(metric) or 0.0, current.get(metric) or 0.0
+            if old > 0 and new > old * (1 + tolerance):
+                regressions.append({
+                    "stage": stage,
+                    "metric": metric,
+                    "baseline": old,
+                    "current": new,
+                    "change": (new - old) / old
+                })
+
+        old, new = previous.get("throughput_rps") or 0.0, current.get("throughput_rps") or 0.0
+        if old > 0 and new < old * (1 - tolerance):
+            regressions.append({
+                "stage": stage,
+                "metric": "throughput_rps",
+                "baseline": old,
+                "current": new,
+                "change": (new - old) / old
+            })
+
+        if current.get("errors", 0) > previous.get("errors", 0):
+            regressions.append({
+                "stage": stage,
+                "metric": "errors",
+                "baseline": previous.get("errors", 0),
+                "current": current.get("errors", 0),
+                "change": None
+            })
+
+    current, previous = report.get("startup"), baseline.get("startup")
+    if current and previous:
+        for metric in STARTUP_METRICS:
+            old, new = previous.get(metric) or 0.0, current.get(metric) or 0.0
+            if old > 0 and new > old * (1 + tolerance):
+                regressions.append({
+                    "stage": "startup",
+                    "metric": metric,
+                    "baseline": old,
+                    "current": new,
+                    "change": (new - old) / old
+                })
+
+    # Routing is deterministic for a given index, so any loss of accuracy counts
+    current, previous = report.get("routing"), baseline.get("routing")
+    if current and previous:
+        for metric in ROUTING_METRICS:
+            old, new = previous.get(metric) or 0.0, current.get(metric) or 0.0
+            worse = new < old if metric == "accuracy" else new > old
+            if worse:
+                regressions.append({
+                    "stage": "routing",
+                    "metric": metric,
+                    "baseline": old,
+                    "current": new,
+                    "change": None
+                })
+
+    return regressions
@@ -4,18 +4,26 @@ import os
 import sys
 import argparse
 from pathlib import Path
+from typing import Optional
 
 # Add the project root to the Python path
 project_root = Path(__file__).parent
 sys.path.append(str(project_root))
 
 from rag_system.chat_interface import ChatInterface, RAGChatbot
+from rag_system.profiling import TurnProfiler, PROFILE_FORMATS
+from rag_system.logger import configure_logging, LEVELS
+from rag_system.batch_eval import run_batch_eval
 from dotenv import load_dotenv
 
 def check_environment():
     """Check if environment variables are properly configured."""
     load_dotenv()
 
+    if os.getenv("AZURE_OPENAI_OFFLINE", "").lower() in ("1", "true", "yes", "on"):
+        print("🧪 Offline mode: Azure OpenAI calls are served by the local stand-in.")
+        return True
+
     required_vars = [
         "AZURE_OPENAI_ENDPOINT",
         "AZURE_OPENAI_API_KEY"
@@ -55,9 +63,100 @@ def main():
         action="store_true",
         help="Disable function calling (RAG only)"
     )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile every turn (CPU profile and allocation snapshot per turn); with eval and serve, "
+             "turns overlapping a profiled one are not profiled"
+    )
+    parser.add_argument(
+        "--profile-format",
+        choices=PROFILE_FORMATS,
+        default="pstats",
+        help="Profile output format (default: pstats)"
+    )
+    parser.add_argument(
+        "--profile-dir",
+        default=None,
+        help="Directory for profile files (default: RAG_PROFILE_DIR or ./profiles)"
+    )
+
+    parser.add_argument(
+        "--log-level",
+        choices=list(LEVELS),
+        default=None,
+        help="Structured log level written to stderr or RAG_LOG_FILE (default: RAG_LOG_LEVEL or info)"
+    )
+
+    subparsers = parser.add_subparsers(dest="command")
+    eval_parser = subparsers.add_parser(
+        "eval",
+        help="Replay a JSONL question set concurrently and write results as JSONL"
+    )
+    eval_parser.add_argument("input", help="JSONL file with one question or multi-turn script per line")
+    eval_parser.add_argument(
+        "--output", "-o",
+        default="eval_results.jsonl",
+        help="JSONL results file, written as cases finish (default: eval_results.jsonl)"
+    )
+    eval_parser.add_argument(
+        "--concurrency", "-c",
+        type=int,
+        default=4,
+        help="Cases evaluated at the same time (default: 4)"
+    )
+    eval_parser.add_argument(
+        "--limit",
+        type=int,
+        default=None,
+        help="Only evaluate the first N cases"
+    )
+
+    build_parser = subparsers.add_parser(
+        "build-index",
+        help="Embed the knowledge base into a versioned index artifact loaded on startup"
+    )
+    build_parser.add_argument(
+        "--output",
+        default=None,
+        help="Artifact directory (default: mock_data/indexes/<use case>, or RAG_INDEX_ARTIFACT_DIR)"
+    )
+    build_parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild even if the artifact matches the current corpus and embedding model"
+    )
+
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="Serve the chatbot over HTTP (chat, streaming chat, search, stats)"
+    )
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: 127.0.0.1)")
+    serve_parser.add_argument("--port", type=int, default=8000, help="Port to bind (default: 8000)")
+    serve_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes sharing the on-disk index (default: 1)"
+    )
+    serve_parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=None,
+        help="Turns processed at the same time per worker (default: RAG_SERVER_MAX_CONCURRENCY or 8)"
+    )
+    serve_parser.add_argument(
+        "--max-queue",
+        type=int,
+        default=None,
+        help="Requests waiting for a slot before new ones get 503 (default: RAG_SERVER_MAX_QUEUE or 64)"
+    )
 
     args = parser.parse_args()
 
+    if args.log_level:
+        configure_logging(level=args.log_level)
+
     # Check environment configuration
     if not check_environment():
         return 1
@@ -66,17 +165,48 @@ def main():
         print(f"🚀 Starting RAG Chatbot System...")
         print(f"📋 Use Case: {args.use_case}")
 
+        profiler = None
+        if args.profile:
+            profiler = TurnProfiler(output_dir=args.profile_dir, fmt=args.profile_format, sample_rate=1.0)
+            print(f"🔬 Profiling every turn ({args.profile_format}) into {profiler.output_dir}")
+
+        if args.command == "eval":
+            return run_eval(args, profiler)
+
+        if args.command == "build-index":
+            from rag_system.vector_store import build_index_artifact
+            manifest = build_index_artifact(args.use_case, output_dir=args.output, force=args.force)
+            print(f"📦 Index artifact {manifest['version']}: {manifest['total_documents']} documents, "
+                  f"{manifest['embedding_model']} ({manifest['embedding_dimension']} dimensions)")
+            return 0
+
+        if args.command == "serve":
+            from rag_system.server import serve
+            print(f"🌐 Serving on http://{args.host}:{args.port} with {args.workers} worker(s)")
+            serve(
+                host=args.host,
+                port=args.port,
+                workers=args.workers,
+                use_case=args.use_case,
+                enable_functions=not args.no_functions,
+                max_concurrency=args.max_concurrency,
+                max_queue=args.max_queue,
+                profiler=profiler
+            )
+            return 0
+
         if args.demo:
             # Run demonstration mode
             print("🎬 Running in demonstration mode...")
             chatbot = RAGChatbot(
                 use_case=args.use_case,
-                enable_functions=not args.no_functions
+                enable_functions=not args.no_functions,
+                profiler=profiler
             )
             chatbot.demo_interaction()
         else:
             # Run interactive chat interface
-            interface = ChatInterface(args.use_case)
+            interface = ChatInterface(args.use_case, profiler=profiler)
             interface.run()
 
         return 0
@@ -90,6 +220,36 @@ def main():
         print("💡 Make sure you have installed all requirements and configured your .env file.")
         return 1
 
+def run_eval(args, profiler: Optional[TurnProfiler] = None) -> int:
+    """Run the batch evaluation subcommand."""
+    print(f"🧪 Evaluating {args.input} with concurrency {args.concurrency} -> {args.output}")
+
+    def progress(done, total, result):
+        status = "✅" if result["success"] and result.get("passed", True) else "❌"
+        print(f"  [{done}/{total}] {status} {result['id']} ({result['total_ms']:.0f} ms)")
+
+    summary = run_batch_eval(
+        args.input,
+        args.output,
+        use_case=args.use_case,
+        concurrency=args.concurrency,
+        enable_functions=not args.no_functions,
+        limit=args.limit,
+        progress=progress,
+        profiler=profiler
+    )
+
+    latency = summary["turn_latency_ms"]
+    print(f"\n📊 {summary['cases']} cases, {summary['turns']} turns in {summary['wall_s']:.1f}s "
+          f"({summary['cases_per_s']:.2f} cases/s)")
+    print(f"   Turn latency p50 {latency['p50']:.0f} ms · p95 {latency['p95']:.0f} ms · p99 {latency['p99']:.0f} ms")
+    print(f"   Methods: {', '.join(f'{name} {count}' for name, count in summary['methods'].items())}")
+    if summary["checked_cases"]:
+        print(f"   Expectations: {summary['passed_cases']}/{summary['checked_cases']} passed")
+    print(f"   Tokens: {summary['tokens']:,} (${summary['cost_usd']:.4f})")
+    print(f"   Failed cases: {summary['failed_cases']}")
+    return 1 if summary["failed_cases"] else 0
+
 if __name__ == "__main__":
     exit_code = main()
     sys.exit(exit_code)
@@ -312,6 +312,14 @@ SOFTWARE_CATALOG = {
     }
 }
 
+# Other names users give the catalog software (matched fuzzily, like the catalog names)
+SOFTWARE_ALIASES = {
+    "microsoft_office": ["MS Office", "Office 365", "Office", "Microsoft 365", "Word", "Excel", "PowerPoint", "Outlook"],
+    "adobe_reader": ["Acrobat", "Adobe Acrobat", "Acrobat Reader", "PDF Reader"],
+    "visual_studio": ["Visual Studio 2022", "VS 2022", "VS Pro"],
+    "slack": ["Slack app", "Slack Desktop"]
+}
+
 # Common IT Issues with Solutions
 COMMON_ISSUES = [
     {
@@ -476,6 +484,67 @@ COMMON_ISSUES = [
     }
 ]
 
+# Labeled example questions for the local intent router
+ROUTING_EXAMPLES = {
+    "tools": [
+        "What's the status of printer01?",
+        "Can you check if server01 is working?",
+        "Is router02 online right now?",
+        "Check the status of laptop02",
+        "Is workstation02 powered on?",
+        "Which devices are offline?",
+        "Is Microsoft Office available and does it need approval?",
+        "What version of Slack do we have in the catalog?",
+        "Do I need a license to install Visual Studio?",
+        "How long does it take to install Adobe Reader?"
+    ],
+    "rag": [
+        "My computer is running very slowly",
+        "How do I reset my password?",
+        "How do I connect to the company VPN?",
+        "How do I configure proxy settings on Windows?",
+        "I get a 407 Proxy Authentication Required error",
+        "How do I get a ServiceNow token?",
+        "My ServiceNow token expired, how do I renew it?",
+        "I cannot access the SLED Slack channel",
+        "ALKS is blocked, what should I do?",
+        "How do I set up two-factor authentication?"
+    ]
+}
+
+# Held-out (question, expected route) pairs for measuring router accuracy;
+# kept apart from ROUTING_EXAMPLES, which the router classifies against
+ROUTING_EVAL_SET = [
+    ("Is printer02 out of toner?", "tools"),
+    ("Has server02 come back up?", "tools"),
+    ("Can you see whether router01 is reachable?", "tools"),
+    ("Is laptop01 online?", "tools"),
+    ("What is the status of workstation01?", "tools"),
+    ("Are any servers down at the moment?", "tools"),
+    ("Does Adobe Acrobat Reader need manager approval?", "tools"),
+    ("Which version of Microsoft Office 365 is in the catalog?", "tools"),
+    ("Is Slack Desktop available to install?", "tools"),
+    ("Do we have licenses left for Visual Studio Professional?", "tools"),
+    ("My laptop keeps freezing when I open Outlook", "rag"),
+    ("I forgot my password and I'm locked out", "rag"),
+    ("The VPN disconnects every few minutes", "rag"),
+    ("Pages won't load because of a proxy error", "rag"),
+    ("How do I request access to the #sled channel?", "rag"),
+    ("Where do I get a new API token for ServiceNow?", "rag"),
+    ("How do I unblock ALKS?", "rag"),
+    ("My password expired, what are the requirements for a new one?", "rag"),
+    ("How do I enable 2FA on my account?", "rag"),
+    ("The wifi in the office is very slow", "rag")
+]
+
+# Questions of the demo mode (CLI and Streamlit); also warmed up after startup
+DEMO_QUESTIONS = [
+    "My computer is running very slowly",
+    "What's the status of printer01?",
+    "How do I connect to the company VPN?",
+    "Can you check if server01 is working?"
+]
+
 def get_it_helpdesk_data() -> List[Dict[str, Any]]:
     """Get all IT helpdesk documents."""
     return IT_HELPDESK_DOCS
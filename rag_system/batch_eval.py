@@ -0,0 +1,370 @@
+"""Concurrent batch evaluation over JSONL question sets.
+
+Each line of the input is one case, either a single question or a
+multi-turn script:
+
+    {"id": "T-1001", "question": "How do I connect to the VPN?"}
+    {"id": "T-1002", "turns": ["Printer is jammed", "It's printer01, can you check it?"]}
+
+Optional ``expected`` fields are checked against the final turn:
+``method`` (answering method), ``sources`` (any of these sources retrieved)
+and ``contains`` (phrases that must appear in the answer). Any other fields
+are copied to the result unchanged.
+
+Cases run concurrently, each in its own conversation: a worker takes a
+chatbot from a pool, clears its history and gives it a fresh session ID,
+so no history leaks between cases. The pooled chatbots share one engine
+(index, chains, functions), so extra concurrency costs no extra index loads. Results are written to the output JSONL
+as each case finishes, with per-turn timings, retrieval details and token
+usage.
+"""
+
+import json
+import math
+import time
+import uuid
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional, Callable, TextIO, TYPE_CHECKING
+
+from .logger import get_logger
+
+if TYPE_CHECKING:
+    from .profiling import TurnProfiler
+
+logger = get_logger(__name__)
+
+
+def load_cases(path: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Load evaluation cases from a JSONL file.
+
+    Args:
+        path: JSONL file with one case per line
+        limit: Only load the first N cases
+
+    Returns:
+        List of cases, each with an "id" and a list of "turns"
+    """
+    cases = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                case = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_number}: invalid JSON ({e})") from e
+            cases.append(normalize_case(case, default_id=str(line_number)))
+            if limit is not None and len(cases) >= limit:
+                break
+    return cases
+
+
+def normalize_case(case: Any, default_id: str) -> Dict[str, Any]:
+    """Turn a raw case (string, question or turns script) into the canonical form.
+
+    Args:
+        case: Raw case from the input file
+        default_id: ID used when the case has none (the line number)
+
+    Returns:
+        Case dict with "id" and "turns"
+    """
+    if isinstance(case, str):
+        case = {"question": case}
+    if not isinstance(case, dict):
+        raise ValueError(f"Case {default_id}: expected an object or a string")
+
+    case = dict(case)
+    turns = case.pop("turns", None)
+    question = case.pop("question", None)
+    if turns is None:
+        turns = [question] if question else []
+    turns = [turn["user"] if isinstance(turn, dict) else turn for turn in turns]
+    if not turns or not all(isinstance(turn, str) and turn.strip() for turn in turns):
+        raise ValueError(f"Case {default_id}: needs a non-empty \"question\" or \"turns\" list")
+
+    case["id"] = str(case.get("id", default_id))
+    case["turns"] = turns
+    return case
+
+
+def check_expectations(expected: Dict[str, Any], response: Dict[str, Any]) -> Dict[str, bool]:
+    """Compare the final turn of a case with its expectations.
+
+    Args:
+        expected: Expected method, sources and/or answer phrases
+        response: Chatbot response for the final turn
+
+    Returns:
+        Dict of check name to pass/fail
+    """
+    checks = {}
+    if "method" in expected:
+        methods = expected["method"] if isinstance(expected["method"], list) else [expected["method"]]
+        checks["method"] = response.get("method") in methods
+    if "sources" in expected:
+        checks["sources"] = bool(set(expected["sources"]) & set(response.get("sources") or []))
+    if "contains" in expected:
+        answer = (response.get("answer") or "").lower()
+        phrases = expected["contains"] if isinstance(expected["contains"], list) else [expected["contains"]]
+        checks["contains"] = all(phrase.lower() in answer for phrase in phrases)
+    return checks
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class BatchEvaluator:
+    """Replays question sets through pooled chatbots with bounded concurrency."""
+
+    def __init__(
+        self,
+        use_case: str = "it_helpdesk",
+        concurrency: int = 4,
+        enable_functions: bool = True,
+        chatbot_factory: Optional[Callable[[], Any]] = None,
+        include_answers: bool = True,
+        profiler: Optional["TurnProfiler"] = None
+    ):
+        """Initialize batch evaluator.
+
+        Args:
+            use_case: The use case for the chatbots
+            concurrency: Cases evaluated at the same time (one chatbot per worker)
+            enable_functions: Whether the chatbots use function calling
+            chatbot_factory: Builds a chatbot; defaults to a RAGChatbot on an engine shared by the pool
+            include_answers: Whether results include the answer text
+            profiler: Turn profiler of the default chatbots; defaults to the one configured
+                by RAG_PROFILE_* environment variables
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.use_case = use_case
+        self.concurrency = concurrency
+        self.enable_functions = enable_functions
+        self.include_answers = include_answers
+        self.profiler = profiler
+        self._chatbot_factory = chatbot_factory or self._default_factory
+        # Idle chatbots; at most `concurrency` are ever created
+        self._pool: "queue.LifoQueue[Any]" = queue.LifoQueue()
+        self._created = 0
+        self._pool_lock = threading.Lock()
+        self._engine = None
+        self._engine_lock = threading.Lock()
+
+    def _default_factory(self):
+        """Build a chatbot for one worker on the shared engine."""
+        from .chat_interface import ChatEngine, RAGChatbot
+        with self._engine_lock:
+            if self._engine is None:
+                self._engine = ChatEngine(self.use_case, enable_functions=self.enable_functions, profiler=self.profiler)
+        return RAGChatbot(engine=self._engine)
+
+    def _acquire(self):
+        """Take an idle chatbot, building one if the pool is not full yet."""
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self._pool_lock:
+            build = self._created < self.concurrency
+            if build:
+                self._created += 1
+        if build:
+            try:
+                return self._chatbot_factory()
+            except Exception:
+                with self._pool_lock:
+                    self._created -= 1
+                raise
+        return self._pool.get()
+
+    def evaluate_case(self, case: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one case in a fresh conversation.
+
+        Args:
+            case: Normalized case (see normalize_case)
+
+        Returns:
+            Result with per-turn details, totals and expectation checks
+        """
+        result: Dict[str, Any] = {key: value for key, value in case.items() if key != "turns"}
+        turns: List[Dict[str, Any]] = []
+        start = time.perf_counter()
+        chatbot = None
+        try:
+            chatbot = self._acquire()
+            # Isolate the case: no history from earlier cases, its own rate-limiter session
+            chatbot.clear_conversation()
+            chatbot.session_id = uuid.uuid4().hex
+            result["session_id"] = chatbot.session_id
+
+            response: Dict[str, Any] = {}
+            for question in case["turns"]:
+                response = chatbot.chat(question)
+                turns.append(self._turn_record(question, response))
+
+            result["success"] = all(turn["success"] for turn in turns)
+            if case.get("expected"):
+                result["checks"] = check_expectations(case["expected"], response)
+                result["passed"] = all(result["checks"].values())
+        except Exception as e:
+            logger.error("batch_case_failed", case_id=case["id"], exc=e)
+            result["success"] = False
+            result["error"] = str(e)
+        finally:
+            if chatbot is not None:
+                self._pool.put(chatbot)
+
+        result["turns"] = turns
+        result["total_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        result["tokens"] = sum(turn.get("tokens", 0) for turn in turns)
+        result["cost_usd"] = round(sum(turn.get("cost_usd", 0) for turn in turns), 8)
+        return result
+
+    def _turn_record(self, question: str, response: Dict[str, Any]) -> Dict[str, Any]:
+        """Summarize one chatbot response for the results file."""
+        timings = response.get("timings", {})
+        usage = response.get("usage", {})
+        record = {
+            "question": question,
+            "method": response.get("method"),
+            "success": response.get("success", False) and "error" not in response,
+            "total_ms": timings.get("total_ms"),
+            "stages": timings.get("stages", {}),
+            "breakdown": timings.get("breakdown", {}),
+            "trace_id": timings.get("trace_id"),
+            "sources": response.get("sources", []),
+            "retrieved": [
+                {"source": doc.get("metadata", {}).get("source", "Unknown"), "score": doc.get("score")}
+                for doc in response.get("retrieved_documents", [])
+            ],
+            "function_calls_made": response.get("function_calls_made", 0),
+            "tokens": usage.get("total_tokens", 0),
+            "cost_usd": usage.get("cost_usd", 0),
+            "wasted_tokens": usage.get("wasted", {}).get("total_tokens", 0)
+        }
+        if "route" in response:
+            record["route"] = response["route"].get("route")
+        if "error" in response:
+            record["error"] = response["error"]
+        if self.include_answers:
+            record["answer"] = response.get("answer", "")
+        return record
+
+    def run(
+        self,
+        cases: List[Dict[str, Any]],
+        output: Optional[TextIO] = None,
+        progress: Optional[Callable[[int, int, Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """Evaluate cases concurrently, streaming each result as it finishes.
+
+        Args:
+            cases: Normalized cases
+            output: Stream the JSONL results are written to (in completion order)
+            progress: Called with (done, total, result) after each case
+
+        Returns:
+            Summary of the run
+        """
+        write_lock = threading.Lock()
+        results: List[Dict[str, Any]] = []
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch-eval") as executor:
+            futures = {executor.submit(self.evaluate_case, case): index for index, case in enumerate(cases)}
+            for future in as_completed(futures):
+                result = future.result()
+                result["index"] = futures[future]
+                with write_lock:
+                    results.append(result)
+                    if output is not None:
+                        output.write(json.dumps(result, default=str, ensure_ascii=False) + "\n")
+                        output.flush()
+                if progress:
+                    progress(len(results), len(cases), result)
+
+        wall_s = time.perf_counter() - start
+        summary = self.summarize(results, wall_s)
+        logger.info("batch_eval_finished", **{key: value for key, value in summary.items() if not isinstance(value, dict)})
+        return summary
+
+    def summarize(self, results: List[Dict[str, Any]], wall_s: float) -> Dict[str, Any]:
+        """Aggregate latency, success, checks and cost over a run.
+
+        Args:
+            results: Case results from evaluate_case
+            wall_s: Wall-clock duration of the run in seconds
+
+        Returns:
+            Summary dict
+        """
+        turn_ms = [turn["total_ms"] for result in results for turn in result["turns"] if turn.get("total_ms") is not None]
+        methods: Dict[str, int] = {}
+        for result in results:
+            for turn in result["turns"]:
+                methods[turn["method"]] = methods.get(turn["method"], 0) + 1
+        checked = [result for result in results if "passed" in result]
+
+        return {
+            "cases": len(results),
+            "turns": len(turn_ms),
+            "failed_cases": sum(1 for result in results if not result["success"]),
+            "concurrency": self.concurrency,
+            "wall_s": round(wall_s, 3),
+            "cases_per_s": round(len(results) / wall_s, 3) if wall_s > 0 else 0.0,
+            "turn_latency_ms": {
+                "p50": round(_percentile(turn_ms, 50), 3),
+                "p95": round(_percentile(turn_ms, 95), 3),
+                "p99": round(_percentile(turn_ms, 99), 3),
+                "mean": round(sum(turn_ms) / len(turn_ms), 3) if turn_ms else 0.0
+            },
+            "methods": methods,
+            "checked_cases": len(checked),
+            "passed_cases": sum(1 for result in checked if result["passed"]),
+            "tokens": sum(result["tokens"] for result in results),
+            "cost_usd": round(sum(result["cost_usd"] for result in results), 6)
+        }
+
+
+def run_batch_eval(
+    input_path: str,
+    output_path: Optional[str] = None,
+    use_case: str = "it_helpdesk",
+    concurrency: int = 4,
+    enable_functions: bool = True,
+    limit: Optional[int] = None,
+    progress: Optional[Callable[[int, int, Dict[str, Any]], None]] = None,
+    profiler: Optional["TurnProfiler"] = None
+) -> Dict[str, Any]:
+    """Evaluate a JSONL question set and write the results as JSONL.
+
+    Args:
+        input_path: JSONL file of cases
+        output_path: JSONL results file (results are not written if omitted)
+        use_case: The use case for the chatbots
+        concurrency: Cases evaluated at the same time
+        enable_functions: Whether the chatbots use function calling
+        limit: Only evaluate the first N cases
+        progress: Called with (done, total, result) after each case
+        profiler: Turn profiler for the chatbots (see BatchEvaluator)
+
+    Returns:
+        Summary of the run
+    """
+    cases = load_cases(input_path, limit=limit)
+    evaluator = BatchEvaluator(use_case, concurrency=concurrency, enable_functions=enable_functions, profiler=profiler)
+    if output_path is None:
+        return evaluator.run(cases, progress=progress)
+    with open(output_path, "w", encoding="utf-8") as output:
+        return evaluator.run(cases, output=output, progress=progress)
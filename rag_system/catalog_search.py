@@ -0,0 +1,156 @@
+"""Indexed lookups over the helpdesk catalogs behind the lookup tools.
+
+mock_data keeps the issue and software catalogs as plain data. This module
+builds the lookup_index structures over them once per use case and serves
+the search_it_solutions and get_software_info tools from them:
+    - SolutionSearch ranks issues by the query keywords through a KeywordIndex;
+    - SoftwareLookup resolves misspelled, partial and alias names through a
+      FuzzyNameIndex and only answers with an entry above a confidence threshold.
+"""
+
+import threading
+from typing import Dict, Any, List, Optional
+
+from .lookup_index import KeywordIndex, FuzzyNameIndex
+
+# Lowest match confidence answered with a catalog entry
+SOFTWARE_MATCH_THRESHOLD = 0.7
+
+# Lowest confidence of a name suggested when nothing matched
+SOFTWARE_SUGGESTION_THRESHOLD = 0.5
+
+
+class SolutionSearch:
+    """Keyword search over troubleshooting issues."""
+
+    def __init__(self, issues: List[Dict[str, Any]]):
+        """Initialize the search.
+
+        Args:
+            issues: Issues with keywords, category and solution; entries appended
+                to the list later are indexed on the next search
+        """
+        self.issues = issues
+        self._index = KeywordIndex()
+        self._lock = threading.Lock()
+        self._sync()
+
+    def _sync(self) -> None:
+        """Index issues appended since the last search."""
+        with self._lock:
+            for issue in self.issues[len(self._index):]:
+                self._index.add(issue["keywords"])
+
+    def add(self, issue: Dict[str, Any]) -> None:
+        """Add an issue to the catalog and the index."""
+        self.issues.append(issue)
+        self._sync()
+
+    def search(self, keywords: List[str], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Search for solutions based on keywords.
+
+        An issue matches when a keyword occurs in its keywords (case-insensitive);
+        issues matching more of the keywords come first.
+
+        Args:
+            keywords: Keywords related to the issue
+            limit: Most solutions returned (default all)
+
+        Returns:
+            Category, solution and number of matched keywords of each issue
+        """
+        self._sync()
+        solutions = []
+        for position, matched in self._index.search(keywords)[:limit]:
+            issue = self.issues[position]
+            solutions.append({
+                "category": issue["category"],
+                "solution": issue["solution"],
+                "matched_keywords": matched
+            })
+        return solutions
+
+
+class SoftwareLookup:
+    """Fuzzy name lookup over the software catalog."""
+
+    def __init__(
+        self,
+        catalog: Dict[str, Dict[str, Any]],
+        aliases: Optional[Dict[str, List[str]]] = None,
+        threshold: float = SOFTWARE_MATCH_THRESHOLD
+    ):
+        """Initialize the lookup.
+
+        Args:
+            catalog: Catalog key -> software record (with its display name)
+            aliases: Catalog key -> other names users give the software
+            threshold: Lowest match confidence answered with a catalog entry
+        """
+        self.catalog = catalog
+        self.threshold = threshold
+        self._index = FuzzyNameIndex()
+        for key, software in catalog.items():
+            self._index.add(key, [software["name"], *(aliases or {}).get(key, [])])
+
+    def resolve(self, software_name: str) -> Optional[str]:
+        """Get the catalog key a name resolves to (None if nothing matches well enough)."""
+        matches = self._index.lookup(software_name, limit=1)
+        if not matches or matches[0].confidence < self.threshold:
+            return None
+        return matches[0].key
+
+    def get(self, software_name: str) -> Dict[str, Any]:
+        """Get software information by name.
+
+        Misspelled names, partial names and aliases are matched; the result says
+        which catalog name matched and with what confidence (1.0 is exact).
+
+        Args:
+            software_name: Free-form software name
+
+        Returns:
+            The catalog record with matched_name and match_confidence, or a not
+            found record with did_you_mean suggestions
+        """
+        matches = self._index.lookup(software_name)
+        if not matches or matches[0].confidence < self.threshold:
+            return {
+                "name": "Software not found",
+                "status": "Not available in catalog",
+                "did_you_mean": [
+                    self.catalog[match.key]["name"] for match in matches
+                    if match.confidence >= SOFTWARE_SUGGESTION_THRESHOLD
+                ]
+            }
+        best = matches[0]
+        return {**self.catalog[best.key], "matched_name": best.name, "match_confidence": best.confidence}
+
+
+_searches: Dict[str, SolutionSearch] = {}
+_lookups: Dict[str, SoftwareLookup] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_solution_search(use_case: str = "it_helpdesk") -> SolutionSearch:
+    """Get the shared solution search of a use case, built on first use."""
+    with _catalogs_lock:
+        if use_case not in _searches:
+            if use_case == "it_helpdesk":
+                from mock_data.it_helpdesk import COMMON_ISSUES
+                _searches[use_case] = SolutionSearch(COMMON_ISSUES)
+            else:
+                raise ValueError(f"Unknown use case: {use_case}")
+        return _searches[use_case]
+
+
+def get_software_lookup(use_case: str = "it_helpdesk") -> SoftwareLookup:
+    """Get the shared software lookup of a use case, built on first use."""
+    with _catalogs_lock:
+        if use_case not in _lookups:
+            if use_case == "it_helpdesk":
+                from mock_data.it_helpdesk import SOFTWARE_CATALOG, SOFTWARE_ALIASES
+                _lookups[use_case] = SoftwareLookup(SOFTWARE_CATALOG, SOFTWARE_ALIASES)
+            else:
+                raise ValueError(f"Unknown use case: {use_case}")
+        return _lookups[use_case]
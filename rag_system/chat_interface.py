@@ -1,53 +1,420 @@
 """Chat interface integrating RAG and function calling."""
 
 import os
-from typing import Dict, Any, List, Optional
+import time
+import uuid
+import threading
+from contextlib import nullcontext
+from typing import Dict, Any, List, Optional, Callable, TYPE_CHECKING
 from datetime import datetime
 
-from .retrieval_chain import RetrievalChain, ConversationManager
-from .function_calling import FunctionCaller
+from .conversation import ConversationManager, TokenStream
+from .intent_router import IntentRouter, ROUTE_RAG, ROUTE_AMBIGUOUS
+from .speculation import SpeculativeExecutor, SPECULATION_FULL
+from .resilience import get_resilience_stats
+from .rate_limiter import session_scope, get_rate_limiter_stats
+from .tracing import start_trace, span
+from .metrics import REQUESTS, REQUEST_LATENCY, get_metrics_summary, start_metrics_exporters
+from .profiling import TurnProfiler, get_profiler
+from .logger import get_logger, get_log_stats
+from .usage import UsageTracker, turn_usage, track_late_usage, ABANDONED_STAGE
+from .warmup import QueryWarmUp, warmup_enabled
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    from .retrieval_chain import RetrievalChain
+    from .function_calling import FunctionCaller
+
 # Load environment variables
 load_dotenv()
 
-class RAGChatbot:
-    """Complete RAG chatbot with retrieval and function calling."""
-
-    def __init__(self, use_case: str = "it_helpdesk", enable_functions: bool = True):
-        """Initialize RAG chatbot.
+logger = get_logger(__name__)
+
+# When the engine builds its components (see ChatEngine)
+STARTUP_EAGER = "eager"
+STARTUP_LAZY = "lazy"
+STARTUP_BACKGROUND = "background"
+STARTUP_MODES = (STARTUP_EAGER, STARTUP_LAZY, STARTUP_BACKGROUND)
+
+# Engine components in build order; the router embeds through the retrieval chain
+COMPONENTS = ("retrieval_chain", "function_caller", "intent_router", "speculation")
+
+
+class ChatEngine:
+    """Components shared by every conversation: index, chains, functions and router.
+
+    None of these hold per-conversation state, so one engine can serve many
+    concurrent chatbots (e.g. the sessions of the HTTP server).
+
+    Components are built on first use, so creating an engine (and importing
+    this module) does not load langchain, openai or the FAISS index. The
+    startup mode decides when they are built:
+        eager: all of them in the constructor
+        lazy: each one the first time a turn needs it
+        background: on a daemon thread started by the constructor, so they are
+            usually ready by the time the first question has been typed
+    """
+
+    def __init__(
+        self,
+        use_case: str = "it_helpdesk",
+        enable_functions: bool = True,
+        enable_router: bool = True,
+        speculation_mode: Optional[str] = None,
+        profiler: Optional[TurnProfiler] = None,
+        startup_mode: Optional[str] = None,
+        warm_queries: Optional[bool] = None
+    ):
+        """Initialize chat engine.
 
         Args:
             use_case: The use case (it_helpdesk)
             enable_functions: Whether to enable function calling
+            enable_router: Whether to route turns locally before calling the function-calling LLM
+            speculation_mode: Run the RAG path alongside ambiguous function-calling turns
+                (off, retrieval, full); defaults to RAG_SPECULATION_MODE
+            profiler: Turn profiler (output, format, sampling); defaults to the one configured
+                by RAG_PROFILE_* environment variables
+            startup_mode: When to build the components (eager, lazy, background);
+                defaults to RAG_STARTUP_MODE or background
+            warm_queries: Warm up the demo and top queries in the background once the
+                components are built (not in lazy mode); defaults to RAG_WARMUP
         """
         self.use_case = use_case
         self.enable_functions = enable_functions
+        self.enable_router = enable_router
+        self.speculation_mode = speculation_mode
+        self.startup_mode = (startup_mode or os.getenv("RAG_STARTUP_MODE", STARTUP_BACKGROUND)).lower()
+        if self.startup_mode not in STARTUP_MODES:
+            raise ValueError(f"Unknown startup mode: {self.startup_mode}")
+
+        self._components: Dict[str, Any] = {}
+        self._component_locks = {name: threading.Lock() for name in COMPONENTS}
+        self._init_ms: Dict[str, float] = {}
+        self._warm_thread: Optional[threading.Thread] = None
+        self._warm_lock = threading.Lock()
+        if warm_queries is None:
+            warm_queries = warmup_enabled()
+        self.query_warm_up = QueryWarmUp(self) if warm_queries and self.startup_mode != STARTUP_LAZY else None
+
+        # Serve /metrics or write the metrics file if configured (once per process)
+        start_metrics_exporters()
+
+        self.profiler = profiler or get_profiler()
+
+        if self.startup_mode == STARTUP_EAGER:
+            self.warm_up()
+        if self.startup_mode == STARTUP_BACKGROUND or self.query_warm_up is not None:
+            self.start_warm_up()
+
+        logger.info("engine_initialized", use_case=use_case, startup_mode=self.startup_mode)
+
+    @property
+    def retrieval_chain(self) -> "RetrievalChain":
+        """RAG chain over the use case's index."""
+        return self._get("retrieval_chain")
+
+    @property
+    def function_caller(self) -> Optional["FunctionCaller"]:
+        """Function-calling client (None when functions are disabled)."""
+        return self._get("function_caller")
+
+    @property
+    def intent_router(self) -> Optional[IntentRouter]:
+        """Local intent router (None when functions or routing are disabled)."""
+        return self._get("intent_router")
+
+    @property
+    def speculation(self) -> Optional[SpeculativeExecutor]:
+        """Speculative RAG executor (None when functions are disabled)."""
+        return self._get("speculation")
+
+    def _get(self, name: str) -> Any:
+        """Get a component, building it on first use (once, even with concurrent callers)."""
+        if name in self._components:
+            return self._components[name]
+        with self._component_locks[name]:
+            if name not in self._components:
+                start = time.perf_counter()
+                component = self._build(name)
+                self._init_ms[name] = (time.perf_counter() - start) * 1000
+                self._components[name] = component
+                logger.info(
+                    "component_initialized",
+                    component=name,
+                    init_ms=round(self._init_ms[name], 3),
+                    thread=threading.current_thread().name
+                )
+        return self._components[name]
+
+    def _build(self, name: str) -> Any:
+        """Build one component, importing its dependencies only now."""
+        if name == "retrieval_chain":
+            from .retrieval_chain import RetrievalChain
+            return RetrievalChain(self.use_case)
+
+        if name == "function_caller":
+            if not self.enable_functions:
+                return None
+            from .function_calling import FunctionCaller
+            return FunctionCaller(self.use_case)
+
+        if name == "intent_router":
+            if not (self.enable_functions and self.enable_router):
+                return None
+            # The router shares the vector store's query embedding cache, so a turn
+            # routed to RAG does not pay for embedding the question twice. The
+            # retrieval chain is only needed once the router has to embed.
+            return IntentRouter(
+                self.use_case,
+                embed_fn=lambda query: self.retrieval_chain.vector_store.embed_query(query)
+            )
+
+        if name == "speculation":
+            # Speculation only matters when a turn can go either way
+            return SpeculativeExecutor(self.speculation_mode) if self.enable_functions else None
+
+        raise ValueError(f"Unknown component: {name}")
+
+    def warm_up(self) -> Dict[str, float]:
+        """Build every component that is not built yet.
 
-        # Initialize components
-        self.retrieval_chain = RetrievalChain(use_case)
-        self.conversation_manager = ConversationManager()
+        Returns:
+            Build time of each component in milliseconds
+        """
+        for name in COMPONENTS:
+            self._get(name)
+        return dict(self._init_ms)
+
+    def start_warm_up(self) -> threading.Thread:
+        """Build the components, then warm up queries, on a background thread (started once).
 
-        if enable_functions:
-            self.function_caller = FunctionCaller(use_case)
-        else:
-            self.function_caller = None
+        Returns:
+            The warm-up thread
+        """
+        with self._warm_lock:
+            if self._warm_thread is None:
+                self._warm_thread = threading.Thread(
+                    target=self._warm_up_in_background, name="engine-warm-up", daemon=True
+                )
+                self._warm_thread.start()
+        return self._warm_thread
+
+    def _warm_up_in_background(self) -> None:
+        """Warm up without raising; a component that failed is retried (and raises) on first use."""
+        try:
+            self.warm_up()
+        except Exception as e:
+            logger.warning("engine_warm_up_failed", exc=e)
+            return
+        if self.query_warm_up is not None:
+            self.query_warm_up.run()
 
-        print(f"RAG Chatbot initialized for {use_case}")
-        if enable_functions:
-            print(f"Function calling enabled with {len(self.function_caller.functions)} functions")
+    @property
+    def ready(self) -> bool:
+        """Whether every component has been built."""
+        return all(name in self._components for name in COMPONENTS)
 
-    def chat(self, user_input: str, use_rag: bool = True, use_functions: bool = True) -> Dict[str, Any]:
+    @property
+    def warmed(self) -> bool:
+        """Whether the components are built and the query warm-up (if any) has finished."""
+        return self.ready and (self.query_warm_up is None or self.query_warm_up.done)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get statistics of the shared components (without building any)."""
+        stats = {
+            "use_case": self.use_case,
+            "functions_enabled": self.enable_functions,
+            "startup": {
+                "mode": self.startup_mode,
+                "ready": self.ready,
+                "warmed": self.warmed,
+                "init_ms": {name: round(ms, 3) for name, ms in self._init_ms.items()},
+                "warm_up": self.query_warm_up.get_status() if self.query_warm_up else {"state": "disabled"}
+            }
+        }
+
+        retrieval_chain = self._components.get("retrieval_chain")
+        stats["retrieval_chain"] = retrieval_chain.get_stats() if retrieval_chain else {"status": "not_initialized"}
+
+        if self.enable_functions:
+            function_caller = self._components.get("function_caller")
+            if function_caller:
+                stats["functions"] = {
+                    "available_functions": list(function_caller.functions.keys()),
+                    "total_functions": len(function_caller.functions),
+                    "result_cache": function_caller.get_cache_stats(),
+                    "device_inventory": function_caller.inventory.get_stats(),
+                    "device_poller": function_caller.poller.get_stats() if function_caller.poller else {"status": "disabled"},
+                    "prefetch": function_caller.prefetcher.get_stats()
+                }
+            else:
+                stats["functions"] = {"status": "not_initialized"}
+
+        if self._components.get("intent_router"):
+            stats["router"] = self._components["intent_router"].get_stats()
+
+        if self._components.get("speculation"):
+            stats["speculation"] = self._components["speculation"].get_stats()
+
+        return stats
+
+
+class RAGChatbot:
+    """Complete RAG chatbot with retrieval and function calling."""
+
+    def __init__(
+        self,
+        use_case: str = "it_helpdesk",
+        enable_functions: bool = True,
+        enable_router: bool = True,
+        speculation_mode: Optional[str] = None,
+        profiler: Optional[TurnProfiler] = None,
+        engine: Optional[ChatEngine] = None,
+        session_id: Optional[str] = None
+    ):
+        """Initialize RAG chatbot.
+
+        Args:
+            use_case: The use case (it_helpdesk)
+            enable_functions: Whether to enable function calling
+            enable_router: Whether to route turns locally before calling the function-calling LLM
+            speculation_mode: Run the RAG path alongside ambiguous function-calling turns
+                (off, retrieval, full); defaults to RAG_SPECULATION_MODE
+            profiler: Turn profiler (output, format, sampling); defaults to the engine's
+            engine: Shared engine to use; when given, the options above except profiler
+                are taken from it instead of building a new one
+            session_id: Conversation ID; a random one by default
+        """
+        start = time.perf_counter()
+        self.owns_engine = engine is None
+        if engine is None:
+            engine = ChatEngine(use_case, enable_functions, enable_router, speculation_mode, profiler)
+        self.engine = engine
+        self.use_case = engine.use_case
+        self.enable_functions = engine.enable_functions
+        # Identifies this conversation to the shared rate limiter for fair queueing
+        self.session_id = session_id or uuid.uuid4().hex
+
+        self.profiler = profiler or engine.profiler
+
+        # Per-conversation state
+        self.conversation_manager = ConversationManager()
+        # Tokens and cost of this conversation, including work that was thrown away
+        self.usage = UsageTracker()
+
+        # With a shared engine, starting a conversation only builds the state above
+        self.startup_ms = (time.perf_counter() - start) * 1000
+        logger.debug(
+            "chatbot_initialized",
+            use_case=self.use_case,
+            session_id=self.session_id,
+            shared_engine=not self.owns_engine,
+            startup_ms=round(self.startup_ms, 3)
+        )
+
+    # Shared components, built by the engine on first use
+    @property
+    def retrieval_chain(self) -> "RetrievalChain":
+        """RAG chain of the engine."""
+        return self.engine.retrieval_chain
+
+    @property
+    def function_caller(self) -> Optional["FunctionCaller"]:
+        """Function-calling client of the engine."""
+        return self.engine.function_caller
+
+    @property
+    def intent_router(self) -> Optional[IntentRouter]:
+        """Intent router of the engine."""
+        return self.engine.intent_router
+
+    @property
+    def speculation(self) -> Optional[SpeculativeExecutor]:
+        """Speculative executor of the engine."""
+        return self.engine.speculation
+
+    def chat(
+        self,
+        user_input: str,
+        use_rag: bool = True,
+        use_functions: bool = True,
+        profile: bool = False,
+        on_token: Optional[Callable[[str], None]] = None,
+        on_reset: Optional[Callable[[], None]] = None
+    ) -> Dict[str, Any]:
         """Process user input with RAG and/or function calling.
 
         Args:
             user_input: User's message
             use_rag: Whether to use RAG retrieval
             use_functions: Whether to use function calling
+            profile: Capture a CPU profile and allocation snapshot for this turn
+                (turns are also profiled at the profiler's sample rate)
+            on_token: Called with answer text as it is generated; answers that are not
+                generated token by token (function calling, speculation) arrive in one call
+            on_reset: Called when text already passed to on_token is superseded
+                (a generation attempt failed part-way and was retried)
 
         Returns:
-            Complete response with all components
+            Complete response with all components, including per-stage "timings",
+            token "usage" and cost, and, for profiled turns, the "profile" file paths
         """
+        profiling = self.profiler.profile_turn(self.session_id) if self.profiler.should_profile(profile) else nullcontext()
+        with profiling as profile_result, session_scope(self.session_id), \
+                start_trace("chat_turn", use_case=self.use_case, session_id=self.session_id) as trace:
+            token_stream = TokenStream(on_token, on_reset) if on_token is not None else None
+            response = self._process_turn(user_input, use_rag, use_functions, token_stream)
+            if token_stream is not None and not token_stream.emitted and response.get("answer"):
+                on_token(response["answer"])
+            trace.root.set_attribute("method", response.get("method"))
+            trace.root.set_attribute("function_calls_made", response.get("function_calls_made", 0))
+            trace.root.set_attribute("profiled", profile_result is not None)
+        response["timings"] = trace.summary()
+        if profile_result is not None:
+            response["profile"] = profile_result
+
+        method = response.get("method", "unknown")
+        speculation_abandoned = response.get("speculation", {}).get("cancelled", False)
+        wasted_stages = self._wasted_stages(response["timings"]["stages"], method, speculation_abandoned)
+        response["usage"] = turn_usage(trace, wasted_stages)
+        self.usage.add_turn(response["usage"])
+        # Abandoned speculation may still be finishing its calls
+        track_late_usage(trace, self.usage, wasted_stages)
+
+        REQUESTS.labels(method=method).inc()
+        REQUEST_LATENCY.labels(method=method).observe(response["timings"]["total_ms"] / 1000)
+        return response
+
+    def _wasted_stages(self, stages: Dict[str, float], method: str, speculation_abandoned: bool = False) -> Dict[str, str]:
+        """Stages of a turn whose results were discarded, mapped to the reason.
+
+        Args:
+            stages: Stage durations from the trace summary
+            method: How the turn was answered
+            speculation_abandoned: Speculative RAG was cancelled (tools answered or function calling failed)
+
+        Returns:
+            Dict of stage name to reason
+        """
+        wasted = {}
+        if "function_calling" in stages and method != "function_calling":
+            # No tool was called, so the turn fell through to RAG
+            wasted["function_calling"] = "fall_through"
+        if method == "function_calling" or speculation_abandoned:
+            # Tools answered (or failed); speculative RAG, finished or still running, was not used
+            wasted["speculative_rag"] = "speculation_abandoned"
+            wasted[ABANDONED_STAGE] = "speculation_abandoned"
+        return wasted
+
+    def _process_turn(
+        self,
+        user_input: str,
+        use_rag: bool,
+        use_functions: bool,
+        token_stream: Optional[TokenStream] = None
+    ) -> Dict[str, Any]:
+        """Run one turn through routing, function calling and RAG."""
         response = {
             "user_input": user_input,
             "timestamp": datetime.now().isoformat(),
@@ -55,7 +422,20 @@ class RAGChatbot:
         }
 
         try:
-            if use_functions and self.function_caller:
+            route_decision = None
+            if use_functions and self.function_caller and self.intent_router:
+                # Decide locally whether this turn needs tools at all
+                with span("routing") as routing_span:
+                    route_decision = self.intent_router.route(user_input)
+                    routing_span.set_attribute("route", route_decision.route)
+                response["route"] = route_decision.to_dict()
+
+            speculative_result = None
+            if use_functions and self.function_caller and (route_decision is None or route_decision.route != ROUTE_RAG):
+                # Start lookups for devices and software named in the message; a turn
+                # routed to RAG skips them, as the model will not ask for tools
+                prefetch = self.function_caller.start_prefetch(user_input)
+
                 # Try function calling first
                 messages = [
                     {"role": "system", "content": self._get_system_message()},
@@ -63,12 +443,41 @@ class RAGChatbot:
                     {"role": "user", "content": user_input}
                 ]
 
-                func_result = self.function_caller.chat_with_functions(messages)
-                function_calls_made = func_result.get("function_calls_made", 0)
+                # When the route is uncertain, start the RAG path alongside function calling
+                speculative_task = None
+                if (use_rag and self.speculation and self.speculation.enabled
+                        and (route_decision is None or route_decision.route == ROUTE_AMBIGUOUS)):
+                    speculative_task = self.speculation.start(
+                        self._make_speculative_rag(user_input, self.conversation_manager.get_history())
+                    )
+
+                func_start = time.perf_counter()
+                speculation_settled = False
+                try:
+                    with span("function_calling") as function_span:
+                        func_result = self.function_caller.chat_with_functions(messages, prefetch=prefetch)
+                        function_calls_made = func_result.get("function_calls_made", 0)
+                        function_span.set_attribute("function_calls_made", function_calls_made)
+                    speculation_settled = True
+                finally:
+                    function_calling_ms = (time.perf_counter() - func_start) * 1000
+                    if speculative_task is not None and not speculation_settled:
+                        # The turn ends with an error; free the worker and count the work as wasted
+                        record = self.speculation.abandon(speculative_task, function_calling_ms, failed=True)
+                        response["speculation"] = record.to_dict()
+
+                if route_decision is not None:
+                    self.intent_router.record_outcome(route_decision, function_calls_made, function_calling_ms)
+                if "prefetch" in func_result:
+                    response["prefetch"] = func_result["prefetch"]
 
                 # Only use function calling response if a function was actually called
                 # If no function was called, fall through to RAG to get context from knowledge base
                 if "content" in func_result and func_result["content"] and function_calls_made > 0:
+                    if speculative_task is not None:
+                        record = self.speculation.abandon(speculative_task, function_calling_ms)
+                        response["speculation"] = record.to_dict()
+
                     # Function calling provided a response (and actually called functions)
                     response.update({
                         "answer": func_result["content"],
@@ -83,13 +492,27 @@ class RAGChatbot:
                     return response
                 # If function_calls_made == 0, continue to RAG below
 
+                if speculative_task is not None:
+                    try:
+                        speculative_result, record = self.speculation.commit(speculative_task, function_calling_ms)
+                        response["speculation"] = record.to_dict()
+                    except Exception:
+                        # Speculative work failed; the regular RAG path below retries it
+                        speculative_result = None
+
             if use_rag:
                 # Use RAG retrieval and generation
                 try:
-                    rag_result = self.retrieval_chain.chat(
-                        user_input,
-                        self.conversation_manager.get_history()
-                    )
+                    if speculative_result and "rag_result" in speculative_result:
+                        rag_result = speculative_result["rag_result"]
+                    else:
+                        with span("rag"):
+                            rag_result = self.retrieval_chain.chat(
+                                user_input,
+                                self.conversation_manager.get_history(),
+                                retrieved_docs=(speculative_result or {}).get("retrieved_docs"),
+                                token_stream=token_stream
+                            )
 
                     # Get method from result (could be "rag_retrieval" or "llm_direct")
                     method = rag_result.get("method", "rag_retrieval")
@@ -103,13 +526,13 @@ class RAGChatbot:
                         "sources": sources,
                         "success": True
                     })
+                    if rag_result.get("cached"):
+                        response["cached"] = True
 
                     # Add to conversation history
                     self.conversation_manager.add_exchange(user_input, rag_result.get("answer", ""))
                 except Exception as e:
-                    import traceback
-                    print(f"❌ Error in RAG chat: {str(e)}")
-                    print(traceback.format_exc())
+                    logger.error("rag_turn_failed", exc=e)
                     # Still return RAG method but with error
                     response.update({
                         "answer": f"Error in RAG retrieval: {str(e)}",
@@ -138,6 +561,27 @@ class RAGChatbot:
 
         return response
 
+    def _make_speculative_rag(self, user_input: str, chat_history: List[Any]):
+        """Build the speculative RAG work for a turn.
+
+        Args:
+            user_input: User's message
+            chat_history: Chat history at the start of the turn
+
+        Returns:
+            Callable run by the speculative executor
+        """
+        full = self.speculation.mode == SPECULATION_FULL
+
+        def run(cancel_event):
+            with span("speculative_rag", mode=self.speculation.mode):
+                if full:
+                    return {"rag_result": self.retrieval_chain.chat(user_input, chat_history, cancel_event=cancel_event)}
+                with span("retrieval"):
+                    return {"retrieved_docs": self.retrieval_chain.vector_store.search(user_input, k=4, score_threshold=0.5)}
+
+        return run
+
     def _get_system_message(self) -> str:
         """Get system message based on use case."""
         return "You are an experienced IT helpdesk assistant. Help users with technical problems, device status checks, and software information. Use available functions when needed to provide accurate information."
@@ -175,7 +619,7 @@ class RAGChatbot:
     def clear_conversation(self):
         """Clear conversation history."""
         self.conversation_manager.clear_history()
-        print("Conversation history cleared.")
+        logger.info("conversation_cleared")
 
     def get_available_functions(self) -> List[str]:
         """Get list of available function names."""
@@ -185,21 +629,25 @@ class RAGChatbot:
 
     def get_chatbot_stats(self) -> Dict[str, Any]:
         """Get comprehensive chatbot statistics."""
-        stats = {
-            "use_case": self.use_case,
-            "functions_enabled": self.enable_functions,
-            "conversation": self.conversation_manager.get_history_summary()
+        # Retrieval chain, functions, router and speculation come from the shared engine
+        stats = self.engine.get_stats()
+        stats["conversation"] = self.conversation_manager.get_history_summary()
+        stats["session"] = {
+            "session_id": self.session_id,
+            "shared_engine": not self.owns_engine,
+            "startup_ms": round(self.startup_ms, 3)
         }
 
-        # Add retrieval chain stats
-        stats["retrieval_chain"] = self.retrieval_chain.get_stats()
+        # Deadlines, retries, hedging and quotas for Azure calls (shared across the process)
+        stats["resilience"] = get_resilience_stats()
+        stats["rate_limits"] = get_rate_limiter_stats()
 
-        # Add function information
-        if self.function_caller:
-            stats["functions"] = {
-                "available_functions": self.get_available_functions(),
-                "total_functions": len(self.function_caller.functions)
-            }
+        # Request, cache, token and error counters (full series on the Prometheus endpoint)
+        stats["metrics"] = get_metrics_summary()
+        stats["logging"] = get_log_stats()
+
+        # Tokens and estimated cost of this conversation, by stage and wasted
+        stats["usage"] = self.usage.get_stats()
 
         return stats
 
@@ -223,28 +671,30 @@ class RAGChatbot:
                 if response.get('sources'):
                     print(f"Sources: {', '.join(response['sources'])}")
 
+            if response.get('profile', {}).get('cpu_profile'):
+                print(f"Profile: {response['profile']['cpu_profile']}")
+
             print()
 
     def _get_demo_questions(self) -> List[str]:
         """Get demo questions based on use case."""
-        return [
-            "My computer is running very slowly",
-            "What's the status of printer01?",
-            "How do I connect to the company VPN?",
-            "Can you check if server01 is working?"
-        ]
+        if self.use_case == "it_helpdesk":
+            from mock_data.it_helpdesk import DEMO_QUESTIONS
+            return list(DEMO_QUESTIONS)
+        raise ValueError(f"Unknown use case: {self.use_case}")
 
 
 class ChatInterface:
     """Command-line chat interface for the RAG chatbot."""
 
-    def __init__(self, use_case: str = "it_helpdesk"):
+    def __init__(self, use_case: str = "it_helpdesk", profiler: Optional[TurnProfiler] = None):
         """Initialize chat interface.
 
         Args:
             use_case: The use case for the chatbot
+            profiler: Turn profiler passed to the chatbot
         """
-        self.chatbot = RAGChatbot(use_case)
+        self.chatbot = RAGChatbot(use_case, profiler=profiler)
         self.use_case = use_case
 
     def run(self):
@@ -272,6 +722,7 @@ class ChatInterface:
 
                 elif user_input.lower() == 'clear':
                     self.chatbot.clear_conversation()
+                    print("Conversation history cleared.")
 
                 elif user_input.lower() == 'stats':
                     self._show_stats()
@@ -295,6 +746,13 @@ class ChatInterface:
                         sources = response['sources'][:3]  # Show first 3 sources
                         print(f"📚 Sources: {', '.join(sources)}")
 
+                    profile = response.get('profile')
+                    if profile and profile.get('cpu_profile'):
+                        print(f"🔬 Profile: {profile['cpu_profile']}")
+                        if profile.get('memory_snapshot'):
+                            print(f"   Allocations: {profile['memory_snapshot']} "
+                                  f"(peak {profile['memory_peak_kb']} KB)")
+
             except KeyboardInterrupt:
                 print("\n\nGoodbye! 👋")
                 break
@@ -320,8 +778,9 @@ class ChatInterface:
         print(f"  Use Case: {stats['use_case']}")
         print(f"  Functions Enabled: {stats['functions_enabled']}")
 
-        if 'functions' in stats:
+        if 'total_functions' in stats.get('functions', {}):
             print(f"  Available Functions: {stats['functions']['total_functions']}")
+        print(f"  Components Ready: {stats['startup']['ready']}")
 
         conv_stats = stats['conversation']
         print(f"  Total Messages: {conv_stats['total_messages']}")
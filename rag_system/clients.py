@@ -0,0 +1,207 @@
+"""Process-wide Azure OpenAI client factory with pooled HTTP connections.
+
+Every component (chat model, embeddings, function-calling client) gets its
+clients from here, so all chatbots in a process share one keep-alive
+connection pool instead of paying a TLS handshake per session.
+"""
+
+import os
+import threading
+import importlib.util
+from typing import Dict, Any, Tuple
+
+import httpx
+import openai
+from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
+from dotenv import load_dotenv
+
+from .offline_azure import OfflineAzureTransport, offline_mode_enabled, OFFLINE_ENDPOINT
+
+# Load environment variables
+load_dotenv()
+
+_lock = threading.Lock()
+_http_client: "httpx.Client | None" = None
+_openai_clients: Dict[Tuple[str, str, str], openai.AzureOpenAI] = {}
+_chat_models: Dict[Tuple[Any, ...], AzureChatOpenAI] = {}
+_embedding_models: Dict[Tuple[str, ...], AzureOpenAIEmbeddings] = {}
+
+
+def get_llm_settings() -> Dict[str, str]:
+    """Get chat model settings, preferring LLM-specific variables over general ones."""
+    offline = offline_mode_enabled()
+    return {
+        "endpoint": os.getenv("AZURE_OPENAI_LLM_ENDPOINT") or os.getenv("AZURE_OPENAI_ENDPOINT") or (OFFLINE_ENDPOINT if offline else None),
+        "api_key": os.getenv("AZURE_OPENAI_LLM_API_KEY") or os.getenv("AZURE_OPENAI_API_KEY") or ("offline" if offline else None),
+        "deployment": os.getenv("AZURE_OPENAI_LLM_MODEL") or os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT", "GPT-4o-mini"),
+        "api_version": os.getenv("AZURE_OPENAI_LLM_API_VERSION") or os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
+    }
+
+
+def get_embedding_settings() -> Dict[str, str]:
+    """Get embedding settings, preferring embedding-specific variables over general ones."""
+    offline = offline_mode_enabled()
+    return {
+        "endpoint": os.getenv("AZURE_OPENAI_EMBEDDING_ENDPOINT") or os.getenv("AZURE_OPENAI_ENDPOINT") or (OFFLINE_ENDPOINT if offline else None),
+        "api_key": os.getenv("AZURE_OPENAI_EMBEDDING_API_KEY") or os.getenv("AZURE_OPENAI_API_KEY") or ("offline" if offline else None),
+        "deployment": os.getenv("AZURE_OPENAI_EMBED_MODEL") or os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-3-small"),
+        "api_version": os.getenv("AZURE_OPENAI_EMBEDDING_API_VERSION") or os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
+    }
+
+
+def stream_usage_enabled(api_version: str) -> bool:
+    """Whether to request token usage on streamed completions.
+
+    Azure accepts stream_options from API version 2024-09-01-preview;
+    AZURE_OPENAI_STREAM_USAGE (auto, true, false) overrides the check.
+    """
+    setting = os.getenv("AZURE_OPENAI_STREAM_USAGE", "auto").lower()
+    if setting != "auto":
+        return setting in ("1", "true", "yes")
+    return offline_mode_enabled() or (api_version or "")[:10] >= "2024-09-01"
+
+
+def get_pool_settings() -> Dict[str, Any]:
+    """Get connection pool settings from the environment."""
+    http2_setting = os.getenv("AZURE_OPENAI_HTTP2", "auto").lower()
+    # HTTP/2 needs the optional h2 package; "auto" enables it only when installed
+    h2_available = importlib.util.find_spec("h2") is not None
+    if http2_setting == "auto":
+        http2 = h2_available
+    else:
+        http2 = http2_setting in ("1", "true", "yes") and h2_available
+
+    return {
+        "max_connections": int(os.getenv("AZURE_OPENAI_MAX_CONNECTIONS", "100")),
+        "max_keepalive_connections": int(os.getenv("AZURE_OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20")),
+        "keepalive_expiry": float(os.getenv("AZURE_OPENAI_KEEPALIVE_EXPIRY", "30")),
+        "timeout": float(os.getenv("AZURE_OPENAI_TIMEOUT", "60")),
+        "http2": http2
+    }
+
+
+def get_http_client() -> httpx.Client:
+    """Get the process-wide pooled HTTP client."""
+    global _http_client
+    if _http_client is None:
+        with _lock:
+            if _http_client is None:
+                settings = get_pool_settings()
+                if offline_mode_enabled():
+                    # Serve every Azure call from the in-process stand-in
+                    _http_client = httpx.Client(
+                        transport=OfflineAzureTransport(),
+                        timeout=httpx.Timeout(settings["timeout"], connect=10.0)
+                    )
+                else:
+                    _http_client = httpx.Client(
+                        limits=httpx.Limits(
+                            max_connections=settings["max_connections"],
+                            max_keepalive_connections=settings["max_keepalive_connections"],
+                            keepalive_expiry=settings["keepalive_expiry"]
+                        ),
+                        timeout=httpx.Timeout(settings["timeout"], connect=10.0),
+                        http2=settings["http2"]
+                    )
+    return _http_client
+
+
+def get_openai_client() -> openai.AzureOpenAI:
+    """Get a shared Azure OpenAI SDK client for the configured LLM endpoint."""
+    settings = get_llm_settings()
+    key = (settings["endpoint"], settings["api_key"], settings["api_version"])
+
+    with _lock:
+        client = _openai_clients.get(key)
+    if client is None:
+        client = openai.AzureOpenAI(
+            azure_endpoint=settings["endpoint"],
+            api_key=settings["api_key"],
+            api_version=settings["api_version"],
+            http_client=get_http_client(),
+            # Retries are owned by the resilience layer (rag_system.resilience)
+            max_retries=0
+        )
+        with _lock:
+            client = _openai_clients.setdefault(key, client)
+    return client
+
+
+def get_chat_model(temperature: float = 0.7) -> AzureChatOpenAI:
+    """Get a shared Azure chat model for the configured LLM deployment.
+
+    Args:
+        temperature: Sampling temperature
+
+    Returns:
+        Chat model using the pooled HTTP client
+    """
+    settings = get_llm_settings()
+    key = (settings["endpoint"], settings["api_key"], settings["deployment"], settings["api_version"], temperature)
+
+    with _lock:
+        model = _chat_models.get(key)
+    if model is None:
+        model = AzureChatOpenAI(
+            azure_deployment=settings["deployment"],
+            azure_endpoint=settings["endpoint"],
+            api_key=settings["api_key"],
+            api_version=settings["api_version"],
+            temperature=temperature,
+            http_client=get_http_client(),
+            max_retries=0,
+            # Token usage on streamed generations feeds tracing and metrics
+            stream_usage=stream_usage_enabled(settings["api_version"])
+        )
+        with _lock:
+            model = _chat_models.setdefault(key, model)
+    return model
+
+
+def get_embeddings() -> AzureOpenAIEmbeddings:
+    """Get shared Azure embeddings for the configured embedding deployment."""
+    settings = get_embedding_settings()
+    key = (settings["endpoint"], settings["api_key"], settings["deployment"], settings["api_version"])
+
+    with _lock:
+        embeddings = _embedding_models.get(key)
+    if embeddings is None:
+        embeddings = AzureOpenAIEmbeddings(
+            azure_deployment=settings["deployment"],
+            model=settings["deployment"],
+            azure_endpoint=settings["endpoint"],
+            api_key=settings["api_key"],
+            api_version=settings["api_version"],
+            http_client=get_http_client(),
+            max_retries=0,
+            # Client-side tokenization downloads tiktoken data; the stand-in takes plain text
+            check_embedding_ctx_length=not offline_mode_enabled()
+        )
+        with _lock:
+            embeddings = _embedding_models.setdefault(key, embeddings)
+    return embeddings
+
+
+def get_client_stats() -> Dict[str, Any]:
+    """Get a summary of the shared clients and pool configuration."""
+    with _lock:
+        return {
+            "http_client_created": _http_client is not None,
+            "offline": offline_mode_enabled(),
+            "openai_clients": len(_openai_clients),
+            "chat_models": len(_chat_models),
+            "embedding_models": len(_embedding_models),
+            "pool": get_pool_settings()
+        }
+
+
+def close_clients() -> None:
+    """Close the shared HTTP client and forget all cached clients."""
+    global _http_client
+    with _lock:
+        if _http_client is not None:
+            _http_client.close()
+        _http_client = None
+        _openai_clients.clear()
+        _chat_models.clear()
+        _embedding_models.clear()
@@ -0,0 +1,117 @@
+"""Per-conversation state: chat history and streaming of generated tokens.
+
+Kept apart from the retrieval chain so a conversation can be started
+without importing langchain; message classes are loaded on first use.
+"""
+
+import threading
+from typing import List, Dict, Any, Optional, Callable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+
+
+class TokenStream:
+    """Forwards generated text chunks to a callback as they arrive.
+
+    Generation may be hedged or retried, so only one attempt is forwarded at a
+    time: the first one to produce a chunk. If that attempt fails after
+    streaming, on_reset is called and the next attempt starts over.
+    """
+
+    def __init__(self, on_token: Callable[[str], None], on_reset: Optional[Callable[[], None]] = None):
+        """Initialize token stream.
+
+        Args:
+            on_token: Called with each text chunk
+            on_reset: Called when already-forwarded text should be discarded
+        """
+        self._on_token = on_token
+        self._on_reset = on_reset
+        self._lock = threading.Lock()
+        self._owner: Optional[object] = None
+        self.emitted = False
+
+    def emit(self, attempt: object, chunk: str) -> None:
+        """Forward a chunk if it comes from the attempt being streamed."""
+        with self._lock:
+            if self._owner is None:
+                self._owner = attempt
+            elif self._owner is not attempt:
+                return
+            self.emitted = True
+        self._on_token(chunk)
+
+    def release(self, attempt: object) -> None:
+        """Give up the stream after an attempt failed."""
+        with self._lock:
+            if self._owner is not attempt:
+                return
+            self._owner = None
+            reset = self.emitted
+            self.emitted = False
+        if reset and self._on_reset is not None:
+            self._on_reset()
+
+
+class ConversationManager:
+    """Manages conversation history and context."""
+
+    def __init__(self, max_history: int = 10):
+        """Initialize conversation manager.
+
+        Args:
+            max_history: Maximum number of message pairs to keep
+        """
+        self.max_history = max_history
+        self.chat_history: List["BaseMessage"] = []
+
+    def add_exchange(self, user_message: str, assistant_message: str):
+        """Add a user-assistant message exchange.
+
+        Args:
+            user_message: User's message
+            assistant_message: Assistant's response
+        """
+        from langchain_core.messages import HumanMessage, AIMessage
+        self.chat_history.extend([
+            HumanMessage(content=user_message),
+            AIMessage(content=assistant_message)
+        ])
+
+        # Trim history if it exceeds max length
+        if len(self.chat_history) > self.max_history * 2:
+            self.chat_history = self.chat_history[-self.max_history * 2:]
+
+    def get_history(self) -> List["BaseMessage"]:
+        """Get current chat history."""
+        return self.chat_history.copy()
+
+    def to_messages(self) -> List[Dict[str, str]]:
+        """Export the history as role/content dicts (e.g. to persist it)."""
+        from langchain_core.messages import HumanMessage
+        return [
+            {"role": "user" if isinstance(message, HumanMessage) else "assistant", "content": message.content}
+            for message in self.chat_history
+        ]
+
+    def load_messages(self, messages: List[Dict[str, str]]) -> None:
+        """Replace the history with role/content dicts exported by to_messages."""
+        from langchain_core.messages import HumanMessage, AIMessage
+        self.chat_history = [
+            HumanMessage(content=message["content"]) if message["role"] == "user" else AIMessage(content=message["content"])
+            for message in messages
+        ][-self.max_history * 2:]
+
+    def clear_history(self):
+        """Clear chat history."""
+        self.chat_history = []
+
+    def get_history_summary(self) -> Dict[str, Any]:
+        """Get a summary of chat history."""
+        # Messages are classified by type name so an empty history needs no langchain import
+        return {
+            "total_messages": len(self.chat_history),
+            "user_messages": len([msg for msg in self.chat_history if msg.__class__.__name__ == "HumanMessage"]),
+            "assistant_messages": len([msg for msg in self.chat_history if msg.__class__.__name__ == "AIMessage"])
+        }
@@ -0,0 +1,495 @@
+"""Device inventory with secondary indexes for bulk and filtered status queries.
+
+The device tools used to look devices up one ID at a time in a dict, so a
+question like "which printers on floor 2 are offline?" could not be
+answered. The inventory keeps device records (device_id, type, status,
+location, details) and answers batch lookups and filtered queries from
+secondary indexes on status, type and location; a location filter matches
+the whole location or one of its comma-separated parts ("Floor 2" matches
+"Floor 2, Room 205"), case-insensitively.
+
+Backends (RAG_DEVICE_INVENTORY):
+    memory  - records in a dict, indexes as sets of device IDs (default)
+    sqlite  - a SQLite table with column indexes (RAG_DEVICE_INVENTORY_DB)
+    service - a JSON inventory service at RAG_DEVICE_INVENTORY_URL; without a
+              URL an in-process stand-in serves it from a memory backend
+
+Queries are ordered by device ID and paged with limit/offset, and report
+how many devices matched in total.
+"""
+
+import os
+import re
+import json
+import heapq
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from urllib.parse import quote
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Set, Tuple
+
+import httpx
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+MEMORY_BACKEND = "memory"
+SQLITE_BACKEND = "sqlite"
+SERVICE_BACKEND = "service"
+BACKENDS = (MEMORY_BACKEND, SQLITE_BACKEND, SERVICE_BACKEND)
+
+FIELDS = ("device_id", "type", "status", "location", "details")
+
+
+def device_type(device_id: str) -> str:
+    """Type of a device from its ID (printer01 -> printer)."""
+    return re.sub(r"[\d_-]+$", "", device_id.lower()) or "unknown"
+
+
+def normalize_value(value: str) -> str:
+    """Lowercase a filter value and collapse whitespace."""
+    return " ".join(str(value).lower().split())
+
+
+def location_terms(location: str) -> Set[str]:
+    """Terms a location is indexed under: the whole location and each comma-separated part."""
+    whole = normalize_value(location)
+    return {whole} | {normalize_value(part) for part in whole.split(",") if part.strip()}
+
+
+def matches_filters(
+    device: Dict[str, Any],
+    status: Optional[str] = None,
+    device_type: Optional[str] = None,
+    location: Optional[str] = None
+) -> bool:
+    """Whether a record passes query filters, matched the way the backends match them."""
+    return ((not status or normalize_value(device["status"]) == normalize_value(status))
+            and (not device_type or normalize_value(device["type"]) == normalize_value(device_type))
+            and (not location or normalize_value(location) in location_terms(device["location"])))
+
+
+def make_device(device_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    """Build an inventory record from a status record (type is derived from the ID if missing)."""
+    return {
+        "device_id": device_id,
+        "type": record.get("type") or device_type(device_id),
+        "status": record.get("status", "Unknown"),
+        "location": record.get("location", "Unknown"),
+        "details": record.get("details", "")
+    }
+
+
+class DeviceInventory(ABC):
+    """Interface of the inventory backends."""
+
+    backend = ""
+
+    def get(self, device_id: str) -> Optional[Dict[str, Any]]:
+        """Get a device record, or None if the device is unknown."""
+        return self.get_many([device_id]).get(device_id)
+
+    @abstractmethod
+    def get_many(self, device_ids: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Get several device records.
+
+        Args:
+            device_ids: Device IDs
+
+        Returns:
+            Record (or None if unknown) by device ID
+        """
+
+    @abstractmethod
+    def query(
+        self,
+        status: Optional[str] = None,
+        device_type: Optional[str] = None,
+        location: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Find devices by status, type and location (all given filters must match).
+
+        Args:
+            status: Status, e.g. Offline
+            device_type: Type, e.g. printer
+            location: Location or part of one, e.g. Floor 2
+            limit: Most records returned
+            offset: Matching records skipped (in device ID order)
+
+        Returns:
+            The page of records and the number of matching devices
+        """
+
+    @abstractmethod
+    def upsert(self, devices: Iterable[Dict[str, Any]]) -> int:
+        """Add or replace device records; returns how many were written."""
+
+    def device_ids(self) -> List[str]:
+        """Get the IDs of all devices, in order."""
+        device_ids: List[str] = []
+        while True:
+            page, total = self.query(limit=1000, offset=len(device_ids))
+            device_ids.extend(record["device_id"] for record in page)
+            if not page or len(device_ids) >= total:
+                return device_ids
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of devices."""
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get inventory statistics."""
+        return {"backend": self.backend, "devices": len(self)}
+
+
+class MemoryInventory(DeviceInventory):
+    """Records in a dict with set indexes on status, type and location terms."""
+
+    backend = MEMORY_BACKEND
+
+    def __init__(self, devices: Optional[Iterable[Dict[str, Any]]] = None):
+        """Initialize the inventory.
+
+        Args:
+            devices: Initial records
+        """
+        self._devices: Dict[str, Dict[str, Any]] = {}
+        self._indexes: Dict[str, Dict[str, Set[str]]] = {"status": {}, "type": {}, "location": {}}
+        self._lock = threading.RLock()
+        if devices:
+            self.upsert(devices)
+
+    @staticmethod
+    def _terms(device: Dict[str, Any]) -> Dict[str, Set[str]]:
+        """Index terms of a record."""
+        return {
+            "status": {normalize_value(device["status"])},
+            "type": {normalize_value(device["type"])},
+            "location": location_terms(device["location"])
+        }
+
+    def upsert(self, devices: Iterable[Dict[str, Any]]) -> int:
+        """Add or replace device records, keeping the indexes in step."""
+        written = 0
+        with self._lock:
+            for device in devices:
+                device = {field: device.get(field) for field in FIELDS}
+                device_id = device["device_id"]
+                previous = self._devices.get(device_id)
+                if previous is not None:
+                    for index, terms in self._terms(previous).items():
+                        for term in terms:
+                            self._indexes[index][term].discard(device_id)
+                self._devices[device_id] = device
+                for index, terms in self._terms(device).items():
+                    for term in terms:
+                        self._indexes[index].setdefault(term, set()).add(device_id)
+                written += 1
+        return written
+
+    def get_many(self, device_ids: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        with self._lock:
+            # Copies, as from the other backends: a caller editing a record must not bypass the indexes
+            return {device_id: dict(self._devices[device_id]) if device_id in self._devices else None
+                    for device_id in device_ids}
+
+    def device_ids(self) -> List[str]:
+        with self._lock:
+            return sorted(self._devices)
+
+    def query(
+        self,
+        status: Optional[str] = None,
+        device_type: Optional[str] = None,
+        location: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        filters = [(index, normalize_value(value)) for index, value in
+                   (("status", status), ("type", device_type), ("location", location)) if value]
+        with self._lock:
+            if filters:
+                # Intersect the postings, smallest first
+                postings = sorted((self._indexes[index].get(value, set()) for index, value in filters), key=len)
+                matching = set(postings[0])
+                for posting in postings[1:]:
+                    matching &= posting
+            else:
+                matching = self._devices.keys()
+            page = heapq.nsmallest(offset + limit, matching)[offset:]
+            return [dict(self._devices[device_id]) for device_id in page], len(matching)
+
+    def __len__(self) -> int:
+        return len(self._devices)
+
+
+class SQLiteInventory(DeviceInventory):
+    """Records in a SQLite table with indexes on status, type and location terms."""
+
+    backend = SQLITE_BACKEND
+
+    def __init__(self, path: str, devices: Optional[Iterable[Dict[str, Any]]] = None):
+        """Initialize the inventory.
+
+        Args:
+            path: SQLite file, created if missing
+            devices: Records written if the table is empty
+        """
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS devices ("
+                "device_id TEXT PRIMARY KEY, type TEXT NOT NULL, status TEXT NOT NULL, "
+                "location TEXT NOT NULL, details TEXT NOT NULL, "
+                "type_key TEXT NOT NULL, status_key TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS devices_status ON devices (status_key, type_key)")
+            conn.execute("CREATE INDEX IF NOT EXISTS devices_type ON devices (type_key)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS device_locations ("
+                "term TEXT NOT NULL, device_id TEXT NOT NULL, PRIMARY KEY (term, device_id)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS device_locations_device ON device_locations (device_id)")
+            empty = conn.execute("SELECT NOT EXISTS (SELECT 1 FROM devices)").fetchone()[0]
+        if devices and empty:
+            self.upsert(devices)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a short-lived connection and commit on success.
+
+        Calls come from many threads, so connections are not shared.
+        """
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _record(row: Tuple) -> Dict[str, Any]:
+        """Record from a (device_id, type, status, location, details) row."""
+        return dict(zip(FIELDS, row))
+
+    def upsert(self, devices: Iterable[Dict[str, Any]]) -> int:
+        written = 0
+        with self._connect() as conn:
+            for device in devices:
+                conn.execute(
+                    "INSERT OR REPLACE INTO devices VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (device["device_id"], device["type"], device["status"], device["location"], device["details"],
+                     normalize_value(device["type"]), normalize_value(device["status"]))
+                )
+                conn.execute("DELETE FROM device_locations WHERE device_id = ?", (device["device_id"],))
+                conn.executemany(
+                    "INSERT INTO device_locations VALUES (?, ?)",
+                    [(term, device["device_id"]) for term in location_terms(device["location"])]
+                )
+                written += 1
+            if written >= 1000:
+                # Refresh planner statistics after bulk loads
+                conn.execute("ANALYZE")
+        return written
+
+    def get_many(self, device_ids: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        device_ids = list(device_ids)
+        found: Dict[str, Optional[Dict[str, Any]]] = {device_id: None for device_id in device_ids}
+        with self._connect() as conn:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(device_ids), 500):
+                chunk = device_ids[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT {', '.join(FIELDS)} FROM devices WHERE device_id IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                for row in rows:
+                    found[row[0]] = self._record(row)
+        return found
+
+    def query(
+        self,
+        status: Optional[str] = None,
+        device_type: Optional[str] = None,
+        location: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        clauses, params = [], []
+        if status:
+            clauses.append("status_key = ?")
+            params.append(normalize_value(status))
+        if device_type:
+            clauses.append("type_key = ?")
+            params.append(normalize_value(device_type))
+        if location:
+            clauses.append("device_id IN (SELECT device_id FROM device_locations WHERE term = ?)")
+            params.append(normalize_value(location))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._connect() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM devices{where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT {', '.join(FIELDS)} FROM devices{where} ORDER BY device_id LIMIT ? OFFSET ?",
+                [*params, limit, offset]
+            ).fetchall()
+        return [self._record(row) for row in rows], total
+
+    def device_ids(self) -> List[str]:
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute("SELECT device_id FROM devices ORDER BY device_id")]
+
+    def __len__(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM devices").fetchone()[0]
+
+
+class InventoryServiceHandler:
+    """Stand-in inventory service: a small JSON API over another backend.
+
+    Routes:
+        GET  /devices/{id}     The record, or 404
+        POST /devices/batch    {"device_ids"} -> {"devices": {id: record or null}}
+        POST /devices/query    {"status"?, "device_type"?, "location"?, "limit"?, "offset"?}
+                               -> {"devices", "total"}
+        PUT  /devices          {"devices"} -> {"written"}
+        GET  /devices          {"devices": count}
+    """
+
+    def __init__(self, inventory: DeviceInventory):
+        """Initialize the handler.
+
+        Args:
+            inventory: Backend serving the requests
+        """
+        self.inventory = inventory
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        """Serve a request (httpx.MockTransport handler)."""
+        path = request.url.path.rstrip("/")
+        body = json.loads(request.read() or b"{}")
+        if request.method == "GET" and path == "/devices":
+            return httpx.Response(200, json={"devices": len(self.inventory)})
+        if request.method == "GET" and path.startswith("/devices/"):
+            record = self.inventory.get(path[len("/devices/"):])
+            return httpx.Response(200, json=record) if record else httpx.Response(404, json={"error": "not found"})
+        if request.method == "POST" and path == "/devices/batch":
+            return httpx.Response(200, json={"devices": self.inventory.get_many(body.get("device_ids", []))})
+        if request.method == "POST" and path == "/devices/query":
+            devices, total = self.inventory.query(
+                status=body.get("status"),
+                device_type=body.get("device_type"),
+                location=body.get("location"),
+                limit=int(body.get("limit", 50)),
+                offset=int(body.get("offset", 0))
+            )
+            return httpx.Response(200, json={"devices": devices, "total": total})
+        if request.method == "PUT" and path == "/devices":
+            return httpx.Response(200, json={"written": self.inventory.upsert(body.get("devices", []))})
+        return httpx.Response(404, json={"error": f"Unknown route {request.method} {path}"})
+
+
+class ServiceInventory(DeviceInventory):
+    """Client of a JSON inventory service (see InventoryServiceHandler for the API)."""
+
+    backend = SERVICE_BACKEND
+
+    def __init__(self, url: Optional[str] = None, devices: Optional[Iterable[Dict[str, Any]]] = None, timeout_s: float = 5.0):
+        """Initialize the client.
+
+        Args:
+            url: Service base URL; None serves the API in-process from a memory backend
+            devices: Initial records of the in-process stand-in
+            timeout_s: Request timeout
+        """
+        if url:
+            self.client = httpx.Client(base_url=url, timeout=timeout_s)
+        else:
+            handler = InventoryServiceHandler(MemoryInventory(devices))
+            self.client = httpx.Client(base_url="http://inventory.local", transport=httpx.MockTransport(handler))
+        self.url = url
+
+    def get(self, device_id: str) -> Optional[Dict[str, Any]]:
+        # IDs come from user messages; a "/" or "?" must not change the route
+        response = self.client.get(f"/devices/{quote(device_id, safe='')}")
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    def get_many(self, device_ids: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        response = self.client.post("/devices/batch", json={"device_ids": list(device_ids)})
+        response.raise_for_status()
+        return response.json()["devices"]
+
+    def query(
+        self,
+        status: Optional[str] = None,
+        device_type: Optional[str] = None,
+        location: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        response = self.client.post("/devices/query", json={
+            "status": status, "device_type": device_type, "location": location, "limit": limit, "offset": offset
+        })
+        response.raise_for_status()
+        payload = response.json()
+        return payload["devices"], payload["total"]
+
+    def upsert(self, devices: Iterable[Dict[str, Any]]) -> int:
+        response = self.client.put("/devices", json={"devices": list(devices)})
+        response.raise_for_status()
+        return response.json()["written"]
+
+    def __len__(self) -> int:
+        response = self.client.get("/devices")
+        response.raise_for_status()
+        return response.json()["devices"]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**super().get_stats(), "url": self.url or "in-process"}
+
+
+def get_use_case_devices(use_case: str) -> List[Dict[str, Any]]:
+    """Get the device records of a use case."""
+    if use_case == "it_helpdesk":
+        from mock_data.it_helpdesk import DEVICE_STATUS_DB
+        return [make_device(device_id, record) for device_id, record in DEVICE_STATUS_DB.items()]
+    raise ValueError(f"Unknown use case: {use_case}")
+
+
+def create_device_inventory(backend: Optional[str] = None, devices: Optional[Iterable[Dict[str, Any]]] = None) -> DeviceInventory:
+    """Create an inventory backend.
+
+    Args:
+        backend: memory, sqlite or service (default RAG_DEVICE_INVENTORY or memory)
+        devices: Initial records (for sqlite, only written to an empty database)
+
+    Returns:
+        The inventory
+    """
+    backend = (backend or os.getenv("RAG_DEVICE_INVENTORY", MEMORY_BACKEND)).lower()
+    if backend == MEMORY_BACKEND:
+        return MemoryInventory(devices)
+    if backend == SQLITE_BACKEND:
+        return SQLiteInventory(os.getenv("RAG_DEVICE_INVENTORY_DB", "./device_inventory.db"), devices)
+    if backend == SERVICE_BACKEND:
+        return ServiceInventory(os.getenv("RAG_DEVICE_INVENTORY_URL") or None, devices)
+    raise ValueError(f"Unknown device inventory backend: {backend}")
+
+
+_inventories: Dict[str, DeviceInventory] = {}
+_inventories_lock = threading.Lock()
+
+
+def get_device_inventory(use_case: str = "it_helpdesk") -> DeviceInventory:
+    """Get the shared inventory of a use case, created on first use."""
+    with _inventories_lock:
+        if use_case not in _inventories:
+            _inventories[use_case] = create_device_inventory(devices=get_use_case_devices(use_case))
+        return _inventories[use_case]
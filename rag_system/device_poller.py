@@ -0,0 +1,424 @@
+"""Background device status poller with a freshness-stamped snapshot.
+
+Probing a live device can take seconds, which a tool call inside the LLM
+loop should not wait for. The poller probes every device of the inventory
+concurrently on a schedule (RAG_DEVICE_POLL_INTERVAL seconds, with
+RAG_DEVICE_POLL_WORKERS probes at a time) into an in-memory snapshot that
+records when each status was observed. Status changes are written back to
+the inventory, so filtered queries see them too.
+
+Tool calls read the snapshot, which takes microseconds. A caller can ask for
+data no older than max_age_s: an older (or missing) entry is then probed
+live, bounded by RAG_DEVICE_PROBE_TIMEOUT; if that probe fails or times out,
+the last known status is returned marked stale.
+
+Failed probes are recorded too: until the device answers again, reads carry
+the probe_error and when it failed, and the status is marked stale; after
+RAG_DEVICE_UNREACHABLE_AFTER failures in a row (default 3) the device reads
+Unreachable, so a device that stopped answering does not keep its last status.
+
+Until devices are probed through a real management API, SimulatedDeviceProbe
+stands in for them: it answers from its own copy of the device states, with
+latency and failures drawn from a LatencyProfile (RAG_DEVICE_PROBE_LATENCY,
+same syntax as OFFLINE_AZURE_LATENCY, e.g. lognormal:median_ms=300,error_rate=0.05).
+"""
+
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Callable
+
+from dotenv import load_dotenv
+
+from .device_inventory import DeviceInventory, get_device_inventory
+from .offline_azure import LatencyProfile
+from .metrics import DEVICE_PROBES, DEVICE_SNAPSHOT_AGE
+from .logger import get_logger
+
+# Load environment variables
+load_dotenv()
+
+logger = get_logger(__name__)
+
+SOURCE_SNAPSHOT = "snapshot"
+SOURCE_LIVE = "live"
+
+# Status of a device that did not answer unreachable_after probes in a row
+UNREACHABLE_STATUS = "Unreachable"
+
+# Fields a probe reports; the rest of a record comes from the inventory
+PROBED_FIELDS = ("status", "details")
+
+
+def poller_enabled() -> bool:
+    """Whether device statuses come from the background poller (RAG_DEVICE_POLLER, default off)."""
+    return os.getenv("RAG_DEVICE_POLLER", "off").lower() in ("1", "true", "yes", "on")
+
+
+def _probed(record: Dict[str, Any]) -> tuple:
+    """The probed fields of a record."""
+    return tuple(record.get(field) for field in PROBED_FIELDS)
+
+
+def _isoformat(timestamp: float) -> str:
+    """A Unix time as an ISO 8601 UTC timestamp."""
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec="seconds")
+
+
+class SimulatedDeviceProbe:
+    """Stand-in for live device probes, with injectable latency and failures."""
+
+    def __init__(
+        self,
+        devices: List[Dict[str, Any]],
+        latency: Optional[LatencyProfile] = None,
+        seed: Optional[int] = None
+    ):
+        """Initialize the simulated devices.
+
+        Args:
+            devices: Initial device records
+            latency: Probe latency and error rate; defaults to RAG_DEVICE_PROBE_LATENCY
+            seed: Random seed for latency sampling
+        """
+        self.latency = latency or LatencyProfile.parse(os.getenv("RAG_DEVICE_PROBE_LATENCY"))
+        self._states = {device["device_id"]: {field: device[field] for field in PROBED_FIELDS} for device in devices}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.probes = 0
+
+    def set_state(self, device_id: str, status: str, details: str = "") -> None:
+        """Change what a simulated device reports (e.g. take it offline)."""
+        with self._lock:
+            self._states[device_id] = {"status": status, "details": details}
+
+    def __call__(self, device_id: str) -> Dict[str, Any]:
+        """Probe a device.
+
+        Returns:
+            The device's status and details
+
+        Raises:
+            ConnectionError: If the probe fails (error_rate) or the device does not answer
+        """
+        with self._lock:
+            delay_ms = self.latency.sample_ms(self._rng)
+            failed = bool(self.latency.error_rate) and self._rng.random() < self.latency.error_rate
+            self.probes += 1
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+        with self._lock:
+            state = self._states.get(device_id)
+        if failed or state is None:
+            raise ConnectionError(f"Device {device_id} did not answer")
+        return dict(state)
+
+
+class DevicePoller:
+    """Refreshes device statuses in the background and serves them from a snapshot."""
+
+    def __init__(
+        self,
+        inventory: DeviceInventory,
+        probe: Callable[[str], Dict[str, Any]],
+        interval_s: Optional[float] = None,
+        workers: Optional[int] = None,
+        probe_timeout_s: Optional[float] = None,
+        unreachable_after: Optional[int] = None
+    ):
+        """Initialize the poller.
+
+        Args:
+            inventory: Devices to poll; status changes are written back to it
+            probe: Returns a device's current status and details (raises on failure)
+            interval_s: Time between polling rounds (default RAG_DEVICE_POLL_INTERVAL or 60)
+            workers: Concurrent probes (default RAG_DEVICE_POLL_WORKERS or 16)
+            probe_timeout_s: Longest wait for a live probe in a tool call
+                (default RAG_DEVICE_PROBE_TIMEOUT or 5)
+            unreachable_after: Failed probes in a row after which a device reads
+                Unreachable (default RAG_DEVICE_UNREACHABLE_AFTER or 3)
+        """
+        self.inventory = inventory
+        self.probe = probe
+        self.interval_s = interval_s if interval_s is not None else float(os.getenv("RAG_DEVICE_POLL_INTERVAL", "60"))
+        self.probe_timeout_s = probe_timeout_s if probe_timeout_s is not None else float(os.getenv("RAG_DEVICE_PROBE_TIMEOUT", "5"))
+        self.unreachable_after = unreachable_after or int(os.getenv("RAG_DEVICE_UNREACHABLE_AFTER", "3"))
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers or int(os.getenv("RAG_DEVICE_POLL_WORKERS", "16")),
+            thread_name_prefix="device-probe"
+        )
+        # Live probes do not queue behind a polling round
+        self._live_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="device-live-probe")
+
+        # device_id -> status record with observed_at (Unix time)
+        self._snapshot: Dict[str, Dict[str, Any]] = {}
+        # device_id -> probed fields last written to the inventory
+        self._written: Dict[str, tuple] = {}
+        # device_id -> consecutive failed probes: count, error and when the last one started
+        self._failures: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        # Serializes inventory writes so they land in observation order
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {
+            "rounds": 0, "probes": 0, "probe_errors": 0, "live_probes": 0,
+            "stale_served": 0, "changes": 0, "superseded": 0, "marked_unreachable": 0
+        }
+        self.last_round_ms = 0.0
+
+    def start(self) -> "DevicePoller":
+        """Start polling on a background thread (the first round starts immediately)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="device-poller", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop polling after the current round."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval_s + self.probe_timeout_s)
+            self._thread = None
+        self._executor.shutdown(wait=False)
+        self._live_executor.shutdown(wait=False)
+
+    def _run(self) -> None:
+        """Poll until stopped."""
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.warning("device_poll_failed", exc=e)
+            self._stop.wait(max(0.0, self.interval_s - (time.perf_counter() - started)))
+
+    def poll_once(self) -> Dict[str, Any]:
+        """Probe every device concurrently and update the snapshot.
+
+        Returns:
+            Counts of the round
+        """
+        started = time.perf_counter()
+        device_ids = self.inventory.device_ids()
+        results = list(self._executor.map(self._probe_quietly, device_ids))
+        errors = sum(1 for result in results if result is None)
+        with self._lock:
+            self.stats["rounds"] += 1
+            self.last_round_ms = (time.perf_counter() - started) * 1000
+        DEVICE_SNAPSHOT_AGE.labels().set(self._oldest_age_s())
+        logger.debug("device_poll_round", devices=len(device_ids), errors=errors, elapsed_ms=round(self.last_round_ms, 3))
+        return {"devices": len(device_ids), "errors": errors, "elapsed_ms": round(self.last_round_ms, 3)}
+
+    def _probe_quietly(self, device_id: str, source: str = "poll") -> Optional[Dict[str, Any]]:
+        """Probe a device and record the result; None if the probe failed."""
+        started = time.time()
+        try:
+            state = self.probe(device_id)
+        except Exception as e:
+            DEVICE_PROBES.labels(source=source, result="error").inc()
+            logger.debug("device_probe_failed", device_id=device_id, source=source, exc=e)
+            self._record_failure(device_id, e, started)
+            return None
+        DEVICE_PROBES.labels(source=source, result="ok").inc()
+        return self._record(device_id, state, started)
+
+    def _record(self, device_id: str, state: Dict[str, Any], started: float) -> Optional[Dict[str, Any]]:
+        """Store a probed state in the snapshot and write changes to the inventory.
+
+        The state counts as observed when its probe started. A live probe and
+        a polling probe can finish out of order: a result from a probe that
+        started before the current entry was observed is dropped.
+
+        Args:
+            device_id: Device ID
+            state: Probed status and details
+            started: Unix time the probe started
+
+        Returns:
+            The device's current snapshot entry, or None if it left the inventory
+        """
+        with self._lock:
+            self.stats["probes"] += 1
+            previous = self._snapshot.get(device_id)
+        base = previous or self.inventory.get(device_id)
+        if base is None:
+            # Removed from the inventory since the round started
+            return None
+        with self._lock:
+            current = self._snapshot.get(device_id)
+            if current is not None and current["observed_at"] >= started:
+                self.stats["superseded"] += 1
+                return current
+            if current is None:
+                self._written.setdefault(device_id, _probed(base))
+            failure = self._failures.get(device_id)
+            if failure is not None and failure["at"] <= started:
+                del self._failures[device_id]
+            base = current or base
+            record = {**base, **{field: state[field] for field in PROBED_FIELDS if field in state}, "observed_at": started}
+            if _probed(record) != _probed(base):
+                self.stats["changes"] += 1
+            self._snapshot[device_id] = record
+        self._write_back(device_id)
+        return record
+
+    def _record_failure(self, device_id: str, error: Exception, started: float) -> None:
+        """Note a failed probe; after unreachable_after in a row the device reads Unreachable.
+
+        Args:
+            device_id: Device ID
+            error: What the probe raised
+            started: Unix time the probe started
+        """
+        with self._lock:
+            self.stats["probe_errors"] += 1
+            previous = self._snapshot.get(device_id)
+        base = previous or self.inventory.get(device_id)
+        with self._lock:
+            current = self._snapshot.get(device_id)
+            if base is None and current is None:
+                # Not a known device; nothing to track
+                return
+            if current is not None and current["observed_at"] >= started:
+                # A probe that started later has answered
+                return
+            count = self._failures.get(device_id, {}).get("count", 0) + 1
+            self._failures[device_id] = {"count": count, "error": str(error) or type(error).__name__, "at": started}
+            base = current or base
+            if count < self.unreachable_after or base is None:
+                return
+            if base.get("status") == UNREACHABLE_STATUS:
+                # Still unreachable, as of this probe
+                self._snapshot[device_id] = {**base, "observed_at": started}
+                return
+            if current is None:
+                self._written.setdefault(device_id, _probed(base))
+            self._snapshot[device_id] = {
+                **base,
+                "status": UNREACHABLE_STATUS,
+                "details": f"No answer to the last {count} probes (last known status: {base.get('status')}).",
+                "observed_at": started
+            }
+            self.stats["changes"] += 1
+            self.stats["marked_unreachable"] += 1
+        logger.info("device_unreachable", device_id=device_id, failures=count)
+        self._write_back(device_id)
+
+    def _write_back(self, device_id: str) -> None:
+        """Write a device's latest snapshot entry to the inventory if its probed fields changed."""
+        with self._write_lock:
+            with self._lock:
+                record = self._snapshot.get(device_id)
+                if record is None or self._written.get(device_id) == _probed(record):
+                    return
+            self.inventory.upsert([{key: value for key, value in record.items() if key != "observed_at"}])
+            with self._lock:
+                self._written[device_id] = _probed(record)
+
+    def get(self, device_id: str, max_age_s: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Get a device's status from the snapshot.
+
+        Args:
+            device_id: Device ID
+            max_age_s: Probe the device live if its status is older than this (or
+                not polled yet); None serves whatever the snapshot holds
+
+        Returns:
+            The record with observed_at (ISO time), age_s and source (snapshot or
+            live; stale=True if a live probe failed), or None for unknown devices.
+            While the latest probes fail, probe_error and probe_failed_at say
+            why and when, and stale=True if the status predates the failure.
+        """
+        with self._lock:
+            record = self._snapshot.get(device_id)
+        fallback = None
+        if record is None:
+            # Not polled yet: only devices in the inventory are worth a probe
+            fallback = self.inventory.get(device_id)
+            if fallback is None:
+                return None
+        now = time.time()
+        source = SOURCE_SNAPSHOT
+        stale = False
+        if record is None or (max_age_s is not None and now - record["observed_at"] > max_age_s):
+            live = self._probe_live(device_id)
+            if live is not None:
+                record, source, now = live, SOURCE_LIVE, time.time()
+            else:
+                with self._lock:
+                    # The failed probe may have marked the device unreachable
+                    record = self._snapshot.get(device_id) or record
+                    if record is not None:
+                        stale = True
+                        self.stats["stale_served"] += 1
+        with self._lock:
+            failure = self._failures.get(device_id)
+
+        if record is None:
+            # Never observed: fall back to the inventory, without a freshness stamp
+            result = {**fallback, "observed_at": None, "age_s": None, "source": "inventory", "stale": True}
+        else:
+            result = {
+                **record,
+                "observed_at": _isoformat(record["observed_at"]),
+                "age_s": round(now - record["observed_at"], 3),
+                "source": source
+            }
+            if stale or (failure is not None and failure["at"] > record["observed_at"]):
+                result["stale"] = True
+        if failure is not None:
+            result["probe_error"] = failure["error"]
+            result["probe_failed_at"] = _isoformat(failure["at"])
+        return result
+
+    def _probe_live(self, device_id: str) -> Optional[Dict[str, Any]]:
+        """Probe a device from a tool call, waiting at most probe_timeout_s."""
+        with self._lock:
+            self.stats["live_probes"] += 1
+        future = self._live_executor.submit(self._probe_quietly, device_id, "live")
+        try:
+            return future.result(timeout=self.probe_timeout_s)
+        except FutureTimeoutError:
+            # The probe keeps running and still updates the snapshot when it answers
+            DEVICE_PROBES.labels(source="live", result="timeout").inc()
+            return None
+
+    def _oldest_age_s(self) -> float:
+        """Age of the oldest status in the snapshot."""
+        with self._lock:
+            oldest = min((record["observed_at"] for record in self._snapshot.values()), default=None)
+        return time.time() - oldest if oldest is not None else 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get poller statistics."""
+        oldest_age_s = self._oldest_age_s()
+        with self._lock:
+            return {
+                "running": self._thread is not None,
+                "interval_s": self.interval_s,
+                "devices": len(self._snapshot),
+                "oldest_age_s": round(oldest_age_s, 3),
+                "last_round_ms": round(self.last_round_ms, 3),
+                **self.stats
+            }
+
+
+_pollers: Dict[str, DevicePoller] = {}
+_pollers_lock = threading.Lock()
+
+
+def get_device_poller(use_case: str = "it_helpdesk") -> DevicePoller:
+    """Get the shared, running poller of a use case, created on first use.
+
+    Devices are probed through SimulatedDeviceProbe over the inventory's records.
+    """
+    with _pollers_lock:
+        if use_case not in _pollers:
+            inventory = get_device_inventory(use_case)
+            devices = list(inventory.get_many(inventory.device_ids()).values())
+            _pollers[use_case] = DevicePoller(inventory, SimulatedDeviceProbe(devices)).start()
+        return _pollers[use_case]
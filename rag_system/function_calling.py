@@ -1,16 +1,54 @@
-"""Function calling implementation for Azure OpenAI."""
+"""Function calling implementation for Azure OpenAI.
+
+Tools are offered through the ``tools`` interface, so the model can request
+several calls in one response (e.g. the status of three devices). All calls
+of a response run concurrently on a shared thread pool, each bounded by
+RAG_TOOL_TIMEOUT seconds, and their results go back in a single follow-up
+completion. Set AZURE_OPENAI_TOOLS_API=functions for API versions older than
+2023-12-01-preview, which only know the legacy single-call
+``functions``/``function_call`` parameters.
+
+Idempotent lookups are registered with a result cache (cache_ttl_s), see
+tool_cache.py. Lookups for devices and software named in the user message
+can start before the model asks for them, see tool_prefetch.py.
+"""
 
 import os
 import json
-from typing import List, Dict, Any, Callable, Optional
+import time
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import List, Dict, Any, Callable, Optional, Tuple
 from dataclasses import dataclass
 
 import openai
 from dotenv import load_dotenv
 
+from .clients import get_openai_client
+from .resilience import get_policy
+from .rate_limiter import estimate_tokens, COMPLETION_TOKEN_RESERVE
+from .tracing import span, SPAN_KIND_CLIENT
+from .metrics import TOOL_CALLS
+from .profiling import profile_worker
+from .tool_cache import ToolCache, tool_cache_enabled
+from .lookup_index import normalize_name
+from .catalog_search import get_solution_search, get_software_lookup
+from .device_inventory import get_device_inventory, matches_filters
+from .device_poller import get_device_poller, poller_enabled
+from .tool_prefetch import ToolPrefetch, ToolPrefetcher, create_entity_extractor, PREFETCH_INJECT
+
 # Load environment variables
 load_dotenv()
 
+TOOLS_API = "tools"
+FUNCTIONS_API = "functions"
+
+# Shared pool for tool handlers; a turn's calls run side by side
+_tool_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("RAG_TOOL_WORKERS", "8")),
+    thread_name_prefix="tool-call"
+)
+
 @dataclass
 class FunctionDefinition:
     """Function definition for OpenAI function calling."""
@@ -18,6 +56,7 @@ class FunctionDefinition:
     description: str
     parameters: Dict[str, Any]
     handler: Callable
+    cache: Optional[ToolCache] = None
 
 class FunctionCaller:
     """Handles Azure OpenAI function calling capabilities."""
@@ -31,22 +70,19 @@ class FunctionCaller:
         self.use_case = use_case
         self.functions: Dict[str, FunctionDefinition] = {}
         self.client = self._initialize_client()
+        self.api_style = os.getenv("AZURE_OPENAI_TOOLS_API", TOOLS_API).lower()
+        if self.api_style not in (TOOLS_API, FUNCTIONS_API):
+            raise ValueError(f"Unknown tools API: {self.api_style}")
+        # Longest wait for a tool handler before its call is answered with an error
+        self.tool_timeout_s = float(os.getenv("RAG_TOOL_TIMEOUT", "10"))
 
         # Register functions based on use case
         self._register_use_case_functions()
+        self.prefetcher = ToolPrefetcher(self, create_entity_extractor(self.use_case, self.inventory))
 
     def _initialize_client(self) -> openai.AzureOpenAI:
-        """Initialize Azure OpenAI client."""
-        # Use LLM-specific credentials if available, otherwise fallback to general ones
-        llm_endpoint = os.getenv("AZURE_OPENAI_LLM_ENDPOINT") or os.getenv("AZURE_OPENAI_ENDPOINT")
-        llm_key = os.getenv("AZURE_OPENAI_LLM_API_KEY") or os.getenv("AZURE_OPENAI_API_KEY")
-        llm_api_version = os.getenv("AZURE_OPENAI_LLM_API_VERSION") or os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
-        
-        return openai.AzureOpenAI(
-            azure_endpoint=llm_endpoint,
-            api_key=llm_key,
-            api_version=llm_api_version
-        )
+        """Initialize Azure OpenAI client from the shared, pooled client factory."""
+        return get_openai_client()
 
     def _register_use_case_functions(self) -> None:
         """Register functions based on the use case."""
@@ -57,7 +93,14 @@ class FunctionCaller:
 
     def _register_it_functions(self) -> None:
         """Register IT helpdesk functions."""
-        from mock_data.it_helpdesk import get_device_status, get_software_info, search_solutions
+        self.inventory = get_device_inventory(self.use_case)
+        # With the poller, statuses are served from its snapshot and a result cache would only hide their age
+        self.poller = get_device_poller(self.use_case) if poller_enabled() else None
+        self.device_max_age_s = float(os.getenv("RAG_DEVICE_MAX_AGE", "300"))
+        software = get_software_lookup(self.use_case)
+        solutions = get_solution_search(self.use_case)
+        # Best matches returned by search_it_solutions; the catalog can hold tens of thousands
+        solution_limit = int(os.getenv("RAG_SOLUTION_SEARCH_LIMIT", "5"))
 
         # Device status check function
         self.register_function(
@@ -69,11 +112,59 @@ class FunctionCaller:
                     "device_id": {
                         "type": "string",
                         "description": "The unique identifier of the device (e.g., printer01, server01)"
+                    },
+                    "max_age_seconds": {
+                        "type": "number",
+                        "description": "Check the device live if its last known status is older than this"
                     }
                 },
                 "required": ["device_id"]
             },
-            handler=lambda device_id: self._format_device_status(get_device_status(device_id))
+            handler=lambda device_id, max_age_seconds=None: self._format_device_status(
+                self._device_status(device_id, max_age_seconds)
+            ),
+            # Status changes, so it is only reused within a short window
+            cache_ttl_s=0 if self.poller else float(os.getenv("RAG_TOOL_CACHE_TTL_DEVICE", "30")),
+            cache_max_entries=1024
+        )
+
+        # Batch and filtered device queries
+        self.register_function(
+            name="find_devices",
+            description=(
+                "Look up several IT devices at once, or find devices by status, type and location "
+                "(e.g. offline printers on Floor 2). Prefer this over repeated check_device_status calls."
+            ),
+            parameters={
+                "type": "object",
+                "properties": {
+                    "device_ids": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Devices to look up (e.g. printer01, server02)"
+                    },
+                    "status": {
+                        "type": "string",
+                        "description": "Only devices with this status (Online, Offline, Warning)"
+                    },
+                    "device_type": {
+                        "type": "string",
+                        "description": "Only devices of this type (printer, server, router, workstation, laptop)"
+                    },
+                    "location": {
+                        "type": "string",
+                        "description": "Only devices at this location or part of one (e.g. Floor 2, Data Center)"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Most devices to return (default 25)"
+                    }
+                }
+            },
+            handler=self._find_devices,
+            # Same policy as check_device_status, so the two never disagree about a device
+            cache_ttl_s=0 if self.poller else float(os.getenv("RAG_TOOL_CACHE_TTL_DEVICE", "30")),
+            cache_max_entries=1024
         )
 
         # Software information function
@@ -85,18 +176,22 @@ class FunctionCaller:
                 "properties": {
                     "software_name": {
                         "type": "string",
-                        "description": "Name of the software to look up"
+                        "description": "Name of the software to look up (misspellings and common aliases are matched)"
                     }
                 },
                 "required": ["software_name"]
             },
-            handler=lambda software_name: get_software_info(software_name)
+            handler=lambda software_name: software.get(software_name),
+            cache_ttl_s=float(os.getenv("RAG_TOOL_CACHE_TTL_SOFTWARE", "3600")),
+            # Keyed by the catalog entry, so "MS Office" and "Microsoft Office" share a result
+            # (matched_name is the first spelling's); unmatched names by their normalized form
+            cache_key=lambda args: software.resolve(args["software_name"]) or "unmatched:" + normalize_name(args["software_name"])
         )
 
         # Troubleshooting search function
         self.register_function(
             name="search_it_solutions",
-            description="Search for IT troubleshooting solutions based on keywords",
+            description="Search for IT troubleshooting solutions based on keywords (best matches first)",
             parameters={
                 "type": "object",
                 "properties": {
@@ -108,10 +203,22 @@ class FunctionCaller:
                 },
                 "required": ["keywords"]
             },
-            handler=lambda keywords: search_solutions(keywords)
+            handler=lambda keywords: solutions.search(keywords, limit=solution_limit),
+            cache_ttl_s=float(os.getenv("RAG_TOOL_CACHE_TTL_SOLUTIONS", "600")),
+            # Matching is case-insensitive and ignores keyword order
+            cache_key=lambda args: json.dumps(sorted({k.strip().lower() for k in args["keywords"]}))
         )
 
-    def register_function(self, name: str, description: str, parameters: Dict[str, Any], handler: Callable) -> None:
+    def register_function(
+        self,
+        name: str,
+        description: str,
+        parameters: Dict[str, Any],
+        handler: Callable,
+        cache_ttl_s: Optional[float] = None,
+        cache_max_entries: int = 256,
+        cache_key: Optional[Callable[[Dict[str, Any]], str]] = None
+    ) -> None:
         """Register a new function for calling.
 
         Args:
@@ -119,12 +226,20 @@ class FunctionCaller:
             description: Function description
             parameters: Function parameters schema
             handler: Function handler callable
+            cache_ttl_s: Cache results for this many seconds (only for idempotent
+                handlers); None or 0 disables caching
+            cache_max_entries: Results kept in the cache
+            cache_key: Maps arguments to a cache key (default: normalized JSON)
         """
+        cache = None
+        if cache_ttl_s and tool_cache_enabled():
+            cache = ToolCache(name, ttl_s=cache_ttl_s, max_entries=cache_max_entries, key=cache_key)
         self.functions[name] = FunctionDefinition(
             name=name,
             description=description,
             parameters=parameters,
-            handler=handler
+            handler=handler,
+            cache=cache
         )
 
     def get_function_definitions(self) -> List[Dict[str, Any]]:
@@ -138,6 +253,10 @@ class FunctionCaller:
             for func in self.functions.values()
         ]
 
+    def get_tool_definitions(self) -> List[Dict[str, Any]]:
+        """Get OpenAI tool definitions (tools API) for API calls."""
+        return [{"type": "function", "function": definition} for definition in self.get_function_definitions()]
+
     def call_function(self, function_name: str, arguments: Dict[str, Any]) -> Any:
         """Execute a function call.
 
@@ -149,29 +268,90 @@ class FunctionCaller:
             Function result
         """
         if function_name not in self.functions:
+            TOOL_CALLS.labels(function=function_name, result="error").inc()
             return {"error": f"Function '{function_name}' not found"}
 
         func = self.functions[function_name]
 
-        try:
-            # Call the function with unpacked arguments
-            result = func.handler(**arguments)
-            return result
-        except Exception as e:
-            return {"error": f"Function execution failed: {str(e)}"}
+        with span("tool", **{"tool.name": function_name}) as tool_span:
+            try:
+                # Call the function with unpacked arguments
+                if func.cache is not None:
+                    result = func.cache.call(lambda: func.handler(**arguments), arguments)
+                else:
+                    result = func.handler(**arguments)
+                TOOL_CALLS.labels(function=function_name, result="ok").inc()
+                return result
+            except Exception as e:
+                tool_span.set_error(e)
+                TOOL_CALLS.labels(function=function_name, result="error").inc()
+                return {"error": f"Function execution failed: {str(e)}"}
+
+    def call_functions(self, calls: List[Tuple[str, str]]) -> List[Any]:
+        """Execute several function calls concurrently.
+
+        Each call gets at most tool_timeout_s; a call that does not finish in
+        time (or has malformed arguments) is answered with an error result,
+        so the model can still use the others.
+
+        Args:
+            calls: (function name, JSON-encoded arguments) pairs
+
+        Returns:
+            Results in the order of the calls
+        """
+        results: List[Any] = [None] * len(calls)
+        futures = {}
+        for index, (function_name, raw_arguments) in enumerate(calls):
+            try:
+                arguments = json.loads(raw_arguments or "{}")
+            except ValueError as e:
+                TOOL_CALLS.labels(function=function_name, result="error").inc()
+                results[index] = {"error": f"Invalid arguments for '{function_name}': {str(e)}"}
+                continue
+            futures[self.submit_call(function_name, arguments)] = index
+
+        if futures:
+            done, _ = wait(futures, timeout=self.tool_timeout_s)
+            for future, index in futures.items():
+                if future in done:
+                    results[index] = future.result()
+                else:
+                    # The handler keeps running in the pool; its result is dropped
+                    function_name = calls[index][0]
+                    TOOL_CALLS.labels(function=function_name, result="timeout").inc()
+                    results[index] = {"error": f"Function '{function_name}' timed out after {self.tool_timeout_s:g}s"}
+        return results
+
+    def submit_call(self, function_name: str, arguments: Dict[str, Any]) -> Future:
+        """Start a function call on the tool pool (in a copy of the caller's context)."""
+        return _tool_executor.submit(contextvars.copy_context().run, self._call_in_worker, function_name, arguments)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get result cache statistics of the cached functions."""
+        return {name: func.cache.get_stats() for name, func in self.functions.items() if func.cache is not None}
+
+    def _call_in_worker(self, function_name: str, arguments: Dict[str, Any]) -> Any:
+        """Run a function call on a pool thread (inside the caller's copied context)."""
+        with profile_worker():
+            return self.call_function(function_name, arguments)
 
     def chat_with_functions(
         self,
         messages: List[Dict[str, str]],
         model: Optional[str] = None,
-        max_function_calls: int = 3
+        max_function_calls: int = 3,
+        prefetch: Optional[ToolPrefetch] = None
     ) -> Dict[str, Any]:
         """Chat with function calling enabled.
 
         Args:
             messages: Conversation messages
             model: Azure OpenAI model deployment name
-            max_function_calls: Maximum number of function calls per response
+            max_function_calls: Maximum number of tool-calling round trips per response
+                (with the tools API, each round trip may run several calls in parallel)
+            prefetch: Tool calls started for the turn by start_prefetch; in inject
+                mode their results are added to the conversation up front
 
         Returns:
             Response with function calls if applicable
@@ -180,28 +360,89 @@ class FunctionCaller:
             model = os.getenv("AZURE_OPENAI_LLM_MODEL") or os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT", "GPT-4o-mini")
 
         function_calls_made = 0
+        tool_rounds = 0
         current_messages = messages.copy()
+        if self.api_style == TOOLS_API:
+            tool_params = {"tools": self.get_tool_definitions(), "tool_choice": "auto"}
+        else:
+            tool_params = {"functions": self.get_function_definitions(), "function_call": "auto"}
+
+        # Timing and calls of the turn, for the prefetch accounting
+        completion_ms: List[float] = []
+        tool_wait_ms = 0.0
+        executed: List[Tuple[str, Dict[str, Any]]] = []
+
+        if prefetch is not None and prefetch.mode == PREFETCH_INJECT:
+            self._inject_prefetched(current_messages, prefetch.results())
 
-        while function_calls_made < max_function_calls:
+        result = None
+        while result is None and tool_rounds < max_function_calls:
             try:
-                response = self.client.chat.completions.create(
-                    model=model,
-                    messages=current_messages,
-                    functions=self.get_function_definitions(),
-                    function_call="auto",
-                    temperature=0.7
-                )
+                completion_start = time.perf_counter()
+                with span("llm", kind=SPAN_KIND_CLIENT, purpose="function_calling", model=model) as llm_span:
+                    response = get_policy("function_calling").call(
+                        lambda timeout: self.client.chat.completions.create(
+                            model=model,
+                            messages=current_messages,
+                            temperature=0.7,
+                            timeout=timeout,
+                            **tool_params
+                        ),
+                        tokens=estimate_tokens(current_messages) + COMPLETION_TOKEN_RESERVE,
+                        usage=lambda response: response.usage.total_tokens if response.usage is not None else None
+                    )
+                    if response.usage is not None:
+                        llm_span.set_attribute("llm.prompt_tokens", response.usage.prompt_tokens)
+                        llm_span.set_attribute("llm.completion_tokens", response.usage.completion_tokens)
+                completion_ms.append((time.perf_counter() - completion_start) * 1000)
 
                 message = response.choices[0].message
 
-                # Check if function call was made
-                if message.function_call:
+                # Check if tool calls were made (all of them are answered in the next request)
+                if message.tool_calls:
+                    tool_rounds += 1
+                    function_calls_made += len(message.tool_calls)
+                    llm_span.set_attribute("tool_calls", len(message.tool_calls))
+
+                    # Execute the functions concurrently
+                    calls = [(call.function.name, call.function.arguments) for call in message.tool_calls]
+                    tool_start = time.perf_counter()
+                    results = self.call_functions(calls)
+                    tool_wait_ms += (time.perf_counter() - tool_start) * 1000
+                    executed.extend(self._parsed_calls(calls))
+
+                    # Add the tool calls and their results to messages
+                    current_messages.append({
+                        "role": "assistant",
+                        "content": message.content,
+                        "tool_calls": [
+                            {
+                                "id": call.id,
+                                "type": "function",
+                                "function": {"name": call.function.name, "arguments": call.function.arguments}
+                            }
+                            for call in message.tool_calls
+                        ]
+                    })
+                    for call, call_result in zip(message.tool_calls, results):
+                        current_messages.append({
+                            "role": "tool",
+                            "tool_call_id": call.id,
+                            "content": json.dumps(call_result)
+                        })
+
+                    # Continue the conversation
+                    continue
+                elif message.function_call:
+                    tool_rounds += 1
                     function_calls_made += 1
 
                     # Execute the function
                     func_name = message.function_call.name
-                    func_args = json.loads(message.function_call.arguments)
-                    func_result = self.call_function(func_name, func_args)
+                    tool_start = time.perf_counter()
+                    func_result = self.call_functions([(func_name, message.function_call.arguments)])[0]
+                    tool_wait_ms += (time.perf_counter() - tool_start) * 1000
+                    executed.extend(self._parsed_calls([(func_name, message.function_call.arguments)]))
 
                     # Add function call and result to messages
                     current_messages.append({
@@ -222,32 +463,146 @@ class FunctionCaller:
                     continue
                 else:
                     # No function call, return the response
-                    return {
+                    result = {
                         "content": message.content,
                         "function_calls_made": function_calls_made,
+                        "tool_rounds": tool_rounds,
                         "messages": current_messages
                     }
 
             except Exception as e:
-                return {
+                result = {
                     "error": f"Chat completion failed: {str(e)}",
                     "function_calls_made": function_calls_made
                 }
 
-        return {
-            "error": "Maximum function calls reached",
-            "function_calls_made": function_calls_made
+        if result is None:
+            result = {
+                "error": "Maximum function calls reached",
+                "function_calls_made": function_calls_made
+            }
+
+        # Failed turns are settled too, so every prefetched call is counted used or unused
+        if prefetch is not None:
+            record = prefetch.settle(executed, completion_ms, tool_wait_ms)
+            self.prefetcher.record(record)
+            result["prefetch"] = record.to_dict()
+            if "content" in result and prefetch.mode == PREFETCH_INJECT:
+                # Injected results count as calls made for the answered turn
+                result["function_calls_made"] += record.injected
+        return result
+
+    def start_prefetch(self, message: str) -> Optional[ToolPrefetch]:
+        """Start tool calls for the entities in a user message (see tool_prefetch.py).
+
+        Returns:
+            Handle to pass to chat_with_functions, or None if nothing was prefetched
+        """
+        return self.prefetcher.start(message)
+
+    def _inject_prefetched(self, messages: List[Dict[str, Any]], results: List[Tuple[str, Dict[str, Any], Any]]) -> None:
+        """Add prefetched results to the conversation as answered tool calls."""
+        if not results:
+            return
+        if self.api_style == TOOLS_API:
+            messages.append({
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {
+                        "id": f"prefetch_{index}",
+                        "type": "function",
+                        "function": {"name": name, "arguments": json.dumps(arguments)}
+                    }
+                    for index, (name, arguments, _) in enumerate(results)
+                ]
+            })
+            for index, (_, _, result) in enumerate(results):
+                messages.append({"role": "tool", "tool_call_id": f"prefetch_{index}", "content": json.dumps(result)})
+            return
+        for name, arguments, result in results:
+            messages.append({"role": "assistant", "content": None, "function_call": {"name": name, "arguments": json.dumps(arguments)}})
+            messages.append({"role": "function", "name": name, "content": json.dumps(result)})
+
+    @staticmethod
+    def _parsed_calls(calls: List[Tuple[str, str]]) -> List[Tuple[str, Dict[str, Any]]]:
+        """(name, arguments) of calls whose JSON arguments parse."""
+        parsed = []
+        for name, raw_arguments in calls:
+            try:
+                parsed.append((name, json.loads(raw_arguments or "{}")))
+            except ValueError:
+                continue
+        return parsed
+
+    def _device_status(self, device_id: str, max_age_s: Optional[float] = None) -> Dict[str, Any]:
+        """Get a device's status record from the poller snapshot or the inventory."""
+        if self.poller is not None:
+            record = self.poller.get(device_id, max_age_s=max_age_s if max_age_s is not None else self.device_max_age_s)
+        else:
+            record = self.inventory.get(device_id)
+        return record or {
+            "status": "Unknown",
+            "details": "Device not found in system.",
+            "location": "Unknown"
+        }
+
+    def _find_devices(
+        self,
+        device_ids: Optional[List[str]] = None,
+        status: Optional[str] = None,
+        device_type: Optional[str] = None,
+        location: Optional[str] = None,
+        limit: int = 25
+    ) -> Dict[str, Any]:
+        """Batch lookup or filtered query of the device inventory."""
+        limit = max(1, min(int(limit), 100))
+        not_found: List[str] = []
+        if device_ids:
+            records = self.inventory.get_many(device_ids)
+            not_found = [device_id for device_id, record in records.items() if record is None]
+            devices = [
+                record for record in records.values()
+                if record is not None and matches_filters(record, status, device_type, location)
+            ]
+            total = len(devices)
+            devices = devices[:limit]
+        elif status or device_type or location:
+            devices, total = self.inventory.query(status=status, device_type=device_type, location=location, limit=limit)
+        else:
+            return {"error": "Give device_ids or at least one of status, device_type and location"}
+
+        summary = ", ".join(f"{d['device_id']} ({d['status']}, {d['location']})" for d in devices)
+        result = {
+            "total_matching": total,
+            "returned": len(devices),
+            "devices": devices,
+            "formatted_response": f"{total} matching device(s)" + (f": {summary}" if summary else ".")
         }
+        if not_found:
+            result["not_found"] = not_found
+        return result
 
     def _format_device_status(self, status_info: Dict[str, Any]) -> Dict[str, Any]:
         """Format device status information for better readability."""
         if "status" in status_info:
-            return {
+            formatted = {
                 "device_status": status_info["status"],
                 "details": status_info.get("details", "No additional details available"),
                 "location": status_info.get("location", "Location unknown"),
                 "formatted_response": f"Device Status: {status_info['status']}. {status_info.get('details', '')}"
             }
+            if status_info.get("observed_at"):
+                formatted["observed_at"] = status_info["observed_at"]
+                formatted["age_s"] = status_info["age_s"]
+                formatted["source"] = status_info["source"]
+                if status_info.get("stale"):
+                    formatted["stale"] = True
+                    formatted["formatted_response"] += f" (last known status, {status_info['age_s']:.0f}s old; live check failed)"
+            if status_info.get("probe_error"):
+                formatted["probe_error"] = status_info["probe_error"]
+                formatted["probe_failed_at"] = status_info["probe_failed_at"]
+            return formatted
         return status_info
 
 
@@ -0,0 +1,140 @@
+"""Versioned vector index artifacts that can be loaded without embedding the corpus.
+
+An index directory (index.faiss and index.pkl written by FAISS.save_local)
+gets a manifest.json recording what it was built from: a fingerprint of the
+corpus, the embedding model, the vector dimension and checksums of the index
+files. An index is only loaded when its manifest matches the current corpus
+and embedding model, so a changed knowledge base or model never serves stale
+vectors.
+
+Artifacts for the mock data are built with ``python chatbot_main.py
+build-index`` into mock_data/indexes and shipped with the code; a fresh
+checkout loads them directly and makes no embedding calls on startup.
+"""
+
+import os
+import json
+import hashlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+from .clients import get_embedding_settings
+from .offline_azure import offline_mode_enabled, DEFAULT_EMBEDDING_DIM
+
+# Bump when the layout of an artifact changes; older artifacts are then rebuilt
+ARTIFACT_FORMAT_VERSION = 1
+
+MANIFEST_FILE = "manifest.json"
+INDEX_FILES = ("index.faiss", "index.pkl")
+
+DEFAULT_ARTIFACT_DIR = Path(__file__).resolve().parent.parent / "mock_data" / "indexes"
+
+
+def get_artifact_dir() -> Path:
+    """Directory holding the prebuilt artifacts (RAG_INDEX_ARTIFACT_DIR or mock_data/indexes)."""
+    return Path(os.getenv("RAG_INDEX_ARTIFACT_DIR") or DEFAULT_ARTIFACT_DIR)
+
+
+def artifact_path(use_case: str) -> Path:
+    """Path of the prebuilt artifact for a use case."""
+    # Offline embeddings are not comparable with real ones, so they get their own artifact
+    suffix = "_offline" if offline_mode_enabled() else ""
+    return get_artifact_dir() / f"{use_case}{suffix}"
+
+
+def corpus_fingerprint(documents: List[Dict[str, Any]]) -> str:
+    """SHA-256 of the documents' content and metadata, independent of key order."""
+    canonical = json.dumps(documents, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def embedding_model_id() -> str:
+    """Identifier of the embedding model vectors are currently produced with."""
+    deployment = get_embedding_settings()["deployment"]
+    if offline_mode_enabled():
+        dimension = int(os.getenv("OFFLINE_AZURE_EMBEDDING_DIM", str(DEFAULT_EMBEDDING_DIM)))
+        return f"offline:{deployment}:{dimension}"
+    return f"azure:{deployment}"
+
+
+def _file_sha256(path: Path) -> str:
+    """SHA-256 of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_manifest(
+    index_dir: str,
+    use_case: str,
+    fingerprint: str,
+    dimension: int,
+    total_documents: int,
+    added_documents: int = 0
+) -> Dict[str, Any]:
+    """Write the manifest of a saved index.
+
+    Args:
+        index_dir: Directory the index was saved to
+        use_case: Use case of the corpus
+        fingerprint: Fingerprint of the corpus the index was built from
+        dimension: Embedding dimension
+        total_documents: Vectors in the index
+        added_documents: Documents added after the corpus was indexed
+
+    Returns:
+        The manifest
+    """
+    model = embedding_model_id()
+    manifest = {
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "version": hashlib.sha256(f"{ARTIFACT_FORMAT_VERSION}:{fingerprint}:{model}".encode("utf-8")).hexdigest()[:12],
+        "use_case": use_case,
+        "corpus_fingerprint": fingerprint,
+        "embedding_model": model,
+        "embedding_dimension": dimension,
+        "total_documents": total_documents,
+        "added_documents": added_documents,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "files": {name: _file_sha256(Path(index_dir, name)) for name in INDEX_FILES}
+    }
+    Path(index_dir, MANIFEST_FILE).write_text(json.dumps(manifest, indent=2) + "\n", encoding="utf-8")
+    return manifest
+
+
+def read_manifest(index_dir: str) -> Optional[Dict[str, Any]]:
+    """Read the manifest of an index (None if it has none or it is unreadable)."""
+    try:
+        return json.loads(Path(index_dir, MANIFEST_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def verify_index(index_dir: str, fingerprint: str, model: Optional[str] = None) -> Optional[str]:
+    """Check that an index on disk was built from this corpus with this embedding model.
+
+    Args:
+        index_dir: Index directory
+        fingerprint: Fingerprint of the current corpus
+        model: Current embedding model ID (default embedding_model_id())
+
+    Returns:
+        Why the index cannot be used, or None if it can
+    """
+    manifest = read_manifest(index_dir)
+    if manifest is None:
+        return "missing_manifest"
+    if manifest.get("format_version") != ARTIFACT_FORMAT_VERSION:
+        return "format_version"
+    if manifest.get("corpus_fingerprint") != fingerprint:
+        return "corpus_changed"
+    if manifest.get("embedding_model") != (model or embedding_model_id()):
+        return "embedding_model_changed"
+    for name, checksum in (manifest.get("files") or {}).items():
+        path = Path(index_dir, name)
+        if not path.exists() or _file_sha256(path) != checksum:
+            return "checksum_mismatch"
+    return None
@@ -0,0 +1,289 @@
+"""Local intent router that decides whether a turn needs tools or retrieval."""
+
+import re
+import time
+import threading
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+import numpy as np
+
+ROUTE_TOOLS = "tools"
+ROUTE_RAG = "rag"
+ROUTE_AMBIGUOUS = "ambiguous"
+
+# Words that signal a lookup against live inventory rather than a how-to question
+STATUS_WORDS = {"status", "online", "offline", "down", "working", "reachable", "check"}
+SOFTWARE_INTENT_WORDS = {"license", "licence", "version", "install", "approval", "available", "catalog"}
+
+
+@dataclass
+class RouteDecision:
+    """Routing decision for a single user turn."""
+    route: str
+    reason: str
+    confidence: float
+    matched_entities: List[str] = field(default_factory=list)
+    latency_ms: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the decision to a JSON-friendly dictionary."""
+        return {
+            "route": self.route,
+            "reason": self.reason,
+            "confidence": round(self.confidence, 3),
+            "matched_entities": self.matched_entities,
+            "latency_ms": round(self.latency_ms, 3)
+        }
+
+
+class IntentRouter:
+    """Cheap local classifier that routes turns to function calling or RAG.
+
+    Rules derived from the use-case data (device IDs, software catalog names)
+    run first; an optional embedding-similarity classifier over labeled
+    examples handles the rest. Anything the router is unsure about is
+    reported as ambiguous so the caller keeps the original behaviour.
+    """
+
+    def __init__(
+        self,
+        use_case: str = "it_helpdesk",
+        embed_fn: Optional[Callable[[str], List[float]]] = None,
+        examples: Optional[Dict[str, List[str]]] = None,
+        similarity_margin: float = 0.05,
+        min_similarity: float = 0.3
+    ):
+        """Initialize the intent router.
+
+        Args:
+            use_case: The use case (it_helpdesk)
+            embed_fn: Optional query embedding function for the similarity classifier
+            examples: Labeled examples keyed by route; defaults to the use case's examples
+            similarity_margin: Minimum similarity gap between routes to commit to one
+            min_similarity: Minimum similarity to the winning route to commit to it
+        """
+        self.use_case = use_case
+        self.embed_fn = embed_fn
+        self.similarity_margin = similarity_margin
+        self.min_similarity = min_similarity
+
+        device_ids, software_terms, default_examples = self._load_use_case_data()
+        self.examples = examples or default_examples
+        self._device_pattern = self._build_device_pattern(device_ids)
+        self._software_terms = software_terms
+
+        self._example_vectors: Optional[Dict[str, np.ndarray]] = None
+        self._vectors_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._route_counts = {ROUTE_TOOLS: 0, ROUTE_RAG: 0, ROUTE_AMBIGUOUS: 0}
+        self._tool_route_misses = 0
+        self._ambiguous_tool_turns = 0
+        self._router_time_ms = 0.0
+        # Running average of a function-calling attempt that fell through to RAG;
+        # this is the latency a correctly routed RAG turn saves.
+        self._fallthrough_ms_avg: Optional[float] = None
+        self._fallthrough_samples = 0
+
+    def _load_use_case_data(self) -> Tuple[List[str], Dict[str, str], Dict[str, List[str]]]:
+        """Load device IDs, software names and labeled examples for the use case."""
+        if self.use_case == "it_helpdesk":
+            from mock_data.it_helpdesk import DEVICE_STATUS_DB, SOFTWARE_CATALOG, ROUTING_EXAMPLES
+        else:
+            raise ValueError(f"Unknown use case: {self.use_case}")
+
+        software_terms: Dict[str, str] = {}
+        for key, info in SOFTWARE_CATALOG.items():
+            software_terms[key.replace("_", " ")] = key
+            name = info.get("name", "").lower()
+            if name:
+                software_terms[name] = key
+                # "Microsoft Office 365" -> "microsoft office"
+                stripped = re.sub(r"\s+[\d.]+$", "", name)
+                software_terms[stripped] = key
+
+        return list(DEVICE_STATUS_DB.keys()), software_terms, ROUTING_EXAMPLES
+
+    @staticmethod
+    def _build_device_pattern(device_ids: List[str]) -> re.Pattern:
+        """Build a regex matching known device IDs and IDs of the same families."""
+        prefixes = sorted({re.sub(r"\d+$", "", device_id) for device_id in device_ids if device_id})
+        known = sorted(device_ids, key=len, reverse=True)
+        alternatives = [re.escape(device_id) for device_id in known]
+        if prefixes:
+            alternatives.append(r"(?:%s)[-_ ]?\d+" % "|".join(re.escape(p) for p in prefixes))
+        return re.compile(r"\b(%s)\b" % "|".join(alternatives), re.IGNORECASE)
+
+    def route(self, user_input: str, record: bool = True) -> RouteDecision:
+        """Decide whether a turn needs tools or retrieval.
+
+        Args:
+            user_input: User's message
+            record: Count the decision in the router's statistics (off for
+                questions that are not user turns, e.g. warm-up queries)
+
+        Returns:
+            Routing decision
+        """
+        start = time.perf_counter()
+        decision = self._route(user_input)
+        decision.latency_ms = (time.perf_counter() - start) * 1000
+        if not record:
+            return decision
+
+        with self._stats_lock:
+            self._route_counts[decision.route] += 1
+            self._router_time_ms += decision.latency_ms
+
+        return decision
+
+    def _route(self, user_input: str) -> RouteDecision:
+        """Apply rules first, then the similarity classifier."""
+        text = user_input.lower()
+        words = set(re.findall(r"[a-z0-9]+", text))
+
+        devices = [match.lower() for match in self._device_pattern.findall(text)]
+        if devices:
+            return RouteDecision(ROUTE_TOOLS, "device_id", 0.95, devices)
+
+        software = sorted({key for term, key in self._software_terms.items() if term and term in text})
+        if software:
+            if words & SOFTWARE_INTENT_WORDS:
+                return RouteDecision(ROUTE_TOOLS, "software_catalog", 0.85, software)
+            return RouteDecision(ROUTE_AMBIGUOUS, "software_mention", 0.5, software)
+
+        if self.embed_fn is not None:
+            classified = self._classify_by_similarity(user_input)
+            if classified is not None:
+                return classified
+
+        if words & STATUS_WORDS:
+            return RouteDecision(ROUTE_AMBIGUOUS, "status_keywords", 0.5)
+
+        return RouteDecision(ROUTE_RAG, "no_tool_signal", 0.7)
+
+    def _get_example_vectors(self) -> Dict[str, np.ndarray]:
+        """Embed labeled examples once and cache the normalized matrices."""
+        if self._example_vectors is None:
+            with self._vectors_lock:
+                if self._example_vectors is None:
+                    vectors = {}
+                    for label, texts in self.examples.items():
+                        matrix = np.array([self.embed_fn(text) for text in texts], dtype=np.float32)
+                        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                        vectors[label] = matrix / np.maximum(norms, 1e-12)
+                    self._example_vectors = vectors
+        return self._example_vectors
+
+    def _classify_by_similarity(self, user_input: str) -> Optional[RouteDecision]:
+        """Classify a turn by its nearest labeled examples.
+
+        Returns:
+            A decision, or None if the classifier is unavailable
+        """
+        try:
+            example_vectors = self._get_example_vectors()
+            query = np.array(self.embed_fn(user_input), dtype=np.float32)
+        except Exception:
+            return None
+
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        # Score each route by the mean of its top-3 most similar examples
+        scores = {}
+        for label, matrix in example_vectors.items():
+            similarities = np.sort(matrix @ query)[::-1][:3]
+            scores[label] = float(similarities.mean()) if similarities.size else 0.0
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        best_label, best_score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+
+        if best_score < self.min_similarity or best_score - runner_up < self.similarity_margin:
+            return RouteDecision(ROUTE_AMBIGUOUS, "similarity_uncertain", best_score)
+
+        return RouteDecision(best_label, "similarity", best_score)
+
+    def record_outcome(
+        self,
+        decision: RouteDecision,
+        function_calls_made: int,
+        function_calling_ms: Optional[float] = None
+    ) -> None:
+        """Record what the function-calling attempt did for a routed turn.
+
+        Args:
+            decision: The decision returned by route()
+            function_calls_made: Number of functions the model called
+            function_calling_ms: Time spent in the function-calling attempt
+        """
+        with self._stats_lock:
+            if decision.route == ROUTE_TOOLS and function_calls_made == 0:
+                self._tool_route_misses += 1
+            if decision.route == ROUTE_AMBIGUOUS and function_calls_made > 0:
+                self._ambiguous_tool_turns += 1
+
+            if function_calls_made == 0 and function_calling_ms is not None:
+                self._fallthrough_samples += 1
+                if self._fallthrough_ms_avg is None:
+                    self._fallthrough_ms_avg = function_calling_ms
+                else:
+                    # Exponential moving average so the estimate tracks the endpoint
+                    self._fallthrough_ms_avg = 0.9 * self._fallthrough_ms_avg + 0.1 * function_calling_ms
+
+    def evaluate(self, labeled: List[Tuple[str, str]]) -> Dict[str, Any]:
+        """Measure routing accuracy over labeled (question, expected_route) pairs.
+
+        Args:
+            labeled: Pairs of question and expected route (tools or rag)
+
+        Returns:
+            Accuracy (questions sent to the expected route), misrouting rates
+            and per-route confusion counts
+        """
+        confusion: Dict[str, Dict[str, int]] = {}
+        misrouted = []
+        ambiguous = 0
+
+        for question, expected in labeled:
+            decision = self._route(question)
+            confusion.setdefault(expected, {}).setdefault(decision.route, 0)
+            confusion[expected][decision.route] += 1
+
+            if decision.route == ROUTE_AMBIGUOUS:
+                ambiguous += 1
+            elif decision.route != expected:
+                misrouted.append({"question": question, "expected": expected, "routed": decision.route})
+
+        total = len(labeled)
+        committed = total - ambiguous
+        correct = committed - len(misrouted)
+        return {
+            "total": total,
+            "correct": correct,
+            "accuracy": correct / total if total else 0.0,
+            "misrouted": len(misrouted),
+            "misroute_rate": len(misrouted) / committed if committed else 0.0,
+            "ambiguous_rate": ambiguous / total if total else 0.0,
+            "confusion": confusion,
+            "misrouted_examples": misrouted
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get routing statistics, including the estimated latency saved."""
+        with self._stats_lock:
+            total = sum(self._route_counts.values())
+            tool_routes = self._route_counts[ROUTE_TOOLS]
+            saved_per_turn = self._fallthrough_ms_avg or 0.0
+            return {
+                "decisions": dict(self._route_counts),
+                "total_decisions": total,
+                "tool_route_misses": self._tool_route_misses,
+                "tool_route_miss_rate": self._tool_route_misses / tool_routes if tool_routes else 0.0,
+                "ambiguous_turns_with_tools": self._ambiguous_tool_turns,
+                "avg_router_ms": self._router_time_ms / total if total else 0.0,
+                "avg_fallthrough_ms": saved_per_turn,
+                "fallthrough_samples": self._fallthrough_samples,
+                "estimated_latency_saved_ms": saved_per_turn * self._route_counts[ROUTE_RAG]
+            }
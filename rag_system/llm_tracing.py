@@ -0,0 +1,120 @@
+"""LangChain callbacks that record prompt build and LLM spans on the current trace.
+
+Separate from tracing so recording spans does not import langchain; only the
+retrieval chain, which runs LangChain anyway, uses this handler.
+"""
+
+import time
+import contextvars
+from typing import Dict, Any, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from .rate_limiter import estimate_tokens
+from .tracing import Span, start_span, end_span, current_trace, SPAN_KIND_CLIENT
+
+
+class LLMTracingHandler(BaseCallbackHandler):
+    """LangChain callbacks recording prompt build and LLM spans with time to first token.
+
+    Create one per chain invocation, inside the span the LLM work belongs to.
+    Prompt build covers the chain start (context formatting, prompt template)
+    up to the model call.
+    """
+
+    def __init__(self, **attributes: Any):
+        """Initialize the handler.
+
+        Args:
+            **attributes: Attributes added to the LLM span
+        """
+        self.attributes = attributes
+        # Callbacks may arrive on other threads, so keep the context they belong to
+        self._context = contextvars.copy_context()
+        self._chain_start_ns: Optional[int] = None
+        self._llm_spans: Dict[Any, Span] = {}
+        self._prompt_estimates: Dict[Any, int] = {}
+        self._streamed: Dict[Any, List[str]] = {}
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        if parent_run_id is None and self._chain_start_ns is None:
+            self._chain_start_ns = self._context.run(_now_ns)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        # Fallback when the service does not report usage on streamed responses
+        self._prompt_estimates[run_id] = sum(
+            estimate_tokens(str(message.content)) + 4 for batch in messages for message in batch
+        )
+        self._context.run(self._start_llm, run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._context.run(self._start_llm, run_id)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        if token:
+            self._streamed.setdefault(run_id, []).append(token)
+        llm_span = self._llm_spans.get(run_id)
+        if llm_span is not None and token and "llm.ttft_ms" not in llm_span.attributes:
+            llm_span.attributes["llm.ttft_ms"] = round((self._context.run(_now_ns) - llm_span.start_ns) / 1e6, 3)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        llm_span = self._llm_spans.pop(run_id, None)
+        if llm_span is not None:
+            usage = _usage_from_result(response)
+            prompt_estimate = self._prompt_estimates.pop(run_id, 0)
+            self._streamed.pop(run_id, None)
+            if usage:
+                llm_span.attributes["llm.prompt_tokens"] = usage.get("input_tokens", 0)
+                llm_span.attributes["llm.completion_tokens"] = usage.get("output_tokens", 0)
+            else:
+                llm_span.attributes["llm.prompt_tokens"] = prompt_estimate
+                llm_span.attributes["llm.completion_tokens"] = estimate_tokens(_text_from_result(response))
+                llm_span.attributes["llm.usage_estimated"] = True
+            self._context.run(end_span, llm_span)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        prompt_estimate = self._prompt_estimates.pop(run_id, 0)
+        streamed = self._streamed.pop(run_id, [])
+        llm_span = self._llm_spans.pop(run_id, None)
+        if llm_span is not None:
+            llm_span.set_error(error)
+            if streamed:
+                # A stream closed part-way (e.g. cancelled) was billed for the prompt and what it sent
+                llm_span.attributes["llm.prompt_tokens"] = prompt_estimate
+                llm_span.attributes["llm.completion_tokens"] = estimate_tokens("".join(streamed))
+                llm_span.attributes["llm.usage_estimated"] = True
+            self._context.run(end_span, llm_span)
+
+    def _start_llm(self, run_id) -> None:
+        """Record prompt build up to now and open the LLM span."""
+        if self._chain_start_ns is not None:
+            prompt_span = start_span("prompt_build")
+            prompt_span.start_ns = self._chain_start_ns
+            end_span(prompt_span)
+            self._chain_start_ns = None
+        self._llm_spans[run_id] = start_span("llm", kind=SPAN_KIND_CLIENT, **self.attributes)
+
+
+def _usage_from_result(result) -> Optional[Dict[str, int]]:
+    """Token usage reported with an LLM result (streamed usage arrives on the message)."""
+    for generations in getattr(result, "generations", None) or []:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage
+    return None
+
+
+def _text_from_result(result) -> str:
+    """Generated text of an LLM result."""
+    return "".join(
+        getattr(generation, "text", "") or ""
+        for generations in getattr(result, "generations", None) or []
+        for generation in generations
+    )
+
+
+def _now_ns() -> int:
+    """Current time on the active trace's clock."""
+    trace = current_trace()
+    return trace.now_ns() if trace is not None else time.time_ns()
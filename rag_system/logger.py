@@ -0,0 +1,283 @@
+"""Structured event logging with a non-blocking, queue-backed JSON-lines sink.
+
+Request threads only build a small dict and put it on a bounded queue; a
+background thread formats and writes the lines. When the queue is full,
+events are dropped and counted instead of blocking the request.
+
+Every event carries the session and trace IDs of the turn it belongs to.
+
+Configuration:
+    RAG_LOG_LEVEL: debug, info, warning, error or off (default info)
+    RAG_LOG_FILE: file to append JSON lines to (default stderr)
+    RAG_LOG_SAMPLE_RATE: fraction of debug/info events kept (default 1.0);
+        warnings and errors are never sampled out
+    RAG_LOG_QUEUE_SIZE: events buffered before dropping (default 10000)
+"""
+
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import threading
+import traceback
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, TextIO
+
+from dotenv import load_dotenv
+
+from .rate_limiter import current_session_id
+from .tracing import current_trace
+
+# Load environment variables
+load_dotenv()
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+OFF = 100
+
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR, "off": OFF}
+LEVEL_NAMES = {value: name for name, value in LEVELS.items()}
+
+
+class LogSink:
+    """Background writer draining a bounded queue of events."""
+
+    def __init__(self, stream: Optional[TextIO] = None, path: Optional[str] = None, max_queue: int = 10000):
+        """Initialize the sink.
+
+        Args:
+            stream: Stream to write to (default stderr)
+            path: File to append to instead of a stream
+            max_queue: Events buffered before new ones are dropped
+        """
+        self._stream = stream
+        self._path = path
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_queue)
+        self._stats_lock = threading.Lock()
+        self._stats = {"written": 0, "dropped": 0, "write_errors": 0}
+        self._thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+        self._thread.start()
+
+    def submit(self, record: Dict[str, Any]) -> None:
+        """Queue an event without blocking; drop it if the queue is full."""
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._stats_lock:
+                self._stats["dropped"] += 1
+
+    def _run(self) -> None:
+        """Write queued events until the stop marker arrives."""
+        handle = open(self._path, "a", encoding="utf-8") if self._path else None
+        try:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    break
+                lines = [self._format(record)]
+                # Write whatever else is already queued in the same batch
+                while True:
+                    try:
+                        record = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if record is None:
+                        self._write(handle, lines)
+                        return
+                    lines.append(self._format(record))
+                self._write(handle, lines)
+        finally:
+            if handle is not None:
+                handle.close()
+
+    def _format(self, record: Dict[str, Any]) -> str:
+        """Serialize an event, rendering an attached exception off the request thread."""
+        error = record.pop("exc", None)
+        if error is not None:
+            record["error"] = f"{type(error).__name__}: {error}"
+            record["traceback"] = "".join(traceback.format_exception(type(error), error, error.__traceback__))
+        return json.dumps(record, default=str, ensure_ascii=False)
+
+    def _write(self, handle: Optional[TextIO], lines) -> None:
+        """Write a batch of lines."""
+        stream = handle or self._stream or sys.stderr
+        try:
+            stream.write("\n".join(lines) + "\n")
+            stream.flush()
+            with self._stats_lock:
+                self._stats["written"] += len(lines)
+        except (OSError, ValueError):
+            with self._stats_lock:
+                self._stats["write_errors"] += 1
+
+    def close(self, timeout: float = 2.0) -> None:
+        """Flush queued events and stop the writer thread."""
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get written/dropped counts and the current queue depth."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize()
+        return stats
+
+
+class StructuredLogger:
+    """Named logger emitting structured events."""
+
+    def __init__(self, name: str):
+        """Initialize the logger.
+
+        Args:
+            name: Logger name, usually the module name
+        """
+        self.name = name
+
+    def is_enabled(self, level: int) -> bool:
+        """Whether events at this level are emitted (check before building expensive fields)."""
+        return level >= _config["level"]
+
+    def log(self, level: int, event: str, message: Optional[str] = None,
+            exc: Optional[BaseException] = None, sample_rate: Optional[float] = None, **fields: Any) -> None:
+        """Emit an event.
+
+        Args:
+            level: Event level (DEBUG, INFO, WARNING, ERROR)
+            event: Short machine-readable event name (e.g. index_loaded)
+            message: Optional human-readable message
+            exc: Exception whose traceback is attached (formatted in the background)
+            sample_rate: Fraction of these events to keep; defaults to RAG_LOG_SAMPLE_RATE
+                for debug/info and 1.0 for warnings and errors
+            **fields: Structured fields
+        """
+        if level < _config["level"]:
+            return
+        if sample_rate is None:
+            sample_rate = _config["sample_rate"] if level < WARNING else 1.0
+        if sample_rate < 1.0 and random.random() >= sample_rate:
+            with _counters_lock:
+                _counters["sampled_out"] += 1
+            return
+
+        record: Dict[str, Any] = {
+            "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "level": LEVEL_NAMES.get(level, str(level)),
+            "logger": self.name,
+            "event": event
+        }
+        if message:
+            record["message"] = message
+        session_id = current_session_id.get()
+        if session_id != "default":
+            record["session_id"] = session_id
+        trace = current_trace()
+        if trace is not None:
+            record["trace_id"] = trace.trace_id
+        if sample_rate < 1.0:
+            record["sample_rate"] = sample_rate
+        record.update(fields)
+        if exc is not None:
+            record["exc"] = exc
+
+        _get_sink().submit(record)
+
+    def debug(self, event: str, message: Optional[str] = None, **fields: Any) -> None:
+        """Emit a debug event."""
+        self.log(DEBUG, event, message, **fields)
+
+    def info(self, event: str, message: Optional[str] = None, **fields: Any) -> None:
+        """Emit an info event."""
+        self.log(INFO, event, message, **fields)
+
+    def warning(self, event: str, message: Optional[str] = None, **fields: Any) -> None:
+        """Emit a warning event."""
+        self.log(WARNING, event, message, **fields)
+
+    def error(self, event: str, message: Optional[str] = None, **fields: Any) -> None:
+        """Emit an error event (pass exc=... to attach a traceback)."""
+        self.log(ERROR, event, message, **fields)
+
+
+def _parse_level(value: Optional[str]) -> int:
+    """Parse a level name, defaulting to info."""
+    return LEVELS.get((value or "info").strip().lower(), INFO)
+
+
+_config: Dict[str, Any] = {
+    "level": _parse_level(os.getenv("RAG_LOG_LEVEL")),
+    "sample_rate": float(os.getenv("RAG_LOG_SAMPLE_RATE", "1.0"))
+}
+_counters = {"sampled_out": 0}
+_counters_lock = threading.Lock()
+_sink: Optional[LogSink] = None
+_sink_lock = threading.Lock()
+_loggers: Dict[str, StructuredLogger] = {}
+
+
+def _get_sink() -> LogSink:
+    """Get the process-wide sink, starting it on first use."""
+    global _sink
+    if _sink is None:
+        with _sink_lock:
+            if _sink is None:
+                _sink = LogSink(
+                    path=os.getenv("RAG_LOG_FILE") or None,
+                    max_queue=int(os.getenv("RAG_LOG_QUEUE_SIZE", "10000"))
+                )
+                atexit.register(_sink.close)
+    return _sink
+
+
+def get_logger(name: str) -> StructuredLogger:
+    """Get the structured logger for a module."""
+    logger = _loggers.get(name)
+    if logger is None:
+        logger = _loggers.setdefault(name, StructuredLogger(name))
+    return logger
+
+
+def configure_logging(level: Optional[str] = None, sample_rate: Optional[float] = None,
+                      path: Optional[str] = None, stream: Optional[TextIO] = None) -> None:
+    """Change the level, sampling or destination at runtime.
+
+    Args:
+        level: debug, info, warning, error or off
+        sample_rate: Fraction of debug/info events kept
+        path: File to append to (replaces the current sink)
+        stream: Stream to write to (replaces the current sink)
+    """
+    global _sink
+    if level is not None:
+        if level.lower() not in LEVELS:
+            raise ValueError(f"Unknown log level: {level}")
+        _config["level"] = LEVELS[level.lower()]
+    if sample_rate is not None:
+        _config["sample_rate"] = sample_rate
+    if path is not None or stream is not None:
+        with _sink_lock:
+            old = _sink
+            _sink = LogSink(stream=stream, path=path, max_queue=int(os.getenv("RAG_LOG_QUEUE_SIZE", "10000")))
+            atexit.register(_sink.close)
+        if old is not None:
+            old.close()
+
+
+def get_log_stats() -> Dict[str, Any]:
+    """Get logger configuration and sink counters."""
+    with _counters_lock:
+        stats = dict(_counters)
+    stats.update({
+        "level": LEVEL_NAMES.get(_config["level"], _config["level"]),
+        "sample_rate": _config["sample_rate"]
+    })
+    if _sink is not None:
+        stats.update(_sink.get_stats())
+    return stats
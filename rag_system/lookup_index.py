@@ -0,0 +1,271 @@
+"""In-memory indexes for the lookup tools.
+
+KeywordIndex answers "which entries have a keyword containing this text"
+without scanning the catalog. Each entry's keywords are lowercased and joined
+(as the original substring scan did), and every substring of up to
+``ngram`` characters of that text is indexed:
+    - a query of up to ``ngram`` characters is a single posting lookup;
+    - a longer query intersects the postings of its n-grams, rarest first,
+      and only the remaining candidates are checked with a substring test.
+Entries are ranked by how many of the query keywords they match, then by
+how many of those were exact keywords or words, then by catalog order.
+
+FuzzyNameIndex resolves free-form names ("MS Office", "acrobat", "slak") to
+catalog keys. Every name and alias of an entry is normalized and indexed by
+its padded trigrams. A query collects candidates from the trigram postings,
+keeps the few sharing the most trigrams, and scores only those by edit
+distance (whole name and per word), so a lookup costs microseconds however
+large the catalog is. A query word that matches no word of a name (nor
+part of it, as in "power point") names something else: "Visual Studio Code"
+is not "Visual Studio 2022", so such a name is scored by its words alone.
+Generic words like "app" or "software" are left out of the word score.
+"""
+
+import re
+import heapq
+import threading
+from typing import Dict, List, Set, Iterable, Tuple, Optional, NamedTuple
+
+# Words that say what kind of thing is meant, not which one ("slack app")
+GENERIC_NAME_WORDS = frozenset({"app", "application", "client", "program", "software", "suite", "tool"})
+
+
+class KeywordIndex:
+    """N-gram inverted index over the keyword lists of catalog entries."""
+
+    def __init__(self, ngram: int = 3):
+        """Initialize an empty index.
+
+        Args:
+            ngram: Longest substring length indexed; longer queries intersect n-grams
+        """
+        self.ngram = ngram
+        self._texts: List[str] = []
+        self._exact: Dict[str, Set[int]] = {}
+        self._grams: Dict[str, Set[int]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def add(self, keywords: Iterable[str]) -> int:
+        """Index the keywords of the next entry.
+
+        Args:
+            keywords: Keywords of the entry
+
+        Returns:
+            Position of the entry (entries are numbered in the order they are added)
+        """
+        keywords = [keyword.lower() for keyword in keywords]
+        text = " ".join(keywords)
+        with self._lock:
+            entry_id = len(self._texts)
+            self._texts.append(text)
+            for term in set(keywords) | set(text.split()):
+                self._exact.setdefault(term, set()).add(entry_id)
+            for size in range(1, self.ngram + 1):
+                for start in range(len(text) - size + 1):
+                    self._grams.setdefault(text[start:start + size], set()).add(entry_id)
+        return entry_id
+
+    def _matching(self, keyword: str) -> Set[int]:
+        """Entries whose keyword text contains the keyword (caller holds the lock)."""
+        if len(keyword) <= self.ngram:
+            return self._grams.get(keyword, set())
+        postings = sorted(
+            (self._grams.get(keyword[start:start + self.ngram], set())
+             for start in range(len(keyword) - self.ngram + 1)),
+            key=len
+        )
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if not candidates:
+                break
+            candidates &= posting
+        return {entry_id for entry_id in candidates if keyword in self._texts[entry_id]}
+
+    def search(self, keywords: Iterable[str]) -> List[Tuple[int, int]]:
+        """Find the entries matching any of the keywords.
+
+        Args:
+            keywords: Query keywords (case-insensitive; empty ones are ignored)
+
+        Returns:
+            (entry position, number of keywords matched) pairs, best first
+        """
+        matched: Dict[int, int] = {}
+        exact: Dict[int, int] = {}
+        with self._lock:
+            for keyword in {keyword.strip().lower() for keyword in keywords}:
+                if not keyword:
+                    continue
+                for entry_id in self._matching(keyword):
+                    matched[entry_id] = matched.get(entry_id, 0) + 1
+                for entry_id in self._exact.get(keyword, ()):
+                    exact[entry_id] = exact.get(entry_id, 0) + 1
+        ranked = sorted(matched, key=lambda entry_id: (-matched[entry_id], -exact.get(entry_id, 0), entry_id))
+        return [(entry_id, matched[entry_id]) for entry_id in ranked]
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase a name and reduce punctuation, underscores and spacing to single spaces."""
+    return " ".join(re.sub(r"[^a-z0-9+#]+", " ", name.lower()).split())
+
+
+def edit_distance(a: str, b: str, limit: Optional[int] = None) -> int:
+    """Levenshtein distance between two strings.
+
+    Args:
+        a: First string
+        b: Second string
+        limit: Stop early once the distance exceeds this (returns limit + 1); only
+            the cells within limit of the diagonal are computed
+
+    Returns:
+        The distance, or limit + 1 if it is larger than limit
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is None:
+        limit = len(a)
+    if len(a) - len(b) > limit:
+        return limit + 1
+    beyond = limit + 1
+    width = len(b) + 1
+    previous = [j if j <= limit else beyond for j in range(width)]
+    for i in range(1, len(a) + 1):
+        char_a = a[i - 1]
+        low, high = max(1, i - limit), min(len(b), i + limit)
+        current = [beyond] * width
+        current[0] = row_min = i if i <= limit else beyond
+        for j in range(low, high + 1):
+            cost = previous[j - 1] + (char_a != b[j - 1])
+            if previous[j] < cost:
+                cost = previous[j] + 1
+            if current[j - 1] < cost:
+                cost = current[j - 1] + 1
+            current[j] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > limit:
+            return beyond
+        previous = current
+    return min(previous[-1], beyond)
+
+
+def _similarity(a: str, b: str, floor: float = 0.0) -> float:
+    """Edit-distance similarity in [0, 1]; 0 when it would be below floor."""
+    longest = max(len(a), len(b))
+    if not longest:
+        return 1.0
+    limit = int((1.0 - floor) * longest)
+    distance = edit_distance(a, b, limit)
+    return 1.0 - distance / longest if distance <= limit else 0.0
+
+
+def _trigrams(text: str) -> Set[str]:
+    """Trigrams of a padded name, so short names and word starts have some."""
+    padded = f"  {text} "
+    return {padded[start:start + 3] for start in range(len(padded) - 2)}
+
+
+class NameMatch(NamedTuple):
+    """Result of a fuzzy name lookup."""
+    key: str
+    name: str
+    confidence: float
+
+
+class FuzzyNameIndex:
+    """Trigram index over entry names and aliases with edit-distance scoring."""
+
+    def __init__(self, candidates: int = 8):
+        """Initialize an empty index.
+
+        Args:
+            candidates: Names (with the most shared trigrams) scored per lookup
+        """
+        self.candidates = candidates
+        self._names: List[Tuple[str, str]] = []
+        self._exact: Dict[str, int] = {}
+        self._grams: Dict[str, Set[int]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, key: str, names: Iterable[str]) -> None:
+        """Index the names of an entry.
+
+        Args:
+            key: Entry key returned by lookups
+            names: Names and aliases of the entry (the key is indexed too)
+        """
+        with self._lock:
+            for name in [key, *names]:
+                normalized = normalize_name(name)
+                if not normalized or normalized in self._exact:
+                    continue
+                name_id = len(self._names)
+                self._names.append((key, normalized))
+                self._exact[normalized] = name_id
+                for gram in _trigrams(normalized):
+                    self._grams.setdefault(gram, set()).add(name_id)
+
+    def _score(self, query: str, name: str) -> float:
+        """Confidence that the query means the name."""
+        # Word by word, so "acrobat" finds "adobe acrobat reader"; a partial name is never certain
+        words = name.split()
+        joined = "".join(words)
+        per_word = []
+        unmatched = False
+        for token in query.split():
+            score = 1.0 if token in words else max(_similarity(token, word, floor=0.75) for word in words)
+            if not score and token not in joined:
+                if token in GENERIC_NAME_WORDS:
+                    continue
+                unmatched = True
+            per_word.append(score)
+        if not per_word:
+            return 0.0
+        by_words = 0.95 * sum(per_word) / len(per_word)
+        if unmatched:
+            # A word the name lacks ("code" against "visual studio 2022") means another product
+            return by_words
+        # The whole name only matters where it beats the word score (which bounds the work)
+        return max(by_words, _similarity(query, name, floor=max(0.5, by_words)))
+
+    def lookup(self, name: str, limit: int = 3) -> List[NameMatch]:
+        """Find the entries best matching a name.
+
+        Args:
+            name: Free-form name
+            limit: Matches returned
+
+        Returns:
+            Best matches first, one per entry key (nothing if no name is similar)
+        """
+        query = normalize_name(name)
+        if not query:
+            return []
+        with self._lock:
+            exact = self._exact.get(query)
+            if exact is not None:
+                return [NameMatch(self._names[exact][0], query, 1.0)]
+            grams = _trigrams(query)
+            shared: Dict[int, int] = {}
+            for gram in grams:
+                for name_id in self._grams.get(gram, ()):
+                    shared[name_id] = shared.get(name_id, 0) + 1
+            # Names sharing under 30% of the query's trigrams cannot score well; skip them
+            least = max(1, int(0.3 * len(grams)))
+            candidates = [
+                self._names[name_id]
+                for name_id in heapq.nlargest(self.candidates, shared, key=shared.get)
+                if shared[name_id] >= least
+            ]
+
+        best: Dict[str, NameMatch] = {}
+        for key, candidate in candidates:
+            confidence = round(self._score(query, candidate), 3)
+            if confidence > 0 and (key not in best or confidence > best[key].confidence):
+                best[key] = NameMatch(key, candidate, confidence)
+        return sorted(best.values(), key=lambda match: -match.confidence)[:limit]
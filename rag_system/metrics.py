@@ -0,0 +1,405 @@
+"""In-process metrics registry with Prometheus text exposition.
+
+Counters, gauges and histograms are process-wide, so every chatbot in the
+process reports into the same series. Stage latencies and token usage come
+from finished tracing spans; request, cache, error and index metrics are
+recorded where they happen.
+
+Exposition (both optional, configured from the environment):
+    RAG_METRICS_PORT: serve /metrics over HTTP on this port
+    RAG_METRICS_FILE: periodically write the metrics to this file (textfile collector)
+"""
+
+import os
+import math
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Tuple, Callable, Iterable
+
+from .tracing import Span, add_span_listener
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# Latency buckets in seconds, from sub-millisecond FAISS lookups to slow completions
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text format."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value for the text format."""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    """Render a label set like {method="rag",le="0.5"}."""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{_escape(extra[1])}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """Base class for labelled metrics."""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], Any] = {}
+
+    def labels(self, **labels: Any):
+        """Get the child series for a label set."""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _series(self) -> List[Tuple[Tuple[str, ...], Any]]:
+        """Snapshot of (label values, child) pairs."""
+        with self._lock:
+            return list(self._children.items())
+
+    def render(self) -> List[str]:
+        """Render the metric in Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for key, child in sorted(self._series()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    def _render_child(self, key: Tuple[str, ...], child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"]
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increase the counter."""
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float) -> None:
+        """Set the gauge."""
+        with self._lock:
+            self.value = float(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increase the gauge."""
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        """Decrease the gauge."""
+        with self._lock:
+            self.value -= amount
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """Record an observation."""
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets."""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, key: Tuple[str, ...], child) -> List[str]:
+        with child._lock:
+            counts, total, count = list(child.counts), child.sum, child.count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', _format_value(bound)))} {cumulative}")
+        lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', '+Inf'))} {count}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Iterable[str], **kwargs) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.type_name}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        """Get or create a counter."""
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        """Get or create a gauge."""
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """Get or create a histogram."""
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Register a callback that refreshes gauges just before rendering."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Render every metric in Prometheus text exposition format."""
+        with self._lock:
+            collectors = list(self._collectors)
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        for collector in collectors:
+            try:
+                collector()
+            except Exception:
+                pass
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+REQUESTS = REGISTRY.counter("rag_requests_total", "Chat turns by answering method", ["method"])
+REQUEST_LATENCY = REGISTRY.histogram("rag_request_duration_seconds", "Chat turn latency by answering method", ["method"])
+STAGE_LATENCY = REGISTRY.histogram("rag_stage_duration_seconds", "Latency of pipeline stages (tracing spans)", ["stage"])
+CACHE_REQUESTS = REGISTRY.counter("rag_cache_requests_total", "Cache lookups by cache and result (hit or miss)", ["cache", "result"])
+TOKENS = REGISTRY.counter("rag_llm_tokens_total", "LLM tokens by purpose and type (prompt or completion)", ["purpose", "type"])
+AZURE_REQUESTS = REGISTRY.counter("rag_azure_requests_total", "Azure OpenAI calls by operation", ["operation"])
+AZURE_ERRORS = REGISTRY.counter("rag_azure_errors_total", "Azure OpenAI errors by operation and kind (rate_limited is HTTP 429)", ["operation", "kind"])
+INDEX_DOCUMENTS = REGISTRY.gauge("rag_index_documents", "Vectors in the FAISS index", ["use_case"])
+RATE_LIMITER_QUEUE = REGISTRY.gauge("rag_rate_limiter_queue_depth", "Requests waiting for Azure quota", ["limiter"])
+COST = REGISTRY.counter("rag_llm_cost_usd_total", "Estimated Azure OpenAI spend in USD by pipeline stage", ["stage"])
+SERVER_IN_FLIGHT = REGISTRY.gauge("rag_server_in_flight_requests", "HTTP API requests being processed")
+SERVER_QUEUE = REGISTRY.gauge("rag_server_queued_requests", "HTTP API requests waiting for a worker slot")
+SERVER_REJECTED = REGISTRY.counter("rag_server_rejected_total", "HTTP API requests rejected by admission control, by reason", ["reason"])
+SERVER_SESSIONS = REGISTRY.gauge("rag_server_sessions", "Conversations held in the HTTP API session store")
+TOOL_CALLS = REGISTRY.counter("rag_tool_calls_total", "Tool handler calls by function and result (ok, error, timeout)", ["function", "result"])
+DEVICE_PROBES = REGISTRY.counter("rag_device_probes_total", "Device status probes by source (poll or live) and result", ["source", "result"])
+DEVICE_SNAPSHOT_AGE = REGISTRY.gauge("rag_device_snapshot_age_seconds", "Age of the oldest device status in the poller snapshot")
+TOOL_PREFETCH = REGISTRY.counter("rag_tool_prefetch_calls_total", "Tool calls prefetched from message entities, by whether the turn used them", ["result"])
+WARMUP_QUERIES = REGISTRY.counter("rag_warmup_queries_total", "Queries run by the startup warm-up, by result", ["result"])
+WASTED_TOKENS = REGISTRY.counter("rag_wasted_tokens_total", "Tokens spent on stages whose result was discarded, by stage and reason", ["stage", "reason"])
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    """Count a cache hit or miss."""
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def _observe_span(span: Span) -> None:
+    """Feed finished spans into the stage latency and token metrics."""
+    STAGE_LATENCY.labels(stage=span.name).observe(span.duration_ms / 1000)
+    if span.name == "llm":
+        purpose = span.attributes.get("purpose", "unknown")
+        for token_type in ("prompt", "completion"):
+            tokens = span.attributes.get(f"llm.{token_type}_tokens")
+            if tokens:
+                TOKENS.labels(purpose=purpose, type=token_type).inc(tokens)
+
+
+def _collect_rate_limiters() -> None:
+    """Refresh rate limiter queue depths."""
+    from .rate_limiter import get_rate_limiter_stats
+    for name, stats in get_rate_limiter_stats().items():
+        RATE_LIMITER_QUEUE.labels(limiter=name).set(stats["queue_depth"])
+
+
+add_span_listener(_observe_span)
+REGISTRY.add_collector(_collect_rate_limiters)
+
+
+def get_metrics_summary() -> Dict[str, Any]:
+    """Summarize the main counters for get_chatbot_stats."""
+    requests = {key[0]: child.value for key, child in REQUESTS._series()}
+    cache_totals: Dict[str, Dict[str, float]] = {}
+    for (cache, result), child in CACHE_REQUESTS._series():
+        cache_totals.setdefault(cache, {"hit": 0.0, "miss": 0.0})[result] = child.value
+    errors: Dict[str, float] = {}
+    for (operation, kind), child in AZURE_ERRORS._series():
+        errors[f"{operation}:{kind}"] = child.value
+    tokens: Dict[str, float] = {}
+    for (purpose, token_type), child in TOKENS._series():
+        tokens[f"{purpose}:{token_type}"] = child.value
+
+    return {
+        "requests_by_method": requests,
+        "cache_hit_ratio": {
+            cache: totals["hit"] / (totals["hit"] + totals["miss"]) if totals["hit"] + totals["miss"] else 0.0
+            for cache, totals in cache_totals.items()
+        },
+        "tokens": tokens,
+        "azure_errors": errors
+    }
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serves the registry on /metrics."""
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve /metrics from a daemon thread.
+
+    Args:
+        port: Port to listen on (0 picks a free port)
+        host: Interface to bind
+
+    Returns:
+        The running server (call shutdown() to stop it)
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+def write_metrics_file(path: str) -> None:
+    """Write the metrics to a file atomically (for the node_exporter textfile collector)."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(REGISTRY.render())
+    os.replace(temp_path, path)
+
+
+def _write_metrics_periodically(path: str, interval: float) -> None:
+    """Background loop writing the metrics file."""
+    while True:
+        try:
+            write_metrics_file(path)
+        except OSError:
+            pass
+        time.sleep(interval)
+
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+
+def start_metrics_exporters() -> None:
+    """Start the HTTP endpoint and/or file writer configured in the environment (once per process)."""
+    global _exporters_started
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+
+        port = os.getenv("RAG_METRICS_PORT")
+        if port:
+            try:
+                start_metrics_server(int(port), os.getenv("RAG_METRICS_HOST", "127.0.0.1"))
+            except OSError as e:
+                # Another process (e.g. a second Streamlit worker) may already serve the port
+                logger.warning("metrics_server_not_started", port=port, error=str(e))
+
+        path = os.getenv("RAG_METRICS_FILE")
+        if path:
+            interval = float(os.getenv("RAG_METRICS_FILE_INTERVAL", "15"))
+            threading.Thread(
+                target=_write_metrics_periodically,
+                args=(path, interval),
+                name="metrics-file-writer",
+                daemon=True
+            ).start()
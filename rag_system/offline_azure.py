@@ -0,0 +1,572 @@
+"""Offline stand-in for Azure OpenAI chat completions, function calling and embeddings.
+
+The stand-in runs either in-process, as an httpx transport the shared client
+factory installs when AZURE_OPENAI_OFFLINE is set, or as a small local HTTP
+server (``python -m rag_system.offline_azure --port 8008``) that
+AZURE_OPENAI_ENDPOINT can point at. Responses are deterministic: embeddings
+are feature-hashed from the input text, tool calls are scripted from
+patterns in the user message, and latency follows a configurable profile.
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import uuid
+import base64
+import random
+import struct
+import hashlib
+import argparse
+import threading
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+import httpx
+
+from .rate_limiter import estimate_tokens, get_token_encoding
+
+OFFLINE_ENDPOINT = "https://offline.azure.local"
+DEFAULT_EMBEDDING_DIM = 1536
+
+
+def offline_mode_enabled() -> bool:
+    """Check whether Azure calls should be served by the in-process stand-in."""
+    return os.getenv("AZURE_OPENAI_OFFLINE", "").lower() in ("1", "true", "yes", "on")
+
+
+@dataclass
+class LatencyProfile:
+    """Simulated service latency.
+
+    Attributes:
+        kind: 'fixed' or 'lognormal'
+        median_ms: Fixed latency, or the median of the lognormal distribution
+        sigma: Lognormal shape parameter (spread of the tail)
+        stall_probability: Chance that a request stalls
+        stall_ms: Extra delay of a stalled request
+        per_token_ms: Delay between streamed chunks
+        error_rate: Chance that a request fails with HTTP 429
+    """
+    kind: str = "fixed"
+    median_ms: float = 0.0
+    sigma: float = 0.5
+    stall_probability: float = 0.0
+    stall_ms: float = 0.0
+    per_token_ms: float = 0.0
+    error_rate: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: Optional[str]) -> "LatencyProfile":
+        """Parse a profile like 'lognormal:median_ms=300,sigma=0.6,stall_probability=0.01,stall_ms=5000'."""
+        if not spec:
+            return cls()
+        kind, _, params = spec.partition(":")
+        profile = cls(kind=kind.strip() or "fixed")
+        for item in filter(None, (part.strip() for part in params.split(","))):
+            key, _, value = item.partition("=")
+            if not hasattr(profile, key):
+                raise ValueError(f"Unknown latency profile parameter: {key}")
+            setattr(profile, key, float(value))
+        if profile.kind not in ("fixed", "lognormal"):
+            raise ValueError(f"Unknown latency profile kind: {profile.kind}")
+        return profile
+
+    def sample_ms(self, rng: random.Random) -> float:
+        """Draw a request latency in milliseconds."""
+        if self.kind == "lognormal" and self.median_ms > 0:
+            latency = rng.lognormvariate(math.log(self.median_ms), self.sigma)
+        else:
+            latency = self.median_ms
+        if self.stall_probability and rng.random() < self.stall_probability:
+            latency += self.stall_ms
+        return latency
+
+
+# Words too common to say anything about a text's topic
+_STOP_WORDS = {
+    "a", "an", "the", "to", "of", "and", "or", "is", "are", "my", "i", "do", "how",
+    "in", "on", "for", "your", "you", "it", "what", "with", "can", "be", "if"
+}
+
+# Weight of a component shared by every text; real embeddings are never orthogonal,
+# and without it related texts fall below the retrieval similarity threshold
+_SHARED_COMPONENT = 0.8
+
+
+def deterministic_embedding(text: str, dimension: int = DEFAULT_EMBEDDING_DIM) -> List[float]:
+    """Embed text by feature-hashing words and character trigrams.
+
+    Texts sharing vocabulary get similar vectors, which is enough for
+    retrieval to behave plausibly in benchmarks.
+    """
+    vector = [0.0] * dimension
+    words = [word for word in re.findall(r"[a-z0-9]+", text.lower()) if word not in _STOP_WORDS]
+    features = words + [f"#{word[i:i + 3]}" for word in words for i in range(max(1, len(word) - 2))]
+    for feature in features:
+        digest = hashlib.md5(feature.encode("utf-8")).digest()
+        index = int.from_bytes(digest[:4], "little") % dimension
+        sign = 1.0 if digest[4] & 1 else -1.0
+        # Whole words count more than their trigrams
+        vector[index] += sign * (1.0 if not feature.startswith("#") else 0.5)
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    vector = [value / norm for value in vector]
+    vector[0] += _SHARED_COMPONENT
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector]
+
+
+class OfflineAzureBackend:
+    """Request handler shared by the in-process transport and the local server."""
+
+    def __init__(
+        self,
+        latency: Optional[LatencyProfile] = None,
+        embedding_latency: Optional[LatencyProfile] = None,
+        script: Optional[List[Dict[str, Any]]] = None,
+        seed: Optional[int] = None,
+        embedding_dimension: Optional[int] = None
+    ):
+        """Initialize the stand-in backend.
+
+        Args:
+            latency: Chat completion latency; defaults to OFFLINE_AZURE_LATENCY
+            embedding_latency: Embedding latency; defaults to OFFLINE_AZURE_EMBEDDING_LATENCY
+            script: Tool-call rules [{"match": regex, "function": name, "arguments": {...}}];
+                argument strings may use {match} and the regex's named groups.
+                Defaults to OFFLINE_AZURE_SCRIPT (a JSON file) or rules derived from mock data
+            seed: Random seed for latency sampling; defaults to OFFLINE_AZURE_SEED
+            embedding_dimension: Embedding size; defaults to OFFLINE_AZURE_EMBEDDING_DIM
+        """
+        self.latency = latency or LatencyProfile.parse(os.getenv("OFFLINE_AZURE_LATENCY"))
+        self.embedding_latency = embedding_latency or LatencyProfile.parse(os.getenv("OFFLINE_AZURE_EMBEDDING_LATENCY"))
+        self.embedding_dimension = embedding_dimension or int(os.getenv("OFFLINE_AZURE_EMBEDDING_DIM", str(DEFAULT_EMBEDDING_DIM)))
+        self._rng = random.Random(seed if seed is not None else int(os.getenv("OFFLINE_AZURE_SEED", "0")))
+        self._rng_lock = threading.Lock()
+        self.script = self._compile_script(script if script is not None else self._load_script())
+
+        self._stats_lock = threading.Lock()
+        self.stats = {"chat_completions": 0, "embeddings": 0, "streamed": 0, "tool_calls": 0, "errors_injected": 0}
+
+    @staticmethod
+    def _load_script() -> List[Dict[str, Any]]:
+        """Load tool-call rules from OFFLINE_AZURE_SCRIPT, or derive them from mock data."""
+        path = os.getenv("OFFLINE_AZURE_SCRIPT")
+        if path:
+            with open(path, "r", encoding="utf-8") as handle:
+                return json.load(handle)
+
+        from mock_data.it_helpdesk import DEVICE_STATUS_DB, SOFTWARE_CATALOG
+        prefixes = sorted({re.sub(r"\d+$", "", device_id) for device_id in DEVICE_STATUS_DB})
+        software_names = sorted(
+            {key.replace("_", " ") for key in SOFTWARE_CATALOG} | {key.split("_")[-1] for key in SOFTWARE_CATALOG},
+            key=len,
+            reverse=True
+        )
+        statuses = sorted({record["status"].lower() for record in DEVICE_STATUS_DB.values()})
+        return [
+            {
+                # "Which printers on floor 2 are offline?"
+                "match": r"^(?=.*\b(?P<device_type>%s)s\b)(?=.*\b(?P<status>%s)\b)(?:(?=.*\b(?P<location>floor \d+)\b))?" % (
+                    "|".join(map(re.escape, prefixes)), "|".join(map(re.escape, statuses))
+                ),
+                "function": "find_devices",
+                "arguments": {"device_type": "{device_type}", "status": "{status}", "location": "{location}"}
+            },
+            {
+                "match": r"\b(?:%s)\d+\b" % "|".join(map(re.escape, prefixes)),
+                "function": "check_device_status",
+                "arguments": {"device_id": "{match}"}
+            },
+            {
+                "match": r"\b(?:%s)\b" % "|".join(map(re.escape, software_names)),
+                "function": "get_software_info",
+                "arguments": {"software_name": "{match}"}
+            }
+        ]
+
+    @staticmethod
+    def _compile_script(script: List[Dict[str, Any]]) -> List[Tuple[re.Pattern, str, Dict[str, Any]]]:
+        """Compile tool-call rules."""
+        return [(re.compile(rule["match"], re.IGNORECASE | re.DOTALL), rule["function"], rule.get("arguments", {})) for rule in script]
+
+    def _sleep(self, profile: LatencyProfile) -> None:
+        """Wait for a sampled request latency."""
+        with self._rng_lock:
+            delay_ms = profile.sample_ms(self._rng)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+    def _should_fail(self, profile: LatencyProfile) -> bool:
+        """Decide whether to inject a 429."""
+        if not profile.error_rate:
+            return False
+        with self._rng_lock:
+            failed = self._rng.random() < profile.error_rate
+        if failed:
+            self._increment("errors_injected")
+        return failed
+
+    def _increment(self, key: str, amount: int = 1) -> None:
+        """Increment a stats counter."""
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def handle(self, method: str, path: str, body: bytes) -> Tuple[int, Dict[str, str], Any]:
+        """Handle a request.
+
+        Args:
+            method: HTTP method
+            path: Request path (query string excluded)
+            body: Request body
+
+        Returns:
+            Status code, headers, and either bytes or an iterator of bytes (streaming)
+        """
+        if method != "POST":
+            return self._json(404, {"error": {"code": "NotFound", "message": f"Unsupported method {method}"}})
+
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            return self._json(400, {"error": {"code": "BadRequest", "message": "Invalid JSON body"}})
+
+        if path.endswith("/embeddings"):
+            return self._embeddings(payload)
+        if path.endswith("/chat/completions"):
+            return self._chat_completions(payload)
+        return self._json(404, {"error": {"code": "NotFound", "message": f"Unknown path {path}"}})
+
+    @staticmethod
+    def _json(status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        """Build a JSON response."""
+        response_headers = {"content-type": "application/json"}
+        response_headers.update(headers or {})
+        return status, response_headers, json.dumps(payload).encode("utf-8")
+
+    def _rate_limited(self) -> Tuple[int, Dict[str, str], bytes]:
+        """Build an injected 429 response."""
+        return self._json(
+            429,
+            {"error": {"code": "429", "message": "Rate limit exceeded (offline stand-in)"}},
+            {"retry-after-ms": "200"}
+        )
+
+    def _embeddings(self, payload: Dict[str, Any]) -> Tuple[int, Dict[str, str], bytes]:
+        """Serve an embeddings request."""
+        if self._should_fail(self.embedding_latency):
+            return self._rate_limited()
+        self._sleep(self.embedding_latency)
+
+        inputs = payload.get("input", [])
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+
+        texts = []
+        for item in inputs:
+            # Clients may send pre-tokenized input
+            if isinstance(item, list):
+                encoding = get_token_encoding()
+                item = encoding.decode(item) if encoding is not None else " ".join(map(str, item))
+            texts.append(item)
+
+        dimension = int(payload.get("dimensions") or self.embedding_dimension)
+        as_base64 = payload.get("encoding_format") == "base64"
+        data = []
+        for index, text in enumerate(texts):
+            vector = deterministic_embedding(text, dimension)
+            embedding: Any = vector
+            if as_base64:
+                embedding = base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode("ascii")
+            data.append({"object": "embedding", "index": index, "embedding": embedding})
+
+        prompt_tokens = sum(estimate_tokens(text) for text in texts)
+        self._increment("embeddings")
+        return self._json(200, {
+            "object": "list",
+            "data": data,
+            "model": payload.get("model", "offline-embedding"),
+            "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens}
+        })
+
+    def _scripted_tool_calls(self, payload: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+        """Pick tool calls for the request, if the script matches the latest user message."""
+        messages = payload.get("messages", [])
+        if not messages or messages[-1].get("role") != "user":
+            # Tool results are in; answer instead of calling again
+            return []
+
+        available = {function["name"] for function in payload.get("functions", [])}
+        available |= {tool["function"]["name"] for tool in payload.get("tools", []) if tool.get("type") == "function"}
+        if not available:
+            return []
+
+        text = str(messages[-1].get("content") or "")
+        calls = []
+        for pattern, function_name, arguments in self.script:
+            if function_name not in available:
+                continue
+            for match in pattern.finditer(text):
+                values = {"match": match.group(0).lower()}
+                values.update((name, group.lower()) for name, group in match.groupdict().items() if group)
+                call_arguments = {}
+                for key, value in arguments.items():
+                    if isinstance(value, str):
+                        value = re.sub(r"\{(\w+)\}", lambda placeholder: values.get(placeholder.group(1), ""), value)
+                        if not value:
+                            # Optional group that did not match
+                            continue
+                    call_arguments[key] = value
+                if (function_name, call_arguments) not in calls:
+                    calls.append((function_name, call_arguments))
+        return calls
+
+    @staticmethod
+    def _answer(messages: List[Dict[str, Any]]) -> str:
+        """Compose a deterministic answer from tool results, retrieved context or the question."""
+        tool_results = [message for message in messages if message.get("role") in ("function", "tool")]
+        if tool_results and messages[-1].get("role") in ("function", "tool"):
+            summaries = []
+            for message in tool_results:
+                content = message.get("content") or ""
+                try:
+                    result = json.loads(content)
+                except ValueError:
+                    result = content
+                if isinstance(result, dict) and "formatted_response" in result:
+                    summaries.append(result["formatted_response"])
+                else:
+                    summaries.append(json.dumps(result) if not isinstance(result, str) else result)
+            return "Here is what I found: " + " ".join(summaries)
+
+        system = " ".join(str(message.get("content") or "") for message in messages if message.get("role") == "system")
+        question = next((str(message.get("content") or "") for message in reversed(messages) if message.get("role") == "user"), "")
+        match = re.search(r"Document 1 \([^)]*\):\n(.+?)(?:\n\n|$)", system, re.DOTALL)
+        if match:
+            return "Based on the knowledge base: " + match.group(1).strip()
+        return f"Here is some general guidance about \"{question}\": restart the affected application, check your network connection, and contact IT support if the problem persists."
+
+    def _chat_completions(self, payload: Dict[str, Any]) -> Tuple[int, Dict[str, str], Any]:
+        """Serve a chat completions request."""
+        if self._should_fail(self.latency):
+            return self._rate_limited()
+        self._sleep(self.latency)
+
+        messages = payload.get("messages", [])
+        prompt_tokens = sum(estimate_tokens(str(message.get("content") or "")) + 4 for message in messages)
+        calls = self._scripted_tool_calls(payload)
+        uses_tools = bool(payload.get("tools"))
+        if calls and not uses_tools:
+            # The legacy functions API returns a single function call
+            calls = calls[:1]
+
+        completion_id = f"chatcmpl-offline-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        model = payload.get("model", "offline-chat")
+
+        if calls:
+            self._increment("tool_calls", len(calls))
+            content = None
+            completion_tokens = sum(estimate_tokens(json.dumps(arguments)) + 5 for _, arguments in calls)
+        else:
+            content = self._answer(messages)
+            completion_tokens = estimate_tokens(content)
+
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+
+        tool_calls = [
+            {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+             "function": {"name": name, "arguments": json.dumps(arguments)}}
+            for name, arguments in calls
+        ]
+
+        self._increment("chat_completions")
+        if payload.get("stream"):
+            self._increment("streamed")
+            include_usage = bool((payload.get("stream_options") or {}).get("include_usage"))
+            stream = self._stream_chunks(completion_id, created, model, content, tool_calls, uses_tools, usage, include_usage)
+            return 200, {"content-type": "text/event-stream"}, stream
+
+        message: Dict[str, Any] = {"role": "assistant", "content": content}
+        finish_reason = "stop"
+        if tool_calls and uses_tools:
+            message["tool_calls"] = tool_calls
+            finish_reason = "tool_calls"
+        elif tool_calls:
+            message["function_call"] = tool_calls[0]["function"]
+            finish_reason = "function_call"
+
+        return self._json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": usage
+        })
+
+    def _stream_chunks(
+        self,
+        completion_id: str,
+        created: int,
+        model: str,
+        content: Optional[str],
+        tool_calls: List[Dict[str, Any]],
+        uses_tools: bool,
+        usage: Dict[str, int],
+        include_usage: bool
+    ) -> Iterator[bytes]:
+        """Yield server-sent events for a streamed completion."""
+        def event(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> bytes:
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            return f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+
+        yield event({"role": "assistant", "content": "" if content is not None else None})
+
+        if content is not None:
+            pieces = re.findall(r"\S+\s*", content) or [content]
+            for piece in pieces:
+                if self.latency.per_token_ms:
+                    time.sleep(self.latency.per_token_ms / 1000)
+                yield event({"content": piece})
+            finish_reason = "stop"
+        elif uses_tools:
+            for index, call in enumerate(tool_calls):
+                yield event({"tool_calls": [{"index": index, **call}]})
+            finish_reason = "tool_calls"
+        else:
+            yield event({"function_call": tool_calls[0]["function"]})
+            finish_reason = "function_call"
+
+        yield event({}, finish_reason)
+
+        if include_usage:
+            usage_chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                           "model": model, "choices": [], "usage": usage}
+            yield f"data: {json.dumps(usage_chunk)}\n\n".encode("utf-8")
+
+        yield b"data: [DONE]\n\n"
+
+
+class _IteratorStream(httpx.SyncByteStream):
+    """httpx byte stream over a generator, so streamed chunks arrive incrementally."""
+
+    def __init__(self, iterator: Iterator[bytes]):
+        self._iterator = iterator
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield from self._iterator
+
+    def close(self) -> None:
+        close = getattr(self._iterator, "close", None)
+        if close is not None:
+            close()
+
+
+class OfflineAzureTransport(httpx.BaseTransport):
+    """httpx transport answering Azure OpenAI requests in-process."""
+
+    def __init__(self, backend: Optional[OfflineAzureBackend] = None):
+        """Initialize the transport.
+
+        Args:
+            backend: Backend to serve requests; a default one is created if omitted
+        """
+        self.backend = backend or OfflineAzureBackend()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        """Serve a request without touching the network."""
+        status, headers, body = self.backend.handle(request.method, request.url.path, request.read())
+        if isinstance(body, bytes):
+            return httpx.Response(status, headers=headers, content=body, request=request)
+        return httpx.Response(status, headers=headers, stream=_IteratorStream(body), request=request)
+
+
+class _OfflineRequestHandler(BaseHTTPRequestHandler):
+    """HTTP handler delegating to the shared backend."""
+
+    backend: OfflineAzureBackend = None  # type: ignore
+
+    def do_POST(self):
+        length = int(self.headers.get("content-length") or 0)
+        status, headers, body = self.backend.handle("POST", self.path.split("?", 1)[0], self.rfile.read(length))
+
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        if isinstance(body, bytes):
+            self.send_header("content-length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        # Close-delimited stream so chunks reach the client as they are produced
+        self.send_header("connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        for chunk in body:
+            self.wfile.write(chunk)
+            self.wfile.flush()
+
+    def log_message(self, format, *args):
+        # Keep benchmark output clean
+        pass
+
+
+def run_server(host: str = "127.0.0.1", port: int = 8008, backend: Optional[OfflineAzureBackend] = None) -> ThreadingHTTPServer:
+    """Create the local stand-in server (call serve_forever() to run it).
+
+    Args:
+        host: Interface to bind
+        port: Port to bind (0 picks a free port)
+        backend: Backend to serve requests
+
+    Returns:
+        The HTTP server
+    """
+    handler = type("OfflineRequestHandler", (_OfflineRequestHandler,), {"backend": backend or OfflineAzureBackend()})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main() -> int:
+    """Run the stand-in as a local HTTP server."""
+    parser = argparse.ArgumentParser(description="Offline Azure OpenAI stand-in")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8008, help="Port to bind (default: 8008)")
+    parser.add_argument("--latency", help="Chat latency profile, e.g. lognormal:median_ms=300,sigma=0.6")
+    parser.add_argument("--embedding-latency", help="Embedding latency profile, e.g. fixed:median_ms=40")
+    parser.add_argument("--seed", type=int, help="Random seed for latency sampling")
+    args = parser.parse_args()
+
+    backend = OfflineAzureBackend(
+        latency=LatencyProfile.parse(args.latency) if args.latency else None,
+        embedding_latency=LatencyProfile.parse(args.embedding_latency) if args.embedding_latency else None,
+        seed=args.seed
+    )
+    server = run_server(args.host, args.port, backend)
+    print(f"Offline Azure OpenAI stand-in listening on http://{args.host}:{server.server_address[1]}")
+    print(f"Set AZURE_OPENAI_ENDPOINT=http://{args.host}:{server.server_address[1]} to use it")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
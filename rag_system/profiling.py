@@ -0,0 +1,354 @@
+"""On-demand profiling of individual chat turns.
+
+A profiled turn writes a CPU profile and a tracemalloc allocation snapshot
+to the profile directory:
+
+- ``pstats``: deterministic cProfile data (``.prof``), readable with
+  ``python -m pstats`` or snakeviz
+- ``speedscope``: wall-clock stack samples (``.speedscope.json``) for
+  https://www.speedscope.app, which also shows time spent waiting on Azure
+
+Work the turn hands to the resilience and speculation thread pools is
+profiled too (those pools call ``profile_worker``). Only one turn is
+profiled at a time; tracemalloc is process-wide, so allocations made by
+concurrent turns show up in the snapshot as well.
+
+Configuration:
+    RAG_PROFILE_SAMPLE_RATE: fraction of turns profiled automatically (default 0)
+    RAG_PROFILE_FORMAT: pstats or speedscope (default pstats)
+    RAG_PROFILE_DIR: output directory (default ./profiles)
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import cProfile
+import pstats
+import threading
+import tracemalloc
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Iterator
+
+PROFILE_FORMATS = ("pstats", "speedscope")
+
+# Only one turn is profiled at a time: cProfile and tracemalloc are expensive,
+# and on newer Pythons only one cProfile per thread group can be active
+_profiling_lock = threading.Lock()
+
+_active_session: contextvars.ContextVar[Optional["ProfileSession"]] = contextvars.ContextVar("active_profile", default=None)
+
+
+class _StackSampler:
+    """Samples the stacks of registered threads at a fixed interval."""
+
+    def __init__(self, interval_s: float):
+        self.interval_s = interval_s
+        self.frames: List[Dict[str, Any]] = []
+        self._frame_index: Dict[tuple, int] = {}
+        self._threads: Dict[int, str] = {}
+        self._thread_names: Dict[int, str] = {}
+        self._samples: Dict[int, List[List[int]]] = {}
+        self._weights: Dict[int, List[float]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self.start_time = 0.0
+        self.end_time = 0.0
+
+    def add_thread(self, ident: int, name: str) -> None:
+        with self._lock:
+            self._threads.setdefault(ident, name)
+            self._thread_names.setdefault(ident, name)
+
+    def remove_thread(self, ident: int) -> None:
+        with self._lock:
+            self._threads.pop(ident, None)
+
+    def start(self) -> None:
+        self.start_time = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.end_time = time.perf_counter()
+
+    def _run(self) -> None:
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval_s):
+            now = time.perf_counter()
+            weight_ms = (now - last) * 1000
+            last = now
+            frames = sys._current_frames()
+            with self._lock:
+                threads = list(self._threads)
+            for ident in threads:
+                frame = frames.get(ident)
+                if frame is not None:
+                    self._record(ident, frame, weight_ms)
+
+    def _record(self, ident: int, frame, weight_ms: float) -> None:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            key = (code.co_name, code.co_filename, code.co_firstlineno)
+            index = self._frame_index.get(key)
+            if index is None:
+                index = self._frame_index[key] = len(self.frames)
+                self.frames.append({"name": code.co_name, "file": code.co_filename, "line": code.co_firstlineno})
+            stack.append(index)
+            frame = frame.f_back
+        stack.reverse()
+        self._samples.setdefault(ident, []).append(stack)
+        self._weights.setdefault(ident, []).append(weight_ms)
+
+    def to_speedscope(self, name: str) -> Dict[str, Any]:
+        """Build a speedscope file with one sampled profile per thread."""
+        duration_ms = (self.end_time - self.start_time) * 1000
+        profiles = []
+        for ident, samples in self._samples.items():
+            profiles.append({
+                "type": "sampled",
+                "name": self._thread_names.get(ident, f"thread {ident}"),
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": duration_ms,
+                "samples": samples,
+                "weights": self._weights[ident]
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": self.frames},
+            "profiles": profiles,
+            "name": name,
+            "activeProfileIndex": 0,
+            "exporter": "rag_system.profiling"
+        }
+
+
+class ProfileSession:
+    """Profiling state for one turn, shared with the threads doing its work."""
+
+    def __init__(self, fmt: str, sample_interval_s: float):
+        self.format = fmt
+        self._profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+        self.sampler = _StackSampler(sample_interval_s) if fmt == "speedscope" else None
+        self.threads_profiled = 0
+
+    @contextmanager
+    def attach(self, thread_name: str) -> Iterator[None]:
+        """Profile the current thread for the duration of the block."""
+        ident = threading.get_ident()
+        with self._lock:
+            self.threads_profiled += 1
+
+        if self.sampler is not None:
+            self.sampler.add_thread(ident, thread_name)
+            try:
+                yield
+            finally:
+                self.sampler.remove_thread(ident)
+            return
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is active in this thread (or interpreter); skip this thread
+            yield
+            return
+        try:
+            yield
+        finally:
+            profile.disable()
+            with self._lock:
+                self._profiles.append(profile)
+
+    def stats(self) -> Optional[pstats.Stats]:
+        """Merge the per-thread cProfile data."""
+        stats = None
+        with self._lock:
+            profiles = list(self._profiles)
+        for profile in profiles:
+            try:
+                if stats is None:
+                    stats = pstats.Stats(profile)
+                else:
+                    stats.add(profile)
+            except TypeError:
+                # Profile with no recorded calls
+                continue
+        return stats
+
+
+@contextmanager
+def profile_worker() -> Iterator[None]:
+    """Profile work running in a pool thread if it belongs to a profiled turn.
+
+    Thread pools that run a turn's work call this inside the copied context.
+    """
+    session = _active_session.get()
+    if session is None:
+        yield
+        return
+    with session.attach(threading.current_thread().name):
+        yield
+
+
+class TurnProfiler:
+    """Decides which turns to profile and writes their profiles."""
+
+    def __init__(
+        self,
+        output_dir: Optional[str] = None,
+        fmt: Optional[str] = None,
+        sample_rate: Optional[float] = None,
+        memory: bool = True,
+        sample_interval_ms: float = 1.0
+    ):
+        """Initialize turn profiler.
+
+        Args:
+            output_dir: Directory for profile files; defaults to RAG_PROFILE_DIR or ./profiles
+            fmt: pstats or speedscope; defaults to RAG_PROFILE_FORMAT or pstats
+            sample_rate: Fraction of turns profiled without being asked; defaults to RAG_PROFILE_SAMPLE_RATE or 0
+            memory: Whether to capture a tracemalloc snapshot
+            sample_interval_ms: Stack sampling interval for the speedscope format
+        """
+        self.output_dir = Path(output_dir or os.getenv("RAG_PROFILE_DIR", "./profiles"))
+        self.format = fmt or os.getenv("RAG_PROFILE_FORMAT", "pstats")
+        if self.format not in PROFILE_FORMATS:
+            raise ValueError(f"Unknown profile format: {self.format}")
+        self.sample_rate = sample_rate if sample_rate is not None else float(os.getenv("RAG_PROFILE_SAMPLE_RATE", "0"))
+        self.memory = memory
+        self.sample_interval_ms = sample_interval_ms
+        self._counter = 0
+        self._counter_lock = threading.Lock()
+
+    def should_profile(self, requested: bool = False) -> bool:
+        """Whether to profile a turn: when asked, or for a sampled fraction of traffic."""
+        return requested or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    @contextmanager
+    def profile_turn(self, label: str = "turn") -> Iterator[Dict[str, Any]]:
+        """Profile the block and write its CPU profile and allocation snapshot.
+
+        Args:
+            label: Included in the file names (e.g., a session ID)
+
+        Yields:
+            Dict filled in on exit with the written file paths and a summary
+        """
+        result: Dict[str, Any] = {}
+        if not _profiling_lock.acquire(blocking=False):
+            result["skipped"] = "another turn is being profiled"
+            yield result
+            return
+
+        session = ProfileSession(self.format, self.sample_interval_ms / 1000)
+        token = _active_session.set(session)
+        started_tracemalloc = False
+        try:
+            if self.memory:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(int(os.getenv("RAG_PROFILE_TRACEMALLOC_FRAMES", "10")))
+                    started_tracemalloc = True
+                tracemalloc.reset_peak()
+                memory_before, _ = tracemalloc.get_traced_memory()
+
+            if session.sampler is not None:
+                session.sampler.start()
+            start = time.perf_counter()
+            try:
+                with session.attach(threading.current_thread().name):
+                    yield result
+            finally:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                if session.sampler is not None:
+                    session.sampler.stop()
+                snapshot = None
+                if self.memory:
+                    memory_after, memory_peak = tracemalloc.get_traced_memory()
+                    snapshot = tracemalloc.take_snapshot()
+                base = self._base_path(label)
+                self._write(result, session, base, label, elapsed_ms)
+                if snapshot is not None:
+                    self._write_memory(result, snapshot, base, memory_before, memory_after, memory_peak)
+        finally:
+            if started_tracemalloc:
+                tracemalloc.stop()
+            _active_session.reset(token)
+            _profiling_lock.release()
+
+    def _base_path(self, label: str) -> Path:
+        """Unique file name prefix for a profiled turn."""
+        with self._counter_lock:
+            self._counter += 1
+            counter = self._counter
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        return self.output_dir / f"{stamp}_{label[:12]}_{os.getpid()}_{counter}"
+
+    def _write(self, result: Dict[str, Any], session: ProfileSession, base: Path, label: str, elapsed_ms: float) -> None:
+        """Write the CPU profile."""
+        result.update({
+            "format": self.format,
+            "elapsed_ms": round(elapsed_ms, 3),
+            "threads_profiled": session.threads_profiled
+        })
+
+        if session.sampler is not None:
+            path = base.with_name(base.name + ".speedscope.json")
+            path.write_text(json.dumps(session.sampler.to_speedscope(f"{label} turn")), encoding="utf-8")
+            result["cpu_profile"] = str(path)
+            return
+
+        stats = session.stats()
+        if stats is None:
+            return
+        path = base.with_name(base.name + ".prof")
+        stats.dump_stats(str(path))
+        result["cpu_profile"] = str(path)
+
+        # Top functions by cumulative time, for a quick look without opening the file
+        entries = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+        result["top_functions"] = [
+            {"function": f"{func[2]} ({os.path.basename(func[0])}:{func[1]})", "cumulative_ms": round(data[3] * 1000, 3), "calls": data[1]}
+            for func, data in entries[:10]
+        ]
+
+    def _write_memory(self, result: Dict[str, Any], snapshot: tracemalloc.Snapshot, base: Path,
+                      before: int, after: int, peak: int) -> None:
+        """Write the allocation snapshot (load with tracemalloc.Snapshot.load)."""
+        path = base.with_name(base.name + ".tracemalloc")
+        snapshot.dump(str(path))
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>")
+        ])
+        result.update({
+            "memory_snapshot": str(path),
+            "memory_allocated_kb": round((after - before) / 1024, 1),
+            "memory_peak_kb": round((peak - before) / 1024, 1),
+            "top_allocations": [
+                {"location": str(stat.traceback[0]), "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+                for stat in snapshot.statistics("lineno")[:10]
+            ]
+        })
+
+
+_default_profiler: Optional[TurnProfiler] = None
+
+
+def get_profiler() -> TurnProfiler:
+    """Get the process-wide profiler configured from the environment."""
+    global _default_profiler
+    if _default_profiler is None:
+        _default_profiler = TurnProfiler()
+    return _default_profiler
@@ -0,0 +1,374 @@
+"""Process-wide token-bucket rate limiting for Azure OpenAI quotas."""
+
+import os
+import time
+import threading
+import contextvars
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Union, Iterator
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+# Tokens reserved for the completion on top of the prompt estimate (Azure counts max tokens);
+# the reservation is settled with the actual usage once the response arrives
+COMPLETION_TOKEN_RESERVE = int(os.getenv("AZURE_OPENAI_COMPLETION_TOKEN_RESERVE", "500"))
+
+# Session that the current call is made on behalf of, used for fair queueing
+current_session_id: contextvars.ContextVar[str] = contextvars.ContextVar("current_session_id", default="default")
+
+
+@contextmanager
+def session_scope(session_id: str) -> Iterator[None]:
+    """Attribute Azure calls made inside the block to a session."""
+    token = current_session_id.set(session_id)
+    try:
+        yield
+    finally:
+        current_session_id.reset(token)
+
+
+def get_token_encoding():
+    """Get the tiktoken encoding, loading it on first use (None if unavailable)."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception:
+                    _encoding = None
+                _encoding_loaded = True
+    return _encoding
+
+
+def estimate_tokens(content: Union[str, List[Dict[str, Any]], None]) -> int:
+    """Estimate the prompt tokens of a text or a list of chat messages.
+
+    Args:
+        content: Text, or chat messages with 'content' fields
+
+    Returns:
+        Estimated token count
+    """
+    if not content:
+        return 0
+    if isinstance(content, list):
+        # Roughly 4 tokens of framing per message
+        return sum(estimate_tokens(str(message.get("content") or "")) + 4 for message in content)
+    encoding = get_token_encoding()
+    if encoding is not None:
+        return len(encoding.encode(content, disallowed_special=()))
+    return max(1, len(content) // 4)
+
+
+class TokenBucket:
+    """Token bucket refilled continuously up to its per-minute capacity."""
+
+    def __init__(self, per_minute: Optional[float]):
+        """Initialize token bucket.
+
+        Args:
+            per_minute: Capacity per minute; None disables the bucket
+        """
+        self.capacity = per_minute
+        self.available = per_minute or 0.0
+        self._rate = (per_minute or 0.0) / 60.0
+        self._updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        """Add tokens accrued since the last refill."""
+        if self.capacity is None:
+            return
+        self.available = min(self.capacity, self.available + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def clamp(self, amount: float) -> float:
+        """Limit a request to the bucket capacity so oversize requests can still proceed."""
+        return amount if self.capacity is None else min(amount, self.capacity)
+
+    def seconds_until(self, amount: float) -> float:
+        """Time until the bucket holds the given amount."""
+        if self.capacity is None or self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self._rate
+
+    def consume(self, amount: float) -> None:
+        """Take tokens from the bucket."""
+        if self.capacity is not None:
+            self.available -= amount
+
+    def give_back(self, amount: float) -> None:
+        """Return unused tokens to the bucket."""
+        if self.capacity is not None:
+            self.available = min(self.capacity, self.available + amount)
+
+
+class _Waiter:
+    """A queued request for capacity."""
+
+    __slots__ = ("tokens", "session_id", "enqueued_at")
+
+    def __init__(self, tokens: float, session_id: str):
+        self.tokens = tokens
+        self.session_id = session_id
+        self.enqueued_at = time.monotonic()
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limiter with fair queueing.
+
+    Waiters are queued per session and served round-robin across sessions,
+    so one busy session cannot starve the others. A 429 from the service
+    pauses the whole limiter so every session backs off together.
+    """
+
+    def __init__(self, name: str, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None):
+        """Initialize rate limiter.
+
+        Args:
+            name: Limiter name (e.g., chat, embedding)
+            requests_per_minute: Request quota; None for unlimited
+            tokens_per_minute: Token quota; None for unlimited
+        """
+        self.name = name
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._condition = threading.Condition()
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+        self._paused_until = 0.0
+
+        self._stats = {
+            "granted": 0,
+            "tokens_granted": 0,
+            "waited": 0,
+            "total_wait_s": 0.0,
+            "max_wait_s": 0.0,
+            "max_queue_depth": 0,
+            "pauses": 0,
+            "tokens_returned": 0,
+            "tokens_charged": 0
+        }
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any quota is configured."""
+        return self._requests.capacity is not None or self._tokens.capacity is not None
+
+    def acquire(self, tokens: int = 0, session_id: Optional[str] = None, timeout: Optional[float] = None) -> float:
+        """Block until one request with the given token estimate fits the quotas.
+
+        Args:
+            tokens: Estimated tokens (prompt plus expected completion)
+            session_id: Session to queue under; defaults to the current session
+            timeout: Maximum seconds to wait
+
+        Returns:
+            Seconds spent waiting
+        """
+        session_id = session_id or current_session_id.get()
+        tokens = self._tokens.clamp(float(tokens))
+
+        if not self.enabled:
+            with self._condition:
+                self._record_grant(tokens, 0.0)
+            return 0.0
+
+        waiter = _Waiter(tokens, session_id)
+        deadline = None if timeout is None else waiter.enqueued_at + timeout
+
+        with self._condition:
+            self._queues.setdefault(session_id, deque()).append(waiter)
+            depth = self.queue_depth_locked()
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], depth)
+
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._requests.refill(now)
+                    self._tokens.refill(now)
+
+                    if self._head() is waiter:
+                        delay = max(
+                            self._paused_until - now,
+                            self._requests.seconds_until(1),
+                            self._tokens.seconds_until(tokens)
+                        )
+                        if delay <= 0:
+                            self._serve(waiter)
+                            waited = now - waiter.enqueued_at
+                            self._record_grant(tokens, waited)
+                            self._condition.notify_all()
+                            return waited
+                    else:
+                        delay = None
+
+                    if deadline is not None:
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            raise TimeoutError(f"Rate limiter '{self.name}' wait exceeded {timeout}s")
+                        delay = remaining if delay is None else min(delay, remaining)
+
+                    self._condition.wait(timeout=delay)
+            except BaseException:
+                self._remove(waiter)
+                self._condition.notify_all()
+                raise
+
+    def try_acquire(self, tokens: int = 0) -> bool:
+        """Take capacity only if it is available now and nobody is queued.
+
+        Used for optional work such as hedged requests.
+        """
+        tokens = self._tokens.clamp(float(tokens))
+        with self._condition:
+            if not self.enabled:
+                self._record_grant(tokens, 0.0)
+                return True
+            now = time.monotonic()
+            self._requests.refill(now)
+            self._tokens.refill(now)
+            if (self._queues or now < self._paused_until
+                    or self._requests.seconds_until(1) > 0 or self._tokens.seconds_until(tokens) > 0):
+                return False
+            self._requests.consume(1)
+            self._tokens.consume(tokens)
+            self._record_grant(tokens, 0.0)
+            return True
+
+    def release(self, unused_tokens: int) -> None:
+        """Return tokens reserved but not used (e.g., estimate above actual usage)."""
+        if unused_tokens <= 0:
+            return
+        with self._condition:
+            self._tokens.refill(time.monotonic())
+            self._tokens.give_back(float(unused_tokens))
+            self._stats["tokens_returned"] += int(unused_tokens)
+            self._condition.notify_all()
+
+    def settle(self, reserved_tokens: int, used_tokens: int) -> None:
+        """Correct a granted reservation with the tokens the request actually used.
+
+        Requests reserve their prompt estimate plus COMPLETION_TOKEN_RESERVE;
+        the unused part is released, and use beyond the reservation is
+        charged, so the bucket follows what the service counts.
+
+        Args:
+            reserved_tokens: Tokens passed to acquire() for the request
+            used_tokens: Tokens the response reported (or an accurate estimate)
+        """
+        difference = self._tokens.clamp(float(reserved_tokens)) - used_tokens
+        if difference > 0:
+            self.release(int(difference))
+        elif difference < 0:
+            with self._condition:
+                self._tokens.refill(time.monotonic())
+                self._tokens.consume(-difference)
+                self._stats["tokens_charged"] += int(-difference)
+
+    def pause(self, seconds: float) -> None:
+        """Stop granting capacity for a while, e.g., after a 429."""
+        with self._condition:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._stats["pauses"] += 1
+
+    def _head(self) -> Optional[_Waiter]:
+        """The waiter whose turn it is: the oldest request of the next session in rotation."""
+        for queue in self._queues.values():
+            if queue:
+                return queue[0]
+        return None
+
+    def _serve(self, waiter: _Waiter) -> None:
+        """Grant capacity to the head waiter and rotate its session to the back."""
+        self._requests.consume(1)
+        self._tokens.consume(waiter.tokens)
+        queue = self._queues.pop(waiter.session_id)
+        queue.popleft()
+        if queue:
+            self._queues[waiter.session_id] = queue
+
+    def _remove(self, waiter: _Waiter) -> None:
+        """Drop a waiter that gave up."""
+        queue = self._queues.get(waiter.session_id)
+        if queue is None:
+            return
+        try:
+            queue.remove(waiter)
+        except ValueError:
+            return
+        if not queue:
+            del self._queues[waiter.session_id]
+
+    def _record_grant(self, tokens: float, waited: float) -> None:
+        """Update grant statistics (caller holds the lock)."""
+        self._stats["granted"] += 1
+        self._stats["tokens_granted"] += int(tokens)
+        if waited > 0:
+            self._stats["waited"] += 1
+            self._stats["total_wait_s"] += waited
+            self._stats["max_wait_s"] = max(self._stats["max_wait_s"], waited)
+
+    def queue_depth_locked(self) -> int:
+        """Number of queued requests (caller holds the lock)."""
+        return sum(len(queue) for queue in self._queues.values())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue depth, wait times and remaining capacity."""
+        with self._condition:
+            now = time.monotonic()
+            self._requests.refill(now)
+            self._tokens.refill(now)
+            stats = dict(self._stats)
+            stats.update({
+                "enabled": self.enabled,
+                "requests_per_minute": self._requests.capacity,
+                "tokens_per_minute": self._tokens.capacity,
+                "queue_depth": self.queue_depth_locked(),
+                "sessions_waiting": len(self._queues),
+                "available_requests": self._requests.available if self._requests.capacity is not None else None,
+                "available_tokens": self._tokens.available if self._tokens.capacity is not None else None,
+                "paused_for_s": max(0.0, self._paused_until - now)
+            })
+        stats["avg_wait_ms"] = stats["total_wait_s"] * 1000 / stats["granted"] if stats["granted"] else 0.0
+        return stats
+
+
+def _env_quota(name: str) -> Optional[float]:
+    """Read an optional per-minute quota from the environment."""
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(kind: str) -> RateLimiter:
+    """Get the process-wide limiter for a deployment kind.
+
+    Args:
+        kind: 'chat' or 'embedding'; quotas come from AZURE_OPENAI_<KIND>_RPM / _TPM
+
+    Returns:
+        Shared rate limiter
+    """
+    with _limiters_lock:
+        if kind not in _limiters:
+            prefix = f"AZURE_OPENAI_{kind.upper()}"
+            _limiters[kind] = RateLimiter(
+                kind,
+                requests_per_minute=_env_quota(f"{prefix}_RPM"),
+                tokens_per_minute=_env_quota(f"{prefix}_TPM")
+            )
+        return _limiters[kind]
+
+
+def get_rate_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    """Get statistics for every limiter created so far."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.get_stats() for limiter in limiters}
@@ -0,0 +1,452 @@
+"""Resilience layer for Azure OpenAI calls: adaptive timeouts, hedging and retries."""
+
+import os
+import sys
+import time
+import random
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Dict, Any, Callable, Optional, TypeVar, List
+
+from .rate_limiter import RateLimiter, get_rate_limiter
+from .metrics import AZURE_REQUESTS, AZURE_ERRORS
+from .profiling import profile_worker
+
+T = TypeVar("T")
+
+# Shared pool for attempts and hedges; the calling thread only waits on futures
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("AZURE_OPENAI_CALL_WORKERS", "32")),
+    thread_name_prefix="azure-call"
+)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call does not finish within its adaptive timeout."""
+
+
+class CallCancelled(Exception):
+    """Raised by an operation its caller stopped on purpose; not retried or counted as a failure."""
+
+
+def _openai_errors(*names: str) -> tuple:
+    """OpenAI exception classes by name.
+
+    openai is only imported by the clients, so if it is not loaded no call
+    can have raised one of its errors and the tuple is empty.
+    """
+    module = sys.modules.get("openai")
+    return tuple(getattr(module, name) for name in names) if module is not None else ()
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    """Read a boolean environment variable."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(percentile / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def is_retryable(error: Exception) -> bool:
+    """Check whether an error is worth retrying (429, 5xx, timeouts, connection errors)."""
+    if isinstance(error, (DeadlineExceeded, *_openai_errors("APITimeoutError", "APIConnectionError", "RateLimitError"))):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return isinstance(status_code, int) and (status_code == 429 or status_code >= 500)
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read the Retry-After header from an API error, if present."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            return None
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class LatencyTracker:
+    """Rolling window of observed latencies for one operation."""
+
+    def __init__(self, window: int = 500):
+        """Initialize latency tracker.
+
+        Args:
+            window: Number of most recent samples to keep
+        """
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency_s: float) -> None:
+        """Record a latency sample in seconds."""
+        with self._lock:
+            self._samples.append(latency_s)
+
+    def percentile(self, percentile: float) -> float:
+        """Get a latency percentile in seconds."""
+        with self._lock:
+            samples = list(self._samples)
+        return _percentile(samples, percentile)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+
+class ResiliencePolicy:
+    """Per-operation deadlines, hedging and retries driven by observed latency.
+
+    Until enough samples are observed the policy uses the static timeout;
+    afterwards the timeout is a multiple of the observed p99 and, when
+    hedging is enabled, a duplicate request is fired once the primary has
+    been outstanding for the observed p95.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        hedging: Optional[bool] = None,
+        max_retries: Optional[int] = None,
+        default_timeout: Optional[float] = None,
+        min_timeout: float = 5.0,
+        timeout_multiplier: float = 3.0,
+        hedge_percentile: float = 95.0,
+        min_samples: int = 20,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+        rate_limiter: Optional[RateLimiter] = None
+    ):
+        """Initialize resilience policy.
+
+        Args:
+            name: Operation name (e.g., function_calling, rag_generation, embedding)
+            hedging: Whether to send hedged duplicates; defaults to AZURE_OPENAI_HEDGING
+            max_retries: Retries on 429/5xx/timeouts; defaults to AZURE_OPENAI_MAX_RETRIES
+            default_timeout: Timeout before enough samples exist; defaults to AZURE_OPENAI_TIMEOUT
+            min_timeout: Lower bound for the adaptive timeout in seconds
+            timeout_multiplier: Adaptive timeout as a multiple of the observed p99
+            hedge_percentile: Percentile of observed latency after which to hedge
+            min_samples: Samples required before adapting timeouts and hedging
+            backoff_base: Base delay for exponential backoff in seconds
+            backoff_max: Maximum backoff delay in seconds
+            rate_limiter: Shared quota limiter every request (hedges included) goes through
+        """
+        self.name = name
+        self.hedging = _env_flag("AZURE_OPENAI_HEDGING", False) if hedging is None else hedging
+        self.max_retries = int(os.getenv("AZURE_OPENAI_MAX_RETRIES", "3")) if max_retries is None else max_retries
+        self.default_timeout = float(os.getenv("AZURE_OPENAI_TIMEOUT", "60")) if default_timeout is None else default_timeout
+        self.min_timeout = min_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limiter = rate_limiter
+
+        # Latency of every request that completed, hedges included
+        self.latency = LatencyTracker()
+        # Latency callers saw, and what they would have seen without hedging
+        self._effective = deque(maxlen=500)
+        self._unhedged = deque(maxlen=500)
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "calls": 0,
+            "failures": 0,
+            "retries": 0,
+            "timeouts": 0,
+            "rate_limited": 0,
+            "server_errors": 0,
+            "hedges_sent": 0,
+            "hedges_won": 0,
+            "cancelled": 0
+        }
+
+    def current_timeout(self) -> float:
+        """Get the deadline for the next attempt in seconds."""
+        if len(self.latency) < self.min_samples:
+            return self.default_timeout
+        adaptive = self.latency.percentile(99) * self.timeout_multiplier
+        return min(self.default_timeout, max(self.min_timeout, adaptive))
+
+    def hedge_delay(self) -> Optional[float]:
+        """Get how long to wait before hedging, or None if hedging is inactive."""
+        if not self.hedging or len(self.latency) < self.min_samples:
+            return None
+        return self.latency.percentile(self.hedge_percentile)
+
+    def call(self, fn: Callable[[float], T], tokens: int = 0, usage: Optional[Callable[[T], Optional[int]]] = None) -> T:
+        """Call an operation with deadline, optional hedging and jittered retries.
+
+        Args:
+            fn: Callable receiving the attempt's timeout in seconds
+            tokens: Estimated tokens per request, charged to the rate limiter
+            usage: Gets the tokens a result actually used (None if unknown); each
+                request's rate limiter reservation is settled with it when the
+                request finishes (failed requests return the whole reservation)
+
+        Returns:
+            The operation's result
+        """
+        self._increment("calls")
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = self._attempt(fn, tokens, usage)
+            except CallCancelled:
+                # Stopped by the caller (e.g. abandoned speculation); says nothing about the service
+                self._increment("cancelled")
+                raise
+            except Exception as error:
+                self._record_error(error)
+                if attempt >= self.max_retries or not is_retryable(error):
+                    self._increment("failures")
+                    raise
+                self._increment("retries")
+                delay = self._backoff(attempt, error)
+                if self.rate_limiter is not None and self._is_rate_limited(error):
+                    # Hold back every session, not just this one, until the quota recovers
+                    self.rate_limiter.pause(delay)
+                time.sleep(delay)
+            else:
+                return result
+
+        raise RuntimeError("unreachable")
+
+    def _settle(self, future: Future, tokens: int, usage: Optional[Callable[[T], Optional[int]]]) -> None:
+        """Correct a finished request's rate limiter reservation with its actual usage."""
+        if future.cancelled():
+            # Never sent
+            used = 0
+        elif future.exception() is not None:
+            if isinstance(future.exception(), CallCancelled):
+                # Stopped part-way; what it used is unknown, so the reservation stands
+                return
+            used = 0
+        elif usage is None:
+            return
+        else:
+            try:
+                used = usage(future.result())
+            except Exception:
+                used = None
+        if used is not None:
+            self.rate_limiter.settle(tokens, used)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, honouring Retry-After when given."""
+        retry_after = _retry_after_seconds(error)
+        if retry_after is not None:
+            return min(self.backoff_max, retry_after + random.uniform(0, self.backoff_base))
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _submit(
+        self,
+        fn: Callable[[float], T],
+        timeout: float,
+        tokens: int,
+        usage: Optional[Callable[[T], Optional[int]]]
+    ) -> Future:
+        """Run one request in the shared pool, recording its latency and settling its reservation when it completes."""
+        context = contextvars.copy_context()
+        submitted = time.perf_counter()
+        AZURE_REQUESTS.labels(operation=self.name).inc()
+
+        def run():
+            with profile_worker():
+                result = fn(timeout)
+            self.latency.record(time.perf_counter() - submitted)
+            return result
+
+        future = _executor.submit(context.run, run)
+        future.submitted_at = submitted
+        if self.rate_limiter is not None:
+            # Winners, losing hedges and failed requests alike, whenever they finish
+            future.add_done_callback(lambda done: self._settle(done, tokens, usage))
+        return future
+
+    def _attempt(self, fn: Callable[[float], T], tokens: int, usage: Optional[Callable[[T], Optional[int]]] = None) -> T:
+        """Run a single attempt and record the latency the caller saw."""
+        start = time.perf_counter()
+        result = self._run_attempt(fn, tokens, usage)
+        with self._stats_lock:
+            self._effective.append(time.perf_counter() - start)
+        return result
+
+    def _run_attempt(self, fn: Callable[[float], T], tokens: int, usage: Optional[Callable[[T], Optional[int]]] = None) -> T:
+        """Run a single attempt, hedging it if the primary is slow."""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(tokens)
+
+        timeout = self.current_timeout()
+        deadline = time.perf_counter() + timeout
+        primary = self._submit(fn, timeout, tokens, usage)
+
+        hedge_delay = self.hedge_delay()
+        if hedge_delay is None or hedge_delay >= timeout:
+            return self._result(primary, deadline)
+
+        done, _ = wait([primary], timeout=hedge_delay)
+        if done:
+            result = primary.result()
+            with self._stats_lock:
+                self._unhedged.append(time.perf_counter() - primary.submitted_at)
+            return result
+
+        if self.rate_limiter is not None and not self.rate_limiter.try_acquire(tokens):
+            # No spare quota for a duplicate; keep waiting on the primary
+            return self._result(primary, deadline)
+
+        self._increment("hedges_sent")
+        hedge = self._submit(fn, max(0.001, deadline - time.perf_counter()), tokens, usage)
+        pending = {primary, hedge}
+        last_error: Optional[Exception] = None
+
+        while pending:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if isinstance(future.exception(), CallCancelled):
+                    # Both requests share the caller's cancellation
+                    raise future.exception()
+                if future.exception() is not None:
+                    last_error = future.exception()
+                    continue
+                if future is hedge:
+                    self._increment("hedges_won")
+                    self._track_unhedged(primary, time.perf_counter())
+                else:
+                    with self._stats_lock:
+                        self._unhedged.append(time.perf_counter() - primary.submitted_at)
+                # The loser's result is dropped; it is cancelled if it has not started
+                for loser in pending:
+                    loser.cancel()
+                return future.result()
+
+        if last_error is not None and not pending:
+            raise last_error
+        self._increment("timeouts")
+        raise DeadlineExceeded(f"{self.name} did not complete within {timeout:.1f}s")
+
+    def _track_unhedged(self, primary: Future, hedge_done_at: float) -> None:
+        """Record what the caller would have waited for had the hedge not been sent."""
+        def on_primary_done(future: Future):
+            # A failed primary still counts: without the hedge the caller waited this long
+            latency = time.perf_counter() - future.submitted_at
+            with self._stats_lock:
+                self._unhedged.append(max(latency, hedge_done_at - future.submitted_at))
+
+        primary.add_done_callback(on_primary_done)
+
+    def _result(self, future: Future, deadline: float) -> T:
+        """Wait for a single future until the deadline."""
+        done, _ = wait([future], timeout=max(0.0, deadline - time.perf_counter()))
+        if not done:
+            self._increment("timeouts")
+            raise DeadlineExceeded(f"{self.name} did not complete before its deadline")
+        result = future.result()
+        with self._stats_lock:
+            self._unhedged.append(time.perf_counter() - future.submitted_at)
+        return result
+
+    @staticmethod
+    def _is_rate_limited(error: Exception) -> bool:
+        """Check whether an error is a 429."""
+        return isinstance(error, _openai_errors("RateLimitError")) or getattr(error, "status_code", None) == 429
+
+    def _record_error(self, error: Exception) -> None:
+        """Count rate-limit and server errors."""
+        status_code = getattr(error, "status_code", None)
+        if self._is_rate_limited(error):
+            self._increment("rate_limited")
+            kind = "rate_limited"
+        elif isinstance(status_code, int) and status_code >= 500:
+            self._increment("server_errors")
+            kind = "server_error"
+        elif isinstance(error, (DeadlineExceeded, *_openai_errors("APITimeoutError"))):
+            kind = "timeout"
+        elif isinstance(error, _openai_errors("APIConnectionError")):
+            kind = "connection_error"
+        elif isinstance(status_code, int):
+            kind = "client_error"
+        else:
+            kind = "other"
+        AZURE_ERRORS.labels(operation=self.name, kind=kind).inc()
+
+    def _increment(self, key: str) -> None:
+        """Increment a counter."""
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get call counts, current deadlines and the tail latency removed by hedging."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+            effective = list(self._effective)
+            unhedged = list(self._unhedged)
+
+        p99_effective = _percentile(effective, 99)
+        p99_unhedged = _percentile(unhedged, 99)
+        stats.update({
+            "hedging": self.hedging,
+            "samples": len(self.latency),
+            "current_timeout_s": self.current_timeout(),
+            "hedge_delay_s": self.hedge_delay(),
+            "p50_ms": self.latency.percentile(50) * 1000,
+            "p95_ms": self.latency.percentile(95) * 1000,
+            "p99_ms": self.latency.percentile(99) * 1000,
+            "p99_effective_ms": p99_effective * 1000,
+            "p99_without_hedging_ms": p99_unhedged * 1000,
+            "tail_latency_removed_ms": max(0.0, p99_unhedged - p99_effective) * 1000
+        })
+        return stats
+
+
+_policies: Dict[str, ResiliencePolicy] = {}
+_policies_lock = threading.Lock()
+
+
+def get_policy(name: str) -> ResiliencePolicy:
+    """Get the process-wide policy for an operation, creating it on first use.
+
+    Args:
+        name: Operation name (e.g., function_calling, rag_generation, embedding)
+
+    Returns:
+        Shared resilience policy
+    """
+    with _policies_lock:
+        if name not in _policies:
+            # Chat operations share the LLM deployment's quota; embeddings have their own
+            kind = "embedding" if name == "embedding" else "chat"
+            _policies[name] = ResiliencePolicy(name, rate_limiter=get_rate_limiter(kind))
+        return _policies[name]
+
+
+def get_resilience_stats() -> Dict[str, Dict[str, Any]]:
+    """Get statistics for every operation seen so far."""
+    with _policies_lock:
+        policies = list(_policies.values())
+    return {policy.name: policy.get_stats() for policy in policies}
@@ -1,19 +1,41 @@
 """Retrieval chain implementation using Langchain for RAG workflow."""
 
 import os
-from typing import List, Dict, Any, Optional, Tuple
+import time
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple, Callable
 
 from langchain_openai import AzureChatOpenAI
-from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
+from langchain_core.messages import BaseMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
 from dotenv import load_dotenv
 
-from .vector_store import VectorStore
+from .vector_store import VectorStore, get_use_case_documents
+from .conversation import TokenStream, ConversationManager
+from .clients import get_chat_model
+from .resilience import get_policy, DeadlineExceeded, CallCancelled
+from .rate_limiter import estimate_tokens, COMPLETION_TOKEN_RESERVE
+from .tracing import span
+from .metrics import record_cache_lookup
+from .llm_tracing import LLMTracingHandler
+from .warmup import warmup_generate_enabled
+from .logger import get_logger
+
+logger = get_logger(__name__)
 
 # Load environment variables
 load_dotenv()
 
+# Answer cache size when the warm-up generates answers into it
+DEFAULT_ANSWER_CACHE_SIZE = 256
+
+
+class GenerationCancelled(CallCancelled):
+    """Raised when a generation is cancelled before it completes."""
+
+
 class RetrievalChain:
     """RAG chain for document retrieval and generation."""
 
@@ -27,26 +49,23 @@ class RetrievalChain:
         self.vector_store = VectorStore(use_case)
         self.llm = self._initialize_llm()
         self.prompt_template = self._create_prompt_template()
-        self.chain = self._create_chain()
+        self.prompt_chain = self._create_chain()
+        self.chain = self.prompt_chain | self.llm | StrOutputParser()
+
+        # First-turn answers by normalized question (0 disables); see chat().
+        # Off unless the warm-up generates answers into it, since answers are sampled
+        default_size = DEFAULT_ANSWER_CACHE_SIZE if warmup_generate_enabled() else 0
+        self.answer_cache_size = int(os.getenv("RAG_ANSWER_CACHE_SIZE", str(default_size)))
+        self.answer_cache_ttl_s = float(os.getenv("RAG_ANSWER_CACHE_TTL", "3600"))
+        self._answers: "OrderedDict[Tuple[str, int], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._answer_cache_lock = threading.Lock()
 
         # Load or create vector index
         self._initialize_vector_store()
 
     def _initialize_llm(self) -> AzureChatOpenAI:
-        """Initialize Azure Chat OpenAI model."""
-        # Use LLM-specific credentials if available, otherwise fallback to general ones
-        llm_endpoint = os.getenv("AZURE_OPENAI_LLM_ENDPOINT") or os.getenv("AZURE_OPENAI_ENDPOINT")
-        llm_key = os.getenv("AZURE_OPENAI_LLM_API_KEY") or os.getenv("AZURE_OPENAI_API_KEY")
-        llm_deployment = os.getenv("AZURE_OPENAI_LLM_MODEL") or os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT", "GPT-4o-mini")
-        llm_api_version = os.getenv("AZURE_OPENAI_LLM_API_VERSION") or os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
-        
-        return AzureChatOpenAI(
-            azure_deployment=llm_deployment,
-            azure_endpoint=llm_endpoint,
-            api_key=llm_key,
-            api_version=llm_api_version,
-            temperature=0.7
-        )
+        """Initialize Azure Chat OpenAI model from the shared, pooled client factory."""
+        return get_chat_model(temperature=0.7)
 
     def _create_prompt_template(self) -> ChatPromptTemplate:
         """Create prompt template based on use case."""
@@ -72,7 +91,7 @@ IMPORTANT:
         ])
 
     def _create_chain(self):
-        """Create the RAG chain."""
+        """Create the RAG chain up to the prompt (generation adds the model and parser)."""
         def format_docs(docs):
             """Format retrieved documents for context."""
             if not docs:
@@ -92,10 +111,12 @@ IMPORTANT:
             return "\n\n".join(formatted)
 
         def retrieve_docs(input_dict):
-            """Retrieve relevant documents."""
-            question = input_dict["question"]
-            # Use same threshold as in chat() method
-            docs = self.vector_store.search(question, k=4, score_threshold=0.5)
+            """Retrieve relevant documents, reusing documents already retrieved by the caller."""
+            docs = input_dict.get("documents")
+            if docs is None:
+                question = input_dict["question"]
+                # Use same threshold as in chat() method
+                docs = self.vector_store.search(question, k=4, score_threshold=0.5)
             return format_docs(docs)
 
         # Create the chain
@@ -108,54 +129,82 @@ IMPORTANT:
                 "chat_history": itemgetter("chat_history")
             }
             | self.prompt_template
-            | self.llm
-            | StrOutputParser()
         )
 
         return chain
 
     def _initialize_vector_store(self):
-        """Initialize vector store with appropriate data."""
-        if not self.vector_store.index_exists():
-            print(f"Creating vector index for {self.use_case}...")
-
-            # Import appropriate data based on use case
-            if self.use_case == "it_helpdesk":
-                from mock_data.it_helpdesk import get_it_helpdesk_data
-                documents = get_it_helpdesk_data()
-            else:
-                raise ValueError(f"Unknown use case: {self.use_case}")
-
-            self.vector_store.create_index(documents)
-        else:
-            print(f"Loading existing vector index for {self.use_case}...")
-            self.vector_store.load_index()
+        """Initialize vector store with appropriate data.
+
+        The local index or the prebuilt artifact is loaded if it matches the
+        use case's documents; the corpus is only embedded when neither does.
+        """
+        documents = get_use_case_documents(self.use_case)
+        self.vector_store.create_index(documents)
 
     def chat(
         self,
         question: str,
-        chat_history: Optional[List[BaseMessage]] = None
+        chat_history: Optional[List[BaseMessage]] = None,
+        retrieved_docs: Optional[List[Dict[str, Any]]] = None,
+        cancel_event: Optional[threading.Event] = None,
+        token_stream: Optional[TokenStream] = None
     ) -> Dict[str, Any]:
         """Process a chat message with RAG.
 
+        When the answer cache is enabled (by default only with
+        RAG_WARMUP_GENERATE), answers to questions asked without chat history
+        are cached for RAG_ANSWER_CACHE_TTL seconds, so a repeated opening
+        question (or one answered ahead of time by the warm-up) skips
+        retrieval and generation.
+
         Args:
             question: User question
             chat_history: Previous chat messages
+            retrieved_docs: Documents already retrieved for this question, if any
+            cancel_event: Event that stops generation early when set
+            token_stream: Receives the answer as it is generated
 
         Returns:
-            Response with answer and retrieved documents
+            Response with answer and retrieved documents ("cached" is set on cache hits)
         """
         if chat_history is None:
             chat_history = []
 
+        cache_key = self._answer_cache_key(question) if not chat_history else None
+        if cache_key is not None:
+            cached = self._cached_answer(cache_key)
+            if cached is not None:
+                return cached
+
+        result = self._answer(question, chat_history, retrieved_docs, cancel_event, token_stream)
+        if cache_key is not None and "error" not in result:
+            self._store_answer(cache_key, result)
+        return result
+
+    def _answer(
+        self,
+        question: str,
+        chat_history: List[BaseMessage],
+        retrieved_docs: Optional[List[Dict[str, Any]]],
+        cancel_event: Optional[threading.Event],
+        token_stream: Optional[TokenStream]
+    ) -> Dict[str, Any]:
+        """Retrieve context and generate the answer (see chat)."""
         try:
             # Retrieve relevant documents with minimum relevance threshold
-            retrieved_docs = self.vector_store.search(question, k=4, score_threshold=0.5)
+            if retrieved_docs is None:
+                with span("retrieval") as retrieval_span:
+                    retrieved_docs = self.vector_store.search(question, k=4, score_threshold=0.5)
+                    retrieval_span.set_attribute("documents", len(retrieved_docs))
             
             # If no relevant documents found (similarity < 0.5), use LLM directly without context
             if not retrieved_docs:
-                print(f"ℹ️ No relevant documents found (similarity < 0.5) for query: {question}")
-                print(f"   Using LLM directly without knowledge base context.")
+                logger.debug(
+                    "no_relevant_documents",
+                    "No documents above similarity 0.5; using the LLM without knowledge base context",
+                    question_chars=len(question)
+                )
                 
                 # Create a simple prompt without RAG context
                 direct_prompt = ChatPromptTemplate.from_messages([
@@ -165,11 +214,10 @@ IMPORTANT:
                 ])
                 
                 # Generate response directly from LLM without context
-                direct_chain = direct_prompt | self.llm | StrOutputParser()
-                response = direct_chain.invoke({
+                response = self._generate(direct_prompt, {
                     "question": question,
                     "chat_history": chat_history
-                })
+                }, cancel_event, token_stream)
                 
                 return {
                     "answer": response,
@@ -179,10 +227,11 @@ IMPORTANT:
                 }
             
             # Generate response using RAG chain with context
-            response = self.chain.invoke({
+            response = self._generate(self.prompt_chain, {
                 "question": question,
-                "chat_history": chat_history
-            })
+                "chat_history": chat_history,
+                "documents": retrieved_docs
+            }, cancel_event, token_stream)
 
             return {
                 "answer": response,
@@ -191,11 +240,11 @@ IMPORTANT:
                 "method": "rag_retrieval"  # Indicate this is RAG with context
             }
 
+        except GenerationCancelled:
+            raise
+
         except Exception as e:
-            import traceback
-            error_trace = traceback.format_exc()
-            print(f"❌ Error in RAG retrieval: {str(e)}")
-            print(f"   Traceback: {error_trace}")
+            logger.error("rag_chat_failed", exc=e)
             return {
                 "answer": f"I apologize, but I encountered an error processing your request: {str(e)}",
                 "retrieved_documents": [],
@@ -203,6 +252,102 @@ IMPORTANT:
                 "error": str(e)
             }
 
+    def _generate(
+        self,
+        prompt_chain,
+        inputs: Dict[str, Any],
+        cancel_event: Optional[threading.Event] = None,
+        token_stream: Optional[TokenStream] = None
+    ) -> str:
+        """Run a chain to completion, stopping early if the cancel event is set.
+
+        Generation always streams: it gives the time to first token for
+        tracing and lets a cancelled generation close the connection instead
+        of paying for the rest of the completion. Generation runs under the
+        rag_generation resilience policy (deadline, hedging, retries); each
+        attempt's timeout is the request timeout of the model call and the
+        deadline of its stream, so an abandoned attempt stops too.
+
+        Args:
+            prompt_chain: Runnable producing the prompt for the model
+            inputs: Chain inputs
+            cancel_event: Event that stops generation when set
+            token_stream: Receives text chunks as they arrive
+
+        Returns:
+            Generated text
+        """
+        tokens = self._estimate_generation_tokens(inputs)
+        with span("generation", documents=len(inputs.get("documents") or [])):
+            return get_policy("rag_generation").call(
+                lambda timeout: self._stream_until_cancelled(prompt_chain, inputs, cancel_event, token_stream, timeout),
+                tokens=tokens,
+                # Streamed answers carry no usage here; the completion is counted with the same tokenizer
+                usage=lambda answer: tokens - COMPLETION_TOKEN_RESERVE + estimate_tokens(answer)
+            )
+
+    @staticmethod
+    def _estimate_generation_tokens(inputs: Dict[str, Any]) -> int:
+        """Estimate tokens for a generation: instructions, context, history, question and completion."""
+        parts = [inputs.get("question", "")]
+        parts.extend(getattr(message, "content", "") for message in inputs.get("chat_history", []))
+        parts.extend(doc.get("content", "") for doc in inputs.get("documents") or [])
+        # About 200 tokens of system instructions in the prompt templates
+        return 200 + estimate_tokens("\n".join(parts)) + COMPLETION_TOKEN_RESERVE
+
+    def _stream_until_cancelled(
+        self,
+        prompt_chain,
+        inputs: Dict[str, Any],
+        cancel_event: Optional[threading.Event] = None,
+        token_stream: Optional[TokenStream] = None,
+        timeout: Optional[float] = None
+    ) -> str:
+        """Stream the model's answer to a prompt, closing the stream as soon as the cancel event is set.
+
+        The model is streamed on its own rather than through an output parser:
+        closing a parsed sequence's stream reads the rest of the completion.
+        timeout is the model call's request timeout and the stream's deadline.
+
+        Raises:
+            GenerationCancelled: If the cancel event is set
+            DeadlineExceeded: If the stream is still running timeout seconds after it started
+        """
+        if cancel_event is not None and cancel_event.is_set():
+            raise GenerationCancelled()
+
+        deadline = time.perf_counter() + timeout if timeout is not None else None
+        chunks = []
+        attempt = object()
+        prompt = prompt_chain.invoke(inputs)
+        stream = self.llm.stream(
+            prompt,
+            config={"callbacks": [LLMTracingHandler(purpose="rag_generation")]},
+            **({"timeout": timeout} if timeout is not None else {})
+        )
+        try:
+            for message_chunk in stream:
+                chunk = message_chunk.text
+                if cancel_event is not None and cancel_event.is_set():
+                    raise GenerationCancelled()
+                if deadline is not None and time.perf_counter() > deadline:
+                    raise DeadlineExceeded(f"Generation stream did not complete within {timeout:.1f}s")
+                chunks.append(chunk)
+                if token_stream is not None and chunk:
+                    token_stream.emit(attempt, chunk)
+        except BaseException:
+            if token_stream is not None:
+                token_stream.release(attempt)
+            raise
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+
+        if cancel_event is not None and cancel_event.is_set():
+            raise GenerationCancelled()
+        return "".join(chunks)
+
     def get_relevant_context(self, question: str, k: int = 4) -> List[Dict[str, Any]]:
         """Get relevant context documents for a question.
 
@@ -223,59 +368,56 @@ IMPORTANT:
         """
         self.vector_store.add_documents(documents)
 
+    def _answer_cache_key(self, question: str) -> Optional[Tuple[str, int]]:
+        """Cache key of a first-turn question (None if the answer cache is disabled).
+
+        The index size is part of the key, so adding documents retires old answers.
+        """
+        if self.answer_cache_size <= 0 or self.vector_store.vectorstore is None:
+            return None
+        normalized = " ".join(question.lower().split()).rstrip("?!. ")
+        return normalized, self.vector_store.vectorstore.index.ntotal
+
+    def _cached_answer(self, key: Tuple[str, int]) -> Optional[Dict[str, Any]]:
+        """Get a cached answer that has not expired."""
+        with self._answer_cache_lock:
+            entry = self._answers.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.answer_cache_ttl_s:
+                del self._answers[key]
+                entry = None
+            if entry is not None:
+                self._answers.move_to_end(key)
+        record_cache_lookup("answer", hit=entry is not None)
+        return {**entry[1], "cached": True} if entry is not None else None
+
+    def _store_answer(self, key: Tuple[str, int], result: Dict[str, Any]) -> None:
+        """Cache an answer, evicting the least recently used ones over capacity."""
+        with self._answer_cache_lock:
+            self._answers[key] = (time.monotonic(), result)
+            self._answers.move_to_end(key)
+            while len(self._answers) > self.answer_cache_size:
+                self._answers.popitem(last=False)
+
+    def clear_answer_cache(self) -> None:
+        """Forget cached answers."""
+        with self._answer_cache_lock:
+            self._answers.clear()
+
     def get_stats(self) -> Dict[str, Any]:
         """Get statistics about the retrieval chain."""
         vector_stats = self.vector_store.get_stats()
         model = os.getenv("AZURE_OPENAI_LLM_MODEL") or os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT", "GPT-4o-mini")
+        with self._answer_cache_lock:
+            cached_answers = len(self._answers)
         return {
             "use_case": self.use_case,
             "vector_store": vector_stats,
-            "model": model
-        }
-
-
-class ConversationManager:
-    """Manages conversation history and context."""
-
-    def __init__(self, max_history: int = 10):
-        """Initialize conversation manager.
-
-        Args:
-            max_history: Maximum number of message pairs to keep
-        """
-        self.max_history = max_history
-        self.chat_history: List[BaseMessage] = []
-
-    def add_exchange(self, user_message: str, assistant_message: str):
-        """Add a user-assistant message exchange.
-
-        Args:
-            user_message: User's message
-            assistant_message: Assistant's response
-        """
-        self.chat_history.extend([
-            HumanMessage(content=user_message),
-            AIMessage(content=assistant_message)
-        ])
-
-        # Trim history if it exceeds max length
-        if len(self.chat_history) > self.max_history * 2:
-            self.chat_history = self.chat_history[-self.max_history * 2:]
-
-    def get_history(self) -> List[BaseMessage]:
-        """Get current chat history."""
-        return self.chat_history.copy()
-
-    def clear_history(self):
-        """Clear chat history."""
-        self.chat_history = []
-
-    def get_history_summary(self) -> Dict[str, Any]:
-        """Get a summary of chat history."""
-        return {
-            "total_messages": len(self.chat_history),
-            "user_messages": len([msg for msg in self.chat_history if isinstance(msg, HumanMessage)]),
-            "assistant_messages": len([msg for msg in self.chat_history if isinstance(msg, AIMessage)])
+            "model": model,
+            "answer_cache": {
+                "entries": cached_answers,
+                "max_entries": self.answer_cache_size,
+                "ttl_s": self.answer_cache_ttl_s
+            }
         }
 
 
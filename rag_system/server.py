@@ -0,0 +1,825 @@
+"""Async HTTP API for the chatbot.
+
+Endpoints:
+    POST   /chat            {"message", "session_id"?, "use_rag"?, "use_functions"?}
+    POST   /chat/stream     Same body; Server-Sent Events: token, reset, done or error
+    POST   /search          {"query", "k"?, "score_threshold"?}
+    GET    /stats           Engine, server and process statistics
+    GET    /sessions/{id}   Conversation statistics and history
+    DELETE /sessions/{id}   End a conversation
+    GET    /health          Liveness and draining state
+    GET    /ready           Readiness: 503 until the query warm-up has finished
+    GET    /metrics         Prometheus text exposition (per worker process)
+
+One ChatEngine (index, chains, functions, router) is shared by every
+conversation in a worker process; each conversation is a lightweight
+RAGChatbot kept in a session store with idle expiry. Turns run on a thread
+pool behind admission control: at most RAG_SERVER_MAX_CONCURRENCY at once,
+up to RAG_SERVER_MAX_QUEUE waiting (for at most RAG_SERVER_QUEUE_TIMEOUT
+seconds), and the rest rejected with 503 and Retry-After. Turns of the same
+conversation run one at a time. On shutdown new requests are rejected and
+in-flight turns are given RAG_SERVER_DRAIN_TIMEOUT seconds to finish.
+
+With several workers, the index is built once before the workers start and
+each worker loads it from disk. Conversation history is then kept in a
+SQLite file shared by the workers (RAG_SERVER_SESSION_DB, default
+./sessions.db), so a conversation can continue on any worker.
+
+Requires starlette and uvicorn (pip install starlette uvicorn).
+"""
+
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, AsyncIterator, Callable, Iterator, Tuple
+
+from dotenv import load_dotenv
+
+try:
+    from starlette.applications import Starlette
+    from starlette.requests import Request
+    from starlette.responses import Response, StreamingResponse
+    from starlette.routing import Route
+except Exception:  # pragma: no cover
+    Starlette = None  # type: ignore
+
+try:
+    import uvicorn
+except Exception:  # pragma: no cover
+    uvicorn = None  # type: ignore
+
+from .chat_interface import ChatEngine, RAGChatbot, STARTUP_EAGER
+from .profiling import TurnProfiler
+from .resilience import get_resilience_stats
+from .rate_limiter import get_rate_limiter_stats
+from .metrics import REGISTRY, CONTENT_TYPE, SERVER_IN_FLIGHT, SERVER_QUEUE, SERVER_REJECTED, SERVER_SESSIONS
+from .logger import get_logger, get_log_stats
+
+# Load environment variables
+load_dotenv()
+
+logger = get_logger(__name__)
+
+
+class Rejected(Exception):
+    """Raised when a request cannot be admitted (queue full, queue timeout or draining)."""
+
+    def __init__(self, reason: str, retry_after_s: int = 1):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after_s = retry_after_s
+
+
+class AdmissionControl:
+    """Bounds concurrent turns and the queue of requests waiting for one.
+
+    Used only from the event loop thread, so the counters need no lock.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout_s: float):
+        """Initialize admission control.
+
+        Args:
+            max_concurrency: Requests processed at the same time
+            max_queue: Requests allowed to wait for a slot; more are rejected
+            queue_timeout_s: Longest a request waits for a slot before being rejected
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.draining = False
+        self.in_flight = 0
+        self.queued = 0
+        self.stats = {"admitted": 0, "rejected_queue_full": 0, "rejected_queue_timeout": 0, "rejected_draining": 0}
+        self._queue_ms_total = 0.0
+
+    async def acquire(self) -> float:
+        """Wait for a slot.
+
+        Returns:
+            Time spent queued in milliseconds
+
+        Raises:
+            Rejected: If the server is draining, the queue is full or the wait timed out
+        """
+        if self.draining:
+            self._reject("draining")
+        if self._semaphore.locked() and self.queued >= self.max_queue:
+            self._reject("queue_full")
+
+        start = time.perf_counter()
+        self.queued += 1
+        SERVER_QUEUE.labels().inc()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout_s)
+        except asyncio.TimeoutError:
+            self._reject("queue_timeout")
+        finally:
+            self.queued -= 1
+            SERVER_QUEUE.labels().dec()
+
+        queue_ms = (time.perf_counter() - start) * 1000
+        self.in_flight += 1
+        SERVER_IN_FLIGHT.labels().inc()
+        self._idle.clear()
+        self.stats["admitted"] += 1
+        self._queue_ms_total += queue_ms
+        return queue_ms
+
+    def release(self) -> None:
+        """Free a slot taken with acquire."""
+        self.in_flight -= 1
+        SERVER_IN_FLIGHT.labels().dec()
+        self._semaphore.release()
+        if self.in_flight == 0:
+            self._idle.set()
+
+    def _reject(self, reason: str) -> None:
+        """Count and raise a rejection."""
+        self.stats[f"rejected_{reason}"] += 1
+        SERVER_REJECTED.labels(reason=reason).inc()
+        raise Rejected(reason, retry_after_s=max(1, int(self.queue_timeout_s / 2)))
+
+    async def drain(self, timeout_s: float) -> bool:
+        """Stop admitting requests and wait for in-flight ones.
+
+        Returns:
+            Whether every in-flight request finished in time
+        """
+        self.draining = True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout_s)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get slot, queue and rejection counters."""
+        admitted = self.stats["admitted"]
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "draining": self.draining,
+            "avg_queue_ms": round(self._queue_ms_total / admitted, 3) if admitted else 0.0,
+            **self.stats
+        }
+
+
+class SessionHistoryDB:
+    """Conversation history in a SQLite file shared by worker processes."""
+
+    def __init__(self, path: str):
+        """Initialize history database.
+
+        Args:
+            path: SQLite file, created if missing
+        """
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, messages TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a short-lived connection and commit on success.
+
+        Calls come from many threads and processes, so connections are not shared.
+        """
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def load(self, session_id: str) -> Optional[List[Dict[str, str]]]:
+        """Get a conversation's messages, or None if it is not stored."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT messages FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, session_id: str, messages: List[Dict[str, str]]) -> None:
+        """Store a conversation's messages."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, messages, updated) VALUES (?, ?, ?)",
+                (session_id, json.dumps(messages, ensure_ascii=False), time.time())
+            )
+
+    def delete(self, session_id: str) -> bool:
+        """Delete a conversation."""
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+
+    def expire(self, cutoff: float) -> int:
+        """Delete conversations last updated before the cutoff (Unix time)."""
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM sessions WHERE updated < ?", (cutoff,)).rowcount
+
+
+@dataclass
+class Session:
+    """A conversation held by the server."""
+
+    chatbot: RAGChatbot
+    created: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.time)
+    turns: int = 0
+    # Turns of one conversation run one at a time so history stays ordered
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+class SessionStore:
+    """Conversations by session ID, expired after a period of inactivity."""
+
+    def __init__(
+        self,
+        engine: ChatEngine,
+        ttl_s: float = 1800.0,
+        max_sessions: int = 1000,
+        history_db: Optional[SessionHistoryDB] = None
+    ):
+        """Initialize session store.
+
+        Args:
+            engine: Shared engine for new conversations
+            ttl_s: Idle time after which a conversation is dropped
+            max_sessions: Most conversations held; the least recently used idle one
+                is dropped to make room
+            history_db: Shared history for conversations that move between workers
+        """
+        self.engine = engine
+        self.ttl_s = ttl_s
+        self.max_sessions = max_sessions
+        self.history_db = history_db
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "expired": 0, "evicted": 0, "deleted": 0}
+
+    def get(self, session_id: str) -> Optional[Session]:
+        """Get a conversation if it exists (here or, with a history database, on another worker)."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is None and self.history_db is not None and self.history_db.load(session_id) is not None:
+            session = self.get_or_create(session_id)
+            self.restore(session)
+        return session
+
+    def restore(self, session: Session) -> None:
+        """Load the conversation's latest history from the history database."""
+        if self.history_db is not None:
+            messages = self.history_db.load(session.chatbot.session_id)
+            if messages is not None:
+                session.chatbot.conversation_manager.load_messages(messages)
+
+    def persist(self, session: Session) -> None:
+        """Save the conversation's history to the history database."""
+        if self.history_db is not None:
+            self.history_db.save(session.chatbot.session_id, session.chatbot.conversation_manager.to_messages())
+
+    def get_or_create(self, session_id: Optional[str] = None) -> Session:
+        """Get a conversation, starting a new one if the ID is unknown or not given.
+
+        Args:
+            session_id: Conversation ID chosen by the client (e.g. a ticket number)
+
+        Returns:
+            The session
+        """
+        with self._lock:
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None:
+                session = Session(RAGChatbot(engine=self.engine, session_id=session_id))
+                self._sessions[session.chatbot.session_id] = session
+                self.stats["created"] += 1
+                self._evict_over_capacity()
+            self._sessions.move_to_end(session.chatbot.session_id)
+            session.last_used = time.time()
+            SERVER_SESSIONS.labels().set(len(self._sessions))
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        """End a conversation."""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            SERVER_SESSIONS.labels().set(len(self._sessions))
+        stored = self.history_db.delete(session_id) if self.history_db is not None else False
+        deleted = session is not None or stored
+        if deleted:
+            self.stats["deleted"] += 1
+        return deleted
+
+    def discard_if_unused(self, session: Session) -> None:
+        """Drop a conversation that never had a turn (its first request was rejected)."""
+        with self._lock:
+            session_id = session.chatbot.session_id
+            if session.turns == 0 and not session.lock.locked() and self._sessions.get(session_id) is session:
+                del self._sessions[session_id]
+                SERVER_SESSIONS.labels().set(len(self._sessions))
+
+    def _evict_over_capacity(self) -> None:
+        """Drop least recently used idle conversations above capacity (lock held)."""
+        for session_id in list(self._sessions):
+            if len(self._sessions) <= self.max_sessions:
+                break
+            if not self._sessions[session_id].lock.locked():
+                del self._sessions[session_id]
+                self.stats["evicted"] += 1
+
+    def expire(self) -> int:
+        """Drop conversations idle for longer than the TTL.
+
+        Returns:
+            Number of conversations dropped
+        """
+        cutoff = time.time() - self.ttl_s
+        with self._lock:
+            expired = [
+                session_id for session_id, session in self._sessions.items()
+                if session.last_used < cutoff and not session.lock.locked()
+            ]
+            for session_id in expired:
+                del self._sessions[session_id]
+            self.stats["expired"] += len(expired)
+            SERVER_SESSIONS.labels().set(len(self._sessions))
+        if self.history_db is not None:
+            self.history_db.expire(cutoff)
+        return len(expired)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get session counts."""
+        with self._lock:
+            active = len(self._sessions)
+        return {"active": active, "ttl_s": self.ttl_s, "max_sessions": self.max_sessions, **self.stats}
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+def _json(data: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> "Response":
+    """JSON response tolerant of values json cannot serialize (timestamps, paths)."""
+    return Response(
+        json.dumps(data, default=str, ensure_ascii=False),
+        status_code=status_code,
+        media_type="application/json",
+        headers=headers
+    )
+
+
+def _error(message: str, status_code: int, headers: Optional[Dict[str, str]] = None) -> "Response":
+    return _json({"error": message}, status_code, headers)
+
+
+def _rejected(error: Rejected) -> "Response":
+    return _error(f"Server busy: {error.reason}", 503, {"Retry-After": str(error.retry_after_s)})
+
+
+def _sse(event: str, data: Any) -> str:
+    """Format a Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str, ensure_ascii=False)}\n\n"
+
+
+async def _read_json(request: "Request") -> Dict[str, Any]:
+    """Parse a JSON object body."""
+    try:
+        body = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise ValueError("Request body must be JSON")
+    if not isinstance(body, dict):
+        raise ValueError("Request body must be a JSON object")
+    return body
+
+
+class ChatServer:
+    """HTTP API state: the shared engine, sessions, worker pool and admission control."""
+
+    def __init__(
+        self,
+        use_case: Optional[str] = None,
+        enable_functions: Optional[bool] = None,
+        max_concurrency: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        queue_timeout_s: Optional[float] = None,
+        session_ttl_s: Optional[float] = None,
+        max_sessions: Optional[int] = None,
+        drain_timeout_s: Optional[float] = None,
+        session_db: Optional[str] = None,
+        engine_factory: Optional[Callable[[], ChatEngine]] = None,
+        profiler: Optional[TurnProfiler] = None
+    ):
+        """Initialize chat server; unset options come from RAG_SERVER_* environment variables.
+
+        Args:
+            use_case: The use case (default RAG_USE_CASE or it_helpdesk)
+            enable_functions: Whether to enable function calling (default RAG_SERVER_FUNCTIONS or on)
+            max_concurrency: Turns processed at the same time (default 8)
+            max_queue: Requests waiting for a slot before new ones are rejected (default 64)
+            queue_timeout_s: Longest wait for a slot (default 30)
+            session_ttl_s: Idle time before a conversation is dropped (default 1800)
+            max_sessions: Most conversations held (default 1000)
+            drain_timeout_s: Time given to in-flight turns on shutdown (default 30)
+            session_db: SQLite file for conversation history shared between workers
+                (default RAG_SERVER_SESSION_DB; history stays in memory if unset)
+            engine_factory: Builds the shared engine (default an eagerly built ChatEngine(use_case, enable_functions))
+            profiler: Turn profiler of the default engine; defaults to the one configured
+                by RAG_PROFILE_* environment variables
+        """
+        self.use_case = use_case or os.getenv("RAG_USE_CASE", "it_helpdesk")
+        if enable_functions is None:
+            enable_functions = os.getenv("RAG_SERVER_FUNCTIONS", "on").lower() not in ("0", "false", "no", "off")
+        self.enable_functions = enable_functions
+        self.max_concurrency = max_concurrency or _env_int("RAG_SERVER_MAX_CONCURRENCY", 8)
+        self.max_queue = max_queue if max_queue is not None else _env_int("RAG_SERVER_MAX_QUEUE", 64)
+        self.queue_timeout_s = queue_timeout_s or _env_float("RAG_SERVER_QUEUE_TIMEOUT", 30.0)
+        self.session_ttl_s = session_ttl_s or _env_float("RAG_SERVER_SESSION_TTL", 1800.0)
+        self.max_sessions = max_sessions or _env_int("RAG_SERVER_MAX_SESSIONS", 1000)
+        self.drain_timeout_s = drain_timeout_s or _env_float("RAG_SERVER_DRAIN_TIMEOUT", 30.0)
+        self.session_db = session_db or os.getenv("RAG_SERVER_SESSION_DB") or None
+        # Build everything before accepting traffic, so the first requests do not pay for it
+        self._engine_factory = engine_factory or (
+            lambda: ChatEngine(self.use_case, self.enable_functions, profiler=profiler, startup_mode=STARTUP_EAGER)
+        )
+
+        self.engine: Optional[ChatEngine] = None
+        self.sessions: Optional[SessionStore] = None
+        self.admission: Optional[AdmissionControl] = None
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.started = time.time()
+        self._sweeper: Optional[asyncio.Task] = None
+
+    @asynccontextmanager
+    async def lifespan(self, app) -> AsyncIterator[None]:
+        """Build the engine on startup; drain and stop the worker pool on shutdown."""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="chat-worker")
+        self.engine = await loop.run_in_executor(self.executor, self._engine_factory)
+        history_db = SessionHistoryDB(self.session_db) if self.session_db else None
+        self.sessions = SessionStore(self.engine, self.session_ttl_s, self.max_sessions, history_db)
+        self.admission = AdmissionControl(self.max_concurrency, self.max_queue, self.queue_timeout_s)
+        self._sweeper = asyncio.create_task(self._sweep_sessions())
+        logger.info(
+            "server_started",
+            use_case=self.use_case,
+            pid=os.getpid(),
+            startup_ms=round((time.perf_counter() - start) * 1000, 3),
+            max_concurrency=self.max_concurrency,
+            max_queue=self.max_queue
+        )
+        try:
+            yield
+        finally:
+            drained = await self.admission.drain(self.drain_timeout_s)
+            self._sweeper.cancel()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            logger.info("server_stopped", pid=os.getpid(), drained=drained, in_flight=self.admission.in_flight)
+
+    async def _sweep_sessions(self) -> None:
+        """Expire idle conversations periodically."""
+        interval = max(1.0, min(self.session_ttl_s / 4, 60.0))
+        while True:
+            await asyncio.sleep(interval)
+            expired = self.sessions.expire()
+            if expired:
+                logger.debug("sessions_expired", count=expired, active=len(self.sessions))
+
+    async def _run(self, fn: Callable[[], Any], session: Optional[Session] = None) -> Tuple["asyncio.Future", float]:
+        """Admit a request and start fn on the worker pool.
+
+        The slot (and the session, if any) is held until fn returns, even if
+        the client goes away first, so the limits reflect the threads in use.
+
+        Returns:
+            Future with fn's result, and the time spent queued in milliseconds
+        """
+        if session is not None:
+            await session.lock.acquire()
+        try:
+            queue_ms = await self.admission.acquire()
+        except BaseException:
+            if session is not None:
+                session.lock.release()
+            raise
+
+        if session is not None and self.sessions.history_db is not None:
+            fn = functools.partial(self._run_with_history, session, fn)
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, fn)
+
+        def release(_):
+            self.admission.release()
+            if session is not None:
+                session.last_used = time.time()
+                session.lock.release()
+
+        future.add_done_callback(release)
+        return future, queue_ms
+
+    def _run_with_history(self, session: Session, fn: Callable[[], Any]) -> Any:
+        """Run a turn on the conversation's latest shared history and save the result."""
+        self.sessions.restore(session)
+        result = fn()
+        self.sessions.persist(session)
+        return result
+
+    @staticmethod
+    def _turn_options(body: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate a chat request body."""
+        message = body.get("message")
+        if not isinstance(message, str) or not message.strip():
+            raise ValueError("\"message\" must be a non-empty string")
+        return {
+            "user_input": message,
+            "use_rag": bool(body.get("use_rag", True)),
+            "use_functions": bool(body.get("use_functions", True))
+        }
+
+    async def chat(self, request: "Request") -> "Response":
+        """Answer a message in a conversation."""
+        try:
+            body = await _read_json(request)
+            options = self._turn_options(body)
+        except ValueError as e:
+            return _error(str(e), 400)
+
+        session = self.sessions.get_or_create(body.get("session_id"))
+        try:
+            future, queue_ms = await self._run(functools.partial(session.chatbot.chat, **options), session)
+        except Rejected as e:
+            self.sessions.discard_if_unused(session)
+            return _rejected(e)
+        response = await asyncio.shield(future)
+        session.turns += 1
+
+        response["session_id"] = session.chatbot.session_id
+        response["queue_ms"] = round(queue_ms, 3)
+        return _json(response)
+
+    async def chat_stream(self, request: "Request") -> "Response":
+        """Answer a message as Server-Sent Events: token chunks, then the full response."""
+        try:
+            body = await _read_json(request)
+            options = self._turn_options(body)
+        except ValueError as e:
+            return _error(str(e), 400)
+
+        session = self.sessions.get_or_create(body.get("session_id"))
+        loop = asyncio.get_running_loop()
+        events: "asyncio.Queue[tuple]" = asyncio.Queue()
+
+        def push(event: str, data: Any) -> None:
+            loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+        def run_turn():
+            return session.chatbot.chat(
+                on_token=lambda text: push("token", {"text": text}),
+                on_reset=lambda: push("reset", {}),
+                **options
+            )
+
+        try:
+            future, queue_ms = await self._run(run_turn, session)
+        except Rejected as e:
+            self.sessions.discard_if_unused(session)
+            return _rejected(e)
+        future.add_done_callback(lambda _: events.put_nowait(("finished", None)))
+
+        async def stream() -> AsyncIterator[str]:
+            yield _sse("session", {"session_id": session.chatbot.session_id, "queue_ms": round(queue_ms, 3)})
+            while True:
+                event, data = await events.get()
+                if event != "finished":
+                    yield _sse(event, data)
+                    continue
+                # Tokens pushed from the worker thread are queued before the result
+                while not events.empty():
+                    yield _sse(*events.get_nowait())
+                try:
+                    response = future.result()
+                except Exception as e:
+                    logger.error("stream_turn_failed", exc=e)
+                    yield _sse("error", {"error": str(e)})
+                    return
+                session.turns += 1
+                response["session_id"] = session.chatbot.session_id
+                response["queue_ms"] = round(queue_ms, 3)
+                yield _sse("done", response)
+                return
+
+        return StreamingResponse(
+            stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    async def search(self, request: "Request") -> "Response":
+        """Search the knowledge base without generating an answer."""
+        try:
+            body = await _read_json(request)
+            query = body.get("query")
+            if not isinstance(query, str) or not query.strip():
+                raise ValueError("\"query\" must be a non-empty string")
+            k = int(body.get("k", 4))
+            score_threshold = float(body.get("score_threshold", 0.5))
+        except (TypeError, ValueError) as e:
+            return _error(str(e), 400)
+
+        vector_store = self.engine.retrieval_chain.vector_store
+        start = time.perf_counter()
+        try:
+            future, queue_ms = await self._run(
+                functools.partial(vector_store.search, query, k=k, score_threshold=score_threshold)
+            )
+        except Rejected as e:
+            return _rejected(e)
+        results = await asyncio.shield(future)
+        return _json({
+            "query": query,
+            "results": results,
+            "queue_ms": round(queue_ms, 3),
+            "total_ms": round((time.perf_counter() - start) * 1000, 3)
+        })
+
+    async def stats(self, request: "Request") -> "Response":
+        """Engine, server and process statistics."""
+        return _json({
+            "engine": self.engine.get_stats(),
+            "server": {
+                "pid": os.getpid(),
+                "uptime_s": round(time.time() - self.started, 3),
+                "admission": self.admission.get_stats(),
+                "sessions": self.sessions.get_stats()
+            },
+            "resilience": get_resilience_stats(),
+            "rate_limits": get_rate_limiter_stats(),
+            "logging": get_log_stats()
+        })
+
+    async def session_stats(self, request: "Request") -> "Response":
+        """Statistics and history of one conversation."""
+        session = self.sessions.get(request.path_params["session_id"])
+        if session is None:
+            return _error("Unknown session", 404)
+        chatbot = session.chatbot
+        return _json({
+            "session_id": chatbot.session_id,
+            "created": session.created,
+            "last_used": session.last_used,
+            "turns": session.turns,
+            "conversation": chatbot.conversation_manager.get_history_summary(),
+            "history": chatbot.get_conversation_history(),
+            "usage": chatbot.usage.get_stats()
+        })
+
+    async def delete_session(self, request: "Request") -> "Response":
+        """End a conversation."""
+        if not self.sessions.delete(request.path_params["session_id"]):
+            return _error("Unknown session", 404)
+        return _json({"deleted": request.path_params["session_id"]})
+
+    async def health(self, request: "Request") -> "Response":
+        """Liveness; 503 while draining so load balancers stop sending traffic."""
+        draining = self.admission.draining
+        return _json({
+            "status": "draining" if draining else "ok",
+            "pid": os.getpid(),
+            "in_flight": self.admission.in_flight,
+            "queued": self.admission.queued,
+            "sessions": len(self.sessions)
+        }, 503 if draining else 200)
+
+    async def ready(self, request: "Request") -> "Response":
+        """Readiness; 503 until the engine is built and warmed up, or while draining."""
+        startup = self.engine.get_stats()["startup"]
+        ready = self.engine.warmed and not self.admission.draining
+        return _json({
+            "status": "ready" if ready else ("draining" if self.admission.draining else "warming_up"),
+            "pid": os.getpid(),
+            "components_ready": startup["ready"],
+            "warm_up": startup["warm_up"]
+        }, 200 if ready else 503)
+
+    async def metrics(self, request: "Request") -> "Response":
+        """Prometheus text exposition for this worker process."""
+        return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+    def build_app(self) -> "Starlette":
+        """Build the Starlette application."""
+        return Starlette(
+            routes=[
+                Route("/chat", self.chat, methods=["POST"]),
+                Route("/chat/stream", self.chat_stream, methods=["POST"]),
+                Route("/search", self.search, methods=["POST"]),
+                Route("/stats", self.stats, methods=["GET"]),
+                Route("/sessions/{session_id}", self.session_stats, methods=["GET"]),
+                Route("/sessions/{session_id}", self.delete_session, methods=["DELETE"]),
+                Route("/health", self.health, methods=["GET"]),
+                Route("/ready", self.ready, methods=["GET"]),
+                Route("/metrics", self.metrics, methods=["GET"])
+            ],
+            lifespan=self.lifespan
+        )
+
+
+def create_app(**options: Any) -> "Starlette":
+    """Create the HTTP API application (also the uvicorn factory for worker processes).
+
+    Args:
+        **options: ChatServer options; unset ones come from the environment
+    """
+    if Starlette is None:
+        raise ImportError("The HTTP API requires starlette and uvicorn: pip install starlette uvicorn")
+    return ChatServer(**options).build_app()
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    workers: int = 1,
+    use_case: str = "it_helpdesk",
+    enable_functions: bool = True,
+    profiler: Optional[TurnProfiler] = None,
+    **options: Any
+) -> None:
+    """Run the HTTP API with uvicorn.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind
+        workers: Worker processes; more than one scales across CPU cores, each with its
+            own engine loaded from the shared on-disk index
+        use_case: The use case
+        enable_functions: Whether to enable function calling
+        profiler: Turn profiler; worker processes get its settings through RAG_PROFILE_*
+        **options: Other ChatServer options (max_concurrency, max_queue, ...)
+    """
+    if uvicorn is None or Starlette is None:
+        raise ImportError("The HTTP API requires starlette and uvicorn: pip install starlette uvicorn")
+
+    drain_timeout_s = options.get("drain_timeout_s") or _env_float("RAG_SERVER_DRAIN_TIMEOUT", 30.0)
+    if workers <= 1:
+        app = create_app(use_case=use_case, enable_functions=enable_functions, profiler=profiler, **options)
+        uvicorn.run(app, host=host, port=port, timeout_graceful_shutdown=int(drain_timeout_s))
+        return
+
+    # Build (or check) the on-disk index once, so workers only load it
+    from .vector_store import create_vector_store_for_use_case
+    create_vector_store_for_use_case(use_case)
+
+    # Worker processes read their options from the environment
+    os.environ["RAG_USE_CASE"] = use_case
+    os.environ["RAG_SERVER_FUNCTIONS"] = "on" if enable_functions else "off"
+    if profiler is not None:
+        os.environ["RAG_PROFILE_SAMPLE_RATE"] = str(profiler.sample_rate)
+        os.environ["RAG_PROFILE_FORMAT"] = profiler.format
+        os.environ["RAG_PROFILE_DIR"] = str(profiler.output_dir)
+    env_names = {
+        "max_concurrency": "RAG_SERVER_MAX_CONCURRENCY",
+        "max_queue": "RAG_SERVER_MAX_QUEUE",
+        "queue_timeout_s": "RAG_SERVER_QUEUE_TIMEOUT",
+        "session_ttl_s": "RAG_SERVER_SESSION_TTL",
+        "max_sessions": "RAG_SERVER_MAX_SESSIONS",
+        "drain_timeout_s": "RAG_SERVER_DRAIN_TIMEOUT",
+        "session_db": "RAG_SERVER_SESSION_DB"
+    }
+    for name, value in options.items():
+        if value is not None:
+            os.environ[env_names[name]] = str(value)
+    # Workers share conversation history through SQLite, since requests can reach any of them
+    os.environ.setdefault("RAG_SERVER_SESSION_DB", "./sessions.db")
+
+    logger.info("server_starting_workers", workers=workers, host=host, port=port)
+    uvicorn.run(
+        "rag_system.server:create_app",
+        factory=True,
+        host=host,
+        port=port,
+        workers=workers,
+        timeout_graceful_shutdown=int(drain_timeout_s)
+    )
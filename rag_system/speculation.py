@@ -0,0 +1,229 @@
+"""Speculative execution of the RAG path alongside function calling."""
+
+import os
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass
+from typing import Dict, Any, Callable, Optional, Tuple
+
+from .profiling import profile_worker
+
+SPECULATION_OFF = "off"
+SPECULATION_RETRIEVAL = "retrieval"
+SPECULATION_FULL = "full"
+SPECULATION_MODES = (SPECULATION_OFF, SPECULATION_RETRIEVAL, SPECULATION_FULL)
+
+
+@dataclass
+class SpeculationRecord:
+    """Accounting for one speculative turn."""
+    mode: str
+    winner: str = ""
+    function_calling_ms: float = 0.0
+    speculative_ms: float = 0.0
+    saved_ms: float = 0.0
+    wasted_ms: float = 0.0
+    cancelled: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the record to a JSON-friendly dictionary."""
+        return {
+            "mode": self.mode,
+            "winner": self.winner,
+            "function_calling_ms": round(self.function_calling_ms, 3),
+            "speculative_ms": round(self.speculative_ms, 3),
+            "saved_ms": round(self.saved_ms, 3),
+            "wasted_ms": round(self.wasted_ms, 3),
+            "cancelled": self.cancelled
+        }
+
+
+class SpeculativeTask:
+    """A speculative unit of work that can be committed or cancelled."""
+
+    def __init__(self, future: Future, cancel_event: threading.Event, timing: Dict[str, float],
+                 fn: Optional[Callable[[threading.Event], Any]] = None):
+        """Initialize a speculative task.
+
+        Args:
+            future: Future running the speculative work
+            cancel_event: Event the work checks to stop early
+            timing: Shared dict receiving the work's start and end times
+            fn: The work itself, for running it in the caller's thread when no worker picked it up
+        """
+        self.future = future
+        self.cancel_event = cancel_event
+        self.timing = timing
+        self.fn = fn
+
+    def elapsed_ms(self) -> float:
+        """Time the speculative work has run so far (or in total, if finished)."""
+        start = self.timing.get("start")
+        if start is None:
+            return 0.0
+        end = self.timing.get("end", time.perf_counter())
+        return (end - start) * 1000
+
+    def run_inline(self) -> Any:
+        """Run the work in the calling thread (the future must have been cancelled)."""
+        self.timing["start"] = time.perf_counter()
+        try:
+            return self.fn(self.cancel_event)
+        finally:
+            self.timing["end"] = time.perf_counter()
+
+    def cancel(self) -> None:
+        """Cancel the work, or signal it to stop if it is already running."""
+        self.cancel_event.set()
+        self.future.cancel()
+
+
+class SpeculativeExecutor:
+    """Runs the RAG path speculatively and accounts for saved and wasted work.
+
+    The mode controls how much is speculated while function calling runs:
+    ``retrieval`` only embeds and searches (cheap), ``full`` also generates
+    the RAG answer (saves the most latency, but spends tokens when tools win).
+    """
+
+    def __init__(self, mode: Optional[str] = None, max_workers: Optional[int] = None):
+        """Initialize the speculative executor.
+
+        Args:
+            mode: Speculation mode (off, retrieval, full); defaults to RAG_SPECULATION_MODE
+            max_workers: Worker threads for speculative work, shared by all sessions;
+                defaults to RAG_SPECULATION_WORKERS
+        """
+        if max_workers is None:
+            max_workers = int(os.getenv("RAG_SPECULATION_WORKERS", "2"))
+        mode = mode or os.getenv("RAG_SPECULATION_MODE", SPECULATION_RETRIEVAL)
+        if mode not in SPECULATION_MODES:
+            raise ValueError(f"Unknown speculation mode: {mode}")
+
+        self.mode = mode
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculation")
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "turns": 0,
+            "rag_wins": 0,
+            "function_wins": 0,
+            "failed_turns": 0,
+            "cancelled_before_start": 0,
+            "ran_inline": 0,
+            "total_saved_ms": 0.0,
+            "total_wasted_ms": 0.0
+        }
+
+    @property
+    def enabled(self) -> bool:
+        """Whether speculation is enabled."""
+        return self.mode != SPECULATION_OFF
+
+    def start(self, fn: Callable[[threading.Event], Any]) -> SpeculativeTask:
+        """Start speculative work in the background.
+
+        Args:
+            fn: Callable receiving a cancel event and returning the speculative result
+
+        Returns:
+            Handle to commit or cancel the work
+        """
+        cancel_event = threading.Event()
+        timing: Dict[str, float] = {}
+
+        def run():
+            timing["start"] = time.perf_counter()
+            try:
+                with profile_worker():
+                    return fn(cancel_event)
+            finally:
+                timing["end"] = time.perf_counter()
+
+        # Carry context variables (session, tracing) into the worker thread
+        context = contextvars.copy_context()
+        future = self._executor.submit(context.run, run)
+        return SpeculativeTask(future, cancel_event, timing, fn=fn)
+
+    def commit(self, task: SpeculativeTask, function_calling_ms: float) -> Tuple[Any, SpeculationRecord]:
+        """Wait for the speculative result after function calling fell through.
+
+        Args:
+            task: Speculative task to commit to
+            function_calling_ms: Time spent in the function-calling attempt
+
+        Returns:
+            The speculative work's result (exceptions propagate) and the turn's record
+        """
+        record = SpeculationRecord(mode=self.mode, winner="rag", function_calling_ms=function_calling_ms)
+        # Every worker is busy with other sessions' speculation: run the work here
+        # rather than queue behind them
+        inline = task.fn is not None and task.future.cancel()
+        try:
+            result = task.run_inline() if inline else task.future.result()
+        finally:
+            record.speculative_ms = task.elapsed_ms()
+            if inline:
+                with self._stats_lock:
+                    self._stats["ran_inline"] += 1
+            else:
+                # Serially the turn would have paid both; the overlap is what we saved
+                record.saved_ms = min(function_calling_ms, record.speculative_ms)
+            self._accumulate(record)
+        return result, record
+
+    def abandon(self, task: SpeculativeTask, function_calling_ms: float, failed: bool = False) -> SpeculationRecord:
+        """Cancel speculative work after function calling answered (or failed) the turn.
+
+        Args:
+            task: Speculative task to cancel
+            function_calling_ms: Time spent in the function-calling attempt
+            failed: Function calling raised, so the turn ends with an error
+
+        Returns:
+            Accounting record for the turn
+        """
+        task.cancel()
+        record = SpeculationRecord(
+            mode=self.mode,
+            winner="none" if failed else "function_calling",
+            function_calling_ms=function_calling_ms,
+            cancelled=True
+        )
+        # Work already done (or still running until it sees the cancel event) is wasted
+        record.speculative_ms = task.elapsed_ms()
+        record.wasted_ms = record.speculative_ms
+        if task.future.cancelled():
+            with self._stats_lock:
+                self._stats["cancelled_before_start"] += 1
+        self._accumulate(record)
+        return record
+
+    def _accumulate(self, record: SpeculationRecord) -> None:
+        """Add a turn's record to the running totals."""
+        with self._stats_lock:
+            self._stats["turns"] += 1
+            if record.winner == "rag":
+                self._stats["rag_wins"] += 1
+            elif record.winner == "function_calling":
+                self._stats["function_wins"] += 1
+            else:
+                self._stats["failed_turns"] += 1
+            self._stats["total_saved_ms"] += record.saved_ms
+            self._stats["total_wasted_ms"] += record.wasted_ms
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cumulative speculation statistics."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["mode"] = self.mode
+        turns = stats["turns"]
+        stats["avg_saved_ms"] = stats["total_saved_ms"] / turns if turns else 0.0
+        stats["avg_wasted_ms"] = stats["total_wasted_ms"] / turns if turns else 0.0
+        return stats
+
+    def shutdown(self) -> None:
+        """Stop the worker threads."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -9,6 +9,8 @@ from __future__ import annotations
 from io import BytesIO
 from typing import Optional
 
+from .tracing import span
+
 try:
     from gtts import gTTS
 except Exception:  # pragma: no cover
@@ -35,6 +37,14 @@ def synthesize_to_mp3_bytes(text: str, lang: str = "en") -> Optional[bytes]:
     if not text:
         return None
 
+    with span("tts", lang=lang, characters=len(text)) as tts_span:
+        audio = _synthesize(text, lang, tts_span)
+        tts_span.set_attribute("success", audio is not None)
+        return audio
+
+
+def _synthesize(text: str, lang: str, tts_span) -> Optional[bytes]:
+    """Try each available provider in turn, recording which one answered."""
     # Try gTTS first
     if gTTS is not None:
         try:
@@ -42,6 +52,7 @@ def synthesize_to_mp3_bytes(text: str, lang: str = "en") -> Optional[bytes]:
             buf = BytesIO()
             tts.write_to_fp(buf)
             buf.seek(0)
+            tts_span.set_attribute("provider", "gtts")
             return buf.read()
         except Exception:
             pass
@@ -59,6 +70,7 @@ def synthesize_to_mp3_bytes(text: str, lang: str = "en") -> Optional[bytes]:
                         buf.write(chunk["data"])
                 return buf.getvalue()
 
+            tts_span.set_attribute("provider", "edge_tts")
             return asyncio.run(_run())
         except Exception:
             return None
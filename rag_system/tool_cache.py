@@ -0,0 +1,156 @@
+"""TTL result cache for idempotent tool handlers.
+
+Lookups such as a device's status or a software catalog entry are declared
+cacheable when they are registered with the FunctionCaller. Results are kept
+for a TTL in a bounded LRU keyed by the normalized arguments, so the model
+asking for printer01 three times in a conversation costs one backend query.
+
+Concurrent calls with the same key share a single fetch: the first caller
+runs the handler and the others wait for its result (or its exception)
+instead of stampeding the backend. Failed fetches are not cached.
+Hits and misses are counted per function in rag_cache_requests_total under
+cache="tool:<name>"; RAG_TOOL_CACHE=off disables all tool caches.
+"""
+
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Optional, Tuple
+
+from .metrics import record_cache_lookup
+
+
+def tool_cache_enabled() -> bool:
+    """Whether tool result caching is enabled (RAG_TOOL_CACHE, default on)."""
+    return os.getenv("RAG_TOOL_CACHE", "on").lower() not in ("0", "false", "no", "off")
+
+
+def normalize_arguments(arguments: Dict[str, Any]) -> str:
+    """Default cache key: the arguments as canonical JSON (sorted keys, compact).
+
+    Values are compared exactly; handlers that ignore case or order of their
+    arguments declare a key function that normalizes them the same way.
+    """
+    return json.dumps(arguments, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+class _InFlight:
+    """A fetch in progress that other callers of the same key wait for."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class ToolCache:
+    """Bounded TTL cache with one in-flight fetch per key."""
+
+    def __init__(
+        self,
+        name: str,
+        ttl_s: float,
+        max_entries: int = 256,
+        key: Optional[Callable[[Dict[str, Any]], str]] = None
+    ):
+        """Initialize the cache.
+
+        Args:
+            name: Function name (the metrics label is tool:<name>)
+            ttl_s: Seconds a result is served from the cache
+            max_entries: Results kept before the least recently used are evicted
+            key: Maps call arguments to a cache key; defaults to normalize_arguments.
+                Calls whose keys are equal must have equal results.
+        """
+        self.name = name
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.key = key or normalize_arguments
+
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._in_flight: Dict[str, _InFlight] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def call(self, fetch: Callable[[], Any], arguments: Dict[str, Any]) -> Any:
+        """Get the cached result for the arguments, or fetch it.
+
+        Args:
+            fetch: Runs the handler; only called on a miss
+            arguments: Call arguments the key is computed from
+
+        Returns:
+            The handler's result (shared between callers; treat it as read-only)
+        """
+        key = self.key(arguments)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_s:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                in_flight = self._in_flight.get(key)
+                leader = in_flight is None
+                if leader:
+                    in_flight = self._in_flight[key] = _InFlight()
+                    self.misses += 1
+                else:
+                    self.coalesced += 1
+
+        if entry is not None:
+            record_cache_lookup(f"tool:{self.name}", hit=True)
+            return entry[1]
+
+        # A caller that joins a running fetch did not query the backend either
+        record_cache_lookup(f"tool:{self.name}", hit=not leader)
+        if not leader:
+            in_flight.event.wait()
+            if in_flight.error is not None:
+                raise in_flight.error
+            return in_flight.result
+
+        try:
+            in_flight.result = fetch()
+        except BaseException as e:
+            in_flight.error = e
+            raise
+        else:
+            with self._lock:
+                self._entries[key] = (time.monotonic(), in_flight.result)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return in_flight.result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            in_flight.event.set()
+
+    def invalidate(self, arguments: Optional[Dict[str, Any]] = None) -> None:
+        """Forget the result for some arguments, or all results."""
+        with self._lock:
+            if arguments is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self.key(arguments), None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_ratio": round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0
+            }
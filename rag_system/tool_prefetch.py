@@ -0,0 +1,290 @@
+"""Prefetch of tool results for entities mentioned in the user message.
+
+A question naming printer01 or Slack will almost certainly end in a
+check_device_status or get_software_info call, but the model only asks for
+it after a full completion, and its answer needs a second one. The
+prefetcher spots known device IDs and catalog software names in the message
+and starts those lookups on the tool pool as soon as the turn is routed to
+function calling (turns the router sends straight to RAG prefetch nothing):
+
+    warm   - the lookups run alongside the first completion and land in the
+             tools' result caches (a call still in flight is joined, not
+             repeated), so the model's own tool calls return at once; only
+             functions with a result cache are warmed;
+    inject - the turn waits for the lookups (RAG_TOOL_PREFETCH_TIMEOUT) and
+             adds them to the conversation as already-answered tool calls,
+             so the model can answer in a single completion.
+
+RAG_TOOL_PREFETCH selects the mode (off, warm or inject; default warm).
+Each turn reports which prefetched calls the model used and an estimate of
+the time saved; totals are kept in get_stats().
+"""
+
+import os
+import re
+import time
+import threading
+from concurrent.futures import Future, wait
+from dataclasses import dataclass, field
+from typing import Dict, Any, Callable, List, Optional, Tuple, TYPE_CHECKING
+
+from dotenv import load_dotenv
+
+from .device_inventory import DeviceInventory, device_type
+from .lookup_index import normalize_name
+from .tool_cache import normalize_arguments
+from .metrics import TOOL_PREFETCH
+
+if TYPE_CHECKING:
+    from .function_calling import FunctionCaller
+
+# Load environment variables
+load_dotenv()
+
+PREFETCH_OFF = "off"
+PREFETCH_WARM = "warm"
+PREFETCH_INJECT = "inject"
+PREFETCH_MODES = (PREFETCH_OFF, PREFETCH_WARM, PREFETCH_INJECT)
+
+
+class EntityExtractor:
+    """Finds device IDs and software names in a message and maps them to tool calls."""
+
+    def __init__(self, device_prefixes: List[str], software_names: List[str]):
+        """Initialize the extractor.
+
+        Args:
+            device_prefixes: Device types whose IDs are the type plus a number (printer -> printer01)
+            software_names: Catalog names and aliases, matched as whole words
+        """
+        self._device_pattern = None
+        if device_prefixes:
+            self._device_pattern = re.compile(
+                r"\b(?:%s)\d+\b" % "|".join(map(re.escape, sorted(device_prefixes, key=len, reverse=True))),
+                re.IGNORECASE
+            )
+        names = sorted({normalize_name(name) for name in software_names if normalize_name(name)}, key=len, reverse=True)
+        self._software_pattern = re.compile(r"\b(?:%s)\b" % "|".join(map(re.escape, names))) if names else None
+
+    def extract(self, text: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """Get the tool calls for the entities in a message.
+
+        Returns:
+            (function name, arguments) pairs, in order of appearance, without duplicates
+        """
+        calls: List[Tuple[str, Dict[str, Any]]] = []
+        if self._device_pattern is not None:
+            for match in self._device_pattern.finditer(text):
+                call = ("check_device_status", {"device_id": match.group(0).lower()})
+                if call not in calls:
+                    calls.append(call)
+        if self._software_pattern is not None:
+            for match in self._software_pattern.finditer(normalize_name(text)):
+                call = ("get_software_info", {"software_name": match.group(0)})
+                if call not in calls:
+                    calls.append(call)
+        return calls
+
+
+def create_entity_extractor(use_case: str, inventory: DeviceInventory) -> EntityExtractor:
+    """Create the entity extractor of a use case.
+
+    Args:
+        use_case: The use case (it_helpdesk)
+        inventory: Device inventory whose ID patterns are recognized
+    """
+    if use_case == "it_helpdesk":
+        from mock_data.it_helpdesk import SOFTWARE_CATALOG, SOFTWARE_ALIASES
+        prefixes = sorted({device_type(device_id) for device_id in inventory.device_ids()})
+        names = [key.replace("_", " ") for key in SOFTWARE_CATALOG]
+        names += [software["name"] for software in SOFTWARE_CATALOG.values()]
+        # Single-word aliases like "Word" are too common in questions to mean the product
+        names += [alias for aliases in SOFTWARE_ALIASES.values() for alias in aliases if len(alias.split()) > 1]
+        return EntityExtractor(prefixes, names)
+    raise ValueError(f"Unknown use case: {use_case}")
+
+
+@dataclass
+class PrefetchedCall:
+    """A tool call started ahead of the model."""
+    function: str
+    arguments: Dict[str, Any]
+    future: Future
+    started: float = field(default_factory=time.perf_counter)
+    finished: Optional[float] = None
+
+    @property
+    def duration_ms(self) -> float:
+        """Time the call took (or has run so far)."""
+        return ((self.finished or time.perf_counter()) - self.started) * 1000
+
+
+@dataclass
+class PrefetchRecord:
+    """Accounting for the prefetch of one turn."""
+    mode: str
+    calls: int = 0
+    used: int = 0
+    injected: int = 0
+    wait_ms: float = 0.0
+    saved_ms: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the record to a JSON-friendly dictionary."""
+        return {
+            "mode": self.mode,
+            "calls": self.calls,
+            "used": self.used,
+            "injected": self.injected,
+            "wait_ms": round(self.wait_ms, 3),
+            "saved_ms": round(self.saved_ms, 3)
+        }
+
+
+class ToolPrefetch:
+    """The prefetched calls of one turn."""
+
+    def __init__(
+        self,
+        mode: str,
+        calls: List[PrefetchedCall],
+        timeout_s: float,
+        call_key: Optional[Callable[[str, Dict[str, Any]], Any]] = None
+    ):
+        """Initialize the handle.
+
+        Args:
+            mode: warm or inject
+            calls: Calls started for the turn
+            timeout_s: Longest wait for the calls when injecting
+            call_key: Maps (function name, arguments) to what makes two calls the same
+                lookup; defaults to the name and normalized arguments
+        """
+        self.mode = mode
+        self.calls = calls
+        self.timeout_s = timeout_s
+        self.call_key = call_key or (lambda function, arguments: (function, normalize_arguments(arguments)))
+        self.record = PrefetchRecord(mode=mode, calls=len(calls))
+
+    def results(self) -> List[Tuple[str, Dict[str, Any], Any]]:
+        """Wait for the calls (at most timeout_s) and get the finished ones.
+
+        Returns:
+            (function name, arguments, result) of every call that finished in time
+        """
+        started = time.perf_counter()
+        wait([call.future for call in self.calls], timeout=self.timeout_s)
+        self.record.wait_ms = (time.perf_counter() - started) * 1000
+        finished = [(call.function, call.arguments, call.future.result()) for call in self.calls if call.future.done()]
+        self.record.injected = len(finished)
+        return finished
+
+    def settle(self, tool_calls: List[Tuple[str, Dict[str, Any]]], completion_ms: List[float], tool_wait_ms: float) -> PrefetchRecord:
+        """Work out what the prefetch saved once the model has answered.
+
+        Args:
+            tool_calls: (function name, arguments) of the calls the model made itself
+            completion_ms: Durations of the turn's completions
+            tool_wait_ms: Time the turn spent waiting for tool calls
+
+        Returns:
+            The turn's record
+        """
+        record = self.record
+        if self.mode == PREFETCH_INJECT:
+            record.used = record.injected
+            if record.injected and completion_ms:
+                # The model skipped the completion that would have asked for the calls
+                # (estimated as long as the answering one) and the calls themselves
+                slowest = max(call.duration_ms for call in self.calls if call.future.done())
+                record.saved_ms = max(0.0, completion_ms[0] + slowest - record.wait_ms)
+        else:
+            # A model call counts as using the prefetch if it hits the same cache entry
+            made = set()
+            for function, arguments in tool_calls:
+                try:
+                    made.add(self.call_key(function, arguments))
+                except Exception:
+                    # Malformed arguments; the call failed and matched nothing
+                    continue
+            used = [call for call in self.calls if self.call_key(call.function, call.arguments) in made]
+            record.used = len(used)
+            if used:
+                # Without the prefetch, the tool round would have lasted at least as long as the slowest call
+                record.saved_ms = max(0.0, max(call.duration_ms for call in used) - tool_wait_ms)
+        TOOL_PREFETCH.labels(result="used").inc(record.used)
+        TOOL_PREFETCH.labels(result="unused").inc(record.calls - record.used)
+        return record
+
+
+class ToolPrefetcher:
+    """Starts tool calls for the entities of incoming messages."""
+
+    def __init__(self, function_caller: "FunctionCaller", extractor: EntityExtractor, mode: Optional[str] = None):
+        """Initialize the prefetcher.
+
+        Args:
+            function_caller: Runs the prefetched calls (through its result caches)
+            extractor: Finds the entities of a message
+            mode: off, warm or inject; defaults to RAG_TOOL_PREFETCH
+        """
+        mode = (mode or os.getenv("RAG_TOOL_PREFETCH", PREFETCH_WARM)).lower()
+        if mode not in PREFETCH_MODES:
+            raise ValueError(f"Unknown tool prefetch mode: {mode}")
+        self.mode = mode
+        self.function_caller = function_caller
+        self.extractor = extractor
+        self.timeout_s = float(os.getenv("RAG_TOOL_PREFETCH_TIMEOUT", "2"))
+
+        self._stats_lock = threading.Lock()
+        self._stats = {"turns": 0, "calls": 0, "used": 0, "total_saved_ms": 0.0}
+
+    @property
+    def enabled(self) -> bool:
+        """Whether prefetching is enabled."""
+        return self.mode != PREFETCH_OFF
+
+    def start(self, message: str) -> Optional[ToolPrefetch]:
+        """Start the lookups for the entities in a message.
+
+        Returns:
+            Handle for the turn, or None if nothing was prefetched
+        """
+        if not self.enabled:
+            return None
+        calls = []
+        for function_name, arguments in self.extractor.extract(message):
+            function = self.function_caller.functions.get(function_name)
+            # Warming only helps functions whose results are cached
+            if function is None or (self.mode == PREFETCH_WARM and function.cache is None):
+                continue
+            future = self.function_caller.submit_call(function_name, arguments)
+            call = PrefetchedCall(function_name, arguments, future)
+            future.add_done_callback(lambda _, call=call: setattr(call, "finished", time.perf_counter()))
+            calls.append(call)
+        if not calls:
+            return None
+        return ToolPrefetch(self.mode, calls, self.timeout_s, call_key=self._call_key)
+
+    def _call_key(self, function_name: str, arguments: Dict[str, Any]) -> Tuple[str, Any]:
+        """Identify a call by its function and result cache key."""
+        function = self.function_caller.functions.get(function_name)
+        if function is not None and function.cache is not None:
+            return function_name, function.cache.key(arguments)
+        return function_name, normalize_arguments(arguments)
+
+    def record(self, record: PrefetchRecord) -> None:
+        """Add a turn's record to the totals."""
+        with self._stats_lock:
+            self._stats["turns"] += 1
+            self._stats["calls"] += record.calls
+            self._stats["used"] += record.used
+            self._stats["total_saved_ms"] += record.saved_ms
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cumulative prefetch statistics."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["mode"] = self.mode
+        stats["avg_saved_ms"] = stats["total_saved_ms"] / stats["turns"] if stats["turns"] else 0.0
+        return stats
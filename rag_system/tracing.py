@@ -0,0 +1,416 @@
+"""Lightweight per-turn tracing with OpenTelemetry-compatible JSON export.
+
+A trace is started for every chatbot turn; components open spans around
+their stages (embedding, FAISS search, prompt build, LLM calls, tools, TTS).
+Spans follow context variables, so work handed to thread pools that copy the
+context (speculation, resilience) lands in the same trace. Outside a trace,
+spans cost a couple of clock reads and are discarded.
+
+Set RAG_TRACE_FILE to append every finished trace to a file as one OTLP/JSON
+``ExportTraceServiceRequest`` per line (the format of the OpenTelemetry
+Collector file exporter). Finished traces are queued and written by a
+background thread, so export adds no file I/O to the turn; when more than
+RAG_TRACE_QUEUE_SIZE traces are waiting, new ones are dropped and counted.
+"""
+
+import os
+import json
+import time
+import queue
+import atexit
+import random
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Iterator, Callable
+
+# OTLP span kinds
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+
+# OTLP status codes
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# Which spans make up each part of the at-a-glance breakdown
+STAGE_CATEGORIES = {
+    "embedding": "retrieval",
+    "faiss_search": "retrieval",
+    "prompt_build": "generation",
+    "llm": "generation",
+    "tool": "tools",
+    "tts": "tts"
+}
+
+SERVICE_NAME = "rag-chatbot"
+
+_span_listeners: List[Callable[["Span"], None]] = []
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """A timed operation within a trace."""
+
+    __slots__ = ("name", "span_id", "parent_id", "kind", "start_ns", "end_ns", "attributes", "status", "status_message")
+
+    def __init__(self, name: str, parent_id: Optional[str], start_ns: int, kind: int = SPAN_KIND_INTERNAL,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = start_ns
+        self.end_ns: Optional[int] = None
+        self.attributes = dict(attributes or {})
+        self.status = STATUS_UNSET
+        self.status_message = ""
+
+    @property
+    def duration_ms(self) -> float:
+        """Span duration (0 while still open)."""
+        return (self.end_ns - self.start_ns) / 1e6 if self.end_ns is not None else 0.0
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Set an attribute on the span."""
+        self.attributes[key] = value
+
+    def set_error(self, error: BaseException) -> None:
+        """Mark the span as failed."""
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"
+
+
+class Trace:
+    """Spans recorded for one chatbot turn."""
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        """Initialize a trace and its root span.
+
+        Args:
+            name: Root span name
+            attributes: Root span attributes
+        """
+        self.trace_id = f"{random.getrandbits(128):032x}"
+        # Wall-clock anchor for OTLP timestamps; durations come from the monotonic clock
+        self._epoch_ns = time.time_ns()
+        self._anchor_ns = time.perf_counter_ns()
+        self._lock = threading.Lock()
+        self._closed = False
+        # Spans finishing after the turn, held until a late-span listener is set
+        self._late_spans: List[Span] = []
+        self._late_listener: Optional[Callable[[Span], None]] = None
+        self.root = Span(name, None, self.now_ns(), attributes=attributes)
+        self.spans: List[Span] = [self.root]
+
+    def now_ns(self) -> int:
+        """Current time in Unix nanoseconds, measured monotonically from the trace start."""
+        return self._epoch_ns + (time.perf_counter_ns() - self._anchor_ns)
+
+    def add(self, span: Span) -> None:
+        """Record a finished span.
+
+        Spans finishing once the trace is closed (e.g. abandoned speculation)
+        are left out of the trace and go to the late-span listener instead.
+        """
+        with self._lock:
+            if not self._closed:
+                self.spans.append(span)
+                return
+            listener = self._late_listener
+            if listener is None:
+                self._late_spans.append(span)
+                return
+        listener(span)
+
+    def on_late_span(self, listener: Callable[[Span], None]) -> None:
+        """Call a function with every span finishing after the trace closed, including earlier ones."""
+        with self._lock:
+            self._late_listener = listener
+            late, self._late_spans = self._late_spans, []
+        for span in late:
+            listener(span)
+
+    def finish(self) -> None:
+        """Close the root span and stop accepting spans."""
+        with self._lock:
+            self._closed = True
+        if self.root.end_ns is None:
+            self.root.end_ns = self.now_ns()
+
+    def summary(self) -> Dict[str, Any]:
+        """Summarize the trace for a chat response.
+
+        Stage totals are summed per span name; spans that ran in parallel
+        (e.g. speculation) can add up to more than the turn's total time.
+        """
+        with self._lock:
+            spans = [span for span in self.spans if span is not self.root and span.end_ns is not None]
+
+        stages: Dict[str, float] = {}
+        breakdown: Dict[str, float] = {}
+        ttft = None
+        for span in spans:
+            stages[span.name] = stages.get(span.name, 0.0) + span.duration_ms
+            category = STAGE_CATEGORIES.get(span.name)
+            if category:
+                breakdown[category] = breakdown.get(category, 0.0) + span.duration_ms
+            if span.name == "llm" and ttft is None and "llm.ttft_ms" in span.attributes:
+                ttft = span.attributes["llm.ttft_ms"]
+
+        if ttft is not None:
+            stages["llm_ttft"] = ttft
+        total_ms = self.root.duration_ms
+
+        return {
+            "trace_id": self.trace_id,
+            "total_ms": round(total_ms, 3),
+            "stages": {name: round(ms, 3) for name, ms in stages.items()},
+            "breakdown": {name: round(ms, 3) for name, ms in breakdown.items()},
+            "dominant": max(breakdown, key=breakdown.get) if breakdown else None,
+            "spans": [
+                {
+                    "name": span.name,
+                    "span_id": span.span_id,
+                    "parent_id": span.parent_id,
+                    "start_ms": round((span.start_ns - self.root.start_ns) / 1e6, 3),
+                    "duration_ms": round(span.duration_ms, 3),
+                    "attributes": dict(span.attributes),
+                    **({"error": span.status_message} if span.status == STATUS_ERROR else {})
+                }
+                for span in sorted(spans, key=lambda s: s.start_ns)
+            ]
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Convert the trace to an OTLP/JSON ExportTraceServiceRequest."""
+        with self._lock:
+            spans = [span for span in self.spans if span.end_ns is not None]
+
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+                "scopeSpans": [{
+                    "scope": {"name": "rag_system.tracing"},
+                    "spans": [
+                        {
+                            "traceId": self.trace_id,
+                            "spanId": span.span_id,
+                            **({"parentSpanId": span.parent_id} if span.parent_id else {}),
+                            "name": span.name,
+                            "kind": span.kind,
+                            "startTimeUnixNano": str(span.start_ns),
+                            "endTimeUnixNano": str(span.end_ns),
+                            "attributes": _otlp_attributes(span.attributes),
+                            "status": {"code": span.status, **({"message": span.status_message} if span.status_message else {})}
+                        }
+                        for span in spans
+                    ]
+                }]
+            }]
+        }
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Convert attributes to OTLP key/value pairs."""
+    converted = []
+    for key, value in attributes.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            typed = {"stringValue": str(value)}
+        converted.append({"key": key, "value": typed})
+    return converted
+
+
+class FileTraceExporter:
+    """Appends finished traces to a file as OTLP/JSON lines from a background thread."""
+
+    def __init__(self, path: str, max_queue: int = 1000):
+        """Initialize the exporter.
+
+        Args:
+            path: File to append to
+            max_queue: Traces waiting to be written before new ones are dropped
+        """
+        self.path = path
+        self._queue: "queue.Queue[Optional[Trace]]" = queue.Queue(maxsize=max_queue)
+        self._stats_lock = threading.Lock()
+        self._stats = {"exported": 0, "dropped": 0, "write_errors": 0}
+        self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+        self._thread.start()
+
+    def export(self, trace: Trace) -> None:
+        """Queue a finished trace without blocking; drop it if the queue is full."""
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            with self._stats_lock:
+                self._stats["dropped"] += 1
+
+    def _run(self) -> None:
+        """Serialize and write queued traces until the stop marker arrives."""
+        while True:
+            trace = self._queue.get()
+            if trace is None:
+                return
+            traces = [trace]
+            # Write whatever else is already queued in the same batch
+            stop = False
+            while True:
+                try:
+                    trace = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if trace is None:
+                    stop = True
+                    break
+                traces.append(trace)
+            self._write(traces)
+            if stop:
+                return
+
+    def _write(self, traces: List[Trace]) -> None:
+        """Append a batch of traces."""
+        try:
+            lines = [json.dumps(trace.to_otlp(), separators=(",", ":")) for trace in traces]
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            with self._stats_lock:
+                self._stats["exported"] += len(traces)
+        except (OSError, ValueError, TypeError):
+            with self._stats_lock:
+                self._stats["write_errors"] += 1
+
+    def close(self, timeout: float = 2.0) -> None:
+        """Write queued traces and stop the writer thread."""
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get exported/dropped counts and the current queue depth."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize()
+        return stats
+
+
+_exporter: Optional[FileTraceExporter] = None
+_exporter_configured = False
+
+
+def get_exporter() -> Optional[FileTraceExporter]:
+    """Get the trace exporter configured by RAG_TRACE_FILE (None if unset)."""
+    global _exporter, _exporter_configured
+    if not _exporter_configured:
+        path = os.getenv("RAG_TRACE_FILE")
+        _exporter = FileTraceExporter(path, max_queue=int(os.getenv("RAG_TRACE_QUEUE_SIZE", "1000"))) if path else None
+        if _exporter is not None:
+            atexit.register(_exporter.close)
+        _exporter_configured = True
+    return _exporter
+
+
+def set_exporter(exporter: Optional[FileTraceExporter]) -> None:
+    """Replace the trace exporter (None disables export)."""
+    global _exporter, _exporter_configured
+    _exporter = exporter
+    _exporter_configured = True
+
+
+@contextmanager
+def start_trace(name: str, **attributes: Any) -> Iterator[Trace]:
+    """Record a trace for the block and export it when the block exits.
+
+    Args:
+        name: Root span name
+        **attributes: Root span attributes
+
+    Yields:
+        The trace; call summary() after the block for the finished timings
+    """
+    trace = Trace(name, attributes)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(trace.root)
+    try:
+        yield trace
+    except BaseException as e:
+        trace.root.set_error(e)
+        raise
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        trace.finish()
+        exporter = get_exporter()
+        if exporter is not None:
+            exporter.export(trace)
+
+
+def start_span(name: str, kind: int = SPAN_KIND_INTERNAL, **attributes: Any) -> Span:
+    """Open a span under the current span without making it current.
+
+    Used for operations reported as start/end events (e.g. LangChain callbacks);
+    pass the span to end_span when the operation finishes.
+    """
+    trace = _current_trace.get()
+    parent = _current_span.get()
+    start_ns = trace.now_ns() if trace is not None else time.time_ns()
+    return Span(name, parent.span_id if parent else None, start_ns, kind, attributes)
+
+
+def end_span(span: Span) -> None:
+    """Close a span opened with start_span and record it in the current trace."""
+    trace = _current_trace.get()
+    span.end_ns = trace.now_ns() if trace is not None else time.time_ns()
+    if trace is not None:
+        trace.add(span)
+    for listener in _span_listeners:
+        try:
+            listener(span)
+        except Exception:
+            pass
+
+
+def add_span_listener(listener: Callable[[Span], None]) -> None:
+    """Call a function with every finished span, inside a trace or not (e.g. metrics)."""
+    _span_listeners.append(listener)
+
+
+@contextmanager
+def span(name: str, kind: int = SPAN_KIND_INTERNAL, **attributes: Any) -> Iterator[Span]:
+    """Time the block as a span that becomes the parent of spans opened inside it.
+
+    Args:
+        name: Span name (e.g. embedding, faiss_search, llm, tool)
+        kind: OTLP span kind
+        **attributes: Span attributes
+
+    Yields:
+        The span, so the block can add attributes
+    """
+    current = start_span(name, kind, **attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.set_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        end_span(current)
+
+
+def current_trace() -> Optional[Trace]:
+    """The trace being recorded in this context, if any."""
+    return _current_trace.get()
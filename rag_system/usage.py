@@ -0,0 +1,216 @@
+"""Token usage and cost attribution per turn, stage and conversation.
+
+Usage is read from the turn's trace: LLM spans carry the prompt and
+completion tokens reported by the API (or an estimate when a streamed
+response carries none), and embedding spans carry the query's tokens.
+Each call is attributed to the top-level stage it ran under (routing,
+function_calling, rag, speculative_rag). Stages whose output was thrown
+away count as wasted: a function-calling attempt that fell through to RAG,
+or speculative RAG abandoned because tools answered. Calls of abandoned
+work that finish after the turn are added to the conversation's usage when
+they finish (see track_late_usage).
+
+Prices are USD per 1,000 tokens and default to GPT-4o-mini and
+text-embedding-3-small list prices:
+    AZURE_OPENAI_PRICE_PROMPT_PER_1K (default 0.00015)
+    AZURE_OPENAI_PRICE_COMPLETION_PER_1K (default 0.0006)
+    AZURE_OPENAI_PRICE_EMBEDDING_PER_1K (default 0.00002)
+"""
+
+import os
+import threading
+from typing import Dict, Any, Optional
+
+from dotenv import load_dotenv
+
+from .tracing import Trace, Span
+from .metrics import COST, WASTED_TOKENS
+
+# Load environment variables
+load_dotenv()
+
+# Stage of calls whose top-level stage was still running when the turn ended
+# (e.g. abandoned speculation); their results were never used
+ABANDONED_STAGE = "abandoned"
+
+USAGE_FIELDS = ("prompt_tokens", "completion_tokens", "embedding_tokens", "total_tokens", "cost_usd", "calls")
+
+
+def get_pricing() -> Dict[str, float]:
+    """Get token prices (USD per 1,000 tokens) from the environment."""
+    return {
+        "prompt": float(os.getenv("AZURE_OPENAI_PRICE_PROMPT_PER_1K", "0.00015")),
+        "completion": float(os.getenv("AZURE_OPENAI_PRICE_COMPLETION_PER_1K", "0.0006")),
+        "embedding": float(os.getenv("AZURE_OPENAI_PRICE_EMBEDDING_PER_1K", "0.00002"))
+    }
+
+
+def _empty() -> Dict[str, Any]:
+    """Zeroed usage counters."""
+    return {field: 0 for field in USAGE_FIELDS}
+
+
+def _add(total: Dict[str, Any], usage: Dict[str, Any]) -> None:
+    """Add one usage dict into another."""
+    for field in USAGE_FIELDS:
+        total[field] += usage.get(field, 0)
+
+
+def _round(usage: Dict[str, Any]) -> Dict[str, Any]:
+    """Round the cost for display."""
+    usage = dict(usage)
+    usage["cost_usd"] = round(usage["cost_usd"], 8)
+    return usage
+
+
+def _span_usage(span: Span, pricing: Dict[str, float]) -> Optional[Dict[str, Any]]:
+    """Usage of an LLM or embedding span (None for other spans)."""
+    if span.name == "llm":
+        prompt = int(span.attributes.get("llm.prompt_tokens") or 0)
+        completion = int(span.attributes.get("llm.completion_tokens") or 0)
+        usage = {
+            "prompt_tokens": prompt,
+            "completion_tokens": completion,
+            "embedding_tokens": 0,
+            "cost_usd": (prompt * pricing["prompt"] + completion * pricing["completion"]) / 1000,
+            "calls": 1
+        }
+    elif span.name == "embedding":
+        tokens = int(span.attributes.get("embedding.tokens") or 0)
+        usage = {
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "embedding_tokens": tokens,
+            "cost_usd": tokens * pricing["embedding"] / 1000,
+            "calls": 1
+        }
+    else:
+        return None
+    usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"] + usage["embedding_tokens"]
+    return usage
+
+
+def turn_usage(trace: Trace, wasted_stages: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Aggregate a turn's token usage by stage.
+
+    Args:
+        trace: Finished trace of the turn
+        wasted_stages: Stages whose results were discarded, mapped to the reason
+
+    Returns:
+        Turn totals, per-stage usage and wasted usage
+    """
+    wasted_stages = wasted_stages or {}
+    pricing = get_pricing()
+    spans = list(trace.spans)
+    by_id = {span.span_id: span for span in spans}
+
+    def stage_of(span) -> str:
+        """Name of the span's ancestor directly under the root."""
+        current = span
+        while current.parent_id and current.parent_id != trace.root.span_id:
+            parent = by_id.get(current.parent_id)
+            if parent is None:
+                return ABANDONED_STAGE
+            current = parent
+        return current.name
+
+    by_stage: Dict[str, Dict[str, Any]] = {}
+    for span in spans:
+        usage = _span_usage(span, pricing)
+        if usage is not None:
+            _add(by_stage.setdefault(stage_of(span), _empty()), usage)
+
+    total = _empty()
+    wasted = _empty()
+    wasted_by_reason: Dict[str, int] = {}
+    for stage, usage in by_stage.items():
+        _add(total, usage)
+        COST.labels(stage=stage).inc(usage["cost_usd"])
+        reason = wasted_stages.get(stage) or ("abandoned" if stage == ABANDONED_STAGE else None)
+        if reason:
+            _add(wasted, usage)
+            wasted_by_reason[reason] = wasted_by_reason.get(reason, 0) + usage["total_tokens"]
+            if usage["total_tokens"]:
+                WASTED_TOKENS.labels(stage=stage, reason=reason).inc(usage["total_tokens"])
+
+    result = _round(total)
+    result["by_stage"] = {stage: _round(usage) for stage, usage in by_stage.items()}
+    result["wasted"] = {**_round(wasted), "by_reason": wasted_by_reason}
+    return result
+
+
+def track_late_usage(trace: Trace, tracker: "UsageTracker", wasted_stages: Optional[Dict[str, str]] = None) -> None:
+    """Count calls that finish after the turn (abandoned work still running) as wasted.
+
+    The turn's own usage is already reported; these calls are added to the
+    conversation totals and the cost and waste metrics as they finish.
+
+    Args:
+        trace: Finished trace of the turn
+        tracker: The conversation's usage tracker
+        wasted_stages: The turn's wasted stages (for the reason of abandoned work)
+    """
+    reason = (wasted_stages or {}).get(ABANDONED_STAGE) or "abandoned"
+    pricing = get_pricing()
+
+    def on_late_span(span: Span) -> None:
+        usage = _span_usage(span, pricing)
+        if usage is None:
+            return
+        COST.labels(stage=ABANDONED_STAGE).inc(usage["cost_usd"])
+        if usage["total_tokens"]:
+            WASTED_TOKENS.labels(stage=ABANDONED_STAGE, reason=reason).inc(usage["total_tokens"])
+        tracker.add_late(usage)
+
+    trace.on_late_span(on_late_span)
+
+
+class UsageTracker:
+    """Accumulates token usage and cost over a conversation."""
+
+    def __init__(self):
+        """Initialize an empty tracker."""
+        self._lock = threading.Lock()
+        self.turns = 0
+        self._total = _empty()
+        self._wasted = _empty()
+        self._by_stage: Dict[str, Dict[str, Any]] = {}
+
+    def add_turn(self, usage: Dict[str, Any]) -> None:
+        """Add a turn's usage (as returned by turn_usage)."""
+        with self._lock:
+            self.turns += 1
+            _add(self._total, usage)
+            _add(self._wasted, usage["wasted"])
+            for stage, stage_usage in usage["by_stage"].items():
+                _add(self._by_stage.setdefault(stage, _empty()), stage_usage)
+
+    def add_late(self, usage: Dict[str, Any]) -> None:
+        """Add the usage of a call that finished after its turn (wasted, abandoned stage)."""
+        with self._lock:
+            _add(self._total, usage)
+            _add(self._wasted, usage)
+            _add(self._by_stage.setdefault(ABANDONED_STAGE, _empty()), usage)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get conversation totals, per-stage usage, waste and per-turn averages."""
+        with self._lock:
+            stats = _round(self._total)
+            stats["turns"] = self.turns
+            stats["by_stage"] = {stage: _round(usage) for stage, usage in self._by_stage.items()}
+            stats["wasted"] = _round(self._wasted)
+        turns = stats["turns"]
+        stats["avg_tokens_per_turn"] = stats["total_tokens"] / turns if turns else 0.0
+        stats["avg_cost_usd_per_turn"] = stats["cost_usd"] / turns if turns else 0.0
+        stats["wasted_share"] = stats["wasted"]["total_tokens"] / stats["total_tokens"] if stats["total_tokens"] else 0.0
+        stats["pricing_per_1k"] = get_pricing()
+        return stats
+
+    def reset(self) -> None:
+        """Forget accumulated usage."""
+        with self._lock:
+            self.turns = 0
+            self._total = _empty()
+            self._wasted = _empty()
+            self._by_stage = {}
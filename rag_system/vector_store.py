@@ -2,6 +2,8 @@
 
 import os
 import pickle
+import threading
+from collections import OrderedDict
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 
@@ -11,6 +13,19 @@ from langchain_openai import AzureOpenAIEmbeddings
 from langchain_core.documents import Document
 from dotenv import load_dotenv
 
+from .clients import get_embeddings
+from .resilience import get_policy
+from .rate_limiter import estimate_tokens
+from .offline_azure import offline_mode_enabled
+from .tracing import span, SPAN_KIND_CLIENT
+from .metrics import INDEX_DOCUMENTS, record_cache_lookup
+from .logger import get_logger
+from .index_artifact import (
+    MANIFEST_FILE, artifact_path, corpus_fingerprint, read_manifest, verify_index, write_manifest
+)
+
+logger = get_logger(__name__)
+
 # Load environment variables
 load_dotenv()
 
@@ -26,26 +41,30 @@ class VectorStore:
         self.use_case = use_case
         self.embeddings = self._initialize_embeddings()
         self.vectorstore: Optional[FAISS] = None
-        self.index_path = f"./vector_indexes/{use_case}_index"
+        # Offline embeddings are not comparable with real ones, so keep their index apart
+        suffix = "_offline" if offline_mode_enabled() else ""
+        self.index_path = f"./vector_indexes/{use_case}_index{suffix}"
+
+        # What the loaded index was built from (see index_artifact) and where it came from
+        self.manifest: Optional[Dict[str, Any]] = None
+        self.index_source: Optional[str] = None
+        self._corpus_fingerprint: Optional[str] = None
+        self._added_documents = 0
+
+        # Small LRU cache so a query embedded by the router is not embedded again for search
+        self.query_cache_size = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "256"))
+        self._query_embeddings: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+
+        # Texts per embedding request when indexing; each request is rate limited on its own
+        self.embedding_batch_size = int(os.getenv("AZURE_OPENAI_EMBEDDING_BATCH_SIZE", "64"))
 
         # Create vector indexes directory if it doesn't exist
         Path("./vector_indexes").mkdir(exist_ok=True)
 
     def _initialize_embeddings(self) -> AzureOpenAIEmbeddings:
-        """Initialize Azure OpenAI embeddings."""
-        # Use Embedding-specific credentials if available, otherwise fallback to general ones
-        embedding_endpoint = os.getenv("AZURE_OPENAI_EMBEDDING_ENDPOINT") or os.getenv("AZURE_OPENAI_ENDPOINT")
-        embedding_key = os.getenv("AZURE_OPENAI_EMBEDDING_API_KEY") or os.getenv("AZURE_OPENAI_API_KEY")
-        embedding_deployment = os.getenv("AZURE_OPENAI_EMBED_MODEL") or os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-3-small")
-        embedding_api_version = os.getenv("AZURE_OPENAI_EMBEDDING_API_VERSION") or os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
-        
-        return AzureOpenAIEmbeddings(
-            azure_deployment=embedding_deployment,
-            model=embedding_deployment,
-            azure_endpoint=embedding_endpoint,
-            api_key=embedding_key,
-            api_version=embedding_api_version
-        )
+        """Initialize Azure OpenAI embeddings from the shared, pooled client factory."""
+        return get_embeddings()
 
     def load_documents(self, documents: List[Dict[str, Any]]) -> List[Document]:
         """Convert document dictionaries to Langchain Document objects.
@@ -67,16 +86,24 @@ class VectorStore:
     def create_index(self, documents: List[Dict[str, Any]], force_recreate: bool = False) -> None:
         """Create FAISS index from documents.
 
+        An index already saved locally, or else the prebuilt artifact shipped
+        with the data, is loaded instead if its manifest matches these
+        documents and the embedding model; only otherwise is the corpus embedded.
+
         Args:
             documents: List of document dictionaries
             force_recreate: Whether to force recreation of existing index
         """
-        if not force_recreate and self.index_exists():
-            print(f"Loading existing index for {self.use_case}...")
-            self.load_index()
-            return
+        fingerprint = corpus_fingerprint(documents)
+        if not force_recreate:
+            if self._load_verified(self.index_path, fingerprint, "local"):
+                return
+            artifact = artifact_path(self.use_case)
+            if Path(artifact).resolve() != Path(self.index_path).resolve() \
+                    and self._load_verified(str(artifact), fingerprint, "artifact"):
+                return
 
-        print(f"Creating new FAISS index for {self.use_case}...")
+        logger.info("index_creating", use_case=self.use_case)
 
         # Convert to Langchain Documents
         docs = self.load_documents(documents)
@@ -85,11 +112,19 @@ class VectorStore:
             raise ValueError("No documents provided for indexing")
 
         # Create FAISS index
-        self.vectorstore = FAISS.from_documents(docs, self.embeddings)
+        texts = [doc.page_content for doc in docs]
+        self.vectorstore = FAISS.from_embeddings(
+            list(zip(texts, self.embed_documents(texts))),
+            self.embeddings,
+            metadatas=[doc.metadata for doc in docs]
+        )
+        self._corpus_fingerprint = fingerprint
+        self._added_documents = 0
+        self.index_source = "built"
 
         # Save the index
         self.save_index()
-        print(f"Index created and saved with {len(docs)} documents")
+        logger.info("index_created", use_case=self.use_case, documents=len(docs))
 
     def add_documents(self, documents: List[Dict[str, Any]]) -> None:
         """Add new documents to existing index.
@@ -101,9 +136,76 @@ class VectorStore:
             raise ValueError("Vector store not initialized. Create index first.")
 
         docs = self.load_documents(documents)
-        self.vectorstore.add_documents(docs)
+        texts = [doc.page_content for doc in docs]
+        self.vectorstore.add_embeddings(
+            list(zip(texts, self.embed_documents(texts))),
+            metadatas=[doc.metadata for doc in docs]
+        )
+        # Still valid for the same corpus; the manifest records the additions
+        self._added_documents += len(docs)
         self.save_index()
-        print(f"Added {len(docs)} documents to existing index")
+        logger.info("documents_added", use_case=self.use_case, documents=len(docs))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed document texts in batches of embedding_batch_size.
+
+        Each batch is one request under the embedding resilience policy, so
+        building an index is rate limited, retried and timed out like queries.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            One embedding vector per text
+        """
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.embedding_batch_size):
+            batch = texts[start:start + self.embedding_batch_size]
+            tokens = sum(estimate_tokens(text) for text in batch)
+            with span("embedding", kind=SPAN_KIND_CLIENT, **{"embedding.tokens": tokens, "embedding.texts": len(batch)}):
+                vectors.extend(get_policy("embedding").call(
+                    lambda timeout, batch=batch: self.embeddings.embed_documents(batch, timeout=timeout),
+                    tokens=tokens
+                ))
+        return vectors
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query, reusing the vector if the same query was embedded recently.
+
+        Args:
+            query: Query text
+
+        Returns:
+            Query embedding vector
+        """
+        with self._query_cache_lock:
+            if query in self._query_embeddings:
+                self._query_embeddings.move_to_end(query)
+                record_cache_lookup("query_embedding", hit=True)
+                return self._query_embeddings[query]
+        record_cache_lookup("query_embedding", hit=False)
+
+        # Embedding models use the cl100k tokenizer, so the estimate is the billed count
+        tokens = estimate_tokens(query)
+        with span("embedding", kind=SPAN_KIND_CLIENT, **{"embedding.tokens": tokens}):
+            embedding = get_policy("embedding").call(
+                lambda timeout: self.embeddings.embed_query(query, timeout=timeout),
+                tokens=tokens
+            )
+
+        if self.query_cache_size > 0:
+            with self._query_cache_lock:
+                self._query_embeddings[query] = embedding
+                self._query_embeddings.move_to_end(query)
+                while len(self._query_embeddings) > self.query_cache_size:
+                    self._query_embeddings.popitem(last=False)
+
+        return embedding
+
+    def clear_query_cache(self) -> None:
+        """Forget cached query embeddings."""
+        with self._query_cache_lock:
+            self._query_embeddings.clear()
 
     def search(self, query: str, k: int = 4, score_threshold: float = 0.5) -> List[Dict[str, Any]]:
         """Search for similar documents.
@@ -120,7 +222,10 @@ class VectorStore:
             raise ValueError("Vector store not initialized. Load or create index first.")
 
         # Perform similarity search with scores
-        results = self.vectorstore.similarity_search_with_score(query, k=k)
+        embedding = self.embed_query(query)
+        with span("faiss_search", k=k) as search_span:
+            results = self.vectorstore.similarity_search_with_score_by_vector(embedding, k=k)
+            search_span.set_attribute("index.size", self.vectorstore.index.ntotal)
 
         # Filter by score threshold and format results
         filtered_results = []
@@ -146,24 +251,71 @@ class VectorStore:
 
         # Save FAISS index
         self.vectorstore.save_local(self.index_path)
-        print(f"Index saved to {self.index_path}")
+        if self._corpus_fingerprint is not None:
+            self.manifest = write_manifest(
+                self.index_path,
+                self.use_case,
+                self._corpus_fingerprint,
+                self.vectorstore.index.d,
+                self.vectorstore.index.ntotal,
+                self._added_documents
+            )
+        INDEX_DOCUMENTS.labels(use_case=self.use_case).set(self.vectorstore.index.ntotal)
+        logger.info("index_saved", use_case=self.use_case, path=self.index_path)
 
-    def load_index(self) -> None:
-        """Load FAISS index from disk."""
-        if not self.index_exists():
-            raise FileNotFoundError(f"Index not found at {self.index_path}")
+    def load_index(self, path: Optional[str] = None) -> None:
+        """Load FAISS index from disk.
+
+        Args:
+            path: Index directory (default: this store's local index)
+        """
+        path = path or self.index_path
+        if not Path(path, "index.faiss").exists():
+            raise FileNotFoundError(f"Index not found at {path}")
 
         # Load FAISS index
         self.vectorstore = FAISS.load_local(
-            self.index_path,
+            path,
             self.embeddings,
             allow_dangerous_deserialization=True
         )
-        print(f"Index loaded from {self.index_path}")
+        self.manifest = read_manifest(path)
+        if self.manifest:
+            self._corpus_fingerprint = self.manifest.get("corpus_fingerprint")
+            self._added_documents = int(self.manifest.get("added_documents", 0))
+        INDEX_DOCUMENTS.labels(use_case=self.use_case).set(self.vectorstore.index.ntotal)
+        logger.info(
+            "index_loaded",
+            use_case=self.use_case,
+            path=path,
+            version=(self.manifest or {}).get("version")
+        )
+
+    def _load_verified(self, path: str, fingerprint: str, source: str) -> bool:
+        """Load an index if it was built from this corpus with the current embedding model.
+
+        Args:
+            path: Index directory
+            fingerprint: Fingerprint of the current corpus
+            source: Where the index comes from (local, artifact), for stats and logs
+
+        Returns:
+            Whether the index was loaded
+        """
+        if not Path(path, "index.faiss").exists():
+            return False
+        reason = verify_index(path, fingerprint)
+        if reason is not None:
+            logger.warning("index_rejected", use_case=self.use_case, path=path, source=source, reason=reason)
+            return False
+        self.load_index(path)
+        self.index_source = source
+        return True
 
     def index_exists(self) -> bool:
         """Check if index exists on disk."""
-        return Path(f"{self.index_path}.faiss").exists()
+        # save_local writes a directory holding index.faiss and index.pkl
+        return Path(self.index_path, "index.faiss").exists()
 
     def get_stats(self) -> Dict[str, Any]:
         """Get statistics about the vector store."""
@@ -174,23 +326,44 @@ class VectorStore:
             "status": "initialized",
             "total_documents": self.vectorstore.index.ntotal,
             "embedding_dimension": self.vectorstore.index.d,
-            "use_case": self.use_case
+            "use_case": self.use_case,
+            "index_source": self.index_source,
+            "index_version": (self.manifest or {}).get("version")
         }
 
     def delete_index(self) -> None:
         """Delete the index files."""
         index_files = [
-            f"{self.index_path}.faiss",
-            f"{self.index_path}.pkl"
+            Path(self.index_path, "index.faiss"),
+            Path(self.index_path, "index.pkl"),
+            Path(self.index_path, MANIFEST_FILE)
         ]
 
         for file_path in index_files:
             if Path(file_path).exists():
                 Path(file_path).unlink()
-                print(f"Deleted {file_path}")
+                logger.info("index_file_deleted", path=file_path)
 
         self.vectorstore = None
-        print("Index deleted successfully")
+        self.manifest = None
+        self.index_source = None
+        logger.info("index_deleted", use_case=self.use_case)
+
+
+def get_use_case_documents(use_case: str) -> List[Dict[str, Any]]:
+    """Get the knowledge base documents of a use case.
+
+    Args:
+        use_case: The use case (it_helpdesk)
+
+    Returns:
+        List of document dictionaries
+    """
+    # Import the appropriate data module
+    if use_case == "it_helpdesk":
+        from mock_data.it_helpdesk import get_it_helpdesk_data
+        return get_it_helpdesk_data()
+    raise ValueError(f"Unknown use case: {use_case}")
 
 
 def create_vector_store_for_use_case(use_case: str, force_recreate: bool = False) -> VectorStore:
@@ -203,12 +376,7 @@ def create_vector_store_for_use_case(use_case: str, force_recreate: bool = False
     Returns:
         Initialized VectorStore instance
     """
-    # Import the appropriate data module
-    if use_case == "it_helpdesk":
-        from mock_data.it_helpdesk import get_it_helpdesk_data
-        documents = get_it_helpdesk_data()
-    else:
-        raise ValueError(f"Unknown use case: {use_case}")
+    documents = get_use_case_documents(use_case)
 
     # Create and initialize vector store
     vector_store = VectorStore(use_case)
@@ -217,6 +385,36 @@ def create_vector_store_for_use_case(use_case: str, force_recreate: bool = False
     return vector_store
 
 
+def build_index_artifact(use_case: str, output_dir: Optional[str] = None, force: bool = False) -> Dict[str, Any]:
+    """Build the prebuilt index artifact of a use case (embeds the whole corpus).
+
+    Args:
+        use_case: The use case (it_helpdesk)
+        output_dir: Artifact directory (default: index_artifact.artifact_path(use_case))
+        force: Rebuild even if the existing artifact matches the corpus and model
+
+    Returns:
+        Manifest of the artifact
+    """
+    documents = get_use_case_documents(use_case)
+    vector_store = VectorStore(use_case)
+    vector_store.index_path = str(output_dir or artifact_path(use_case))
+
+    if not force and verify_index(vector_store.index_path, corpus_fingerprint(documents)) is None:
+        logger.info("index_artifact_current", use_case=use_case, path=vector_store.index_path)
+        return read_manifest(vector_store.index_path)
+
+    vector_store.create_index(documents, force_recreate=True)
+    logger.info(
+        "index_artifact_built",
+        use_case=use_case,
+        path=vector_store.index_path,
+        version=vector_store.manifest["version"],
+        model=vector_store.manifest["embedding_model"]
+    )
+    return vector_store.manifest
+
+
 if __name__ == "__main__":
     # Test the vector store
     print("Testing Vector Store...")
@@ -0,0 +1,191 @@
+"""Background warm-up of frequently asked questions after startup.
+
+After a deploy, the first hit of every popular question pays for embedding
+it, searching the index and generating the answer. Once the engine's
+components are built, the warm-up runs a query list through them on a
+background thread:
+    - the query embedding is computed and kept in the vector store's cache
+      (the intent router reuses it);
+    - retrieval is run once, touching the index before user traffic does;
+    - optionally (RAG_WARMUP_GENERATE), answers to knowledge-base questions
+      are generated into the retrieval chain's answer cache. Questions the
+      router sends to tools are skipped, since their answers are live data.
+
+The query list is the use case's demo questions followed by an optional file
+of top production queries (RAG_WARMUP_QUERIES_FILE, one query per line, #
+for comments), capped at RAG_WARMUP_MAX_QUERIES. RAG_WARMUP=off disables it.
+Progress is reported by get_status() and in the engine statistics.
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Any, List, Optional, TYPE_CHECKING
+
+from dotenv import load_dotenv
+
+from .intent_router import ROUTE_TOOLS
+from .rate_limiter import session_scope
+from .tracing import start_trace
+from .metrics import WARMUP_QUERIES
+from .logger import get_logger
+
+if TYPE_CHECKING:
+    from .chat_interface import ChatEngine
+
+# Load environment variables
+load_dotenv()
+
+logger = get_logger(__name__)
+
+WARMUP_PENDING = "pending"
+WARMUP_RUNNING = "running"
+WARMUP_DONE = "done"
+
+
+def warmup_enabled() -> bool:
+    """Whether query warm-up is enabled (RAG_WARMUP, default on)."""
+    return os.getenv("RAG_WARMUP", "on").lower() not in ("0", "false", "no", "off")
+
+
+def warmup_generate_enabled() -> bool:
+    """Whether the warm-up also generates answers (RAG_WARMUP_GENERATE, default off)."""
+    return os.getenv("RAG_WARMUP_GENERATE", "off").lower() in ("1", "true", "yes", "on")
+
+
+def get_warmup_queries(use_case: str) -> List[str]:
+    """Get the warm-up query list of a use case.
+
+    Args:
+        use_case: The use case (it_helpdesk)
+
+    Returns:
+        Demo questions, then queries from RAG_WARMUP_QUERIES_FILE, without duplicates
+    """
+    if use_case == "it_helpdesk":
+        from mock_data.it_helpdesk import DEMO_QUESTIONS
+        queries = list(DEMO_QUESTIONS)
+    else:
+        raise ValueError(f"Unknown use case: {use_case}")
+
+    path = os.getenv("RAG_WARMUP_QUERIES_FILE")
+    if path:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                queries.extend(line.strip() for line in f if line.strip() and not line.lstrip().startswith("#"))
+        except OSError as e:
+            logger.warning("warm_up_queries_unreadable", path=path, exc=e)
+
+    limit = int(os.getenv("RAG_WARMUP_MAX_QUERIES", "50"))
+    return list(dict.fromkeys(queries))[:limit]
+
+
+class QueryWarmUp:
+    """Runs a query list through an engine ahead of user traffic and tracks progress."""
+
+    def __init__(
+        self,
+        engine: "ChatEngine",
+        queries: Optional[List[str]] = None,
+        generate: Optional[bool] = None
+    ):
+        """Initialize the warm-up.
+
+        Args:
+            engine: Engine whose caches are warmed
+            queries: Queries to warm; defaults to get_warmup_queries(engine.use_case)
+            generate: Also generate answers into the answer cache; defaults to
+                RAG_WARMUP_GENERATE (off, since it spends completion tokens)
+        """
+        self.engine = engine
+        self.queries = queries if queries is not None else get_warmup_queries(engine.use_case)
+        if generate is None:
+            generate = warmup_generate_enabled()
+        self.generate = generate
+
+        self._lock = threading.Lock()
+        self.state = WARMUP_PENDING
+        self.completed = 0
+        self.failed = 0
+        self.generated = 0
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+
+    def run(self) -> Dict[str, Any]:
+        """Warm every query (errors are counted, not raised).
+
+        Returns:
+            Final status (see get_status)
+        """
+        with self._lock:
+            self.state = WARMUP_RUNNING
+            self._started = time.perf_counter()
+
+        for query in self.queries:
+            try:
+                # Traced like a turn, so its tokens show up in the metrics
+                with session_scope("warm-up"), start_trace("warm_up", use_case=self.engine.use_case):
+                    generated = self._warm(query)
+                with self._lock:
+                    self.completed += 1
+                    self.generated += int(generated)
+                WARMUP_QUERIES.labels(result="warmed").inc()
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                WARMUP_QUERIES.labels(result="failed").inc()
+                logger.warning("warm_up_query_failed", query_chars=len(query), exc=e)
+
+        with self._lock:
+            self.state = WARMUP_DONE
+            self._finished = time.perf_counter()
+        status = self.get_status()
+        logger.info(
+            "warm_up_finished",
+            queries=status["total"],
+            failed=status["failed"],
+            generated=status["generated"],
+            elapsed_ms=status["elapsed_ms"]
+        )
+        return status
+
+    def _warm(self, query: str) -> bool:
+        """Embed, retrieve and optionally answer one query; returns whether an answer was generated."""
+        retrieval_chain = self.engine.retrieval_chain
+        retrieval_chain.vector_store.search(query, k=4, score_threshold=0.5)
+        if not self.generate:
+            return False
+
+        router = self.engine.intent_router
+        if router is not None and router.route(query, record=False).route == ROUTE_TOOLS:
+            return False
+
+        result = retrieval_chain.chat(query)
+        if "error" in result:
+            raise RuntimeError(result["error"])
+        return not result.get("cached", False)
+
+    @property
+    def done(self) -> bool:
+        """Whether the warm-up has finished."""
+        return self.state == WARMUP_DONE
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get warm-up progress."""
+        with self._lock:
+            total = len(self.queries)
+            processed = self.completed + self.failed
+            if self._started is None:
+                elapsed_ms = 0.0
+            else:
+                elapsed_ms = ((self._finished or time.perf_counter()) - self._started) * 1000
+            return {
+                "state": self.state,
+                "total": total,
+                "completed": self.completed,
+                "failed": self.failed,
+                "generated": self.generated,
+                "generate": self.generate,
+                "progress": round(processed / total, 3) if total else 1.0,
+                "elapsed_ms": round(elapsed_ms, 3)
+            }
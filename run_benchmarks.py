@@ -0,0 +1,79 @@
+"""Run latency benchmarks for the RAG chatbot system."""
+
+import os
+import sys
+import json
+import argparse
+from pathlib import Path
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark the RAG chatbot pipeline stages")
+    parser.add_argument("--workload", help="JSON workload file (see benchmarks.suite.DEFAULT_WORKLOAD)")
+    parser.add_argument("--stages", help="Comma-separated stages to run (vector_search, retrieval_chain, function_calling, chatbot, tts)")
+    parser.add_argument("--iterations", type=int, help="Timed iterations per stage")
+    parser.add_argument("--concurrency", type=int, help="Concurrent callers per stage")
+    parser.add_argument("--warmup", type=int, help="Untimed warm-up iterations per stage")
+    parser.add_argument("--cold-cache", action="store_true", default=None, help="Clear the query-embedding cache before each search")
+    parser.add_argument("--startup-runs", type=int, help="Fresh interpreters started to time imports and the first prompt/answer (0 skips it)")
+    parser.add_argument("--no-routing-eval", dest="routing_eval", action="store_false", default=None, help="Skip the intent router accuracy check")
+    parser.add_argument("--offline", action="store_true", help="Use the offline Azure OpenAI stand-in")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON report")
+    parser.add_argument("--baseline", help="Baseline report to compare against; regressions fail the run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown versus the baseline (default 0.2)")
+    parser.add_argument("--save-baseline", help="Also write the report to this baseline path")
+    return parser.parse_args()
+
+def main():
+    """Run the benchmarks and compare against a baseline if given."""
+    args = parse_args()
+
+    if args.offline:
+        # Must be set before the clients are created
+        os.environ["AZURE_OPENAI_OFFLINE"] = "1"
+
+    from benchmarks.suite import BenchmarkRunner, load_workload, compare_to_baseline
+
+    print("⏱️ Running RAG Chatbot Benchmarks")
+    print("=" * 50)
+
+    try:
+        workload = load_workload(
+            args.workload,
+            stages=args.stages.split(",") if args.stages else None,
+            iterations=args.iterations,
+            concurrency=args.concurrency,
+            warmup=args.warmup,
+            cold_cache=args.cold_cache,
+            startup_runs=args.startup_runs,
+            routing_eval=args.routing_eval
+        )
+    except (OSError, ValueError) as e:
+        print(f"❌ Invalid workload: {str(e)}")
+        return 2
+
+    report = BenchmarkRunner(workload).run(progress=print)
+
+    Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\n📄 Results written to {args.output}")
+
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"📌 Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare_to_baseline(report, baseline, tolerance=args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) versus {args.baseline}:")
+            for regression in regressions:
+                change = f" ({regression['change']:+.0%})" if regression["change"] is not None else ""
+                print(f"   {regression['stage']}.{regression['metric']}: "
+                      f"{regression['baseline']:.2f} -> {regression['current']:.2f}{change}")
+            return 1
+        print(f"\n✅ No regressions versus {args.baseline} (tolerance {args.tolerance:.0%})")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
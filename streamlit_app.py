@@ -73,8 +73,9 @@ except Exception:
 project_root = Path(__file__).parent
 sys.path.append(str(project_root))
 
-from rag_system.chat_interface import RAGChatbot
+from rag_system.chat_interface import ChatEngine, RAGChatbot
 from rag_system.text_to_speech import synthesize_to_mp3_bytes
+from rag_system.tracing import start_trace
 
 # Page configuration
 st.set_page_config(
@@ -382,10 +383,25 @@ def get_download_link(data: str, filename: str, mime: str = "application/json"):
 # -----------------------------
 # Chatbot creation
 # -----------------------------
+@st.cache_resource(show_spinner=False)
+def get_shared_engine(use_case: str, enable_functions: bool) -> ChatEngine:
+    """Build the index, clients, chains and function registry once per process.
+
+    Every browser session shares this engine. Components are built on a
+    background thread while the page renders; one that fails to build is
+    retried by the next turn that needs it.
+    """
+    return ChatEngine(use_case=use_case, enable_functions=enable_functions)
+
 def create_chatbot(use_case: str, enable_functions: bool) -> RAGChatbot:
-    """Create or recreate chatbot with specified settings."""
+    """Create or recreate chatbot with specified settings.
+
+    Only the conversation state is per session; the heavy components come
+    from the shared engine.
+    """
     try:
-        return RAGChatbot(use_case=use_case, enable_functions=enable_functions)
+        engine = get_shared_engine(use_case, enable_functions)
+        return RAGChatbot(engine=engine)
     except Exception as e:
         st.error(f"Failed to initialize chatbot: {str(e)}")
         
@@ -791,13 +807,9 @@ def main():
 
     if st.sidebar.button("🎬 Run Demo"):
         st.session_state.in_demo = True
-        demo_questions = [
-            "My computer is running very slowly",
-            "What's the status of printer01?",
-            "How do I connect to the VPN?"
-        ]
-
-        questions = demo_questions
+        # Same questions the engine warms up after startup
+        from mock_data.it_helpdesk import DEMO_QUESTIONS
+        questions = DEMO_QUESTIONS[:3]
         
         # Clear existing chat for demo
         st.session_state.chat_history = []
@@ -844,10 +856,27 @@ def main():
         st.success("Chat cleared!")
         st.rerun()
 
+    # Readiness of the shared engine (components, then the query warm-up)
+    if st.session_state.chatbot:
+        startup = st.session_state.chatbot.engine.get_stats()["startup"]
+        warm_up = startup["warm_up"]
+        if not startup["ready"]:
+            st.sidebar.caption("⏳ Loading index and models...")
+        elif warm_up["state"] in ("pending", "running"):
+            st.sidebar.caption(f"🔥 Warming up: {warm_up['completed'] + warm_up['failed']}/{warm_up['total']} queries")
+
     # Show chatbot statistics
     if st.sidebar.button("📊 Show Statistics"):
         if st.session_state.chatbot:
             stats = st.session_state.chatbot.get_chatbot_stats()
+            usage = stats.get("usage", {})
+            st.sidebar.metric("Session tokens", f"{usage.get('total_tokens', 0):,}")
+            st.sidebar.metric(
+                "Session cost",
+                f"${usage.get('cost_usd', 0):.4f}",
+                delta=f"{usage.get('wasted_share', 0):.0%} wasted",
+                delta_color="inverse"
+            )
             st.sidebar.json(stats)
 
     # RAG is always used, no function calling
@@ -940,10 +969,24 @@ def main():
                     # Show LLM direct indicator (no context from KB)
                     st.info("💡 Using LLM directly (no relevant information in knowledge base)")
                 
+                # Show where the time went for this turn
+                timings = response.get("timings")
+                if timings:
+                    parts = [f"{name} {ms:.0f} ms" for name, ms in timings.get("breakdown", {}).items()]
+                    st.caption(f"⏱️ {timings['total_ms']:.0f} ms" + (" · " + " · ".join(parts) if parts else ""))
+                usage = response.get("usage")
+                if usage:
+                    wasted = usage["wasted"]["total_tokens"]
+                    st.caption(f"🪙 {usage['total_tokens']:,} tokens · ${usage['cost_usd']:.5f}"
+                               + (f" · {wasted:,} wasted" if wasted else ""))
+                
                 # Optionally synthesize TTS
                 if tts_enable and response.get("answer"):
                     to_say = (response.get("answer", "") or "")[:4000]
-                    audio_bytes = synthesize_to_mp3_bytes(to_say, lang=tts_lang)
+                    with start_trace("tts", session_id=st.session_state.chatbot.session_id) as tts_trace:
+                        audio_bytes = synthesize_to_mp3_bytes(to_say, lang=tts_lang)
+                    if timings is not None:
+                        timings.setdefault("stages", {})["tts"] = round(tts_trace.root.duration_ms, 3)
                     if audio_bytes:
                         st.audio(audio_bytes, format="audio/mp3")
                         response["audio"] = audio_bytes
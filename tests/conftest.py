@@ -0,0 +1,11 @@
+"""Shared pytest configuration.
+
+Tests run against the offline stand-in for Azure OpenAI, so they need no
+credentials or network access, and with logging off.
+"""
+
+import os
+
+os.environ.setdefault("AZURE_OPENAI_OFFLINE", "1")
+os.environ.setdefault("OFFLINE_AZURE_LATENCY", "fixed:median_ms=0")
+os.environ.setdefault("RAG_LOG_LEVEL", "off")
@@ -0,0 +1,99 @@
+"""Tests for the indexed solution search and software lookup."""
+
+import pytest
+
+from mock_data.it_helpdesk import COMMON_ISSUES, SOFTWARE_CATALOG, SOFTWARE_ALIASES, search_solutions
+from rag_system.catalog_search import SolutionSearch, SoftwareLookup, get_solution_search, get_software_lookup
+
+
+@pytest.mark.unit
+class TestSolutionSearch:
+    """search_it_solutions answers."""
+
+    @pytest.fixture
+    def search(self):
+        return SolutionSearch(list(COMMON_ISSUES))
+
+    @pytest.mark.parametrize("keywords", [
+        ["printer"],
+        ["VPN", "password"],
+        ["slow", "freezing", "wifi"],
+        ["token"],
+        ["snow"],
+        ["4"],
+        ["photoshop"],
+    ])
+    def test_same_solutions_as_linear_scan(self, search, keywords):
+        found = [(solution["category"], solution["solution"]) for solution in search.search(keywords)]
+        expected = [(solution["category"], solution["solution"]) for solution in search_solutions(keywords)]
+        assert sorted(found) == sorted(expected)
+
+    def test_best_matches_first(self, search):
+        results = search.search(["servicenow", "token", "sled"])
+        assert results[0]["category"] == "ServiceNow"
+        assert [result["matched_keywords"] for result in results] == sorted(
+            (result["matched_keywords"] for result in results), reverse=True
+        )
+        assert results[0]["matched_keywords"] == 3
+
+    def test_limit(self, search):
+        assert len(search.search(["password"], limit=1)) == 1
+
+    def test_added_issues_are_searchable(self, search):
+        issue = {"keywords": ["badge", "door access"], "category": "Facilities", "solution": "Visit reception."}
+        search.add(issue)
+        assert search.search(["badge"]) == [{"category": "Facilities", "solution": "Visit reception.", "matched_keywords": 1}]
+
+    def test_issues_appended_to_the_catalog_are_indexed(self):
+        issues = list(COMMON_ISSUES)
+        search = SolutionSearch(issues)
+        issues.append({"keywords": ["monitor flicker"], "category": "Hardware", "solution": "Replace the cable."})
+        assert search.search(["flicker"])[0]["category"] == "Hardware"
+
+    def test_shared_search_per_use_case(self):
+        assert get_solution_search("it_helpdesk") is get_solution_search("it_helpdesk")
+        with pytest.raises(ValueError):
+            get_solution_search("unknown")
+
+
+@pytest.mark.unit
+class TestSoftwareLookup:
+    """get_software_info answers."""
+
+    @pytest.fixture
+    def lookup(self):
+        return SoftwareLookup(SOFTWARE_CATALOG, SOFTWARE_ALIASES)
+
+    def test_exact_catalog_key(self, lookup):
+        result = lookup.get("slack")
+        assert result["name"] == SOFTWARE_CATALOG["slack"]["name"]
+        assert result["match_confidence"] == 1.0
+
+    def test_misspelled_name(self, lookup):
+        result = lookup.get("Microsft Ofice")
+        assert result["name"] == SOFTWARE_CATALOG["microsoft_office"]["name"]
+        assert result["matched_name"] == "microsoft office"
+        assert 0.7 <= result["match_confidence"] < 1.0
+
+    def test_different_product_is_not_found(self, lookup):
+        # Regression: used to answer with Visual Studio Professional at confidence 0.778
+        result = lookup.get("Visual Studio Code")
+        assert result["name"] == "Software not found"
+        assert "match_confidence" not in result
+        assert result["did_you_mean"] == [SOFTWARE_CATALOG["visual_studio"]["name"]]
+
+    def test_unknown_software(self, lookup):
+        assert lookup.get("Photoshop") == {
+            "name": "Software not found",
+            "status": "Not available in catalog",
+            "did_you_mean": []
+        }
+
+    def test_resolve(self, lookup):
+        assert lookup.resolve("MS Office") == lookup.resolve("Microsft Ofice") == "microsoft_office"
+        assert lookup.resolve("Visual Studio Code") is None
+
+    def test_shared_lookup_per_use_case(self):
+        assert get_software_lookup("it_helpdesk") is get_software_lookup("it_helpdesk")
+        with pytest.raises(ValueError):
+            get_software_lookup("unknown")
@@ -0,0 +1,193 @@
+"""Tests for the device inventory backends."""
+
+import pytest
+
+from rag_system.device_inventory import (
+    BACKENDS, DeviceInventory, MemoryInventory, SQLiteInventory, ServiceInventory,
+    create_device_inventory, get_use_case_devices, location_terms, make_device, device_type, matches_filters
+)
+
+QUERIES = [
+    {},
+    {"status": "Offline"},
+    {"status": "offline "},
+    {"device_type": "printer"},
+    {"location": "Floor 2"},
+    {"location": "floor 2, room 205"},
+    {"location": "Data Center", "status": "Warning"},
+    {"status": "Online", "device_type": "laptop", "location": "Remote"},
+    {"status": "Retired"},
+    {"limit": 3},
+    {"limit": 3, "offset": 3},
+    {"status": "Online", "limit": 2, "offset": 4},
+]
+
+
+def create(backend, tmp_path, monkeypatch, devices=None):
+    """Create a backend loaded with the helpdesk devices."""
+    monkeypatch.setenv("RAG_DEVICE_INVENTORY_DB", str(tmp_path / f"{backend}.db"))
+    monkeypatch.delenv("RAG_DEVICE_INVENTORY_URL", raising=False)
+    return create_device_inventory(backend, devices or get_use_case_devices("it_helpdesk"))
+
+
+@pytest.fixture(params=BACKENDS)
+def inventory(request, tmp_path, monkeypatch):
+    return create(request.param, tmp_path, monkeypatch)
+
+
+@pytest.mark.unit
+class TestInventoryBackends:
+    """Every backend answers the same way."""
+
+    def test_backend(self, inventory):
+        assert isinstance(inventory, DeviceInventory)
+        assert inventory.get_stats()["devices"] == len(inventory) == 10
+
+    def test_get(self, inventory):
+        assert inventory.get("printer02") == {
+            "device_id": "printer02",
+            "type": "printer",
+            "status": "Offline",
+            "location": "Floor 2, Room 205",
+            "details": inventory.get("printer02")["details"]
+        }
+        assert inventory.get("printer99") is None
+
+    def test_get_many(self, inventory):
+        found = inventory.get_many(["server01", "scanner01", "router01"])
+        assert list(found) == ["server01", "scanner01", "router01"]
+        assert found["scanner01"] is None
+        assert found["router01"]["status"] == "Offline"
+
+    def test_status_filter_is_case_insensitive(self, inventory):
+        devices, total = inventory.query(status="OFFLINE")
+        assert [device["device_id"] for device in devices] == ["printer02", "router01", "workstation02"]
+        assert total == 3
+
+    def test_location_part_matches(self, inventory):
+        devices, total = inventory.query(location="floor 1")
+        assert [device["device_id"] for device in devices] == ["laptop02", "workstation01"]
+        assert total == 2
+
+    def test_combined_filters(self, inventory):
+        devices, total = inventory.query(status="Offline", location="Floor 2", device_type="printer")
+        assert [device["device_id"] for device in devices] == ["printer02"]
+        assert total == 1
+
+    def test_paging_reports_the_total(self, inventory):
+        first, total = inventory.query(limit=4)
+        second, _ = inventory.query(limit=4, offset=4)
+        rest, _ = inventory.query(limit=4, offset=8)
+        ids = [device["device_id"] for device in first + second + rest]
+        assert total == 10
+        assert ids == sorted(ids) == inventory.device_ids()
+
+    def test_upsert_moves_a_device_between_indexes(self, inventory):
+        record = inventory.get("printer02")
+        assert inventory.upsert([{**record, "status": "Online", "location": "Floor 4, Room 410"}]) == 1
+        assert "printer02" not in [device["device_id"] for device in inventory.query(status="Offline")[0]]
+        assert inventory.query(location="Floor 2")[1] == 1
+        assert [device["device_id"] for device in inventory.query(location="floor 4")[0]] == ["printer02"]
+        assert len(inventory) == 10
+
+    def test_upsert_adds_devices(self, inventory):
+        inventory.upsert([make_device("scanner01", {"status": "Online", "location": "Floor 2, Room 210"})])
+        assert inventory.get("scanner01")["type"] == "scanner"
+        assert inventory.query(device_type="scanner", location="Floor 2")[1] == 1
+        assert len(inventory) == 11
+
+
+@pytest.mark.unit
+def test_backends_return_identical_results(tmp_path, monkeypatch):
+    inventories = {backend: create(backend, tmp_path, monkeypatch) for backend in BACKENDS}
+    for inventory in inventories.values():
+        inventory.upsert([make_device("printer03", {"status": "Offline", "location": "Floor 2, Room 207"})])
+
+    for query in QUERIES:
+        results = {backend: inventory.query(**query) for backend, inventory in inventories.items()}
+        assert results["sqlite"] == results["memory"], query
+        assert results["service"] == results["memory"], query
+
+    ids = ["printer03", "laptop01", "unknown01"]
+    assert inventories["sqlite"].get_many(ids) == inventories["memory"].get_many(ids)
+    assert inventories["service"].get_many(ids) == inventories["memory"].get_many(ids)
+
+
+@pytest.mark.unit
+class TestSQLiteInventory:
+    """SQLite file handling."""
+
+    def test_existing_database_is_not_reseeded(self, tmp_path):
+        path = str(tmp_path / "inventory.db")
+        devices = get_use_case_devices("it_helpdesk")
+        SQLiteInventory(path, devices).upsert([{**devices[0], "status": "Offline"}])
+
+        reopened = SQLiteInventory(path, devices)
+        assert reopened.get(devices[0]["device_id"])["status"] == "Offline"
+        assert len(reopened) == len(devices)
+
+
+@pytest.mark.unit
+class TestServiceInventory:
+    """Client of the inventory service."""
+
+    @pytest.fixture
+    def service(self):
+        return ServiceInventory(devices=get_use_case_devices("it_helpdesk"))
+
+    @pytest.mark.parametrize("device_id", ["printer01/../batch", "printer01?status=x", "printer01#x", "../devices"])
+    def test_device_ids_cannot_change_the_route(self, service, device_id):
+        assert service.get(device_id) is None
+
+    def test_stand_in_is_reported(self, service):
+        assert service.get_stats() == {"backend": "service", "devices": 10, "url": "in-process"}
+
+
+@pytest.mark.unit
+class TestInventoryHelpers:
+    """Record and index helpers."""
+
+    def test_interface_is_abstract(self):
+        with pytest.raises(TypeError):
+            DeviceInventory()
+
+        class Incomplete(DeviceInventory):
+            def get_many(self, device_ids):
+                return {}
+
+        with pytest.raises(TypeError):
+            Incomplete()
+
+    def test_location_terms(self):
+        assert location_terms(" Floor 2,  Room 205 ") == {"floor 2, room 205", "floor 2", "room 205"}
+        assert location_terms("Remote") == {"remote"}
+
+    @pytest.mark.parametrize("query", [query for query in QUERIES if "limit" not in query])
+    def test_matches_filters_agrees_with_query(self, query):
+        inventory = MemoryInventory(get_use_case_devices("it_helpdesk"))
+        devices, _ = inventory.query(**query, limit=100)
+        everything, _ = inventory.query(limit=100)
+        assert [device for device in everything if matches_filters(device, **query)] == devices
+
+    def test_location_part_is_not_a_prefix(self):
+        device = make_device("printer22", {"status": "Online", "location": "Floor 22, Room 2201"})
+        assert not matches_filters(device, location="Floor 2")
+        assert matches_filters(device, location=" floor 22 ")
+
+    @pytest.mark.parametrize("device_id, kind", [("printer01", "printer"), ("Core-Switch_02", "core-switch"), ("42", "unknown")])
+    def test_device_type(self, device_id, kind):
+        assert device_type(device_id) == kind
+
+    def test_make_device_defaults(self):
+        assert make_device("router07", {}) == {
+            "device_id": "router07", "type": "router", "status": "Unknown", "location": "Unknown", "details": ""
+        }
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            create_device_inventory("redis")
+
+    def test_memory_inventory_copies_records(self):
+        inventory = MemoryInventory(get_use_case_devices("it_helpdesk"))
+        inventory.get("server01")["status"] = "Offline"
+        assert inventory.get("server01")["status"] == "Online"
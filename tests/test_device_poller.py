@@ -0,0 +1,201 @@
+"""Tests for the background device poller and its snapshot."""
+
+import threading
+from datetime import datetime
+
+import pytest
+
+from rag_system.device_inventory import MemoryInventory, get_use_case_devices
+from rag_system.device_poller import DevicePoller, SimulatedDeviceProbe, UNREACHABLE_STATUS
+from rag_system.offline_azure import LatencyProfile
+
+
+class ScriptedProbe:
+    """Simulated devices that can be told to stop answering or to hang on the next probe."""
+
+    def __init__(self, devices):
+        self.devices = SimulatedDeviceProbe(devices, latency=LatencyProfile.parse("fixed:median_ms=0"), seed=1)
+        self.failing = set()
+        self._holds = {}
+
+    def hold_next(self, device_id):
+        """Make the next probe of a device wait; returns (entered, release) events."""
+        hold = (threading.Event(), threading.Event())
+        self._holds[device_id] = hold
+        return hold
+
+    def __call__(self, device_id):
+        hold = self._holds.pop(device_id, None)
+        state = None if device_id in self.failing else self.devices(device_id)
+        if hold is not None:
+            entered, release = hold
+            entered.set()
+            release.wait(timeout=5)
+        if state is None:
+            raise ConnectionError(f"Device {device_id} did not answer")
+        return state
+
+
+class CountingInventory(MemoryInventory):
+    """Memory inventory that counts writes."""
+
+    def __init__(self, devices):
+        self.writes = []
+        super().__init__(devices)
+        self.writes.clear()
+
+    def upsert(self, devices):
+        devices = list(devices)
+        self.writes.extend(device["device_id"] for device in devices)
+        return super().upsert(devices)
+
+
+@pytest.fixture
+def inventory():
+    return CountingInventory(get_use_case_devices("it_helpdesk"))
+
+
+@pytest.fixture
+def probe():
+    return ScriptedProbe(get_use_case_devices("it_helpdesk"))
+
+
+@pytest.fixture
+def poller(inventory, probe):
+    poller = DevicePoller(inventory, probe, interval_s=60, workers=4, probe_timeout_s=1, unreachable_after=2)
+    yield poller
+    poller.stop()
+
+
+@pytest.mark.unit
+class TestSnapshot:
+    """Polling rounds and snapshot reads."""
+
+    def test_round_fills_the_snapshot(self, poller):
+        assert poller.poll_once()["devices"] == 10
+        result = poller.get("printer01")
+        assert result["status"] == "Online"
+        assert result["source"] == "snapshot"
+        assert "stale" not in result
+        assert 0 <= result["age_s"] < 5
+        datetime.fromisoformat(result["observed_at"])
+        assert poller.get_stats()["devices"] == 10
+
+    def test_changes_are_written_back(self, poller, probe, inventory):
+        poller.poll_once()
+        assert inventory.writes == []
+        probe.devices.set_state("printer01", "Offline", "Paper tray removed")
+        poller.poll_once()
+        assert inventory.writes == ["printer01"]
+        assert inventory.get("printer01")["status"] == "Offline"
+        assert "printer01" in [device["device_id"] for device in inventory.query(status="Offline")[0]]
+        assert poller.get_stats()["changes"] == 1
+
+    def test_unknown_device(self, poller):
+        poller.poll_once()
+        assert poller.get("printer99") is None
+
+    def test_unknown_device_is_not_probed(self, poller):
+        assert poller.get("printer99", max_age_s=0) is None
+        stats = poller.get_stats()
+        assert (stats["live_probes"], stats["probe_errors"]) == (0, 0)
+        assert poller._failures == {}
+
+
+@pytest.mark.unit
+class TestLiveProbes:
+    """Reads with a freshness bound."""
+
+    def test_unpolled_device_is_probed_live(self, poller):
+        result = poller.get("server02", max_age_s=60)
+        assert (result["status"], result["source"]) == ("Warning", "live")
+        assert poller.get_stats()["live_probes"] == 1
+
+    def test_fresh_entry_is_served_from_the_snapshot(self, poller):
+        poller.poll_once()
+        assert poller.get("server02", max_age_s=60)["source"] == "snapshot"
+        assert poller.get("server02", max_age_s=0)["source"] == "live"
+
+    def test_slow_probe_serves_the_last_status_as_stale(self, poller, probe):
+        poller.poll_once()
+        probe.devices.set_state("router01", "Online")
+        poller.probe_timeout_s = 0.05
+        entered, release = probe.hold_next("router01")
+        try:
+            result = poller.get("router01", max_age_s=0)
+        finally:
+            release.set()
+        assert entered.is_set()
+        assert (result["status"], result["source"], result["stale"]) == ("Offline", "snapshot", True)
+        assert poller.get_stats()["stale_served"] == 1
+
+    def test_never_observed_device_falls_back_to_the_inventory(self, poller, probe):
+        probe.failing.add("laptop01")
+        result = poller.get("laptop01", max_age_s=60)
+        assert (result["status"], result["source"], result["stale"]) == ("Online", "inventory", True)
+        assert result["observed_at"] is None
+        assert result["probe_error"] == "Device laptop01 did not answer"
+
+
+@pytest.mark.unit
+class TestFailedProbes:
+    """Devices that stop answering."""
+
+    def test_failure_is_reported_with_the_last_status(self, poller, probe):
+        poller.poll_once()
+        probe.failing.add("server01")
+        assert poller.poll_once()["errors"] == 1
+        result = poller.get("server01")
+        assert result["status"] == "Online"
+        assert result["stale"] is True
+        assert result["probe_error"] == "Device server01 did not answer"
+        datetime.fromisoformat(result["probe_failed_at"])
+
+    def test_device_reads_unreachable_after_repeated_failures(self, poller, probe, inventory):
+        poller.poll_once()
+        probe.failing.add("server01")
+        poller.poll_once()
+        poller.poll_once()
+        result = poller.get("server01")
+        assert result["status"] == UNREACHABLE_STATUS
+        assert "last known status: Online" in result["details"]
+        assert inventory.get("server01")["status"] == UNREACHABLE_STATUS
+        assert poller.get_stats()["marked_unreachable"] == 1
+
+        poller.poll_once()
+        assert poller.get_stats()["marked_unreachable"] == 1
+
+    def test_answer_clears_the_failure(self, poller, probe, inventory):
+        poller.poll_once()
+        probe.failing.add("server01")
+        poller.poll_once()
+        poller.poll_once()
+        probe.failing.discard("server01")
+        poller.poll_once()
+        result = poller.get("server01")
+        assert result["status"] == "Online"
+        assert "probe_error" not in result
+        assert "stale" not in result
+        assert inventory.get("server01")["status"] == "Online"
+
+
+@pytest.mark.unit
+class TestProbeRace:
+    """A live probe and a polling probe finishing out of order."""
+
+    def test_older_probe_result_is_dropped(self, poller, probe, inventory):
+        entered, release = probe.hold_next("workstation02")
+        round_thread = threading.Thread(target=poller.poll_once)
+        round_thread.start()
+        try:
+            assert entered.wait(timeout=5)
+            # The polling probe saw Offline; the device comes back before a live probe
+            probe.devices.set_state("workstation02", "Online", "Back on the network")
+            assert poller.get("workstation02", max_age_s=0)["status"] == "Online"
+        finally:
+            release.set()
+            round_thread.join(timeout=5)
+
+        assert poller.get("workstation02")["status"] == "Online"
+        assert inventory.get("workstation02")["status"] == "Online"
+        assert poller.get_stats()["superseded"] == 1
@@ -0,0 +1,62 @@
+"""Tests for function calling against the offline Azure stand-in."""
+
+import pytest
+
+from rag_system.function_calling import FunctionCaller
+
+
+def ask(question):
+    return [{"role": "user", "content": question}]
+
+
+class FailingCompletions:
+    """Chat completions endpoint that is down."""
+
+    def create(self, **kwargs):
+        raise ConnectionError("endpoint unavailable")
+
+
+@pytest.fixture
+def function_caller():
+    return FunctionCaller("it_helpdesk")
+
+
+@pytest.mark.unit
+class TestChatWithFunctions:
+    """Tool-calling turns."""
+
+    def test_tool_results_are_answered(self, function_caller):
+        result = function_caller.chat_with_functions(ask("What's the status of printer01?"))
+        assert result["function_calls_made"] == 1
+        assert "Online" in result["content"]
+        assert [message["role"] for message in result["messages"]] == ["user", "assistant", "tool"]
+
+    def test_prefetch_is_settled_when_the_completion_fails(self, function_caller, monkeypatch):
+        prefetch = function_caller.start_prefetch("What's the status of printer01?")
+        monkeypatch.setattr(function_caller.client.chat, "completions", FailingCompletions())
+        result = function_caller.chat_with_functions(ask("What's the status of printer01?"), prefetch=prefetch)
+        assert result["error"].startswith("Chat completion failed")
+        assert (result["prefetch"]["calls"], result["prefetch"]["used"]) == (1, 0)
+        assert function_caller.prefetcher.get_stats()["turns"] == 1
+
+
+@pytest.mark.unit
+def test_solution_search_is_bounded(monkeypatch):
+    monkeypatch.setenv("RAG_SOLUTION_SEARCH_LIMIT", "2")
+    result = FunctionCaller("it_helpdesk").call_function("search_it_solutions", {"keywords": ["password", "vpn", "slow", "printer"]})
+    assert len(result) == 2
+    assert result[0]["matched_keywords"] >= result[1]["matched_keywords"]
+
+
+@pytest.mark.unit
+class TestFindDevices:
+    """Batch lookups filter like the inventory queries."""
+
+    @pytest.mark.parametrize("location, expected", [("Floor 2", ["printer02"]), ("floor  2", ["printer02"]), ("Floor", [])])
+    def test_batch_lookup_matches_whole_location_parts(self, function_caller, location, expected):
+        device_ids = ["printer01", "printer02", "printer99"]
+        result = function_caller.call_function("find_devices", {"device_ids": device_ids, "location": location})
+        assert [device["device_id"] for device in result["devices"]] == expected
+        assert result["not_found"] == ["printer99"]
+        query = function_caller.call_function("find_devices", {"location": location})
+        assert set(expected) <= {device["device_id"] for device in query["devices"]}
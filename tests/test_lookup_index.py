@@ -0,0 +1,125 @@
+"""Tests for the keyword and fuzzy name indexes."""
+
+import pytest
+
+from rag_system.lookup_index import KeywordIndex, FuzzyNameIndex, edit_distance, normalize_name
+
+
+@pytest.mark.unit
+class TestKeywordIndex:
+    """Substring search over keyword lists."""
+
+    @pytest.fixture
+    def index(self):
+        index = KeywordIndex()
+        index.add(["slow computer", "performance", "lag"])
+        index.add(["printer", "paper jam", "toner"])
+        index.add(["vpn", "remote access", "connection"])
+        index.add(["proxy", "407", "proxy authentication"])
+        return index
+
+    def test_positions_follow_insertion_order(self):
+        index = KeywordIndex()
+        assert [index.add(["a"]), index.add(["b"])] == [0, 1]
+        assert len(index) == 2
+
+    @pytest.mark.parametrize("keyword, entries", [
+        ("printer", [1]),
+        ("PRINTER", [1]),
+        ("jam", [1]),
+        ("rem", [2]),
+        ("authenticat", [3]),
+        ("o", [0, 1, 2, 3]),
+        ("scanner", []),
+    ])
+    def test_substring_match(self, index, keyword, entries):
+        assert sorted(entry for entry, _ in index.search([keyword])) == entries
+
+    def test_long_keyword_must_be_contiguous(self):
+        index = KeywordIndex()
+        index.add(["abcd", "bcde"])
+        # Every trigram of "abcde" is indexed, but the keyword itself does not occur
+        assert index.search(["abcde"]) == []
+        assert index.search(["abcd bc"]) == [(0, 1)]
+
+    def test_more_matched_keywords_rank_first(self, index):
+        assert index.search(["connection", "proxy", "407"]) == [(3, 2), (2, 1)]
+
+    def test_exact_keyword_breaks_ties(self):
+        index = KeywordIndex()
+        index.add(["accessibility"])
+        index.add(["remote access"])
+        assert index.search(["access"]) == [(1, 1), (0, 1)]
+
+    def test_blank_and_duplicate_keywords(self, index):
+        assert index.search(["", "  "]) == []
+        assert index.search(["toner", "Toner "]) == [(1, 1)]
+
+
+@pytest.mark.unit
+class TestEditDistance:
+    """Banded Levenshtein distance."""
+
+    @pytest.mark.parametrize("a, b, distance", [
+        ("", "", 0),
+        ("slack", "slack", 0),
+        ("slak", "slack", 1),
+        ("kitten", "sitting", 3),
+        ("office", "", 6),
+    ])
+    def test_distance(self, a, b, distance):
+        assert edit_distance(a, b) == distance
+        assert edit_distance(b, a) == distance
+
+    def test_limit_stops_early(self):
+        assert edit_distance("kitten", "sitting", limit=2) == 3
+        assert edit_distance("kitten", "sitting", limit=3) == 3
+        assert edit_distance("a", "abcdef", limit=2) == 3
+
+
+@pytest.mark.unit
+class TestFuzzyNameIndex:
+    """Name lookups with misspellings, partial names and aliases."""
+
+    @pytest.fixture
+    def index(self):
+        index = FuzzyNameIndex()
+        index.add("microsoft_office", ["Microsoft Office 365", "MS Office", "PowerPoint"])
+        index.add("adobe_reader", ["Adobe Acrobat Reader", "Acrobat"])
+        index.add("visual_studio", ["Visual Studio Professional", "Visual Studio 2022", "VS Pro"])
+        index.add("slack", ["Slack Desktop", "Slack app"])
+        return index
+
+    def test_normalize_name(self):
+        assert normalize_name("  Microsoft_Office  365! ") == "microsoft office 365"
+        assert normalize_name("C++ / C#") == "c++ c#"
+
+    def test_exact_name_and_alias(self, index):
+        assert index.lookup("MS-Office") == [("microsoft_office", "ms office", 1.0)]
+        assert index.lookup("acrobat")[0].key == "adobe_reader"
+
+    @pytest.mark.parametrize("query, key", [
+        ("Microsft Ofice", "microsoft_office"),
+        ("visual studo", "visual_studio"),
+        ("slak", "slack"),
+        ("power point", "microsoft_office"),
+        ("slack software", "slack"),
+    ])
+    def test_misspelled_and_partial_names(self, index, query, key):
+        best = index.lookup(query)[0]
+        assert best.key == key
+        assert 0.7 <= best.confidence < 1.0
+
+    def test_unmatched_word_means_another_product(self, index):
+        # "code" matches no word of "visual studio 2022": Visual Studio Code is not in the catalog
+        best = index.lookup("Visual Studio Code")[0]
+        assert best.key == "visual_studio"
+        assert best.confidence < 0.7
+
+    def test_unrelated_name(self, index):
+        assert all(match.confidence < 0.5 for match in index.lookup("photoshop"))
+
+    def test_one_match_per_key(self, index):
+        matches = index.lookup("visual studio pro", limit=5)
+        assert len({match.key for match in matches}) == len(matches)
+        assert matches == sorted(matches, key=lambda match: -match.confidence)
@@ -0,0 +1,216 @@
+"""Tests for the token-bucket rate limiter."""
+
+import time
+import threading
+
+import pytest
+
+from rag_system import rate_limiter
+from rag_system.rate_limiter import RateLimiter, TokenBucket, estimate_tokens, get_rate_limiter
+
+
+class FakeClock:
+    """Stands in for the time module so refills happen only when a test says so."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    return clock
+
+
+def drain_requests(limiter: RateLimiter) -> int:
+    """Take every request the limiter grants right now."""
+    granted = 0
+    while limiter.try_acquire():
+        granted += 1
+    return granted
+
+
+@pytest.mark.unit
+class TestTokenBucket:
+    """Continuous refill up to the per-minute capacity."""
+
+    def test_refills_at_the_per_minute_rate(self, clock):
+        bucket = TokenBucket(60)
+        bucket.consume(60)
+        clock.advance(10)
+        bucket.refill(clock.monotonic())
+        assert bucket.available == pytest.approx(10)
+        assert bucket.seconds_until(15) == pytest.approx(5)
+
+    def test_refill_stops_at_capacity(self, clock):
+        bucket = TokenBucket(60)
+        bucket.consume(30)
+        clock.advance(600)
+        bucket.refill(clock.monotonic())
+        assert bucket.available == 60
+
+    def test_unlimited_bucket(self):
+        bucket = TokenBucket(None)
+        bucket.consume(10 ** 6)
+        assert bucket.seconds_until(10 ** 6) == 0.0
+        assert bucket.clamp(10 ** 6) == 10 ** 6
+
+
+@pytest.mark.unit
+class TestRateLimiterQuotas:
+    """Requests and tokens are granted as the buckets refill."""
+
+    def test_request_quota_refills(self, clock):
+        limiter = RateLimiter("test", requests_per_minute=60)
+        assert drain_requests(limiter) == 60
+        clock.advance(1)
+        assert drain_requests(limiter) == 1
+        clock.advance(0.5)
+        assert not limiter.try_acquire()
+
+    def test_token_quota_refills(self, clock):
+        limiter = RateLimiter("test", tokens_per_minute=600)
+        assert limiter.try_acquire(tokens=400)
+        assert not limiter.try_acquire(tokens=400)
+        # 10 tokens a second: 200 more are needed
+        clock.advance(19)
+        assert not limiter.try_acquire(tokens=400)
+        clock.advance(1)
+        assert limiter.try_acquire(tokens=400)
+
+    def test_oversize_request_is_clamped_to_capacity(self, clock):
+        limiter = RateLimiter("test", tokens_per_minute=600)
+        assert limiter.try_acquire(tokens=5000)
+        assert limiter.get_stats()["tokens_granted"] == 600
+
+    def test_unlimited_limiter_never_waits(self):
+        limiter = RateLimiter("test")
+        assert not limiter.enabled
+        assert limiter.acquire(tokens=10 ** 6) == 0.0
+        assert limiter.get_stats()["granted"] == 1
+
+    def test_acquire_times_out_and_leaves_the_queue(self):
+        limiter = RateLimiter("test", requests_per_minute=1)
+        assert limiter.try_acquire()
+        with pytest.raises(TimeoutError):
+            limiter.acquire(timeout=0.05)
+        assert limiter.get_stats()["queue_depth"] == 0
+
+
+@pytest.mark.unit
+class TestRateLimiterPause:
+    """A 429 stops every caller for the retry-after period."""
+
+    def test_pause_blocks_until_it_expires(self, clock):
+        limiter = RateLimiter("test", requests_per_minute=60)
+        limiter.pause(5)
+        assert not limiter.try_acquire()
+        assert limiter.get_stats()["paused_for_s"] == pytest.approx(5)
+        clock.advance(5)
+        assert limiter.try_acquire()
+        assert limiter.get_stats()["pauses"] == 1
+
+    def test_shorter_pause_does_not_cut_a_longer_one(self, clock):
+        limiter = RateLimiter("test", requests_per_minute=60)
+        limiter.pause(5)
+        limiter.pause(1)
+        clock.advance(2)
+        assert not limiter.try_acquire()
+
+    def test_blocked_acquire_resumes_after_pause(self):
+        limiter = RateLimiter("test", requests_per_minute=6000)
+        limiter.pause(0.2)
+        waited = limiter.acquire(timeout=5)
+        assert waited >= 0.15
+        assert limiter.get_stats()["waited"] == 1
+
+
+@pytest.mark.unit
+class TestRateLimiterSettle:
+    """Reservations are corrected with the tokens actually used."""
+
+    @pytest.fixture
+    def limiter(self, clock):
+        limiter = RateLimiter("test", tokens_per_minute=1000)
+        assert limiter.try_acquire(tokens=500)
+        return limiter
+
+    def test_unused_tokens_are_returned(self, limiter):
+        limiter.settle(500, 200)
+        stats = limiter.get_stats()
+        assert stats["available_tokens"] == pytest.approx(800)
+        assert stats["tokens_returned"] == 300
+
+    def test_extra_tokens_are_charged(self, limiter):
+        limiter.settle(500, 700)
+        stats = limiter.get_stats()
+        assert stats["available_tokens"] == pytest.approx(300)
+        assert stats["tokens_charged"] == 200
+
+    def test_release_does_not_overfill(self, limiter):
+        limiter.release(5000)
+        assert limiter.get_stats()["available_tokens"] == 1000
+
+
+@pytest.mark.unit
+class TestRateLimiterFairness:
+    """Waiting sessions are served round-robin."""
+
+    def test_sessions_take_turns(self):
+        # 10 requests a second once the initial burst is spent
+        limiter = RateLimiter("test", requests_per_minute=600)
+        drain_requests(limiter)
+
+        order = []
+        threads = []
+
+        def request(label: str, session_id: str) -> None:
+            limiter.acquire(session_id=session_id, timeout=5)
+            order.append(label)
+
+        for label, session_id in [("a1", "a"), ("a2", "a"), ("a3", "a"), ("b1", "b")]:
+            depth = limiter.get_stats()["queue_depth"]
+            thread = threading.Thread(target=request, args=(label, session_id))
+            thread.start()
+            threads.append(thread)
+            # Queue the requests in a known order
+            while limiter.get_stats()["queue_depth"] == depth and thread.is_alive():
+                time.sleep(0.001)
+
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert order == ["a1", "b1", "a2", "a3"]
+        assert limiter.get_stats()["max_queue_depth"] == 4
+
+
+@pytest.mark.unit
+class TestEstimateTokens:
+    """Prompt token estimates."""
+
+    def test_messages_add_framing(self):
+        text = "How do I reset my password?"
+        assert estimate_tokens([{"role": "user", "content": text}]) == estimate_tokens(text) + 4
+
+    def test_empty_content(self):
+        assert estimate_tokens(None) == 0
+        assert estimate_tokens("") == 0
+        assert estimate_tokens([{"role": "assistant", "content": None}]) == 4
+
+
+@pytest.mark.unit
+def test_shared_limiter_reads_quotas_from_environment(monkeypatch):
+    monkeypatch.setenv("AZURE_OPENAI_UNITTEST_RPM", "120")
+    monkeypatch.delenv("AZURE_OPENAI_UNITTEST_TPM", raising=False)
+    limiter = get_rate_limiter("unittest")
+    assert get_rate_limiter("unittest") is limiter
+    stats = limiter.get_stats()
+    assert stats["requests_per_minute"] == 120
+    assert stats["tokens_per_minute"] is None
@@ -0,0 +1,96 @@
+"""Tests for the resilience policy of Azure OpenAI calls."""
+
+import time
+
+import pytest
+
+from rag_system.rate_limiter import RateLimiter
+from rag_system.resilience import ResiliencePolicy, CallCancelled, DeadlineExceeded
+from rag_system.retrieval_chain import GenerationCancelled
+
+
+class ServerError(Exception):
+    """API error with a 5xx status."""
+    status_code = 503
+
+
+@pytest.mark.unit
+class TestRetries:
+    """Errors worth retrying and errors that are not."""
+
+    def test_server_errors_are_retried(self):
+        policy = ResiliencePolicy("test", hedging=False, max_retries=2, backoff_base=0.001)
+        attempts = []
+
+        def fn(timeout):
+            attempts.append(timeout)
+            if len(attempts) < 2:
+                raise ServerError("unavailable")
+            return "ok"
+
+        assert policy.call(fn) == "ok"
+        stats = policy.get_stats()
+        assert (stats["retries"], stats["server_errors"], stats["failures"]) == (1, 1, 0)
+
+    def test_cancellation_is_not_a_failure(self):
+        policy = ResiliencePolicy("test", hedging=False, max_retries=2, backoff_base=0.001)
+        attempts = []
+
+        def fn(timeout):
+            attempts.append(timeout)
+            raise GenerationCancelled()
+
+        with pytest.raises(CallCancelled):
+            policy.call(fn)
+        stats = policy.get_stats()
+        assert len(attempts) == 1
+        assert (stats["cancelled"], stats["failures"], stats["retries"], stats["samples"]) == (1, 0, 0, 0)
+
+    def test_deadline(self):
+        policy = ResiliencePolicy("test", hedging=False, max_retries=0, default_timeout=0.05)
+        with pytest.raises(DeadlineExceeded):
+            policy.call(lambda timeout: time.sleep(0.5))
+        assert policy.get_stats()["timeouts"] == 1
+
+
+def wait_for(condition):
+    """Wait for requests still finishing in the pool."""
+    for _ in range(2000):
+        if condition():
+            return
+        time.sleep(0.001)
+    raise AssertionError("condition not reached")
+
+
+@pytest.mark.unit
+class TestReservations:
+    """Every request's rate limiter reservation is settled."""
+
+    def test_failed_request_returns_its_reservation(self):
+        limiter = RateLimiter("test", tokens_per_minute=100000)
+        policy = ResiliencePolicy("test", hedging=False, max_retries=1, backoff_base=0.001, rate_limiter=limiter)
+
+        def fn(timeout):
+            raise ServerError("unavailable")
+
+        with pytest.raises(ServerError):
+            policy.call(fn, tokens=1000, usage=lambda result: 10)
+        wait_for(lambda: limiter.get_stats()["tokens_returned"] == 2000)
+
+    def test_hedge_and_primary_are_both_settled(self):
+        limiter = RateLimiter("test", tokens_per_minute=100000)
+        policy = ResiliencePolicy("test", hedging=True, min_samples=1, rate_limiter=limiter)
+        policy.latency.record(0.01)
+        calls = []
+
+        def fn(timeout):
+            calls.append(timeout)
+            if len(calls) == 1:
+                time.sleep(0.2)
+                return "primary"
+            return "hedge"
+
+        assert policy.call(fn, tokens=1000, usage=lambda result: 10) == "hedge"
+        assert policy.get_stats()["hedges_won"] == 1
+        # The losing primary is settled once it finishes, too
+        wait_for(lambda: limiter.get_stats()["tokens_returned"] == 2 * 990)
@@ -0,0 +1,74 @@
+"""Tests for speculative execution of the RAG path."""
+
+import threading
+
+import pytest
+
+from rag_system.speculation import SpeculativeExecutor, SPECULATION_FULL
+
+
+@pytest.fixture
+def executor():
+    executor = SpeculativeExecutor(SPECULATION_FULL, max_workers=1)
+    yield executor
+    executor.shutdown()
+
+
+def blocked(executor):
+    """Occupy the executor's only worker; returns (entered, release) events."""
+    entered, release = threading.Event(), threading.Event()
+
+    def hold(cancel_event):
+        entered.set()
+        release.wait(timeout=5)
+
+    executor.start(hold)
+    assert entered.wait(timeout=5)
+    return release
+
+
+@pytest.mark.unit
+class TestSpeculativeExecutor:
+    """Committing and abandoning speculative work."""
+
+    def test_commit_returns_the_result(self, executor):
+        task = executor.start(lambda cancel_event: {"retrieved_docs": []})
+        result, record = executor.commit(task, function_calling_ms=100.0)
+        assert result == {"retrieved_docs": []}
+        assert record.winner == "rag"
+        assert executor.get_stats()["rag_wins"] == 1
+
+    def test_queued_work_runs_in_the_caller(self, executor):
+        release = blocked(executor)
+        try:
+            task = executor.start(lambda cancel_event: threading.current_thread().name)
+            result, record = executor.commit(task, function_calling_ms=100.0)
+        finally:
+            release.set()
+        assert result == threading.current_thread().name
+        assert record.saved_ms == 0.0
+        assert executor.get_stats()["ran_inline"] == 1
+
+    def test_abandon_before_start(self, executor):
+        release = blocked(executor)
+        try:
+            task = executor.start(lambda cancel_event: None)
+            record = executor.abandon(task, function_calling_ms=100.0)
+        finally:
+            release.set()
+        assert record.cancelled and record.wasted_ms == 0.0
+        stats = executor.get_stats()
+        assert (stats["function_wins"], stats["cancelled_before_start"]) == (1, 1)
+
+    def test_abandon_after_failure(self, executor):
+        task = executor.start(lambda cancel_event: cancel_event.wait(timeout=5))
+        record = executor.abandon(task, function_calling_ms=100.0, failed=True)
+        assert (record.winner, record.cancelled) == ("none", True)
+        stats = executor.get_stats()
+        assert (stats["failed_turns"], stats["function_wins"]) == (1, 0)
+
+    def test_pool_size_from_environment(self, monkeypatch):
+        monkeypatch.setenv("RAG_SPECULATION_WORKERS", "3")
+        executor = SpeculativeExecutor(SPECULATION_FULL)
+        assert executor._executor._max_workers == 3
+        executor.shutdown()
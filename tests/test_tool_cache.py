@@ -0,0 +1,237 @@
+"""Tests for the tool result cache."""
+
+import time
+import threading
+
+import pytest
+
+from rag_system import tool_cache
+from rag_system.tool_cache import ToolCache, normalize_arguments
+
+
+class FakeClock:
+    """Stands in for the time module so entries expire only when a test says so."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(tool_cache, "time", clock)
+    return clock
+
+
+class CountingFetch:
+    """Handler stand-in that counts how often the backend is queried."""
+
+    def __init__(self, result="status"):
+        self.result = result
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.result
+
+
+@pytest.mark.unit
+class TestToolCacheTTL:
+    """Results are reused within the TTL only."""
+
+    def test_hit_within_ttl(self, clock):
+        cache = ToolCache("check_device_status", ttl_s=30)
+        fetch = CountingFetch()
+        assert cache.call(fetch, {"device_id": "printer01"}) == "status"
+        clock.advance(29)
+        assert cache.call(fetch, {"device_id": "printer01"}) == "status"
+        assert fetch.calls == 1
+        assert cache.get_stats()["hits"] == 1
+
+    def test_expired_entry_is_fetched_again(self, clock):
+        cache = ToolCache("check_device_status", ttl_s=30)
+        fetch = CountingFetch()
+        cache.call(fetch, {"device_id": "printer01"})
+        clock.advance(31)
+        cache.call(fetch, {"device_id": "printer01"})
+        assert fetch.calls == 2
+        assert cache.get_stats()["misses"] == 2
+
+    def test_different_arguments_are_separate_entries(self, clock):
+        cache = ToolCache("check_device_status", ttl_s=30)
+        fetch = CountingFetch()
+        cache.call(fetch, {"device_id": "printer01"})
+        cache.call(fetch, {"device_id": "printer02"})
+        assert fetch.calls == 2
+
+    def test_least_recently_used_entry_is_evicted(self, clock):
+        cache = ToolCache("check_device_status", ttl_s=30, max_entries=2)
+        fetch = CountingFetch()
+        for device_id in ("printer01", "printer02"):
+            cache.call(fetch, {"device_id": device_id})
+        cache.call(fetch, {"device_id": "printer01"})
+        cache.call(fetch, {"device_id": "server01"})
+
+        cache.call(fetch, {"device_id": "printer01"})
+        assert fetch.calls == 3
+        cache.call(fetch, {"device_id": "printer02"})
+        assert fetch.calls == 4
+        assert cache.get_stats()["entries"] == 2
+
+    def test_invalidate(self, clock):
+        cache = ToolCache("check_device_status", ttl_s=30)
+        fetch = CountingFetch()
+        cache.call(fetch, {"device_id": "printer01"})
+        cache.call(fetch, {"device_id": "printer02"})
+        cache.invalidate({"device_id": "printer01"})
+        cache.call(fetch, {"device_id": "printer01"})
+        cache.call(fetch, {"device_id": "printer02"})
+        assert fetch.calls == 3
+        cache.invalidate()
+        assert cache.get_stats()["entries"] == 0
+
+    def test_failed_fetch_is_not_cached(self, clock):
+        cache = ToolCache("check_device_status", ttl_s=30)
+
+        def failing():
+            raise ConnectionError("inventory unavailable")
+
+        with pytest.raises(ConnectionError):
+            cache.call(failing, {"device_id": "printer01"})
+        assert cache.call(CountingFetch("recovered"), {"device_id": "printer01"}) == "recovered"
+
+    def test_custom_key(self, clock):
+        cache = ToolCache("search_it_solutions", ttl_s=600, key=lambda args: args["keywords"].lower())
+        fetch = CountingFetch()
+        cache.call(fetch, {"keywords": "VPN"})
+        cache.call(fetch, {"keywords": "vpn"})
+        assert fetch.calls == 1
+
+
+@pytest.mark.unit
+class TestToolCacheSingleFlight:
+    """Concurrent calls with the same key share one fetch."""
+
+    CALLERS = 8
+
+    def run_concurrently(self, cache, fetch, started):
+        results, errors = [], []
+
+        def call():
+            try:
+                results.append(cache.call(fetch, {"device_id": "printer01"}))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(self.CALLERS)]
+        for thread in threads:
+            thread.start()
+        assert started.wait(timeout=5)
+        return threads, results, errors
+
+    def wait_for_followers(self, cache):
+        # The leader is inside fetch(); release it once everyone else has joined
+        for _ in range(5000):
+            if cache.get_stats()["coalesced"] == self.CALLERS - 1:
+                return
+            time.sleep(0.001)
+        raise AssertionError("callers did not join the in-flight fetch")
+
+    def test_one_fetch_for_concurrent_callers(self):
+        cache = ToolCache("check_device_status", ttl_s=30)
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            started.set()
+            release.wait(timeout=5)
+            return {"status": "Online"}
+
+        threads, results, errors = self.run_concurrently(cache, fetch, started)
+        self.wait_for_followers(cache)
+        release.set()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert len(calls) == 1
+        assert errors == []
+        assert results == [{"status": "Online"}] * self.CALLERS
+        stats = cache.get_stats()
+        assert (stats["misses"], stats["coalesced"]) == (1, self.CALLERS - 1)
+
+    def test_waiters_get_the_leaders_error(self):
+        cache = ToolCache("check_device_status", ttl_s=30)
+        started, release = threading.Event(), threading.Event()
+
+        def fetch():
+            started.set()
+            release.wait(timeout=5)
+            raise TimeoutError("probe timed out")
+
+        threads, results, errors = self.run_concurrently(cache, fetch, started)
+        self.wait_for_followers(cache)
+        release.set()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert results == []
+        assert len(errors) == self.CALLERS
+        assert all(isinstance(error, TimeoutError) for error in errors)
+        assert cache.get_stats()["entries"] == 0
+
+
+@pytest.mark.unit
+class TestCachedFunctions:
+    """Caches of the registered helpdesk tools."""
+
+    @pytest.fixture
+    def function_caller(self):
+        from rag_system.function_calling import FunctionCaller
+        return FunctionCaller("it_helpdesk")
+
+    def test_solution_search_key_ignores_case_and_order(self, function_caller):
+        first = function_caller.call_function("search_it_solutions", {"keywords": ["VPN", "password"]})
+        second = function_caller.call_function("search_it_solutions", {"keywords": ["password", "vpn "]})
+        assert first == second
+        stats = function_caller.get_cache_stats()["search_it_solutions"]
+        assert (stats["misses"], stats["hits"]) == (1, 1)
+
+    def test_software_key_is_the_catalog_entry(self, function_caller):
+        function_caller.call_function("get_software_info", {"software_name": "MS Office"})
+        function_caller.call_function("get_software_info", {"software_name": "Microsoft Office"})
+        function_caller.call_function("get_software_info", {"software_name": "Photoshop"})
+        stats = function_caller.get_cache_stats()["get_software_info"]
+        assert (stats["misses"], stats["hits"]) == (2, 1)
+
+    def test_prefetch_counts_a_differently_spelled_call_as_used(self, function_caller):
+        prefetch = function_caller.start_prefetch("Is MS Office available?")
+        assert [call.arguments for call in prefetch.calls] == [{"software_name": "ms office"}]
+        record = prefetch.settle([("get_software_info", {"software_name": "Microsoft Office"})], [100.0], 0.0)
+        assert (record.calls, record.used) == (1, 1)
+
+    def test_device_tools_are_not_cached_with_the_poller(self, monkeypatch):
+        from rag_system.function_calling import FunctionCaller
+        monkeypatch.setattr("rag_system.function_calling.poller_enabled", lambda: True)
+        monkeypatch.setattr("rag_system.function_calling.get_device_poller", lambda use_case: object())
+        stats = FunctionCaller("it_helpdesk").get_cache_stats()
+        assert "check_device_status" not in stats
+        assert "find_devices" not in stats
+        assert "get_software_info" in stats
+
+    def test_disabled_by_environment(self, monkeypatch):
+        from rag_system.function_calling import FunctionCaller
+        monkeypatch.setenv("RAG_TOOL_CACHE", "off")
+        assert FunctionCaller("it_helpdesk").get_cache_stats() == {}
+
+
+@pytest.mark.unit
+def test_normalize_arguments_is_order_independent():
+    assert normalize_arguments({"b": 1, "a": "x"}) == normalize_arguments({"a": "x", "b": 1})
+    assert normalize_arguments({"a": "X"}) != normalize_arguments({"a": "x"})
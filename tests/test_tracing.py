@@ -0,0 +1,54 @@
+"""Tests for turn tracing and the OTLP/JSON file exporter."""
+
+import json
+
+import pytest
+
+from rag_system.tracing import FileTraceExporter, start_trace, span, set_exporter
+
+
+@pytest.fixture
+def exporter(tmp_path):
+    exporter = FileTraceExporter(str(tmp_path / "traces.jsonl"))
+    set_exporter(exporter)
+    yield exporter
+    set_exporter(None)
+    exporter.close()
+
+
+@pytest.mark.unit
+class TestFileTraceExporter:
+    """Finished traces are written by the background thread."""
+
+    def test_traces_are_written_on_close(self, exporter):
+        for turn in range(3):
+            with start_trace("chat_turn", turn=turn):
+                with span("retrieval"):
+                    pass
+        exporter.close()
+
+        with open(exporter.path, encoding="utf-8") as f:
+            requests = [json.loads(line) for line in f]
+        assert len(requests) == 3
+        spans = requests[0]["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        assert [s["name"] for s in spans] == ["chat_turn", "retrieval"]
+        assert spans[1]["parentSpanId"] == spans[0]["spanId"]
+        assert exporter.get_stats() == {"exported": 3, "dropped": 0, "write_errors": 0, "queued": 0}
+
+    def test_full_queue_drops_traces(self, tmp_path):
+        exporter = FileTraceExporter(str(tmp_path / "traces.jsonl"), max_queue=1)
+        # Stop the writer so nothing drains the queue
+        exporter.close()
+        with start_trace("chat_turn") as trace:
+            pass
+        exporter.export(trace)
+        exporter.export(trace)
+        assert exporter.get_stats()["dropped"] == 1
+
+    def test_unwritable_file_is_counted(self, tmp_path):
+        exporter = FileTraceExporter(str(tmp_path / "missing" / "traces.jsonl"))
+        with start_trace("chat_turn") as trace:
+            pass
+        exporter.export(trace)
+        exporter.close()
+        assert exporter.get_stats()["write_errors"] == 1
@@ -0,0 +1,68 @@
+"""Tests for token usage attribution."""
+
+import pytest
+
+from rag_system.tracing import start_trace, start_span, end_span, span, current_trace
+from rag_system.usage import UsageTracker, turn_usage, track_late_usage, ABANDONED_STAGE
+
+
+def llm_call(prompt_tokens, completion_tokens):
+    """Record an LLM span with reported usage."""
+    llm = start_span("llm")
+    llm.set_attribute("llm.prompt_tokens", prompt_tokens)
+    llm.set_attribute("llm.completion_tokens", completion_tokens)
+    end_span(llm)
+
+
+@pytest.mark.unit
+class TestTurnUsage:
+    """Usage by stage and waste of one turn."""
+
+    def test_stages_and_waste(self):
+        with start_trace("chat_turn") as trace:
+            with span("function_calling"):
+                llm_call(100, 10)
+            with span("rag"):
+                llm_call(500, 50)
+        usage = turn_usage(trace, {"function_calling": "fall_through"})
+        assert usage["total_tokens"] == 660
+        assert usage["by_stage"]["rag"]["completion_tokens"] == 50
+        assert usage["wasted"]["total_tokens"] == 110
+        assert usage["wasted"]["by_reason"] == {"fall_through": 110}
+
+
+@pytest.mark.unit
+class TestLateUsage:
+    """Calls of abandoned work finishing after the turn."""
+
+    def run_turn(self, tracker, finish_before_tracking):
+        with start_trace("chat_turn") as trace:
+            with span("speculative_rag"):
+                late = start_span("llm")
+                context_trace = current_trace()
+        tracker.add_turn(turn_usage(trace))
+
+        def finish():
+            late.set_attribute("llm.prompt_tokens", 400)
+            late.set_attribute("llm.completion_tokens", 20)
+            late.end_ns = context_trace.now_ns()
+            context_trace.add(late)
+
+        if finish_before_tracking:
+            finish()
+            track_late_usage(trace, tracker, {ABANDONED_STAGE: "speculation_abandoned"})
+        else:
+            track_late_usage(trace, tracker, {ABANDONED_STAGE: "speculation_abandoned"})
+            finish()
+        return trace
+
+    @pytest.mark.parametrize("finish_before_tracking", [False, True])
+    def test_late_calls_count_as_wasted(self, finish_before_tracking):
+        tracker = UsageTracker()
+        trace = self.run_turn(tracker, finish_before_tracking)
+        stats = tracker.get_stats()
+        assert stats["turns"] == 1
+        assert stats["total_tokens"] == stats["wasted"]["total_tokens"] == 420
+        assert stats["by_stage"][ABANDONED_STAGE]["calls"] == 1
+        # The trace itself is unchanged
+        assert [s.name for s in trace.spans] == ["chat_turn", "speculative_rag"]